@@ -7,13 +7,17 @@ from django.db.models import ProtectedError
 from registration.models import RegistrationProfile
 
 from .mtmodel import ConcurrencyError
-from .core.models import Product, ProductVersion, ApiKey
+from .core.models import Product, ProductVersion, ApiKey, IndexGeneration
 from .core.auth import User, Role, Permission
 from .environments.models import Environment, Profile, Element, Category
-from .execution.models import Run, RunSuite, RunCaseVersion, Result, StepResult
+from .execution.models import (
+    Run, RunSuite, RunCaseVersion, Result, StepResult, RunResultSummary,
+    LatestResult)
+from .jobs.models import Job
 from .library.bulk import BulkParser
 from .library.models import (
-    Case, CaseVersion, CaseAttachment, CaseStep, Suite, SuiteCase)
+    Case, CaseVersion, CaseAttachment, CaseStep, Suite, SuiteCase,
+    CaseVersionSearchText)
 from .tags.models import Tag
 
 # version of the REST endpoint APIs for TastyPie
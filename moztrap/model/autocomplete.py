@@ -0,0 +1,142 @@
+"""
+In-process trigram indexes of object names, for autocomplete.
+
+Each process builds its own copy of an index from the database on first use.
+Saving or deleting an indexed object bumps the index's generation, a counter
+in the database (``core.IndexGeneration``) that commits or rolls back with
+the change itself; a process rebuilds its copy when it sees a new generation.
+Copies are also rebuilt after ``NameIndex.MAX_AGE`` seconds, which bounds how
+long changes that bypass ``save`` (bulk updates, cascading deletes) go
+unnoticed.
+
+"""
+from collections import defaultdict, namedtuple
+import heapq
+import time
+
+
+
+Suggestion = namedtuple("Suggestion", ["id", "name", "scope", "start"])
+
+
+
+class NameIndex(object):
+    """
+    A per-process, ranked substring index of names.
+
+    ``load`` is a callable returning an iterable of ``(id, name, scope)``
+    rows, where ``scope`` is e.g. a product id, or None for global rows.
+
+    """
+    # seconds after which a process rebuilds its copy regardless
+    MAX_AGE = 600
+
+
+    def __init__(self, key, load):
+        self.key = key
+        self.load = load
+        # (generation, build time, _Trigrams) of this process' copy
+        self._built = (None, None, None)
+
+
+    def generation(self):
+        """Return current generation token of the index."""
+        # core.models imports (via environments) this module
+        from .core.models import IndexGeneration
+        return unicode(IndexGeneration.current(self.key))
+
+
+    def invalidate(self):
+        """Bump the generation; all processes rebuild once it commits."""
+        from .core.models import IndexGeneration
+        IndexGeneration.bump(self.key)
+
+
+    def rows(self):
+        """Return list of all ``(id, name, scope)`` rows in the index."""
+        return self._index().rows
+
+
+    def suggest(self, text, scope=None, limit=None):
+        """
+        Return list of ``Suggestion`` for names containing ``text``.
+
+        Matching is case-insensitive. With ``scope``, only rows of that scope
+        or global rows are returned. Names starting with ``text`` rank first,
+        then names with a word starting with ``text``, then other matches;
+        shorter names first within each. At most ``limit`` are returned.
+
+        """
+        return self._index().suggest(text, scope, limit)
+
+
+    def _index(self):
+        """Return this process' copy of the index, (re)built if stale."""
+        # read the generation before loading rows, so that changes committed
+        # while loading mark the new copy stale
+        generation = self.generation()
+        built_generation, built_on, index = self._built
+        if (index is None or built_generation != generation or
+                time.time() - built_on > self.MAX_AGE):
+            built_on = time.time()
+            index = _Trigrams(self.load())
+            self._built = (generation, built_on, index)
+        return index
+
+
+
+def trigrams(text):
+    """Return set of three-character substrings of ``text``."""
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+
+class _Trigrams(object):
+    """Rows indexed by the trigrams of their lowercased names."""
+    def __init__(self, rows):
+        self.rows = [tuple(row) for row in rows]
+        self.names = [name.lower() for id, name, scope in self.rows]
+        self.index = defaultdict(set)
+        for i, name in enumerate(self.names):
+            for gram in trigrams(name):
+                self.index[gram].add(i)
+
+
+    def candidates(self, text):
+        """Return iterable of row indexes whose name may contain ``text``."""
+        grams = trigrams(text)
+        if not grams:
+            # too short for trigrams; check every name
+            return xrange(len(self.rows))
+        postings = sorted(
+            (self.index.get(gram, set()) for gram in grams), key=len)
+        return postings[0].intersection(*postings[1:])
+
+
+    def suggest(self, text, scope, limit):
+        """See ``NameIndex.suggest``."""
+        text = text.lower()
+        matches = []
+        for i in self.candidates(text):
+            if scope is not None and self.rows[i][2] not in (None, scope):
+                continue
+            name = self.names[i]
+            start = name.find(text)
+            if start == -1:
+                continue
+            if start == 0:
+                rank = 0
+            elif not name[start - 1].isalnum():
+                rank = 1
+            else:
+                rank = 2
+            matches.append((rank, len(name), name, i, start))
+
+        if limit:
+            matches = heapq.nsmallest(limit, matches)
+        else:
+            matches.sort()
+        return [
+            Suggestion(*(self.rows[i] + (start,)))
+            for rank, length, name, i, start in matches
+            ]
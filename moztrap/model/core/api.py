@@ -65,6 +65,44 @@ class ProductVersionResource(MTResource):
         return ["product"]
 
 
+    def obj_create(self, bundle, request=None, **kwargs):
+        """Create productversion; optionally clone another's envs and cases.
+
+        If ``clone_from`` is the URI of a productversion of the same product,
+        its environments are copied and a job is queued to copy its cases;
+        the id of that job is returned as ``copy_job``.
+
+        """
+        request = request or bundle.request
+        clone_from_uri = bundle.data.pop("clone_from", None)
+        clone_from = None
+        if clone_from_uri:
+            try:
+                clone_from = ProductVersion.objects.get(
+                    pk=self._id_from_uri(clone_from_uri))
+            except (ProductVersion.DoesNotExist, ValueError, IndexError):
+                raise ImmediateHttpResponse(
+                    response=http.HttpBadRequest(
+                        "clone_from must be the URI of a productversion."))
+            product_id = unicode(
+                bundle.data.get("product", "")).rstrip("/").split("/")[-1]
+            if product_id != unicode(clone_from.product_id):
+                raise ImmediateHttpResponse(
+                    response=http.HttpBadRequest(
+                        "Cases can only be copied from a version of the "
+                        "same product."))
+
+        bundle = super(ProductVersionResource, self).obj_create(
+            bundle=bundle, request=request, **kwargs)
+
+        if clone_from is not None:
+            bundle.obj.environments.add(*clone_from.environments.all())
+            job = bundle.obj.queue_copy_cases(clone_from, user=request.user)
+            bundle.data["copy_job"] = job.id
+
+        return bundle
+
+
     def obj_update(self, bundle, request=None, **kwargs):
         """Avoid concurrency error caused by the setting of latest_version"""
         request = request or bundle.request
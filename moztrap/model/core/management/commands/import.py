@@ -35,6 +35,7 @@ from django.core.management.base import BaseCommand, CommandError
 from optparse import make_option
 import json
 import os.path
+import time
 
 from moztrap.model.core.models import Product, ProductVersion
 from moztrap.model.library.importer import Importer
@@ -56,6 +57,44 @@ class Command(BaseCommand):
             default=False,
             help="Force importing cases, even if the case name is a"
             " duplicate"),
+        make_option(
+            "-b",
+            "--bulk",
+            action='store_true',
+            dest="bulk",
+            default=False,
+            help="Import cases with multi-row inserts; much faster for"
+            " large files"),
+        make_option(
+            "-s",
+            "--stream",
+            action='store_true',
+            dest="stream",
+            default=False,
+            help="Read suites and cases from the file incrementally, and"
+            " commit them in batches"),
+        make_option(
+            "--batch-size",
+            type="int",
+            dest="batch_size",
+            default=500,
+            help="Number of suites and cases per batch with --stream"
+            " (default 500)"),
+        make_option(
+            "--resume",
+            type="int",
+            dest="resume",
+            default=0,
+            help="With --stream, skip this many suites and cases, to resume"
+            " an import after its last committed batch"),
+        make_option(
+            "-w",
+            "--workers",
+            type="int",
+            dest="workers",
+            default=0,
+            help="Validate and prepare cases in this many processes, while"
+            " this process writes them; implies --stream and --bulk"),
 
         )
 
@@ -64,6 +103,13 @@ class Command(BaseCommand):
             raise CommandError("Usage: {0}".format(self.args))
 
         force_dupes = options.get("force_dupes")
+        bulk = options.get("bulk")
+        workers = options.get("workers")
+        stream = options.get("stream") or bool(workers)
+        resume = options.get("resume") or 0
+
+        if resume and not stream:
+            raise CommandError("--resume requires --stream")
 
         try:
             product = Product.objects.get(name=args[0])
@@ -88,26 +134,37 @@ class Command(BaseCommand):
                         files.append("{0}/{1}".format(args[2], file))
             else:
                 files.append(args[2])
+            if resume and len(files) > 1:
+                raise CommandError("--resume requires a single file")
 
             results_for_files = None
             for file in files:
                 with open(file) as fh:
 
-                    # try to import this as JSON
-                    try:
-                        case_data = json.load(fh)   # pragma: no branch
-                    except ValueError as e:
-                        raise CommandError(
-                            "Could not parse JSON: {0}: {1}".format(
-                                str(e),
-                                fh,
-                                ))
-
-                    # @@@: support importing as CSV.  Rather than returning an
-                    # error above, just try CSV import instead.
-
-                    result = Importer().import_data(
-                        product_version, case_data, force_dupes=force_dupes)
+                    if stream:
+                        result = self.import_stream(
+                            product_version, fh, **options)
+                    else:
+                        # try to import this as JSON
+                        try:
+                            case_data = json.load(fh)   # pragma: no branch
+                        except ValueError as e:
+                            raise CommandError(
+                                "Could not parse JSON: {0}: {1}".format(
+                                    str(e),
+                                    fh,
+                                    ))
+
+                        # @@@: support importing as CSV.  Rather than
+                        # returning an error above, just try CSV import
+                        # instead.
+
+                        result = Importer().import_data(
+                            product_version,
+                            case_data,
+                            force_dupes=force_dupes,
+                            bulk=bulk,
+                            )
 
                     # append this result to those for any of the other files.
                     if not results_for_files:
@@ -128,3 +185,54 @@ class Command(BaseCommand):
                 'Could not open "{0}", I/O error {1}: {2}'.format(
                     args[2], errno, strerror)
                 )
+
+
+    def import_stream(self, product_version, fh, **options):
+        """
+        Import file object incrementally, in batches; return ImportResult.
+
+        Reports progress with verbosity 2, throughput with ``workers``, and
+        on failure reports how many items were committed, to resume from.
+
+        """
+        verbosity = int(options.get("verbosity", 1))
+        workers = options.get("workers")
+        start_num = options.get("resume") or 0
+        committed = [start_num]
+        start_time = time.time()
+
+        def batch_done(num):
+            committed[0] = num
+            if verbosity > 1:
+                self.stdout.write("Committed {0} items.\n".format(num))
+
+        try:
+            result = Importer().import_stream(
+                product_version,
+                fh,
+                batch_size=options.get("batch_size") or 500,
+                skip=committed[0],
+                force_dupes=options.get("force_dupes"),
+                bulk=options.get("bulk"),
+                callback=batch_done,
+                workers=workers,
+                )
+        except ValueError as e:
+            raise CommandError(
+                "Could not parse JSON: {0}: {1}\n"
+                "Resume with --resume={2}".format(str(e), fh, committed[0]))
+        except Exception:
+            self.stderr.write(
+                "Import failed. Resume with --resume={0}\n".format(
+                    committed[0]))
+            raise
+
+        if workers and verbosity:
+            elapsed = time.time() - start_time
+            num = committed[0] - start_num
+            self.stdout.write(
+                "Read {0} items in {1:.1f} seconds ({2:.0f} items/second) "
+                "with {3} workers.\n".format(
+                    num, elapsed, num / elapsed if elapsed else 0, workers))
+
+        return result
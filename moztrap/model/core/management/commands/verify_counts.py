@@ -0,0 +1,54 @@
+"""
+Verify (and optionally repair) the denormalized counts on suites and runs.
+
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from moztrap.model.execution.models import Run
+from moztrap.model.library.models import Suite
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Report suites and runs whose denormalized case and environment "
+        "counts are off; recount them all with --repair.")
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            "--repair",
+            action="store_true",
+            dest="repair",
+            default=False,
+            help="Recount all denormalized counts.",
+            ),
+        )
+
+    models = [Suite, Run]
+
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get("verbosity", 1))
+        repair = options.get("repair")
+
+        num = 0
+        for model in self.models:
+            name = model._meta.object_name
+            for pk, field, stored, actual in model.stale_counts():
+                num += 1
+                if verbosity:
+                    self.stdout.write(
+                        "{0} {1}: {2} is {3}, should be {4}.\n".format(
+                            name, pk, field, stored, actual))
+
+        if repair and num:
+            with transaction.commit_on_success():
+                for model in self.models:
+                    model.update_counts()
+            if verbosity:
+                self.stdout.write("Repaired {0} stale counts.\n".format(num))
+        elif verbosity:
+            self.stdout.write("Found {0} stale counts.\n".format(num))
@@ -5,12 +5,13 @@ Core MozTrap models (Product).
 import uuid
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connection, models
 
 from pkg_resources import parse_version
 from preferences.models import Preferences
 
 from ..environments.models import HasEnvironmentsModel
+from ..jobs.models import Job
 from ..mtmodel import MTModel, MTManager, TeamModel
 from ..auth.models import Role, User
 
@@ -52,18 +53,32 @@ class Product(MTModel, TeamModel):
         ``latest`` flag.
 
         """
-        ordered = sorted(self.versions.all(), key=by_version)
-        for i, version in enumerate(ordered, 1):
-            version.order = i
-            version.latest = (i == len(ordered))
-            version.save(force_update=True, skip_reorder=True, notrack=True)
-            if version == update_instance:
-                update_instance.order = version.order
-                update_instance.latest = version.latest
+        ordered = sorted(self.versions.only("id", "version"), key=by_version)
+        if ordered:
+            qn = connection.ops.quote_name
+            ids = [v.id for v in ordered]
+            connection.cursor().execute(
+                """UPDATE {0}
+                SET {1} = CASE id {2} END,
+                    latest = (id = {3}),
+                    cc_version = cc_version + 1
+                WHERE id IN ({4})
+                """.format(
+                    qn(ProductVersion._meta.db_table),
+                    qn("order"),
+                    " ".join(
+                        "WHEN {0} THEN {1}".format(pv_id, i)
+                        for i, pv_id in enumerate(ids, 1)),
+                    ids[-1],
+                    ",".join(str(pv_id) for pv_id in ids),
+                    )
+                )
+            if update_instance is not None and update_instance.id in ids:
+                update_instance.order = ids.index(update_instance.id) + 1
+                update_instance.latest = (update_instance.id == ids[-1])
                 update_instance.cc_version += 1
-        # now we have to update latest caseversions too, @@@ too slow?
-        for case in self.cases.all():
-            case.set_latest_version()
+        # now we have to update latest caseversions too
+        self.__class__.cases.related.model.update_latest_versions(product=self)
 
 
 
@@ -168,6 +183,40 @@ class ProductVersion(MTModel, TeamModel, HasEnvironmentsModel):
         return super(ProductVersion, self).clone(*args, **kwargs)
 
 
+    def clone_with_cases(self, user=None):
+        """
+        Clone ProductVersion; queue a job to copy latest caseversions to it.
+
+        The latest version of each case of the product is copied. Returns the
+        clone; its cases appear as the job makes progress.
+
+        """
+        clone = self.clone(user=user)
+        clone.queue_copy_cases(user=user)
+        return clone
+
+
+    def queue_copy_cases(self, source=None, user=None):
+        """
+        Queue a job to copy caseversions of ``source`` here; return the job.
+
+        If ``source`` is ``None``, the latest version of each case of the
+        product is copied. Only cases without a version in this
+        productversion are copied.
+
+        """
+        source_id = source.id if source is not None else None
+        return Job.enqueue(
+            "moztrap.model.library.jobs.copy_productversion_cases",
+            key="productversion-copy-cases-{0}-{1}".format(
+                source_id or "latest", self.id),
+            user=user,
+            source_id=source_id,
+            target_id=self.id,
+            user_id=user.id if user else None,
+            )
+
+
 
 def by_version(productversion):
     """
@@ -226,3 +275,43 @@ class ApiKey(MTModel):
 
         return cls.objects.create(
             owner=owner, user=user, key=unicode(uuid.uuid4()))
+
+
+
+class IndexGeneration(models.Model):
+    """
+    Generation counter of a per-process index (see ``model.autocomplete``).
+
+    A counter is bumped in the same transaction as the change to the indexed
+    data, so other processes see the new generation exactly when they can see
+    the change.
+
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    generation = models.PositiveIntegerField(default=0)
+
+
+    def __unicode__(self):
+        return u"{0} ({1})".format(self.name, self.generation)
+
+
+    @classmethod
+    def current(cls, name):
+        """Return current generation of ``name``; 0 if never bumped."""
+        generations = list(
+            cls.objects.filter(name=name).values_list(
+                "generation", flat=True)[:1])
+        return generations[0] if generations else 0
+
+
+    @classmethod
+    def bump(cls, name):
+        """Increment the generation of ``name`` in the current transaction."""
+        qn = connection.ops.quote_name
+        connection.cursor().execute(
+            """INSERT INTO {0} ({1}, {2}) VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE {2} = {2} + 1
+            """.format(
+                qn(cls._meta.db_table), qn("name"), qn("generation")),
+            [name],
+            )
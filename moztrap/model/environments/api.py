@@ -142,10 +142,11 @@ class EnvironmentResource(MTResource):
         ``PATCH`` is poorly defined with regards to RESTfulness, we are
         overloading ``PATCH`` to take a single request that performs
         combinatorics and creates multiple objects.
+
+        The environments are created in bulk, skipping combinations the
+        profile already has.
         """
-        import itertools
         from django.db import transaction
-        from tastypie.utils import dict_strip_unicode_keys
 
         deserialized = self.deserialize(
             request,
@@ -163,31 +164,29 @@ class EnvironmentResource(MTResource):
 
         # do the combinatorics
         elem_lists = []
+        category_ids = []
         for cat in categories:
             # do some type validation / variation
             if isinstance(cat, basestring):
                 # simple case of create all the combinations
-                cat = Category.objects.filter(id=self._id_from_uri(cat))
-                elem_list = Element.objects.filter(category=cat)
+                category_id = self._id_from_uri(cat)
+                elem_list = Element.objects.filter(category=category_id)
             elif isinstance(cat, dict):
                 # we must be working with at least one partial category
-                category = Category.objects.filter(
-                    id=self._id_from_uri(cat['category']))
-                elem_list = Element.objects.filter(category=category)
+                category_id = self._id_from_uri(cat['category'])
+                elem_list = Element.objects.filter(category=category_id)
                 if 'exclude' in cat:
                     # exclude some element(s) from the combinations
                     exclude_uris = cat['exclude']
                     exclude_ids = [int(
                         self._id_from_uri(x)) for x in exclude_uris]
-                    elem_list = [elem for elem in elem_list
-                                 if elem.id not in exclude_ids]
+                    elem_list = elem_list.exclude(id__in=exclude_ids)
                 elif 'include' in cat:
                     # include only a few elements in the combinations
                     include_uris = cat['include']
                     include_ids = [int(
                         self._id_from_uri(x)) for x in include_uris]
-                    elem_list = [elem for elem in elem_list
-                                 if elem.id in include_ids]
+                    elem_list = elem_list.filter(id__in=include_ids)
                 else:
                     # don't worry about this,
                     # it'll act like a list of categories
@@ -199,22 +198,31 @@ class EnvironmentResource(MTResource):
                     response=http.HttpBadRequest(error_msg))
 
             # save off the elements from this category that will be used
-            elem_lists.append(elem_list)
+            category_ids.append(category_id)
+            elem_lists.append(elem_list.values_list("id", flat=True))
 
-        # create all the combinations of elements from categories
-        combinatorics = itertools.product(*elem_lists)
+        if len(set(category_ids)) != len(category_ids):
+            error_msg = "Elements must each belong to a different Category."
+            logger.error(error_msg)
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(error_msg))
+
+        profile = None
+        if deserialized.get('profile'):
+            profile = ProfileResource().get_via_uri(
+                deserialized['profile'], request=request)
 
-        # do the creation
+        bundle = self.build_bundle(
+            obj=Environment(profile=profile), request=request)
+        self.authorized_create_detail([], bundle)
+
+        # create all the combinations of elements from categories
         with transaction.commit_on_success():
-            for combo in combinatorics:
-                deserialized['elements'] = combo
-                bundle = self.build_bundle(
-                    data=dict_strip_unicode_keys(deserialized))
-                bundle.request.META['REQUEST_METHOD'] = 'PATCH'
-                if getattr(request, 'user', None):
-                    bundle.request.user = request.user
-                self.is_valid(bundle)
-                self.obj_create(bundle, request=request)
+            Environment.generate(
+                elem_lists,
+                profile=profile,
+                user=getattr(request, 'user', None),
+                )
 
         # don't try to reply with data, the request doesn't
         # really match the results.
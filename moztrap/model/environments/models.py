@@ -5,8 +5,10 @@ Models for environments.
 import itertools
 from collections import defaultdict
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.query import QuerySet
 
+from ..autocomplete import NameIndex
 from ..mtmodel import MTModel
 
 
@@ -38,13 +40,12 @@ class Profile(MTModel):
         """
         by_category = defaultdict(list)
         for element in elements:
-            by_category[element.category].append(element)
+            by_category[element.category_id].append(element)
 
-        new = cls.objects.create(name=name, **kwargs)
-
-        for element_list in itertools.product(*by_category.values()):
-            e = Environment.objects.create(profile=new)
-            e.elements.add(*element_list)
+        with transaction.commit_on_success():
+            new = cls.objects.create(name=name, **kwargs)
+            Environment.generate(
+                by_category.values(), profile=new, user=kwargs.get("user"))
 
         return new
 
@@ -101,7 +102,9 @@ class Category(MTModel):
                     self.name),
                 list(Environment.objects.filter(elements__category=self).all())
                 )
-        return super(Category, self).delete(*args, **kwargs)
+        super(Category, self).delete(*args, **kwargs)
+        # its elements were deleted with it
+        Element.name_index.invalidate()
 
 
 
@@ -113,12 +116,30 @@ class Element(MTModel):
     name = models.CharField(db_index=True, max_length=200)
     category = models.ForeignKey(Category, related_name="elements")
 
+    # for autocomplete; scoped by category
+    name_index = NameIndex(
+        "elements",
+        lambda: Element.objects.values_list("id", "name", "category_id"),
+        )
+
 
     def __unicode__(self):
         """Return unicode representation."""
         return self.name
 
 
+    def save(self, *args, **kwargs):
+        """Save element, invalidating the name index."""
+        super(Element, self).save(*args, **kwargs)
+        self.name_index.invalidate()
+
+
+    def undelete(self, *args, **kwargs):
+        """Undelete element, invalidating the name index."""
+        super(Element, self).undelete(*args, **kwargs)
+        self.name_index.invalidate()
+
+
     class Meta:
         ordering = ["name"]
 
@@ -139,7 +160,8 @@ class Element(MTModel):
                     self.name),
                 list(self.environments.all())
                 )
-        return super(Element, self).delete(*args, **kwargs)
+        super(Element, self).delete(*args, **kwargs)
+        self.name_index.invalidate()
 
 
 
@@ -181,6 +203,69 @@ class Environment(MTModel):
         return iter(self.elements.order_by("category__name"))
 
 
+    # environments inserted per statement by ``generate``
+    GENERATE_CHUNK_SIZE = 500
+
+
+    @classmethod
+    def generate(cls, element_lists, profile=None, user=None):
+        """
+        Create an environment for each combination of one element per list.
+
+        ``element_lists`` is a sequence of lists of elements (or element
+        ids), typically one per category. Combinations that are already an
+        environment in ``profile`` (or, without one, of no profile) are
+        skipped. Environments and their element links are bulk-inserted,
+        ``GENERATE_CHUNK_SIZE`` environments at a time, so the number of
+        queries depends on the number of chunks, not of combinations.
+        Returns the number of environments created.
+
+        """
+        element_lists = [
+            [getattr(e, "id", e) for e in elements]
+            for elements in element_lists
+            ]
+        through = cls.elements.through
+        profile_id = profile.id if profile is not None else None
+
+        existing = defaultdict(set)
+        for env_id, element_id in through.objects.filter(
+                environment__profile=profile_id,
+                environment__deleted_on__isnull=True).values_list(
+                "environment_id", "element_id"):
+            existing[env_id].add(element_id)
+        seen = set(frozenset(ids) for ids in existing.values())
+
+        combos = []
+        for combo in itertools.product(*element_lists):
+            combo = frozenset(combo)
+            if combo and combo not in seen:
+                seen.add(combo)
+                combos.append(combo)
+
+        if not combos:
+            return 0
+
+        # ids are read back from the inserted rows before any element links
+        # refer to them
+        envs = cls.objects.bulk_create_with_ids(
+            [cls(profile_id=profile_id) for combo in combos],
+            user=user,
+            batch_size=cls.GENERATE_CHUNK_SIZE,
+            )
+        for i in range(0, len(combos), cls.GENERATE_CHUNK_SIZE):
+            chunk = slice(i, i + cls.GENERATE_CHUNK_SIZE)
+            through.objects.bulk_create(
+                [
+                    through(environment_id=env.id, element_id=element_id)
+                    for env, combo in zip(envs[chunk], combos[chunk])
+                    for element_id in combo
+                    ]
+                )
+
+        return len(combos)
+
+
     def clone(self, *args, **kwargs):
         """Clone environment, including element relationships."""
         kwargs.setdefault("cascade", ["elements"])
@@ -273,18 +358,103 @@ class HasEnvironmentsModel(models.Model):
         return {}
 
 
+    # objects whose environments are changed per statement
+    ENVS_CHUNK_SIZE = 1000
+
+
+    @classmethod
+    def _envs_sql(cls):
+        """Return quoted (through table, object column, environment column)."""
+        qn = connection.ops.quote_name
+        field = cls.environments.field
+        return (
+            qn(cls.environments.through._meta.db_table),
+            qn(field.m2m_column_name()),
+            qn(field.m2m_reverse_name()),
+            )
+
+
+    @classmethod
+    def _env_chunks(cls, objs, envs):
+        """
+        Return (env id list SQL, iterator of object id list SQL chunks).
+
+        ``objs`` may be a queryset, or a list of objects or ids; ``envs`` a
+        list of environments or ids.
+
+        """
+        if isinstance(objs, QuerySet):
+            obj_ids = list(objs.values_list("id", flat=True))
+        else:
+            obj_ids = [getattr(o, "id", o) for o in objs]
+        env_ids = ",".join(str(int(getattr(e, "id", e))) for e in envs)
+        chunks = (
+            ",".join(
+                str(int(pk)) for pk in obj_ids[i:i + cls.ENVS_CHUNK_SIZE])
+            for i in range(0, len(obj_ids), cls.ENVS_CHUNK_SIZE)
+            )
+        return env_ids, chunks
+
+
+    @classmethod
+    def _add_envs(cls, objs, envs):
+        """
+        Add one or more environments to one or more objects of this class.
+
+        Pairs are inserted with one ``INSERT ... SELECT`` per
+        ``ENVS_CHUNK_SIZE`` objects, skipping those that already exist; then
+        the addition is cascaded the same way, a model class at a time.
+
+        """
+        if not envs:
+            return
+        table, obj_col, env_col = cls._envs_sql()
+        env_ids, chunks = cls._env_chunks(objs, envs)
+        cursor = connection.cursor()
+        for obj_ids in chunks:
+            cursor.execute(
+                """INSERT INTO {t} ({o}, {e})
+                SELECT obj.id, env.id
+                FROM {objects} AS obj, {environments} AS env
+                WHERE obj.id IN ({obj_ids}) AND env.id IN ({env_ids})
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {t} AS oe
+                        WHERE oe.{o} = obj.id AND oe.{e} = env.id)
+                """.format(
+                    t=table,
+                    o=obj_col,
+                    e=env_col,
+                    objects=connection.ops.quote_name(cls._meta.db_table),
+                    environments=connection.ops.quote_name(
+                        Environment._meta.db_table),
+                    obj_ids=obj_ids,
+                    env_ids=env_ids,
+                    )
+                )
+        for model, instances in cls.cascade_envs_to(objs, adding=True).items():
+            model._add_envs(instances, envs)
+
+
     @classmethod
     def _remove_envs(cls, objs, envs):
-        """Remove one or environments from one or more objects of this class."""
+        """
+        Remove one or more environments from one or more objects of this class.
+
+        The removal is cascaded first, a model class at a time; then pairs
+        are deleted with one ``DELETE`` per ``ENVS_CHUNK_SIZE`` objects.
+
+        """
+        if not envs:
+            return
         for model, instances in cls.cascade_envs_to(objs, adding=False).items():
             model._remove_envs(instances, envs)
-        m2m_reverse_name = cls.environments.field.related_query_name()
-        cls.environments.through._base_manager.filter(
-            **{
-                "{0}__in".format(m2m_reverse_name): objs,
-                "environment__in": envs
-                }
-              ).delete()
+        table, obj_col, env_col = cls._envs_sql()
+        env_ids, chunks = cls._env_chunks(objs, envs)
+        cursor = connection.cursor()
+        for obj_ids in chunks:
+            cursor.execute(
+                "DELETE FROM {0} WHERE {1} IN ({2}) AND {3} IN ({4})".format(
+                    table, obj_col, obj_ids, env_col, env_ids))
 
 
     def remove_envs(self, *envs):
@@ -294,9 +464,4 @@ class HasEnvironmentsModel(models.Model):
 
     def add_envs(self, *envs):
         """Add one or more environments to this object's profile."""
-        # @@@ optimize this to reduce queries once we have bulk insert in 1.4
-        self.environments.add(*envs)
-        for model, instances in self.cascade_envs_to(
-                [self], adding=True).items():
-            for instance in instances:
-                instance.add_envs(*envs)
+        self._add_envs([self], envs)
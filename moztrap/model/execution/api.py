@@ -1,4 +1,3 @@
-from django.db.models import Count
 from tastypie.resources import ModelResource, ALL_WITH_RELATIONS
 from tastypie import http, fields
 from tastypie.exceptions import ImmediateHttpResponse
@@ -9,6 +8,7 @@ import json
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.http import HttpResponse
 
+from .batch import ResultBatch
 from .models import Run, RunCaseVersion, RunSuite, Result
 from ..mtapi import MTResource, MTApiKeyAuthentication, MTAuthorization
 from ..core.api import (ProductVersionResource, ProductResource,
@@ -312,6 +312,72 @@ class ResultResource(ModelResource):
 
 
 
+class ResultBatchResource(ModelResource):
+    """
+    Endpoint for submitting a large batch of results at once.
+
+    This endpoint is write only and accepts POSTs of result objects formed
+    as for ``ResultResource``.  The whole batch is validated before anything
+    is saved; if any result object is invalid, nothing is saved and the
+    response is a 400 listing the errors by index in ``objects``::
+
+        {
+            "errors": [
+                {"index": 3, "error": "bad result object data missing key: case"}
+            ]
+        }
+
+    Otherwise the response is a 201 with the number of results created.
+
+    """
+
+    class Meta:
+        queryset = Result.objects.all()
+        resource_name = "resultbatch"
+        list_allowed_methods = ["post"]
+        detail_allowed_methods = []
+
+        authentication = MTApiKeyAuthentication()
+        authorization = ReportResultsAuthorization()
+
+
+    def post_list(self, request, **kwargs):
+        """Validate and save the posted batch of results."""
+        deserialized = self.deserialize(
+            request,
+            request.body,
+            format=request.META.get("CONTENT_TYPE", "application/json"),
+            )
+        try:
+            items = deserialized["objects"]
+        except (KeyError, TypeError):
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(
+                    "Submitted data must have an 'objects' list."))
+        if not isinstance(items, list):
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest("'objects' must be a list."))
+
+        bundle = self.build_bundle(obj=Result(), request=request)
+        self.authorized_create_detail([], bundle)
+
+        batch = ResultBatch(items, user=request.user)
+        if not batch.is_valid():
+            return self.create_response(
+                request,
+                {"errors": batch.errors},
+                response_class=http.HttpBadRequest,
+                )
+
+        created = batch.save()
+        return self.create_response(
+            request,
+            {"created": created},
+            response_class=http.HttpCreated,
+            )
+
+
+
 class RunSuiteResource(MTResource):
     """
     Create, Read, Update and Delete capabilities for RunSuite.
@@ -381,7 +447,7 @@ class SuiteSelectionResource(BaseSelectionResource):
     class Meta:
         queryset = Suite.objects.all().select_related(
             "created_by",
-            ).annotate(case_count=Count("cases"))
+            )
 
         list_allowed_methods = ['get']
         fields = ["id", "name", "created_by"]
@@ -0,0 +1,346 @@
+"""
+Batch submission of results, using set-based writes.
+
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from ..environments.models import Environment
+from ..library.models import CaseStep
+from ..mtmodel import utcnow
+from .models import (
+    RunCaseVersion, Result, StepResult, LatestResult, RunResultSummary)
+
+
+
+class ResultBatch(object):
+    """
+    A batch of results submitted by one user.
+
+    Items are dictionaries formed like those accepted by ``ResultResource``::
+
+        {
+            "case": "326",
+            "environment": "23",
+            "run_id": "1",
+            "status": "failed",
+            "comment": "why u no pass?",
+            "stepnumber": 1,
+            "bug": "http://www.deathvalleydogs.com"
+        }
+
+    Instantiate a ``ResultBatch`` and check ``is_valid`` before calling
+    ``save``::
+
+        batch = ResultBatch(items, user=user)
+        if batch.is_valid():
+            created = batch.save()
+        else:
+            errors = batch.errors
+
+    Validation resolves every run/case/environment in a fixed number of
+    queries, and ``save`` writes the whole batch in a single transaction, so a
+    batch with any invalid item saves nothing. ``errors`` is a list of
+    ``{"index": <item index>, "error": <message>}`` dictionaries.
+
+    """
+    STATUSES = [
+        Result.STATUS.passed,
+        Result.STATUS.failed,
+        Result.STATUS.invalidated,
+        Result.STATUS.blocked,
+        Result.STATUS.skipped,
+        ]
+    REQUIRED = ["case", "environment", "run_id", "status"]
+
+    # rows per INSERT or UPDATE ... WHERE id IN (...)
+    CHUNK_SIZE = 500
+
+
+    def __init__(self, items, user):
+        self.items = items
+        self.user = user
+        self.errors = None
+        self.rows = None
+
+
+    def is_valid(self):
+        """Validate and resolve all items; return True if there are no errors."""
+        if self.errors is None:
+            self._resolve()
+        return not self.errors
+
+
+    def _error(self, index, message):
+        self.errors.append({"index": index, "error": message})
+
+
+    def _resolve(self):
+        """Populate ``self.rows`` with result rows to create, or ``errors``."""
+        self.errors = []
+        self.rows = []
+
+        parsed = []
+        for i, item in enumerate(self.items):
+            try:
+                missing = [k for k in self.REQUIRED if k not in item]
+            except TypeError:
+                self._error(i, "result object data must be an object")
+                continue
+            if missing:
+                self._error(
+                    i, "bad result object data missing key: {0}".format(
+                        ", ".join(missing)))
+                continue
+            try:
+                ids = [int(item[k]) for k in ["run_id", "case", "environment"]]
+                stepnumber = item.get("stepnumber")
+                if stepnumber is not None:
+                    stepnumber = int(stepnumber)
+            except (TypeError, ValueError):
+                self._error(i, "run_id, case, environment and stepnumber "
+                               "must be integers")
+                continue
+            if item["status"] not in self.STATUSES:
+                self._error(
+                    i, "{0} is not a valid status.".format(item["status"]))
+                continue
+            parsed.append((i, item, ids, stepnumber))
+
+        if not parsed:
+            return
+
+        run_ids = set(p[2][0] for p in parsed)
+        case_ids = set(p[2][1] for p in parsed)
+        env_ids = set(p[2][2] for p in parsed)
+
+        existing_envs = set(
+            Environment.objects.filter(pk__in=env_ids).values_list(
+                "id", flat=True))
+
+        # (run, case, env) -> (rcv, caseversion)
+        rcvs = {}
+        for run_id, case_id, env_id, rcv_id, cv_id in (
+                RunCaseVersion.objects.filter(
+                    run__in=run_ids,
+                    caseversion__case__in=case_ids,
+                    environments__in=env_ids,
+                    ).values_list(
+                        "run", "caseversion__case", "environments",
+                        "id", "caseversion")):
+            rcvs[(run_id, case_id, env_id)] = (rcv_id, cv_id)
+
+        resolved = []
+        for i, item, ids, stepnumber in parsed:
+            run_id, case_id, env_id = ids
+            if env_id not in existing_envs:
+                self._error(
+                    i, "Specified environment does not exist: {0}".format(
+                        env_id))
+                continue
+            try:
+                rcv_id, cv_id = rcvs[(run_id, case_id, env_id)]
+            except KeyError:
+                self._error(
+                    i,
+                    "RunCaseVersion not found for run: {0}, case: {1}, "
+                    "environment: {2}".format(run_id, case_id, env_id))
+                continue
+            resolved.append((item, run_id, env_id, rcv_id, cv_id, stepnumber))
+
+        if self.errors:
+            return
+
+        # skipping a case skips it for all of its environments
+        skip_envs = defaultdict(list)
+        skipped_rcv_ids = set(
+            r[3] for r in resolved if r[0]["status"] == Result.STATUS.skipped)
+        if skipped_rcv_ids:
+            for rcv_id, env_id in (
+                    RunCaseVersion.environments.through.objects.filter(
+                        runcaseversion__in=skipped_rcv_ids).values_list(
+                            "runcaseversion", "environment")):
+                skip_envs[rcv_id].append(env_id)
+
+        # (caseversion, number) -> step
+        steps = {}
+        step_keys = set(
+            (r[4], r[5]) for r in resolved
+            if r[0]["status"] == Result.STATUS.failed and r[5] is not None)
+        if step_keys:
+            for cv_id, number, step_id in CaseStep.objects.filter(
+                    caseversion__in=set(k[0] for k in step_keys),
+                    number__in=set(k[1] for k in step_keys),
+                    ).values_list("caseversion", "number", "id"):
+                steps[(cv_id, number)] = step_id
+
+        for item, run_id, env_id, rcv_id, cv_id, stepnumber in resolved:
+            status = item["status"]
+            row = {
+                "run_id": run_id,
+                "runcaseversion_id": rcv_id,
+                "status": status,
+                "comment": item.get("comment", ""),
+                "step_id": (steps.get((cv_id, stepnumber))
+                            if status == Result.STATUS.failed else None),
+                "bug": item.get("bug", ""),
+                }
+            if status == Result.STATUS.skipped:
+                for skip_env_id in skip_envs[rcv_id]:
+                    self.rows.append(dict(row, environment_id=skip_env_id))
+            else:
+                self.rows.append(dict(row, environment_id=env_id))
+
+
+    @transaction.commit_on_success
+    def save(self):
+        """Save all results in the batch; return the number created."""
+        if not self.is_valid():
+            raise ValueError("Cannot save an invalid result batch.")
+
+        rows = self.rows
+        if not rows:
+            return 0
+
+        now = utcnow()
+        key = lambda row: (row["runcaseversion_id"], row["environment_id"])
+
+        # the last result in the batch for a case/env becomes latest
+        latest_rows = {}
+        for row in rows:
+            latest_rows[key(row)] = row
+
+        # latest result pointers this user already has for these case/envs
+        rcv_ids = set(k[0] for k in latest_rows)
+        env_ids = set(k[1] for k in latest_rows)
+        replaced = defaultdict(list)
+        replaced_ids = []
+        pointer_ids = []
+        for pointer_id, rcv_id, env_id, result_id, status, deleted_on in (
+                LatestResult.everything.select_for_update().filter(
+                    tester=self.user,
+                    runcaseversion__in=rcv_ids,
+                    environment__in=env_ids,
+                    ).values_list(
+                        "id", "runcaseversion", "environment", "result",
+                        "status", "deleted_on")):
+            if (rcv_id, env_id) in latest_rows:
+                pointer_ids.append(pointer_id)
+                if deleted_on is None:
+                    replaced[(rcv_id, env_id)].append(status)
+                    replaced_ids.append(result_id)
+        for chunk in _chunks(replaced_ids, self.CHUNK_SIZE):
+            Result.objects.filter(pk__in=chunk).update(is_latest=False)
+
+        # ids are read back from the inserted rows, not computed, so results
+        # saved concurrently by other testers can't be mixed in
+        results = Result.objects.bulk_create_with_ids(
+            [
+                Result(
+                    tester=self.user,
+                    runcaseversion_id=row["runcaseversion_id"],
+                    environment_id=row["environment_id"],
+                    status=row["status"],
+                    comment=row["comment"],
+                    is_latest=latest_rows[key(row)] is row,
+                    created_by=self.user,
+                    created_on=now,
+                    modified_by=self.user,
+                    modified_on=now,
+                    )
+                for row in rows
+                ],
+            batch_size=self.CHUNK_SIZE,
+            )
+        for result, row in zip(results, rows):
+            row["result_id"] = result.id
+
+        StepResult.objects.bulk_create(
+            [
+                StepResult(
+                    result_id=row["result_id"],
+                    step_id=row["step_id"],
+                    status=StepResult.STATUS.failed,
+                    bug_url=row["bug"],
+                    created_by=self.user,
+                    created_on=now,
+                    modified_by=self.user,
+                    modified_on=now,
+                    )
+                for row in rows
+                if row["step_id"]
+                ],
+            batch_size=self.CHUNK_SIZE,
+            )
+
+        # replace the pointers rather than updating each one
+        for chunk in _chunks(pointer_ids, self.CHUNK_SIZE):
+            LatestResult.everything.filter(pk__in=chunk).delete(permanent=True)
+        LatestResult.objects.bulk_create(
+            [
+                LatestResult(
+                    runcaseversion_id=rcv_id,
+                    environment_id=env_id,
+                    tester=self.user,
+                    result_id=row["result_id"],
+                    status=row["status"],
+                    created_by=self.user,
+                    created_on=now,
+                    modified_by=self.user,
+                    modified_on=now,
+                    )
+                for (rcv_id, env_id), row in latest_rows.items()
+                ],
+            batch_size=self.CHUNK_SIZE,
+            )
+
+        failed_rcv_ids = set(
+            row["runcaseversion_id"] for row in rows
+            if row["status"] == Result.STATUS.failed)
+        if failed_rcv_ids:
+            RunCaseVersion.objects.filter(pk__in=failed_rcv_ids).update(
+                user=self.user)
+
+        self._update_summaries(latest_rows, replaced)
+
+        return len(rows)
+
+
+    def _update_summaries(self, latest_rows, replaced):
+        """Apply changes in latest results to the run result summaries."""
+        completed_states = Result.COMPLETED_STATES
+        completed_elsewhere = None
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for (rcv_id, env_id), row in latest_rows.items():
+            summary = deltas[(row["run_id"], env_id)]
+            removed = replaced[(rcv_id, env_id)]
+            for status in removed:
+                summary[RunResultSummary.STATUS_FIELDS[status]] -= 1
+            summary[RunResultSummary.STATUS_FIELDS[row["status"]]] += 1
+
+            was_completed = any(s in completed_states for s in removed)
+            is_completed = row["status"] in completed_states
+            if was_completed != is_completed:
+                if completed_elsewhere is None:
+                    completed_elsewhere = set(
+                        LatestResult.objects.filter(
+                            runcaseversion__in=set(
+                                k[0] for k in latest_rows),
+                            environment__in=set(k[1] for k in latest_rows),
+                            status__in=completed_states,
+                            ).exclude(tester=self.user).values_list(
+                                "runcaseversion", "environment"))
+                if (rcv_id, env_id) not in completed_elsewhere:
+                    summary["completed"] += 1 if is_completed else -1
+
+        for (run_id, env_id), summary in deltas.items():
+            RunResultSummary.apply(run_id, env_id, summary)
+
+
+
+def _chunks(seq, size):
+    """Yield successive ``size``-length lists from list ``seq``."""
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
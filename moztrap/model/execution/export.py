@@ -0,0 +1,190 @@
+"""
+Streaming export of results as CSV or newline-delimited JSON.
+
+"""
+import csv
+import json
+from cStringIO import StringIO
+
+from ..environments.models import Environment
+from .models import Result, StepResult
+
+
+
+class ResultExport(object):
+    """
+    Flat rows for the results of a run, series or product version.
+
+    Iterating a ``ResultExport`` yields one dictionary per result with the
+    keys in ``FIELDS``. Results are read in chunks of ``CHUNK_SIZE`` keyed on
+    result id, with one values query and one bug url query per chunk, so
+    memory use is the same for a run of a hundred results as for one of
+    hundreds of thousands::
+
+        export = ResultExport.for_run(run)
+        for line in export.csv_lines():
+            out.write(line)
+
+    """
+    FIELDS = [
+        "id",
+        "run_id",
+        "run",
+        "case_id",
+        "case",
+        "environment_id",
+        "environment",
+        "tester",
+        "status",
+        "comment",
+        "bugs",
+        "is_latest",
+        "created_on",
+        "modified_on",
+        ]
+
+    CHUNK_SIZE = 2000
+
+    FORMATS = ["csv", "json"]
+
+    CONTENT_TYPES = {
+        "csv": "text/csv",
+        "json": "application/x-ndjson",
+        }
+
+
+    def __init__(self, results, latest=False):
+        """Export given queryset of results; only latest if ``latest``."""
+        if latest:
+            results = results.filter(is_latest=True)
+        self.results = results
+        # environment id -> label; there are few environments, cache them all
+        self._env_labels = {}
+
+
+    @classmethod
+    def for_run(cls, run, **kwargs):
+        """Export results of a run, or of all builds in a series."""
+        if run.is_series:
+            results = Result.objects.filter(runcaseversion__run__series=run)
+        else:
+            results = Result.objects.filter(runcaseversion__run=run)
+        return cls(results, **kwargs)
+
+
+    @classmethod
+    def for_productversion(cls, productversion, **kwargs):
+        """Export results of all runs of a product version."""
+        return cls(
+            Result.objects.filter(
+                runcaseversion__run__productversion=productversion),
+            **kwargs)
+
+
+    def __iter__(self):
+        """Yield a dictionary for each result, in order of result id."""
+        last_id = 0
+        while True:
+            chunk = list(
+                self.results.filter(id__gt=last_id).order_by("id").values_list(
+                    "id",
+                    "runcaseversion__run_id",
+                    "runcaseversion__run__name",
+                    "runcaseversion__caseversion__case_id",
+                    "runcaseversion__caseversion__name",
+                    "environment_id",
+                    "tester__username",
+                    "status",
+                    "comment",
+                    "is_latest",
+                    "created_on",
+                    "modified_on",
+                    )[:self.CHUNK_SIZE]
+                )
+            if not chunk:
+                return
+            last_id = chunk[-1][0]
+
+            bugs = self._bugs([row[0] for row in chunk])
+            self._load_env_labels(set(row[5] for row in chunk))
+
+            for (rid, run_id, run_name, case_id, case_name, env_id, tester,
+                 status, comment, is_latest, created_on, modified_on) in chunk:
+                yield {
+                    "id": rid,
+                    "run_id": run_id,
+                    "run": run_name,
+                    "case_id": case_id,
+                    "case": case_name,
+                    "environment_id": env_id,
+                    "environment": self._env_labels.get(env_id, u""),
+                    "tester": tester,
+                    "status": status,
+                    "comment": comment,
+                    "bugs": sorted(bugs.get(rid, [])),
+                    "is_latest": is_latest,
+                    "created_on": created_on.isoformat(),
+                    "modified_on": modified_on.isoformat(),
+                    }
+
+            if len(chunk) < self.CHUNK_SIZE:
+                return
+
+
+    def _bugs(self, result_ids):
+        """Return dict mapping given result ids to sets of bug urls."""
+        bugs = {}
+        for rid, url in StepResult.objects.filter(
+                result__in=result_ids).exclude(bug_url="").values_list(
+                "result_id", "bug_url"):
+            bugs.setdefault(rid, set()).add(url)
+        return bugs
+
+
+    def _load_env_labels(self, env_ids):
+        """Cache labels of given environments not already cached."""
+        missing = set(env_ids).difference(self._env_labels)
+        if not missing:
+            return
+        elements = {}
+        for env_id, category, element in Environment.objects.filter(
+                pk__in=missing).order_by(
+                "elements__category__name").values_list(
+                "id", "elements__category__name", "elements__name"):
+            if element is not None:
+                elements.setdefault(env_id, []).append(element)
+        for env_id in missing:
+            self._env_labels[env_id] = u", ".join(elements.get(env_id, []))
+
+
+    def lines(self, format):
+        """Yield lines of export in given format ("csv" or "json")."""
+        if format == "json":
+            return self.json_lines()
+        return self.csv_lines()
+
+
+    def csv_lines(self):
+        """Yield a CSV header line, then a line per result."""
+        buf = StringIO()
+        writer = csv.writer(buf)
+
+        def line(values):
+            writer.writerow(
+                [unicode(v).encode("utf-8") for v in values])
+            value = buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            return value
+
+        yield line(self.FIELDS)
+        for row in self:
+            row["bugs"] = u" ".join(row["bugs"])
+            row["is_latest"] = int(row["is_latest"])
+            yield line([row[f] for f in self.FIELDS])
+
+
+    def json_lines(self):
+        """Yield a JSON object per result, each on its own line."""
+        for row in self:
+            yield json.dumps(row) + "\n"
@@ -0,0 +1,58 @@
+"""
+Background job tasks for test runs.
+
+Each of these is safe to retry: locking case versions is incremental, and a
+series run created by an earlier attempt is found and reused.
+
+"""
+from django.db import transaction
+
+from ..core.auth import User
+from .models import Run
+
+
+
+def activate_run(job, run_id, user_id=None):
+    """Lock in case versions for a draft run and make it active."""
+    run = Run.objects.get(pk=run_id)
+    job.set_progress(10, "Locking in case versions.")
+    run.activate(user=_get_user(user_id))
+    return {"run_id": run.id}
+
+
+
+def refresh_run(job, run_id):
+    """Update the case versions of an active run with changes to suites."""
+    run = Run.objects.get(pk=run_id)
+    job.set_progress(10, "Refreshing case versions.")
+    run.refresh()
+    return {"run_id": run.id}
+
+
+
+def build_series_run(job, run_id, build, user_id=None):
+    """Find or create the run of series ``run_id`` for ``build``, active."""
+    series = Run.objects.get(pk=run_id)
+    user = _get_user(user_id)
+
+    runs = Run.objects.filter(series=series, build=build).order_by("id")[:1]
+    if runs:
+        run = runs[0]
+    else:
+        job.set_progress(10, "Creating run for build {0}.".format(build))
+        with transaction.commit_on_success():
+            run = series.clone_for_series(build=build, user=user)
+
+    if run.status == Run.STATUS.draft:
+        job.set_progress(50, "Locking in case versions.")
+        run.activate(user=user)
+
+    return {"run_id": run.id}
+
+
+
+def _get_user(user_id):
+    """Return the user with given id, or None."""
+    if user_id is None:
+        return None
+    return User.objects.get(pk=user_id)
@@ -0,0 +1,61 @@
+"""
+Stream results of a run, series or product version as CSV or JSON lines.
+
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from moztrap.model.core.models import ProductVersion
+from moztrap.model.execution.export import ResultExport
+from moztrap.model.execution.models import Run
+
+
+
+class Command(BaseCommand):
+    args = "run <run_id> | productversion <productversion_id>"
+    help = (
+        "Writes results of a run (or all builds of a series) or of a product "
+        "version to stdout as CSV or newline-delimited JSON.")
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            "--format",
+            dest="format",
+            default="csv",
+            choices=ResultExport.FORMATS,
+            help="Output format: csv (default) or json"),
+        make_option(
+            "--latest",
+            action="store_true",
+            dest="latest",
+            default=False,
+            help="Export only latest results"),
+        )
+
+
+    def handle(self, *args, **options):
+        if len(args) != 2 or args[0] not in ["run", "productversion"]:
+            raise CommandError("Usage: {0}".format(self.args))
+        try:
+            obj_id = int(args[1])
+        except ValueError:
+            raise CommandError("Usage: {0}".format(self.args))
+
+        latest = options.get("latest")
+        if args[0] == "run":
+            try:
+                run = Run.objects.get(pk=obj_id)
+            except Run.DoesNotExist:
+                raise CommandError("Run {0} does not exist.".format(obj_id))
+            export = ResultExport.for_run(run, latest=latest)
+        else:
+            try:
+                pv = ProductVersion.objects.get(pk=obj_id)
+            except ProductVersion.DoesNotExist:
+                raise CommandError(
+                    "Product version {0} does not exist.".format(obj_id))
+            export = ResultExport.for_productversion(pv, latest=latest)
+
+        for line in export.lines(options.get("format") or "csv"):
+            self.stdout.write(line, ending="")
@@ -0,0 +1,41 @@
+"""
+Rebuild the denormalized run result summaries from the results themselves.
+
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from moztrap.model.execution.models import Run, RunResultSummary
+
+
+
+class Command(BaseCommand):
+    args = "[<run_id> <run_id> ...]"
+    help = (
+        "Recount latest results into run result summaries for the given runs "
+        "(default all runs).")
+
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get("verbosity", 1))
+
+        runs = None
+        if args:
+            try:
+                run_ids = [int(a) for a in args]
+            except ValueError:
+                raise CommandError("Usage: {0}".format(self.args))
+            runs = list(
+                Run.everything.filter(pk__in=run_ids).values_list(
+                    "id", flat=True))
+            missing = set(run_ids).difference(runs)
+            if missing:
+                raise CommandError(
+                    "Run(s) {0} do not exist.".format(
+                        ", ".join(map(str, sorted(missing)))))
+
+        with transaction.commit_on_success():
+            num = RunResultSummary.rebuild(runs=runs)
+
+        if verbosity:
+            self.stdout.write("Rebuilt {0} run result summaries.\n".format(num))
@@ -3,17 +3,21 @@ Models for test execution (runs, results).
 
 """
 import datetime
+import hashlib
+from collections import defaultdict
 
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
-from django.db import connection, transaction, models
-from django.db.models import Q, Count, Max
+from django.db import connection, transaction, models, IntegrityError
+from django.db.models import Count, Max, Sum, F
 
 from model_utils import Choices
 
-from ..mtmodel import MTModel, TeamModel, DraftStatusModel
+from ..mtmodel import (
+    MTModel, MTManager, MTQuerySet, TeamModel, DraftStatusModel, utcnow)
 from ..core.auth import User
 from ..core.models import ProductVersion
 from ..environments.models import Environment, HasEnvironmentsModel
+from ..jobs.models import Job
 from ..library.models import CaseVersion, Suite, CaseStep
 
 
@@ -34,6 +38,30 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
     suites = models.ManyToManyField(
         Suite, through="RunSuite", related_name="runs")
 
+    # number of (not deleted) runcaseversions locked in
+    case_count = models.IntegerField(default=0)
+    # number of runcaseversion/environment combinations to be run
+    env_count = models.IntegerField(default=0)
+    # digest of what the runcaseversions were last locked in from
+    lock_fingerprint = models.CharField(max_length=40, blank=True, default="")
+
+    # keys of the background jobs activating and refreshing a run
+    ACTIVATE_JOB_KEY = "run-activate-{0}"
+    REFRESH_JOB_KEY = "run-refresh-{0}"
+
+    denormalized_counts = {
+        "case_count": """
+            SELECT COUNT(*) FROM execution_runcaseversion as rcv
+            WHERE rcv.run_id = {0}.id AND rcv.deleted_on IS NULL
+            """,
+        "env_count": """
+            SELECT COUNT(*) FROM execution_runcaseversion_environments as rce
+                INNER JOIN execution_runcaseversion as rcv
+                    ON rcv.id = rce.runcaseversion_id
+            WHERE rcv.run_id = {0}.id AND rcv.deleted_on IS NULL
+            """,
+        }
+
 
     def __unicode__(self):
         """Return unicode representation."""
@@ -69,6 +97,7 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         overrides = kwargs.setdefault("overrides", {})
         overrides["status"] = self.STATUS.draft
         overrides.setdefault("name", "Cloned: {0}".format(self.name))
+        overrides["lock_fingerprint"] = ""
         return super(Run, self).clone(*args, **kwargs)
 
 
@@ -81,6 +110,7 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         overrides.setdefault("name", "{0} - Build: {1}".format(
             self.name, build))
         overrides["status"] = self.STATUS.draft
+        overrides["lock_fingerprint"] = ""
         overrides.setdefault("is_series", False)
         overrides.setdefault("build", build)
         overrides.setdefault("series", self)
@@ -104,6 +134,45 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
             self.update_case_versions()
 
 
+    def queue_activate(self, user=None):
+        """Queue a background job to activate this run; return the job."""
+        return Job.enqueue(
+            "moztrap.model.execution.jobs.activate_run",
+            key=self.ACTIVATE_JOB_KEY.format(self.id),
+            user=user,
+            run_id=self.id,
+            user_id=user.id if user else None,
+            )
+
+
+    def queue_refresh(self, user=None):
+        """Queue a background job to refresh this run; return the job."""
+        return Job.enqueue(
+            "moztrap.model.execution.jobs.refresh_run",
+            key=self.REFRESH_JOB_KEY.format(self.id),
+            user=user,
+            run_id=self.id,
+            )
+
+
+    def queue_series_build(self, build, user=None):
+        """
+        Queue a job to find or create the active series run for ``build``.
+
+        The job result's ``run_id`` is the run to execute.
+
+        """
+        return Job.enqueue(
+            "moztrap.model.execution.jobs.build_series_run",
+            key="run-series-{0}-{1}".format(
+                self.id, hashlib.sha1(build.encode("utf-8")).hexdigest()),
+            user=user,
+            run_id=self.id,
+            build=build,
+            user_id=user.id if user else None,
+            )
+
+
     def update_case_versions(self):
         """
         Update the runcaseversions with any changes to suites.
@@ -122,6 +191,17 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         """
         Select caseversions from suites, create runcaseversions.
 
+        This is incremental: the caseversions the run's suites call for now
+        are diffed against the runcaseversions locked in previously, and only
+        runcaseversions that are no longer needed are deleted, only missing
+        ones are created, and only those whose order changed are reordered
+        (with one bulk statement).
+
+        A new build run of a series copies the runcaseversions of a sibling
+        build locked from the same suites, caseversions and environments
+        instead, without selecting caseversions at all (see
+        ``_lock_fingerprint`` and ``_copy_series_runcaseversions``).
+
         WARNING: Testing this code in the PyCharm debugger will give an
         incorrect number of queries, because for the debugger to show all the
         information it wants, it must do queries itself.  When testing with
@@ -132,12 +212,91 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         # get the list of environments for this run
         run_env_ids = self.environments.values_list("id", flat=True)
 
+        # a new build of a series can usually copy a sibling build's rcvs
+        fingerprint = None
+        if self.series_id:
+            fingerprint = self._lock_fingerprint(run_env_ids)
+            if (not self.runcaseversions.exists() and
+                    self._copy_series_runcaseversions(fingerprint)):
+                self._store_lock_fingerprint(fingerprint)
+                self._lock_caseversions_complete()
+                return
+
         # make a list of cvs in order by RunSuite, then SuiteCase.
         # This list is built from the run / suite / env combination and has
         # no knowledge of any possibly existing runcaseversions yet.
+        cv_list = self._select_caseversions(run_env_ids)
+
+        # runcaseversions locked in previously: cv_id -> [(rcv_id, order)]
+        existing = defaultdict(list)
+        for rcv_id, cv_id, order in self.runcaseversions.values_list(
+                "id", "caseversion_id", "order"):
+            existing[cv_id].append((rcv_id, order))
+
+        # delete rcvs that we won't be needing anymore
+        wanted = set(cv_list)
+        self._delete_runcaseversions(
+            [rcv_id
+             for cv_id, rcvs in existing.items() if cv_id not in wanted
+             for rcv_id, order in rcvs])
+
+        # audit for duplicate rcvs for the same cv.id
+        dups = [cv_id for cv_id in wanted if len(existing.get(cv_id, [])) > 1]
+        if dups:
+            # keep the runcaseversion with the latest result for each cv
+            keep = {}
+            for rcv_id, cv_id, latest_result in self.runcaseversions.filter(
+                    caseversion__in=dups).annotate(
+                        latest_result=Max("results__id")).values_list(
+                            "id", "caseversion", "latest_result"):
+                if cv_id not in keep or (latest_result or 0) > keep[cv_id][1]:
+                    keep[cv_id] = (rcv_id, latest_result or 0)
+            self.runcaseversions.filter(caseversion__in=dups).exclude(
+                id__in=[k[0] for k in keep.values()]).delete()
+            RunResultSummary.rebuild(runs=[self.id])
+            for cv_id in dups:
+                existing[cv_id] = [
+                    r for r in existing[cv_id] if r[0] == keep[cv_id][0]]
+
+        # rcvs that already exist just get reordered, if their order changed;
+        # the rest need to be created.
+        reorder = {}
+        rcv_proxies_to_create = []
+        for order, cv_id in enumerate(cv_list, 1):
+            if existing.get(cv_id):
+                rcv_id, old_order = existing[cv_id][0]
+                if old_order != order:
+                    reorder[rcv_id] = order
+            else:
+                rcv_proxies_to_create.append(
+                    RunCaseVersion(
+                        run_id=self.id, caseversion_id=cv_id, order=order))
+
+        self._reorder_runcaseversions(reorder)
+
+        # insert these rcvs in bulk
+        self._bulk_insert_new_runcaseversions(rcv_proxies_to_create)
+
+        self._bulk_update_runcaseversion_environments_for_lock()
+
+        if fingerprint is not None:
+            self._store_lock_fingerprint(fingerprint)
+        self._lock_caseversions_complete()
+
+
+    def _select_caseversions(self, run_env_ids):
+        """
+        Return ids of the caseversions this run's suites call for, in order.
+
+        Only active caseversions sharing an environment with the run are
+        included. A case in several suites is placed by its first appearance.
+
+        """
+        cv_list = []
         if len(run_env_ids):
+            qn = connection.ops.quote_name
             cursor = connection.cursor()
-            sql = """SELECT DISTINCT cv.id as id
+            sql = """SELECT cv.id as id
                 FROM execution_run as r
                     INNER JOIN execution_runsuite as rs
                         ON rs.run_id = r.id
@@ -148,95 +307,196 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
                     INNER JOIN library_caseversion as cv
                         ON cv.case_id = sc.case_id
                         AND cv.productversion_id = r.productversion_id
-                    INNER JOIN library_caseversion_environments as cve
-                        ON cv.id = cve.caseversion_id
                 WHERE cv.status = 'active'
                     AND cv.deleted_on IS NULL
                     AND s.status = 'active'
                     AND rs.run_id = {0}
-                    AND cve.environment_id IN ({1})
-                ORDER BY rs.order, sc.order
-                """.format(self.id, ",".join(map(str, run_env_ids)))
+                    AND EXISTS (
+                        SELECT 1 FROM library_caseversion_environments as cve
+                        WHERE cve.caseversion_id = cv.id
+                            AND cve.environment_id IN ({1}))
+                ORDER BY rs.{2}, sc.{2}
+                """.format(
+                    self.id, ",".join(map(str, run_env_ids)), qn("order"))
             cursor.execute(sql)
 
-            cv_list = [x[0] for x in cursor.fetchall()]
+            # a case in several suites is placed by its first appearance
+            seen = set()
+            for (cv_id,) in cursor.fetchall():
+                if cv_id not in seen:
+                    seen.add(cv_id)
+                    cv_list.append(cv_id)
 
-            # @@@ do we need to check for duplicates?
-            # use itertools.unique_everseen
-            #if len(set(cv_list)) != len(cv_list):
-            #    cv_list = itertools.unique_everseen(cv_list)
+        return cv_list
 
-        else:
-            cv_list = []
 
-        # delete rcvs that we won't be needing anymore
-        self._delete_runcaseversions(cv_list)
+    def _lock_fingerprint(self, run_env_ids):
+        """
+        Return a digest of the state runcaseversions would be locked from.
 
-        # audit for duplicate rcvs for the same cv.id
-        dups = self.runcaseversions.values("caseversion_id").annotate(
-            num_records=Count("caseversion")).filter(num_records__gt=1)
-        if len(dups) > 0:
-            for dup in dups:
-                # get the runcaseversions, and sort descending by the id
-                # of the results.  So the first one is the one with the latest
-                # result.  We keep that one and delete the rest.
-                rcv_to_save = self.runcaseversions.annotate(
-                    latest_result=Max("results__id")).filter(
-                        caseversion=dup["caseversion_id"]).order_by(
-                            "-latest_result")[0]
-                self.runcaseversions.filter(
-                    caseversion=dup["caseversion_id"]).exclude(
-                        id=rcv_to_save.id).delete()
-
-        # remaining rcvs should be ones we want to keep, and we need to inject
-        # those ids into the insert/update list for bulk_insert.  So create
-        # a dict mapping cv_id: rcv_id.  If one exists, its order field will
-        # be updated in the build_update cmd.
-        existing_rcv_map = {}
-        for map_item in self.runcaseversions.values("id", "caseversion_id"):
-            existing_rcv_map[map_item["caseversion_id"]] = map_item["id"]
-
-        # build the list of rcvs that we DO need.  Be sure to include the ids
-        # for rcvs that already exist so that we will just be updating the
-        # order and not replacing it.  We will use a special manager that does
-        # an update on insert error.
-
-        # runcaseversion objects we will use to bulk create
-        rcv_to_update = []
-        rcv_proxies_to_create = []
+        Covers the run's product version and environments, its suites (with
+        their order and status), and cheap aggregates over the suites' cases,
+        those cases' caseversions in the product version and their
+        environments: any edit bumps ``cc_version`` and ``modified_on``, and
+        additions and removals change the count and id sum. Runs with equal
+        fingerprints select the same caseversions, in the same order.
 
-        order = 1
-        for cv in cv_list:
-            if cv in existing_rcv_map:
-                # we will just update the order value
-                rcv_to_update.append({"caseversion_id": cv, "order": order})
-            else:
-                # we need to create a new one
-                kwargs = {
-                    "run_id": self.id,
-                    "caseversion_id": cv,
-                    "order": order
-                    }
-                rcv_proxies_to_create.append(RunCaseVersion(**kwargs))
-            order += 1
-
-        # update existing rcvs
-        for rcv in rcv_to_update:
-            self.runcaseversions.filter(
-                caseversion=rcv["caseversion_id"]).update(order=rcv["order"])
+        """
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT rs.suite_id, rs.{0}, s.status
+            FROM execution_runsuite as rs
+                INNER JOIN library_suite as s
+                    ON s.id = rs.suite_id
+            WHERE rs.run_id = {1}
+            ORDER BY rs.{0}, rs.suite_id
+            """.format(qn("order"), self.id))
+        runsuites = cursor.fetchall()
+        caseversions = """
+            SELECT {{0}} FROM library_caseversion
+            WHERE productversion_id = {1}
+                AND case_id IN (
+                    SELECT sc.case_id FROM library_suitecase as sc
+                        INNER JOIN execution_runsuite as rs
+                            ON rs.suite_id = sc.suite_id
+                    WHERE rs.run_id = {0})
+            """.format(self.id, self.productversion_id)
+        cursor.execute("""
+            SELECT sc.n, sc.ids, sc.versions, sc.modified,
+                cv.n, cv.ids, cv.versions, cv.modified, cve.n, cve.ids
+            FROM (
+                SELECT COUNT(*) as n, SUM(id) as ids,
+                    SUM(cc_version) as versions, MAX(modified_on) as modified
+                FROM library_suitecase
+                WHERE suite_id IN (
+                    SELECT suite_id FROM execution_runsuite
+                    WHERE run_id = {0})
+                ) as sc, ({1}) as cv, (
+                SELECT COUNT(*) as n, SUM(id) as ids
+                FROM library_caseversion_environments
+                WHERE caseversion_id IN ({2})
+                ) as cve
+            """.format(
+                self.id,
+                caseversions.format(
+                    "COUNT(*) as n, SUM(id) as ids, SUM(cc_version) as "
+                    "versions, MAX(modified_on) as modified"),
+                caseversions.format("id"),
+                ))
+        state = (
+            self.productversion_id,
+            sorted(run_env_ids),
+            [tuple(row) for row in runsuites],
+            tuple(cursor.fetchone()),
+            )
+        return hashlib.sha1(repr(state)).hexdigest()
 
-        # insert these rcvs in bulk
-        self._bulk_insert_new_runcaseversions(rcv_proxies_to_create)
 
-        self._bulk_update_runcaseversion_environments_for_lock()
+    def _store_lock_fingerprint(self, fingerprint):
+        """Record the lock fingerprint; not an edit, so no version bump."""
+        cursor = connection.cursor()
+        cursor.execute(
+            "UPDATE execution_run SET lock_fingerprint = %s WHERE id = %s",
+            [fingerprint, self.id])
+        self.lock_fingerprint = fingerprint
 
-        self._lock_caseversions_complete()
 
+    def _copy_series_runcaseversions(self, fingerprint):
+        """
+        Copy the runcaseversions of a sibling build locked from the same state.
+
+        The latest active sibling build of this run's series with the given
+        ``lock_fingerprint`` locked in exactly the caseversions this run's
+        suites call for, so its runcaseversions are copied with one ``INSERT
+        ... SELECT``. Their environments are not copied from the sibling, as
+        additions don't cascade to locked-in runcaseversions; they are
+        inserted with one more ``INSERT ... SELECT`` from the current
+        caseversion and run environments (environments deleted since the
+        sibling was locked are left out). Returns True if the runcaseversions
+        were copied.
+
+        """
+        sources = Run.objects.filter(
+            series=self.series_id,
+            status=self.STATUS.active,
+            lock_fingerprint=fingerprint,
+            ).exclude(pk=self.id).order_by(
+                "-created_on", "-id").values_list("id", flat=True)[:1]
+        if not sources:
+            return False
+
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO execution_runcaseversion
+                (run_id, caseversion_id, {0}, created_on, modified_on,
+                 cc_version)
+            SELECT {1}, rcv.caseversion_id, rcv.{0}, %s, %s, 0
+            FROM execution_runcaseversion as rcv
+            WHERE rcv.run_id = {2}
+                AND rcv.deleted_on IS NULL
+            """.format(
+                connection.ops.quote_name("order"), self.id, sources[0]),
+            [utcnow()] * 2)
+        cursor.execute("""
+            INSERT INTO execution_runcaseversion_environments
+                (runcaseversion_id, environment_id)
+            SELECT rcv.id, cve.environment_id
+            FROM execution_runcaseversion as rcv
+                INNER JOIN library_caseversion_environments as cve
+                    ON cve.caseversion_id = rcv.caseversion_id
+                INNER JOIN execution_run_environments as re
+                    ON re.environment_id = cve.environment_id
+                    AND re.run_id = rcv.run_id
+                INNER JOIN environments_environment as e
+                    ON e.id = cve.environment_id
+            WHERE rcv.run_id = {0}
+                AND e.deleted_on IS NULL
+            """.format(self.id))
+        return True
+
+
+    # rows per CASE-based reorder UPDATE
+    REORDER_CHUNK_SIZE = 500
+
+
+    def _reorder_runcaseversions(self, orders):
+        """
+        Set the order of runcaseversions, given dict mapping rcv id to order.
+
+        Issues one ``UPDATE ... SET order = CASE id WHEN ...`` per
+        ``REORDER_CHUNK_SIZE`` rcvs, rather than one update per rcv.
 
-    def _delete_runcaseversions(self, cv_list):
+        """
+        if not orders:
+            return
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        items = sorted(orders.items())
+        for i in range(0, len(items), self.REORDER_CHUNK_SIZE):
+            chunk = items[i:i + self.REORDER_CHUNK_SIZE]
+            sql = """UPDATE execution_runcaseversion
+                SET {0} = CASE id {1} END,
+                    modified_on = %s,
+                    modified_by_id = NULL,
+                    cc_version = cc_version + 1
+                WHERE id IN ({2})
+                """.format(
+                    qn("order"),
+                    " ".join(
+                        "WHEN {0} THEN {1}".format(rcv_id, order)
+                        for rcv_id, order in chunk),
+                    ",".join(str(rcv_id) for rcv_id, order in chunk),
+                    )
+            cursor.execute(sql, [utcnow()])
+
+
+    def _delete_runcaseversions(self, rcv_ids):
         """Hook to delete runcaseversions we know we don't need anymore."""
-        self.runcaseversions.exclude(caseversion__in=cv_list).delete(
-            permanent=True)
+        if rcv_ids:
+            self.runcaseversions.filter(id__in=rcv_ids).delete(permanent=True)
+            # removing runcaseversions also removed their results
+            RunResultSummary.rebuild(runs=[self.id])
 
 
     def _bulk_insert_new_runcaseversions(self, rcv_proxies):
@@ -244,96 +504,116 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         self.runcaseversions.bulk_create(rcv_proxies)
 
 
-    def _bulk_update_runcaseversion_environments_for_lock(self):
-        """
-        update runcaseversion_environment records with latest state.
+    # stale runcaseversion_environments deleted per statement
+    RCV_ENV_DELETE_CHUNK_SIZE = 1000
 
-        Approach:
-          do another raw sql query to get all existing_rcv_envs for this run
-          existing_rcv_envs - needed_rcv_envs = list to delete (no longer needed)
-          needed_rcv_envs - existing_rcv_envs = list to create
-        build a list of RunCaseVersion_environment objects
-        and use bulk_create.
 
+    def _bulk_update_runcaseversion_environments_for_lock(self):
         """
+        update runcaseversion_environment records with latest state.
 
-        # re-query all the rcvs (including newly created) for this run
-        final_rcvs = RunCaseVersion.objects.filter(run=self).select_related(
-            "caseversion").prefetch_related("caseversion__environments")
-
-        final_rcv_ids = [x.id for x in final_rcvs]
-
-        # runcaseversion_environments that were there prior to our changes
-        prev_rcv_envs_set = set(RunCaseVersion.environments.through.objects.filter(
-            runcaseversion_id__in=final_rcv_ids).values_list(
-                "runcaseversion_id", "environment_id"))
-
-        # runcaseversion_environment objects we will use to bulk create
-        # loop through all cvs and fetch the env intersection with this run
-        needed_rcv_envs_tuples = []
-        run_env_ids = set(
-            self.environments.values_list("id", flat=True))
-        for rcv in final_rcvs:
-            case_env_ids = set([x.id for x in rcv.caseversion.environments.all()])
-            for env in run_env_ids.intersection(case_env_ids):
-                needed_rcv_envs_tuples.append((rcv.id, env))
-        needed_rcv_envs_set = set(needed_rcv_envs_tuples)
-
-        # get the set of rcv_envs we need to delete because they don't belong
-        # to the needed set.
-        delete_rcv_envs = prev_rcv_envs_set - needed_rcv_envs_set
-        if len(delete_rcv_envs):
-            delquery = Q()
-            for combo in delete_rcv_envs:
-                delquery = delquery | Q(
-                    **{"runcaseversion_id": combo[0],
-                       "environment_id": combo[1]})
-            RunCaseVersion.environments.through.objects.filter(delquery).delete()
-
-        # get the set of rcv_envs we need to create that don't already exist
-        needed_rcv_envs_set = needed_rcv_envs_set - prev_rcv_envs_set
+        Each runcaseversion should have the environments its caseversion
+        and this run have in common. This is reconciled entirely in SQL, so
+        memory use doesn't depend on the size of the run:
 
-        # build all the objects to pass to bulk_create
-        needed_rcv_envs = [RunCaseVersion.environments.through(
-            runcaseversion_id=needed[0],
-            environment_id=needed[1]) for needed in needed_rcv_envs_set]
+          missing pairs are added with one ``INSERT ... SELECT`` from the
+          caseversion and run environment joins;
+          stale pairs are found with an anti-join and deleted by id, in
+          chunks of ``RCV_ENV_DELETE_CHUNK_SIZE``.
 
-        RunCaseVersion.environments.through.objects.bulk_create(needed_rcv_envs)
+        """
+        cursor = connection.cursor()
+
+        # environments the rcv's caseversion and its run have in common
+        needed = """
+            SELECT 1 FROM library_caseversion_environments as cve
+                INNER JOIN execution_run_environments as re
+                    ON re.environment_id = cve.environment_id
+                INNER JOIN environments_environment as e
+                    ON e.id = cve.environment_id
+            WHERE cve.caseversion_id = rcv.caseversion_id
+                AND re.run_id = rcv.run_id
+                AND e.deleted_on IS NULL
+                AND cve.environment_id = {0}
+            """
+
+        cursor.execute("""
+            INSERT INTO execution_runcaseversion_environments
+                (runcaseversion_id, environment_id)
+            SELECT rcv.id, cve.environment_id
+            FROM execution_runcaseversion as rcv
+                INNER JOIN library_caseversion_environments as cve
+                    ON cve.caseversion_id = rcv.caseversion_id
+                INNER JOIN execution_run_environments as re
+                    ON re.environment_id = cve.environment_id
+                    AND re.run_id = rcv.run_id
+                INNER JOIN environments_environment as e
+                    ON e.id = cve.environment_id
+            WHERE rcv.run_id = {0}
+                AND rcv.deleted_on IS NULL
+                AND e.deleted_on IS NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM execution_runcaseversion_environments as rce
+                    WHERE rce.runcaseversion_id = rcv.id
+                        AND rce.environment_id = cve.environment_id)
+            """.format(self.id))
+
+        stale = """
+            SELECT rce.id
+            FROM execution_runcaseversion_environments as rce
+                INNER JOIN execution_runcaseversion as rcv
+                    ON rcv.id = rce.runcaseversion_id
+            WHERE rcv.run_id = {0}
+                AND rcv.deleted_on IS NULL
+                AND NOT EXISTS ({1})
+            LIMIT {2}
+            """.format(
+                self.id,
+                needed.format("rce.environment_id"),
+                self.RCV_ENV_DELETE_CHUNK_SIZE,
+                )
+        while True:
+            cursor.execute(stale)
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids:
+                cursor.execute(
+                    "DELETE FROM execution_runcaseversion_environments "
+                    "WHERE id IN ({0})".format(",".join(map(str, ids))))
+            if len(ids) < self.RCV_ENV_DELETE_CHUNK_SIZE:
+                break
 
 
     def _lock_caseversions_complete(self):
         """Hook for doing any post-processing after doing the rcv lock."""
-        pass
+        self.refresh_counts()
+
+
+    def undelete(self, *args, **kwargs):
+        """Undelete run, recounting its results."""
+        super(Run, self).undelete(*args, **kwargs)
+        RunResultSummary.rebuild(runs=[self.id])
 
 
     def result_summary(self):
         """Return a dict summarizing status of results."""
-        return result_summary(Result.objects.filter(runcaseversion__run=self))
+        totals = RunResultSummary.objects.filter(run=self).totals()
+        return dict((s, totals[s]) for s in Result.COMPLETED_STATES)
 
 
     def completion(self):
         """
         Return fraction of case/env combos that have a completed result.
 
-        Have to specify deleted_on=None for the through, because the
-        default manager doesn't go through our MT model manager.
+        The number of combos is read from the stored ``env_count``, rather
+        than this instance's copy, which may predate changes to the run.
+
         """
-        total = RunCaseVersion.environments.through.objects.filter(
-            runcaseversion__run=self,
-            runcaseversion__deleted_on=None,
-            ).count()
-        skipped = Result.objects.filter(
-            runcaseversion__run=self,
-            is_latest=True,
-            status=Result.STATUS.skipped).count()
-        completed = Result.objects.filter(
-            status__in=Result.COMPLETED_STATES,
-            is_latest=True,
-            runcaseversion__run=self).values(
-            "runcaseversion", "environment").distinct().count()
+        total = Run.everything.filter(pk=self.pk).values_list(
+            "env_count", flat=True)[0]
+        totals = RunResultSummary.objects.filter(run=self).totals()
 
         try:
-            return float(completed) / (total - skipped)
+            return float(totals["completed"]) / (total - totals["skipped"])
         except ZeroDivisionError:
             return 0
 
@@ -343,20 +623,11 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         total = RunCaseVersion.objects.filter(
             environments=env_id,
             run=self).count()
-        skipped = Result.objects.filter(
-            runcaseversion__run=self,
-            environment=env_id,
-            is_latest=True,
-            status=Result.STATUS.skipped).count()
-        completed = Result.objects.filter(
-            status__in=Result.COMPLETED_STATES,
-            is_latest=True,
-            environment=env_id,
-            runcaseversion__run=self).values(
-            "runcaseversion", "environment").distinct().count()
+        totals = RunResultSummary.objects.filter(
+            run=self, environment=env_id).totals()
 
         try:
-            return float(completed) / (total - skipped)
+            return float(totals["completed"]) / (total - totals["skipped"])
         except ZeroDivisionError:
             return 0.0
 
@@ -422,23 +693,63 @@ class RunCaseVersion(HasEnvironmentsModel, MTModel):
         if adding and inherit_envs:
             self.environments.add(
                 *_environment_intersection(self.run, self.caseversion))
+        if adding:
+            Run.update_counts([self.run_id])
 
         return ret
 
 
+    @classmethod
+    def deletion_changed(cls, instances):
+        """Update counts of the runs of (un)deleted runcaseversions."""
+        Run.update_counts(set(rcv.run_id for rcv in instances))
+
+
+    @classmethod
+    def _add_envs(cls, objs, envs):
+        """Add environments, updating counts of the affected runs."""
+        super(RunCaseVersion, cls)._add_envs(objs, envs)
+        cls._update_run_counts(objs)
+
+
+    @classmethod
+    def _remove_envs(cls, objs, envs):
+        """Remove environments, updating counts of the affected runs."""
+        super(RunCaseVersion, cls)._remove_envs(objs, envs)
+        cls._update_run_counts(objs)
+
+
+    @classmethod
+    def _update_run_counts(cls, objs):
+        """Update counts of the runs of given runcaseversions."""
+        Run.update_counts(
+            Run.everything.filter(runcaseversions__in=objs).values_list(
+                "id", flat=True).distinct())
+
+
+    def delete(self, *args, **kwargs):
+        """Delete runcaseversion, recounting the results of its run."""
+        super(RunCaseVersion, self).delete(*args, **kwargs)
+        RunResultSummary.rebuild(runs=[self.run_id])
+
+
+    def undelete(self, *args, **kwargs):
+        """Undelete runcaseversion, recounting the results of its run."""
+        super(RunCaseVersion, self).undelete(*args, **kwargs)
+        RunResultSummary.rebuild(runs=[self.run_id])
+
+
     def result_summary(self):
         """Return a dict summarizing status of results."""
-        return result_summary(self.results.values())
+        return result_summary(self.latest_results.all())
 
 
     def completion(self):
         """Return fraction of environments that have a completed result."""
         total = self.environments.count()
-        skipped = self.results.filter(
-            is_latest=True,
+        skipped = self.latest_results.filter(
             status=Result.STATUS.skipped).count()
-        completed = self.results.filter(
-            is_latest=True,
+        completed = self.latest_results.filter(
             status__in=Result.COMPLETED_STATES).values(
             "environment").distinct().count()
 
@@ -643,25 +954,197 @@ class Result(MTModel):
 
 
     def save(self, *args, **kwargs):
-        if self.pk is None:
-            self.set_latest()
-        super(Result, self).save(*args, **kwargs)
+        """
+        Save result, keeping latest flags and run result summary up to date.
+
+        The result, latest pointer and summary change are saved atomically,
+        within any transaction already in progress.
+
+        """
+        with transaction.atomic():
+            if self.pk is None:
+                self.is_latest = True
+                ret = super(Result, self).save(*args, **kwargs)
+                removed = []
+                previous = self._point_latest()
+                if previous is not None:
+                    previous_id, previous_status = previous
+                    Result.objects.filter(pk=previous_id).update(
+                        is_latest=False)
+                    removed = [previous_status]
+                self._update_summary(removed=removed, added=[self.status])
+                return ret
+
+            try:
+                previous_status, was_latest = Result.everything.filter(
+                    pk=self.pk).values_list("status", "is_latest")[0]
+            except IndexError:
+                previous_status, was_latest = None, False
+            ret = super(Result, self).save(*args, **kwargs)
+            if was_latest and previous_status != self.status:
+                LatestResult.everything.filter(result=self).update(
+                    status=self.status, notrack=True)
+                self._update_summary(
+                    removed=[previous_status], added=[self.status])
+            return ret
+
+
+    def delete(self, *args, **kwargs):
+        """Delete result, recounting the results of its run."""
+        super(Result, self).delete(*args, **kwargs)
+        RunResultSummary.rebuild(runs=[self.runcaseversion.run_id])
+
+
+    def undelete(self, *args, **kwargs):
+        """Undelete result, recounting the results of its run."""
+        super(Result, self).undelete(*args, **kwargs)
+        RunResultSummary.rebuild(runs=[self.runcaseversion.run_id])
 
 
     def set_latest(self):
         """
         Set this result to latest, and unset all others with this env/user/rcv
 
-        """
+        Also moves the replaced results' counts in the run result summary over
+        to this result. New results are made latest on save; this is for
+        making an existing result latest again, or repairing duplicate latest
+        flags.
 
-        Result.objects.filter(
+        """
+        others = Result.objects.filter(
             tester=self.tester,
             runcaseversion=self.runcaseversion,
             environment=self.environment,
             is_latest=True,
-            ).exclude(pk=self.pk).update(is_latest=False)
+            ).exclude(pk=self.pk)
+        removed = list(others.values_list("status", flat=True))
+        others.update(is_latest=False)
+
+        added = [self.status]
+        if self.pk is not None:
+            if self.is_latest:
+                # already counted as latest
+                added = []
+            else:
+                Result.objects.filter(pk=self.pk).update(
+                    is_latest=True, notrack=True)
+            self._point_latest()
 
         self.is_latest = True
+        self._update_summary(removed=removed, added=added)
+
+
+    def _point_latest(self):
+        """
+        Point the latest result for this env/user/rcv at this (saved) result.
+
+        Upserts this result's ``LatestResult`` row, which is keyed (and locked)
+        by runcaseversion, environment and tester, so no range of the results
+        table needs to be scanned or locked. Returns ``(id, status)`` of the
+        result that was previously latest (and not deleted), or ``None``.
+
+        """
+        pointers = LatestResult.everything.select_for_update().filter(
+            runcaseversion=self.runcaseversion_id,
+            environment=self.environment_id,
+            tester=self.tester_id,
+            ).values_list("id", "result", "status", "deleted_on")
+        rows = list(pointers)
+
+        if not rows:
+            # another tester session may insert the same pointer
+            # concurrently, so create it in a savepoint
+            sid = transaction.savepoint()
+            try:
+                LatestResult.objects.create(
+                    runcaseversion_id=self.runcaseversion_id,
+                    environment_id=self.environment_id,
+                    tester_id=self.tester_id,
+                    result=self,
+                    status=self.status,
+                    user=self.modified_by,
+                    )
+            except IntegrityError:
+                transaction.savepoint_rollback(sid)
+                rows = list(pointers)
+            else:
+                transaction.savepoint_commit(sid)
+                return None
+
+        pointer_id, previous_id, previous_status, deleted_on = rows[0]
+        if previous_id == self.pk:
+            return None
+        LatestResult.everything.filter(pk=pointer_id).update(
+            result=self,
+            status=self.status,
+            deleted_on=None,
+            deleted_by=None,
+            user=self.modified_by,
+            )
+        if deleted_on is not None:
+            return None
+        return (previous_id, previous_status)
+
+
+    def _update_summary(self, removed, added):
+        """
+        Apply a change in latest result statuses to the run result summary.
+
+        ``removed`` is a list of statuses that are no longer latest for this
+        result's runcaseversion/environment/tester, ``added`` a list of
+        statuses that have become latest.
+
+        """
+        deltas = defaultdict(int)
+        for status in removed:
+            deltas[RunResultSummary.STATUS_FIELDS[status]] -= 1
+        for status in added:
+            deltas[RunResultSummary.STATUS_FIELDS[status]] += 1
+
+        # the case/env combo counts as completed once if any tester has a
+        # latest completed result for it; only check the other testers when
+        # this tester's change could flip that.
+        was_completed = any(s in self.COMPLETED_STATES for s in removed)
+        is_completed = any(s in self.COMPLETED_STATES for s in added)
+        if was_completed != is_completed:
+            completed_elsewhere = LatestResult.objects.filter(
+                runcaseversion=self.runcaseversion,
+                environment=self.environment,
+                status__in=self.COMPLETED_STATES,
+                ).exclude(tester=self.tester).exists()
+            if not completed_elsewhere:
+                deltas["completed"] += 1 if is_completed else -1
+
+        RunResultSummary.apply(
+            self.runcaseversion.run_id, self.environment_id, deltas)
+
+
+
+class LatestResult(MTModel):
+    """
+    Points at the latest result of a tester for a runcaseversion/environment.
+
+    Holds a copy of the result's status, so lookups of the current status of
+    cases don't need to touch the (much larger) results table.
+
+    """
+    runcaseversion = models.ForeignKey(
+        RunCaseVersion, related_name="latest_results")
+    environment = models.ForeignKey(Environment, related_name="+")
+    tester = models.ForeignKey(User, related_name="+")
+    result = models.OneToOneField(Result, related_name="latest")
+    status = models.CharField(
+        max_length=50, db_index=True, choices=Result.STATUS)
+
+
+    def __unicode__(self):
+        """Return unicode representation."""
+        return "Latest result of %s in %s by %s: %s" % (
+            self.runcaseversion, self.environment, self.tester, self.status)
+
+
+    class Meta:
+        unique_together = [("runcaseversion", "environment", "tester")]
 
 
 
@@ -682,24 +1165,143 @@ class StepResult(MTModel):
 
 
 
-def result_summary(results):
+class RunResultSummaryQuerySet(MTQuerySet):
+    """Adds summing of result counts to run result summary querysets."""
+    def totals(self):
+        """Return dict of count field: sum over these summary rows."""
+        sums = self.aggregate(
+            **dict((f, Sum(f)) for f in RunResultSummary.COUNT_FIELDS))
+        return dict((f, sums[f] or 0) for f in RunResultSummary.COUNT_FIELDS)
+
+
+
+class RunResultSummaryManager(MTManager):
+    """Manager using ``RunResultSummaryQuerySet``."""
+    use_for_related_fields = True
+
+    def get_query_set(self):
+        qs = RunResultSummaryQuerySet(self.model, using=self.db)
+        if not self._show_deleted:
+            qs = qs.filter(deleted_on__isnull=True)
+        return qs
+
+
+
+class RunResultSummary(MTModel):
     """
-    Given a queryset of results, return a dict summarizing their states.
+    Denormalized counts of latest results for one environment of a run.
+
+    Kept up to date by ``Result`` as results become (or stop being) latest, so
+    run summaries and completion don't need to aggregate over all results.
 
     """
-    states = Result.COMPLETED_STATES
+    STATUS_FIELDS = {
+        Result.STATUS.assigned: "pending",
+        Result.STATUS.started: "pending",
+        Result.STATUS.passed: "passed",
+        Result.STATUS.failed: "failed",
+        Result.STATUS.invalidated: "invalidated",
+        Result.STATUS.blocked: "blocked",
+        Result.STATUS.skipped: "skipped",
+        }
+    COUNT_FIELDS = [
+        "passed", "failed", "invalidated", "blocked", "skipped", "pending",
+        "completed"]
+
+    run = models.ForeignKey(Run, related_name="result_summaries")
+    environment = models.ForeignKey(Environment, related_name="+")
+    passed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    invalidated = models.IntegerField(default=0)
+    blocked = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    # number of case/env combos with a latest completed result from any tester
+    completed = models.IntegerField(default=0)
+
+    objects = RunResultSummaryManager()
 
-    result_ids = results.filter(is_latest=True).values_list("id", flat=True)
 
-    if not result_ids:
-        return dict((s, 0) for s in states)
+    def __unicode__(self):
+        """Return unicode representation."""
+        return "Result summary for run '%s' in %s" % (
+            self.run, self.environment)
 
-    cols = ["COUNT(CASE WHEN status=%s THEN 1 ELSE NULL END)"] * len(states)
-    sql = "SELECT {0} FROM {1} WHERE id IN ({2})".format(
-        ",".join(cols), Result._meta.db_table, ",".join(map(str, result_ids))
-        )
 
-    cursor = connection.cursor()
-    cursor.execute(sql, states)
+    class Meta:
+        unique_together = [("run", "environment")]
+
+
+    @classmethod
+    def apply(cls, run_id, environment_id, deltas):
+        """Add ``deltas`` (dict of count field: delta) to a summary row."""
+        deltas = dict((k, v) for k, v in deltas.items() if v)
+        if not deltas:
+            return
+        updates = dict((k, F(k) + v) for k, v in deltas.items())
+        summaries = cls.everything.filter(
+            run=run_id, environment=environment_id)
+        if not summaries.update(notrack=True, **updates):
+            cls.everything.get_or_create(
+                run_id=run_id, environment_id=environment_id)
+            summaries.update(notrack=True, **updates)
+
+
+    @classmethod
+    def rebuild(cls, runs=None):
+        """
+        Recount summaries from scratch for ``runs`` (default all runs).
+
+        ``runs`` may be a list of run ids or a queryset of runs. Returns the
+        number of summary rows created.
+
+        """
+        results = LatestResult.objects.all()
+        existing = cls.everything.all()
+        if runs is not None:
+            results = results.filter(runcaseversion__run__in=runs)
+            existing = existing.filter(run__in=runs)
+
+        rows = {}
+        def row(run_id, environment_id):
+            key = (run_id, environment_id)
+            if key not in rows:
+                rows[key] = cls(run_id=run_id, environment_id=environment_id)
+            return rows[key]
+
+        counts = results.values(
+            "runcaseversion__run", "environment", "status").annotate(
+                num=Count("id")).order_by()
+        for c in counts:
+            summary = row(c["runcaseversion__run"], c["environment"])
+            field = cls.STATUS_FIELDS[c["status"]]
+            setattr(summary, field, getattr(summary, field) + c["num"])
+
+        completed = results.filter(
+            status__in=Result.COMPLETED_STATES).values(
+                "runcaseversion__run", "environment").annotate(
+                    num=Count("runcaseversion", distinct=True)).order_by()
+        for c in completed:
+            row(c["runcaseversion__run"], c["environment"]).completed = c["num"]
+
+        existing.delete(permanent=True)
+        cls.objects.bulk_create(rows.values())
+        return len(rows)
+
+
+
+def result_summary(latest_results):
+    """
+    Given a queryset of latest results, return a dict summarizing states.
+
+    """
+    states = Result.COMPLETED_STATES
+
+    summary = dict((s, 0) for s in states)
+    counts = latest_results.filter(
+        deleted_on__isnull=True, status__in=states).values(
+            "status").annotate(num=Count("id")).order_by()
+    for c in counts:
+        summary[c["status"]] = c["num"]
 
-    return dict(zip(states, cursor.fetchone()))
+    return summary
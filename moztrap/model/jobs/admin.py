@@ -0,0 +1,12 @@
+"""
+Admin config for background jobs.
+
+"""
+from django.contrib import admin
+
+from ..mtadmin import MTModelAdmin
+from . import models
+
+
+
+admin.site.register(models.Job, MTModelAdmin)
@@ -0,0 +1,42 @@
+from tastypie.resources import ModelResource, ALL
+
+from .models import Job
+from ..mtapi import MTApiKeyAuthentication
+
+
+
+class JobResource(ModelResource):
+    """
+    Poll the status and progress of background jobs.
+
+    Filterable by status; ``result`` is the deserialized return value of a
+    job that is done.
+
+    """
+
+    class Meta:
+        queryset = Job.objects.all()
+        list_allowed_methods = ["get"]
+        detail_allowed_methods = ["get"]
+        fields = [
+            "id",
+            "task",
+            "status",
+            "progress",
+            "message",
+            "attempts",
+            "created_on",
+            "started_on",
+            "finished_on",
+            ]
+        filtering = {
+            "status": ALL,
+            }
+        authentication = MTApiKeyAuthentication()
+        ordering = ["id"]
+
+
+    def dehydrate(self, bundle):
+        """Add the deserialized result to the return JSON."""
+        bundle.data["result"] = bundle.obj.result_data
+        return bundle
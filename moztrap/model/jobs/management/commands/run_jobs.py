@@ -0,0 +1,67 @@
+"""
+Run queued background jobs.
+
+Run one or more of these alongside the web processes; each claims queued jobs
+from the database one at a time, so no other message broker is needed.
+
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from optparse import make_option
+
+from moztrap.model.jobs.models import Job
+
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs."
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            "--once",
+            action="store_true",
+            dest="once",
+            default=False,
+            help="Exit once the queue is empty, rather than waiting for "
+            "more jobs."),
+        make_option(
+            "--sleep",
+            action="store",
+            type="float",
+            dest="sleep",
+            default=2.0,
+            help="Seconds to wait before checking an empty queue again "
+            "(default 2)."),
+        make_option(
+            "--stale",
+            action="store",
+            type="int",
+            dest="stale",
+            default=300,
+            help="Requeue running jobs whose worker hasn't recorded a "
+            "heartbeat for more than this many seconds, assuming it died "
+            "(default 300)."),
+        )
+
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get("verbosity", 1))
+
+        while True:
+            Job.requeue_stale(options["stale"])
+            job = Job.claim_next()
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            if job.run():
+                if verbosity:
+                    self.stdout.write("Job {0} {1} done.\n".format(
+                            job.id, job.task))
+            else:
+                self.stderr.write("Job {0} {1} {2}:\n{3}\n".format(
+                        job.id, job.task, job.status, job.error))
@@ -0,0 +1,253 @@
+"""
+Models for background jobs.
+
+"""
+import datetime
+import json
+import threading
+import traceback
+from contextlib import contextmanager
+
+from django.db import connection, models, transaction, IntegrityError
+from django.db.models import F, Q
+from django.utils.module_loading import import_by_path
+
+from model_utils import Choices
+
+from ..mtmodel import MTModel, utcnow
+
+
+
+class Job(MTModel):
+    """
+    A unit of background work, queued in the database.
+
+    ``task`` is the dotted path of a function that a worker (see the
+    ``run_jobs`` management command) calls as ``task(job, **arguments)``. Its
+    return value must be JSON-serializable and is stored as the job's
+    ``result``; it may call ``job.set_progress`` to report how far along it is.
+
+    A task that raises is queued again until it has been attempted
+    ``max_attempts`` times, so tasks must be safe to run more than once.
+
+    While a worker runs a job it records a heartbeat every
+    ``HEARTBEAT_INTERVAL`` seconds; running jobs without a recent heartbeat
+    were abandoned by their worker (see ``requeue_stale``).
+
+    """
+    STATUS = Choices("queued", "running", "done", "failed")
+
+    # seconds between heartbeats of a running job
+    HEARTBEAT_INTERVAL = 30
+
+    task = models.CharField(max_length=200)
+    arguments = models.TextField(default="{}")
+    # queueing a job with the key of an unfinished job returns that job
+    key = models.CharField(max_length=200, blank=True, db_index=True)
+    # the key while the job is unfinished, so it is unique among those
+    active_key = models.CharField(
+        max_length=200, blank=True, null=True, unique=True)
+    status = models.CharField(
+        max_length=30, db_index=True, choices=STATUS, default=STATUS.queued)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    started_on = models.DateTimeField(blank=True, null=True)
+    heartbeat_on = models.DateTimeField(blank=True, null=True)
+    finished_on = models.DateTimeField(blank=True, null=True)
+
+
+    def __unicode__(self):
+        """Unicode representation is task and status."""
+        return u"{0} ({1})".format(self.task, self.status)
+
+
+    class Meta:
+        ordering = ["id"]
+
+
+    @classmethod
+    def enqueue(cls, task, key="", user=None, **arguments):
+        """
+        Queue a job calling ``task`` with ``arguments``; return the job.
+
+        If an unfinished job with the same (non-empty) ``key`` exists, it is
+        returned rather than queueing a duplicate. The key is held in the
+        unique ``active_key`` until the job finishes, so of concurrent
+        requests to queue it, only one inserts a job.
+
+        """
+        if not key:
+            return cls.objects.create(
+                task=task, arguments=json.dumps(arguments), user=user)
+
+        existing = list(cls.everything.filter(active_key=key)[:1])
+        while not existing:
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(
+                        task=task,
+                        key=key,
+                        active_key=key,
+                        arguments=json.dumps(arguments),
+                        user=user,
+                        )
+            except IntegrityError:
+                # queued concurrently; a locking read sees the committed job
+                with transaction.atomic():
+                    existing = list(
+                        cls.everything.select_for_update().filter(
+                            active_key=key)[:1])
+        return existing[0]
+
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Claim the oldest queued job for this worker and return it.
+
+        Claiming is a conditional update, so concurrent workers never claim
+        the same job. Returns None if there are no queued jobs.
+
+        """
+        while True:
+            job_ids = list(
+                cls.objects.filter(status=cls.STATUS.queued).order_by(
+                    "id").values_list("id", flat=True)[:10])
+            if not job_ids:
+                return None
+            for job_id in job_ids:
+                now = utcnow()
+                claimed = cls.objects.filter(
+                    pk=job_id, status=cls.STATUS.queued).update(
+                        status=cls.STATUS.running,
+                        attempts=F("attempts") + 1,
+                        started_on=now,
+                        heartbeat_on=now,
+                        notrack=True,
+                        )
+                if claimed:
+                    return cls.objects.get(pk=job_id)
+
+
+    @classmethod
+    def requeue_stale(cls, timeout):
+        """
+        Recover running jobs without a heartbeat for over ``timeout`` seconds.
+
+        These were claimed by a worker that died; they are queued again, or
+        failed if they are out of attempts. Returns the number requeued.
+
+        """
+        now = utcnow()
+        cutoff = now - datetime.timedelta(seconds=timeout)
+        stale = cls.objects.filter(
+            Q(heartbeat_on__lt=cutoff) |
+            Q(heartbeat_on__isnull=True, started_on__lt=cutoff),
+            status=cls.STATUS.running,
+            )
+        stale.filter(attempts__gte=F("max_attempts")).update(
+            status=cls.STATUS.failed,
+            active_key=None,
+            error="Job was abandoned by its worker.",
+            finished_on=now,
+            notrack=True,
+            )
+        return stale.update(status=cls.STATUS.queued, notrack=True)
+
+
+    @property
+    def finished(self):
+        """True if this job is done or has failed for good."""
+        return self.status in [self.STATUS.done, self.STATUS.failed]
+
+
+    @property
+    def result_data(self):
+        """The deserialized return value of the task, if it is done."""
+        if self.result:
+            return json.loads(self.result)
+        return None
+
+
+    def set_progress(self, progress, message=""):
+        """Record that the task is ``progress`` percent done."""
+        self._set(progress=progress, message=message, heartbeat_on=utcnow())
+
+
+    def run(self):
+        """
+        Call the task for this (claimed) job and record the outcome.
+
+        Returns True if the task succeeded.
+
+        """
+        try:
+            task = import_by_path(self.task)
+            with self._heartbeat():
+                result = task(self, **json.loads(self.arguments))
+        except Exception:
+            if self.attempts < self.max_attempts:
+                self._set(
+                    status=self.STATUS.queued,
+                    error=traceback.format_exc(),
+                    )
+            else:
+                self._set(
+                    status=self.STATUS.failed,
+                    active_key=None,
+                    error=traceback.format_exc(),
+                    finished_on=utcnow(),
+                    )
+            return False
+
+        self._set(
+            status=self.STATUS.done,
+            active_key=None,
+            progress=100,
+            result=json.dumps(result),
+            error="",
+            finished_on=utcnow(),
+            )
+        return True
+
+
+    @contextmanager
+    def _heartbeat(self):
+        """
+        Record a heartbeat every ``HEARTBEAT_INTERVAL`` seconds in the block.
+
+        Heartbeats are recorded from a separate thread (and database
+        connection), so they continue while the task waits on a long query.
+
+        """
+        stop = threading.Event()
+
+        def beat():
+            try:
+                while not stop.wait(self.HEARTBEAT_INTERVAL):
+                    self.__class__.objects.filter(pk=self.pk).update(
+                        heartbeat_on=utcnow(), notrack=True)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat)
+        thread.daemon = True
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+
+    def _set(self, **kwargs):
+        """Update given fields in the database and on this instance."""
+        self.__class__.objects.filter(pk=self.pk).update(
+            notrack=True, **kwargs)
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        self.cc_version += 1
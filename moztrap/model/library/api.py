@@ -1,3 +1,5 @@
+from django.db import transaction
+
 from tastypie import http, fields
 from tastypie.exceptions import ImmediateHttpResponse
 from tastypie.resources import ModelResource, ALL, ALL_WITH_RELATIONS
@@ -6,7 +8,7 @@ from ..core.api import (ProductVersionResource, ProductResource,
                         UserResource)
 from .models import CaseVersion, Case, Suite, CaseStep, SuiteCase
 from ...model.core.models import ProductVersion
-from ..mtapi import MTResource, MTAuthorization
+from ..mtapi import MTResource, MTAuthorization, MTApiKeyAuthentication
 from ..environments.api import EnvironmentResource
 from ..tags.api import TagResource
 
@@ -207,6 +209,143 @@ class SuiteCaseResource(MTResource):
 
 
 
+class SuiteMembershipResource(ModelResource):
+    """
+    Endpoint for setting the full, ordered list of cases in a suite.
+
+    This endpoint is write only and accepts POSTs of the form::
+
+        {"suite": "/api/v1/suite/1/", "cases": ["/api/v1/case/3/", 2]}
+
+    where each case is a resource uri or id. Afterwards the suite contains
+    exactly these cases, in this order; only the suitecases that differ are
+    written. The response contains the number of suitecases "added",
+    "removed" and "reordered".
+
+    """
+
+    class Meta:
+        queryset = SuiteCase.objects.all()
+        resource_name = "suitemembership"
+        list_allowed_methods = ["post"]
+        detail_allowed_methods = []
+
+        authentication = MTApiKeyAuthentication()
+        authorization = SuiteCaseAuthorization()
+
+
+    def post_list(self, request, **kwargs):
+        """Set the cases of the posted suite."""
+        deserialized = self.deserialize(
+            request,
+            request.body,
+            format=request.META.get("CONTENT_TYPE", "application/json"),
+            )
+        try:
+            suite = Suite.objects.get(
+                pk=self._id(deserialized["suite"]))
+            case_ids = [self._id(c) for c in deserialized["cases"]]
+        except (KeyError, TypeError, ValueError, Suite.DoesNotExist):
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(
+                    "Submitted data must have a 'suite' and a list of "
+                    "'cases'."))
+
+        bundle = self.build_bundle(obj=SuiteCase(suite=suite), request=request)
+        self.authorized_create_detail([], bundle)
+
+        try:
+            with transaction.commit_on_success():
+                result = suite.set_cases(case_ids, user=request.user)
+        except ValueError as e:
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(str(e)))
+
+        return self.create_response(request, result)
+
+
+    def _id(self, value):
+        """Return integer id given a resource uri or id."""
+        if isinstance(value, (list, dict)):
+            raise ValueError("Not an id: {0!r}".format(value))
+        return int(unicode(value).rstrip("/").split("/")[-1])
+
+
+
+class CaseNamesResource(ModelResource):
+    """
+    Endpoint for renaming many cases at once.
+
+    This endpoint is write only and accepts POSTs of the form::
+
+        {"cases": [{"case": "/api/v1/case/3/", "name": "New name"}, ...]}
+
+    where each case is a resource uri or id. All versions of each case get
+    the new name, with one ``UPDATE`` per chunk of cases. The response
+    contains the number of caseversions "renamed".
+
+    """
+
+    class Meta:
+        queryset = Case.objects.all()
+        resource_name = "casenames"
+        list_allowed_methods = ["post"]
+        detail_allowed_methods = []
+
+        authentication = MTApiKeyAuthentication()
+        authorization = CaseVersionAuthorization()
+
+
+    def post_list(self, request, **kwargs):
+        """Rename the posted cases."""
+        deserialized = self.deserialize(
+            request,
+            request.body,
+            format=request.META.get("CONTENT_TYPE", "application/json"),
+            )
+        try:
+            names = dict(
+                (self._id(item["case"]), unicode(item["name"]).strip())
+                for item in deserialized["cases"]
+                )
+        except (KeyError, TypeError, ValueError):
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(
+                    "Submitted data must have a list of 'cases', each with "
+                    "a 'case' and a 'name'."))
+
+        max_length = CaseVersion._meta.get_field("name").max_length
+        if not all(0 < len(name) <= max_length for name in names.values()):
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(
+                    "Case names must be 1 to {0} characters long.".format(
+                        max_length)))
+
+        missing = set(names).difference(
+            Case.objects.filter(pk__in=names).values_list("id", flat=True))
+        if missing:
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(
+                    "Case(s) {0} do not exist.".format(
+                        ", ".join(map(str, sorted(missing))))))
+
+        bundle = self.build_bundle(obj=CaseVersion(), request=request)
+        self.authorized_update_detail([], bundle)
+
+        with transaction.commit_on_success():
+            renamed = CaseVersion.sync_names(names, user=request.user)
+
+        return self.create_response(request, {"renamed": renamed})
+
+
+    def _id(self, value):
+        """Return integer id given a resource uri or id."""
+        if isinstance(value, (list, dict)):
+            raise ValueError("Not an id: {0!r}".format(value))
+        return int(unicode(value).rstrip("/").split("/")[-1])
+
+
+
 class CaseVersionResource(MTResource):
     """
     Create, Read, Update and Delete capabilities for CaseVersions.
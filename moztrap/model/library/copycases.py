@@ -0,0 +1,168 @@
+"""
+Set-based copying of case versions from one product version to another.
+
+"""
+from django.db import connection, transaction
+
+from ..mtmodel import utcnow
+from .models import Case, CaseVersion, CaseStep, CaseAttachment
+from .search import get_backend
+
+
+
+# cases copied per transaction
+CHUNK_SIZE = 500
+
+
+
+def copy_caseversions(source, target, user=None, progress=None,
+                      chunk_size=None):
+    """
+    Copy caseversions of ``source`` product version to ``target``.
+
+    If ``source`` is ``None``, the latest version of each case of the
+    target's product is copied instead. Only cases that have no version in
+    ``target`` yet are copied, so copying again after a partial copy picks up
+    where it left off. Copied versions keep their name and status and get the
+    steps, attachments, tags and environments of the version they are copied
+    from.
+
+    Each chunk of ``chunk_size`` (default ``CHUNK_SIZE``) cases is copied in
+    its own transaction with an ``INSERT ... SELECT`` per table, rather than
+    cloning and saving each caseversion, step and link in turn. ``progress``,
+    if given, is called after each chunk with the number of cases copied so
+    far and the total. Returns the number of cases copied.
+
+    """
+    if source is not None and source.product_id != target.product_id:
+        raise ValueError(
+            "Cannot copy cases from {0} to {1}: different products.".format(
+                source, target))
+
+    caseversions = CaseVersion.objects.filter(
+        case__product=target.product_id, case__deleted_on__isnull=True)
+    if source is None:
+        caseversions = caseversions.filter(latest=True)
+    else:
+        caseversions = caseversions.filter(productversion=source)
+    case_ids = list(
+        caseversions.exclude(
+            case__in=CaseVersion.objects.filter(
+                productversion=target).values("case_id")).order_by(
+            "case").values_list("case_id", flat=True)
+        )
+    total = len(case_ids)
+    chunk_size = chunk_size or CHUNK_SIZE
+    for i in range(0, total, chunk_size):
+        chunk = case_ids[i:i + chunk_size]
+        with transaction.commit_on_success():
+            _copy_chunk(source, target, chunk, user)
+            Case.update_latest_versions(cases=chunk)
+            get_backend().update(
+                CaseVersion.objects.filter(
+                    productversion=target, case__in=chunk).values_list(
+                    "id", flat=True))
+        if progress is not None:
+            progress(min(i + chunk_size, total), total)
+    return total
+
+
+
+def _copy_chunk(source, target, case_ids, user):
+    """Copy source (or latest) versions of given cases, with children."""
+    qn = connection.ops.quote_name
+    cursor = connection.cursor()
+    now = utcnow()
+    user_id = user.id if user is not None else None
+    cv = qn(CaseVersion._meta.db_table)
+    cases = ",".join(str(int(c)) for c in case_ids)
+
+    # selects the caseversions to copy from, aliased as {0}
+    if source is None:
+        selected = "{0}.latest = 1"
+        source_params = []
+    else:
+        selected = "{0}.productversion_id = %s"
+        source_params = [source.id]
+
+    cursor.execute(
+        """INSERT INTO {cv} (
+            created_on, created_by_id, modified_on, modified_by_id,
+            cc_version, status, productversion_id, case_id,
+            name, description, latest, envs_narrowed)
+        SELECT %s, %s, %s, %s, 0, cv.status, %s, cv.case_id,
+            cv.name, cv.description, 0, cv.envs_narrowed
+        FROM {cv} AS cv
+        WHERE {selected}
+            AND cv.deleted_on IS NULL
+            AND cv.case_id IN ({cases})
+        """.format(
+            cv=cv,
+            selected=selected.format("cv"),
+            cases=cases,
+            ),
+        [now, user_id, now, user_id, target.id] + source_params,
+        )
+
+    # joins each source caseversion (ocv) to its copy (ncv)
+    joins = """INNER JOIN {cv} AS ocv ON ocv.id = {{0}}
+        INNER JOIN {cv} AS ncv ON ncv.case_id = ocv.case_id
+            AND ncv.productversion_id = %s
+            AND ncv.deleted_on IS NULL""".format(cv=cv)
+    where = """{0}
+        AND ocv.deleted_on IS NULL
+        AND ocv.case_id IN ({1})""".format(selected.format("ocv"), cases)
+    params = [target.id] + source_params
+    stamp = [now, user_id, now, user_id]
+
+    cursor.execute(
+        """INSERT INTO {step} (
+            created_on, created_by_id, modified_on, modified_by_id,
+            cc_version, caseversion_id, number, instruction, expected)
+        SELECT %s, %s, %s, %s, 0, ncv.id, s.number, s.instruction, s.expected
+        FROM {step} AS s
+        {joins}
+        WHERE s.deleted_on IS NULL AND {where}
+        """.format(
+            step=qn(CaseStep._meta.db_table),
+            joins=joins.format("s.caseversion_id"),
+            where=where,
+            ),
+        stamp + params,
+        )
+
+    cursor.execute(
+        """INSERT INTO {att} (
+            created_on, created_by_id, modified_on, modified_by_id,
+            cc_version, caseversion_id, attachment, name)
+        SELECT %s, %s, %s, %s, 0, ncv.id, a.attachment, a.name
+        FROM {att} AS a
+        {joins}
+        WHERE a.deleted_on IS NULL AND {where}
+        """.format(
+            att=qn(CaseAttachment._meta.db_table),
+            joins=joins.format("a.caseversion_id"),
+            where=where,
+            ),
+        stamp + params,
+        )
+
+    for name in ["tags", "environments"]:
+        field = CaseVersion._meta.get_field(name)
+        source_col = qn(field.m2m_column_name())
+        target_col = qn(field.m2m_reverse_name())
+        cursor.execute(
+            """INSERT INTO {through} ({src}, {tgt})
+            SELECT ncv.id, t.{tgt}
+            FROM {through} AS t
+            {joins}
+            WHERE {where}
+            """.format(
+                through=qn(field.rel.through._meta.db_table),
+                src=source_col,
+                tgt=target_col,
+                joins=joins.format("t." + source_col),
+                where=where,
+                ),
+            params,
+            )
@@ -1,12 +1,18 @@
 """Importer for suites and cases from a dictionary."""
 
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
 import json
 
 from django.db import transaction
+from django.db.models import Q
 
 from ..core.auth import User
 from ..tags.models import Tag
+from .jsonstream import iter_array_items
 from .models import Case, CaseVersion, CaseStep, Suite, SuiteCase
+from .search import get_backend
 
 
 
@@ -46,6 +52,9 @@ class Importer(object):
         importer = Importer()
         import_result = importer.import_data(productversion, case_data)
 
+    Pass ``bulk=True`` to ``import_data`` to import cases with a
+    ``BulkCaseImporter``, for large imports.
+
     Returned value will be an ``ImportResult`` object with the following
     attributes:
 
@@ -56,7 +65,8 @@ class Importer(object):
     """
 
     @transaction.commit_on_success
-    def import_data(self, productversion, case_data, force_dupes=False):
+    def import_data(self, productversion, case_data, force_dupes=False,
+                    bulk=False, prepared=False):
         """
         Import the top-level dictionary of cases and suites.
 
@@ -69,6 +79,9 @@ class Importer(object):
         * case_data -- a dictionary of cases and/or suites to be imported
         * force_dupes -- if True, will import cases with duplicate names.  If
           False, they will be skipped.
+        * bulk -- if True, import cases with a ``BulkCaseImporter``.
+        * prepared -- if True, the cases have already been passed through
+          ``prepare_cases``; implies ``bulk``.
 
         """
 
@@ -85,10 +98,17 @@ class Importer(object):
         # no reason why the data couldn't include ONLY suites.  So function
         # gracefully if no cases.
         if "cases" in case_data:
-            case_importer = CaseImporter(productversion, suite_importer)
-            result.append(case_importer.import_cases(
-                case_data["cases"],
-                force_dupes=force_dupes))
+            if prepared:
+                case_importer = BulkCaseImporter(productversion, suite_importer)
+                result.append(case_importer.import_prepared(
+                    case_data["cases"],
+                    force_dupes=force_dupes))
+            else:
+                importer_class = BulkCaseImporter if bulk else CaseImporter
+                case_importer = importer_class(productversion, suite_importer)
+                result.append(case_importer.import_cases(
+                    case_data["cases"],
+                    force_dupes=force_dupes))
 
         # now create the suites and add cases to them
         if suite_importer:
@@ -98,6 +118,112 @@ class Importer(object):
 
 
 
+    def import_stream(self, productversion, fh, batch_size=500, skip=0,
+                      force_dupes=False, bulk=False, callback=None,
+                      workers=None):
+        """
+        Import cases and suites read incrementally from a JSON file object.
+
+        The file has the same format as the data for ``import_data``, but is
+        never loaded whole: items of its "suites" and "cases" arrays are read
+        one at a time and imported in batches of ``batch_size`` items, each
+        in its own transaction.
+
+        Keyword arguments (others as for ``import_data``):
+
+        * fh -- a file object with the JSON data
+        * batch_size -- number of suites and cases per committed batch
+        * skip -- number of items (suites, then cases) to skip, for resuming
+          an import after the last committed batch
+        * callback -- if given, called after each committed batch with the
+          total number of items (including skipped ones) committed so far
+        * workers -- if given, cases are passed through ``prepare_cases`` by
+          a pool of this many processes; this process writes each prepared
+          batch, in order, with a ``BulkCaseImporter``
+
+        """
+        result = ImportResult()
+        batches = iter_batches(
+            iter_array_items(fh, ["suites", "cases"]), batch_size, skip)
+
+        if workers:
+            # prepared batches are written by this process alone, in order
+            batches = self._prepare_in_pool(batches, workers)
+
+        for num, batch in batches:
+            result.append(self.import_data(
+                productversion,
+                batch,
+                force_dupes=force_dupes,
+                bulk=bulk,
+                prepared=bool(workers),
+                ))
+            if callback is not None:
+                callback(num)
+
+        return result
+
+
+    def _prepare_in_pool(self, batches, workers):
+        """
+        Yield batches with cases passed through ``prepare_cases`` in a pool.
+
+        At most two batches per worker are read ahead, so memory use stays
+        bounded however large the file is.
+
+        """
+        # workers only run prepare_cases; they never touch the database
+        pool = Pool(workers)
+        try:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.apply_async(prepare_batch, (batch,)))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+
+
+def iter_batches(items, batch_size, skip=0):
+    """
+    Group ``(key, item)`` pairs into batches of ``batch_size`` items.
+
+    Yields ``(num, batch)``, where ``batch`` is a dictionary mapping key to
+    list of items, and ``num`` is the number of items read so far. The first
+    ``skip`` items are dropped.
+
+    """
+    batch = {}
+    num = 0
+    for key, item in items:
+        num += 1
+        if num <= skip:
+            continue
+        batch.setdefault(key, []).append(item)
+        if sum(len(v) for v in batch.values()) == batch_size:
+            yield num, batch
+            batch = {}
+    if batch:
+        yield num, batch
+
+
+
+def prepare_batch(numbered_batch):
+    """Pass the cases of a ``(num, batch)`` pair through ``prepare_cases``."""
+    num, batch = numbered_batch
+    if "cases" in batch:
+        batch = dict(batch, cases=prepare_cases(batch["cases"]))
+    return num, batch
+
+
+
 class CaseImporter(object):
     """Imports cases and links to or creates associated tags, suites."""
 
@@ -282,6 +408,282 @@ class CaseImporter(object):
 
 
 
+def prepare_cases(case_dict_list):
+    """
+    Validate and normalize a list of case dicts for ``BulkCaseImporter``.
+
+    Needs no database access, so it can run in worker processes. Returns a
+    list with a dictionary per case::
+
+        {
+            "data": <the case dict, for warnings>,
+            "error": <ImportResult reason to skip the case, or None>,
+            "name": "case title",
+            "description": "case description",
+            "idprefix": "",
+            "created_by": <email, or None>,
+            "steps": <list of (instruction, expected) tuples, or None>,
+            "tags": ["tag1", "tag2"],
+            "suites": ["suite1 name"],
+        }
+
+    """
+    prepared = []
+    for new_case in case_dict_list:
+        if not "name" in new_case:
+            prepared.append(
+                {"data": new_case, "error": ImportResult.SKIP_CASE_NO_NAME})
+            continue
+
+        error = None
+        steps = None
+        if "steps" in new_case:
+            try:
+                steps = [
+                    (step["instruction"], step.get("expected", ""))
+                    for step in new_case["steps"]
+                    ]
+            except KeyError:
+                error = ImportResult.SKIP_STEP_NO_INSTRUCTION
+
+        prepared.append({
+                "data": new_case,
+                "error": error,
+                "name": new_case["name"],
+                "description": new_case.get("description", ""),
+                "idprefix": new_case.get("idprefix", ""),
+                "created_by": new_case.get("created_by"),
+                "steps": steps,
+                "tags": new_case.get("tags", []),
+                "suites": new_case.get("suites", []),
+                })
+    return prepared
+
+
+
+class BulkCaseImporter(CaseImporter):
+    """
+    Imports cases with multi-row inserts.
+
+    Takes the same case data and gives the same warnings as ``CaseImporter``,
+    but validates the whole list up front, fetches existing case names, users
+    and tags in a few queries, and creates cases, caseversions, steps and
+    their tag, environment and suite links in chunks of ``CHUNK_SIZE`` rows.
+    Cases are never saved one at a time, so caseversions are created with
+    ``latest`` set and without name syncing (a new case has one version).
+
+    """
+    CHUNK_SIZE = 500
+
+
+    def import_cases(self, case_dict_list, force_dupes=False):
+        """Import the test cases in the data; see ``CaseImporter``."""
+        return self.import_prepared(
+            prepare_cases(case_dict_list), force_dupes=force_dupes)
+
+
+    def import_prepared(self, prepared, force_dupes=False):
+        """Import cases already passed through ``prepare_cases``."""
+
+        result = ImportResult()
+
+        # lowercased, since name lookups in the database are case-insensitive
+        existing_names = set()
+        if not force_dupes:
+            existing_names.update(
+                name.lower() for name in CaseVersion.objects.filter(
+                    productversion=self.productversion).values_list(
+                    "name", flat=True)
+                )
+
+        emails = set(c["created_by"] for c in prepared if c.get("created_by"))
+        users = {}
+        if emails:
+            users = dict(
+                (u.email, u) for u in User.objects.filter(email__in=emails))
+        missing_emails = set()
+
+        # list of (prepared case, Case, CaseVersion) to create
+        new = []
+
+        for prepared_case in prepared:
+
+            if prepared_case["error"] == ImportResult.SKIP_CASE_NO_NAME:
+                result.warn(
+                    ImportResult.SKIP_CASE_NO_NAME,
+                    prepared_case["data"],
+                    )
+                continue
+
+            name = prepared_case["name"].lower()
+            if name in existing_names:
+                result.warn(
+                    ImportResult.SKIP_CASE_NAME_CONFLICT,
+                    prepared_case["data"],
+                    )
+                continue
+
+            user = None
+            email = prepared_case["created_by"]
+            if email is not None:
+                user = users.get(email)
+                # only warn the first time, as UserCache does
+                if user is None and email not in missing_emails:
+                    missing_emails.add(email)
+                    result.warn(
+                        ImportResult.WARN_USER_NOT_FOUND,
+                        email,
+                        )
+
+            if prepared_case["error"] is not None:
+                result.warn(
+                    prepared_case["error"],
+                    prepared_case["data"],
+                    )
+                continue
+
+            case = Case(
+                product=self.productversion.product,
+                idprefix=prepared_case["idprefix"],
+                )
+            caseversion = CaseVersion(
+                productversion=self.productversion,
+                name=prepared_case["name"],
+                description=prepared_case["description"],
+                latest=True,
+                created_by=user,
+                modified_by=user,
+                )
+
+            if prepared_case["steps"] is None:
+                result.warn(
+                    ImportResult.WARN_NO_STEPS,
+                    caseversion,
+                    )
+
+            if not force_dupes:
+                existing_names.add(name)
+            new.append((prepared_case, case, caseversion))
+            result.num_cases += 1
+
+        if new:
+            self.create_cases(new)
+
+        # now create the suites and add cases to them
+        result.append(self.suite_importer.import_suites())
+
+        return result
+
+
+    def create_cases(self, new):
+        """
+        Create cases, caseversions, steps, tag and environment links.
+
+        ``new`` is a list of (prepared case, unsaved Case, unsaved
+        CaseVersion) tuples. Suite membership is added to the suite importer.
+
+        """
+        Case.objects.bulk_create_with_ids(
+            [case for prepared, case, cv in new], batch_size=self.CHUNK_SIZE)
+        for prepared, case, cv in new:
+            cv.case = case
+        CaseVersion.objects.bulk_create_with_ids(
+            [cv for prepared, case, cv in new], batch_size=self.CHUNK_SIZE)
+
+        self.bulk_create(
+            CaseStep,
+            (
+                CaseStep(
+                    caseversion=cv,
+                    number=i,
+                    instruction=instruction,
+                    expected=expected,
+                    )
+                for prepared, case, cv in new
+                for i, (instruction, expected) in enumerate(
+                    prepared["steps"] or [], 1)
+                )
+            )
+
+        get_backend().update([cv.id for prepared, case, cv in new])
+
+        env_ids = list(
+            self.productversion.environments.values_list("id", flat=True))
+        EnvLink = CaseVersion.environments.through
+        self.bulk_create(
+            EnvLink,
+            (
+                EnvLink(caseversion_id=cv.id, environment_id=env_id)
+                for prepared, case, cv in new
+                for env_id in env_ids
+                )
+            )
+
+        tags = self.get_tags(
+            name for prepared, case, cv in new for name in prepared["tags"])
+        TagLink = CaseVersion.tags.through
+        self.bulk_create(
+            TagLink,
+            (
+                TagLink(caseversion_id=cv.id, tag_id=tag_id)
+                for prepared, case, cv in new
+                for tag_id in set(
+                    tags[name.lower()].id for name in prepared["tags"])
+                )
+            )
+
+        for prepared, case, cv in new:
+            if prepared["suites"]:
+                self.suite_importer.add_names(case, prepared["suites"])
+
+
+    def get_tags(self, tag_names):
+        """
+        Return dict mapping lowercased tag names to tags, creating as needed.
+
+        Uses an existing product tag, then an existing global tag, and creates
+        a product tag otherwise; the same priority as ``TagImporter``.
+
+        """
+        names = {}
+        for name in tag_names:
+            names.setdefault(name.lower(), name)
+        if not names:
+            return {}
+
+        product = self.productversion.product
+        tags = {}
+        # global tags sort first, so product tags win
+        for tag in Tag.objects.filter(
+                Q(product=product) | Q(product__isnull=True),
+                name__in=names.values(),
+                ).order_by("product"):
+            tags[tag.name.lower()] = tag
+
+        new_tags = [
+            Tag(name=name, product=product)
+            for key, name in sorted(names.items()) if key not in tags]
+        Tag.objects.bulk_create_with_ids(
+            new_tags, batch_size=self.CHUNK_SIZE)
+        if new_tags:
+            Tag.name_index.invalidate()
+        for tag in new_tags:
+            tags[tag.name.lower()] = tag
+
+        return tags
+
+
+    def bulk_create(self, model, objs):
+        """Bulk-create iterable of ``objs`` in chunks of ``CHUNK_SIZE``."""
+        objs = iter(objs)
+        while True:
+            chunk = list(islice(objs, self.CHUNK_SIZE))
+            if not chunk:
+                break
+            model.objects.bulk_create(chunk)
+
+
+
 class UserCache(object):
     """
     Cache of emails to User objects.
@@ -506,8 +908,14 @@ class SuiteImporter(object):
 
             # now add any cases the suite may have specified
             if "cases" in suite_data:
-                for case in suite_data["cases"]:
-                    SuiteCase.objects.create(case=case, suite=suite)
+                SuiteCase.objects.bulk_create(
+                    [
+                        SuiteCase(case=case, suite=suite)
+                        for case in suite_data["cases"]
+                        ],
+                    batch_size=500,
+                    )
+                Suite.update_counts([suite.id])
 
         # we have imported (or warned on) these items, so reset map.
         self.map.clear()
@@ -0,0 +1,33 @@
+"""
+Background job tasks for the test case library.
+
+Copying cases is safe to retry: each chunk is committed on its own, and only
+cases not yet in the target product version are copied.
+
+"""
+from ..core.auth import User
+from ..core.models import ProductVersion
+from .copycases import copy_caseversions
+
+
+
+def copy_productversion_cases(job, source_id, target_id, user_id=None):
+    """
+    Copy the caseversions of one product version to another.
+
+    If ``source_id`` is ``None``, the latest version of each case is copied.
+
+    """
+    source = None
+    if source_id is not None:
+        source = ProductVersion.objects.get(pk=source_id)
+    target = ProductVersion.objects.get(pk=target_id)
+    user = User.objects.get(pk=user_id) if user_id is not None else None
+
+    def progress(done, total):
+        job.set_progress(
+            done * 100 // total,
+            "Copied {0} of {1} cases.".format(done, total))
+
+    copied = copy_caseversions(source, target, user=user, progress=progress)
+    return {"productversion_id": target.id, "copied": copied}
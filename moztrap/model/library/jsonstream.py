@@ -0,0 +1,126 @@
+"""
+Incremental reading of the top-level arrays of a JSON object in a file.
+
+"""
+import json
+
+
+
+def iter_array_items(fh, keys, chunk_size=65536):
+    """
+    Yield ``(key, item)`` for each item of the arrays named in ``keys``.
+
+    ``fh`` is a file object containing a JSON object, such as the import
+    format::
+
+        {"suites": [...], "cases": [...]}
+
+    Items are yielded in file order as they are read, so memory use depends
+    on the size of the largest item rather than of the file. Values of other
+    keys are parsed and discarded. Raises ``ValueError`` on malformed JSON.
+
+    """
+    reader = _Reader(fh, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, basestring):
+            raise reader.error("Expected object key")
+        reader.expect(":")
+        if key in keys:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield key, reader.value()
+                    if reader.next_char(",]") == "]":
+                        break
+        else:
+            reader.value()
+        if reader.next_char(",}") == "}":
+            return
+
+
+
+class _Reader(object):
+    """A buffered JSON reader over a file object."""
+    WHITESPACE = " \t\n\r"
+
+
+    def __init__(self, fh, chunk_size):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        # number of characters dropped from the start of the buffer
+        self.offset = 0
+        self.eof = False
+
+
+    def error(self, message):
+        """Return a ValueError with given message and current position."""
+        return ValueError(
+            "{0} at character {1}".format(message, self.offset + self.pos))
+
+
+    def fill(self):
+        """Read another chunk into the buffer; return False at end of file."""
+        if self.eof:
+            return False
+        data = self.fh.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+
+    def peek(self):
+        """Skip whitespace; return next character, or "" at end of file."""
+        while True:
+            while (self.pos < len(self.buf) and
+                   self.buf[self.pos] in self.WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+
+    def expect(self, char):
+        """Consume ``char`` (after whitespace) or raise ValueError."""
+        self.next_char(char)
+
+
+    def next_char(self, chars):
+        """Consume and return one of ``chars`` (after whitespace)."""
+        c = self.peek()
+        if not c or c not in chars:
+            raise self.error(
+                "Expected {0}".format(" or ".join(repr(c) for c in chars)))
+        self.pos += 1
+        return c
+
+
+    def value(self):
+        """Decode and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                # maybe the value isn't all in the buffer yet
+                if not self.fill():
+                    raise self.error("Invalid JSON value")
+                continue
+            # a number or literal at the end of the buffer may be cut short
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
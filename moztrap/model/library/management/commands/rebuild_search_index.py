@@ -0,0 +1,29 @@
+"""
+Rebuild the caseversion full-text search index of the configured backend.
+
+"""
+from django.core.management.base import BaseCommand
+
+from moztrap.model.library.search import get_backend
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Reindex all caseversion text in the search backend, creating its "
+        "full-text indexes if missing.")
+
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get("verbosity", 1))
+
+        backend = get_backend()
+        num = backend.rebuild()
+
+        if verbosity:
+            if backend.indexed:
+                self.stdout.write("Indexed {0} caseversions.\n".format(num))
+            else:
+                self.stdout.write(
+                    "The search backend {0} has no index.\n".format(
+                        type(backend).__name__))
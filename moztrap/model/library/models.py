@@ -3,17 +3,24 @@ Models for test-case library (cases, suites).
 
 """
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connection, models
 from django.db.models import Max
 
 from ..attachments.models import Attachment
-from ..mtmodel import MTModel, DraftStatusModel
+from ..mtmodel import MTModel, DraftStatusModel, utcnow
 from ..core.models import Product, ProductVersion
 from ..environments.models import HasEnvironmentsModel
 from ..tags.models import Tag
 
 
 
+def _search_backend():
+    """Return the search backend; imported late, as it imports these models."""
+    from .search import get_backend
+    return get_backend()
+
+
+
 class Case(MTModel):
     """A test case for a given product."""
     product = models.ForeignKey(Product, related_name="cases")
@@ -39,21 +46,58 @@ class Case(MTModel):
         appropriately.
 
         """
-        try:
-            latest_version = self.versions.order_by("-productversion__order")[0]
-        except IndexError:
-            pass
+        self.update_latest_versions(cases=[self.id])
+        if update_instance is not None:
+            update_instance.latest, update_instance.cc_version = (
+                CaseVersion.everything.filter(
+                    pk=update_instance.pk).values_list(
+                    "latest", "cc_version")[0]
+                )
+
+
+    @classmethod
+    def update_latest_versions(cls, cases=None, product=None):
+        """
+        Recompute ``CaseVersion.latest`` for given case ids or product.
+
+        A single ``UPDATE`` joined to the per-case maximum product version
+        order; only non-deleted caseversions whose flag changes are written
+        (with ``cc_version`` bumped, but not modified_on/modified_by).
+
+        """
+        if product is not None:
+            where = "pv2.product_id = %s"
+            params = [getattr(product, "id", product)]
+        elif cases:
+            where = "cv2.case_id IN ({0})".format(
+                ",".join(str(int(getattr(c, "id", c))) for c in cases))
+            params = []
         else:
-            self.versions.exclude(pk=latest_version.pk).update(
-                latest=False, notrack=True)
-            self.versions.filter(pk=latest_version.pk).update(
-                latest=True, notrack=True)
-            if update_instance is not None:
-                update_instance.cc_version += 1
-                if update_instance == latest_version:
-                    update_instance.latest = True
-                else:
-                    update_instance.latest = False
+            return
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        cursor.execute(
+            """UPDATE {cv} AS cv
+            INNER JOIN {pv} AS pv ON pv.id = cv.productversion_id
+            INNER JOIN (
+                SELECT cv2.case_id AS case_id, MAX(pv2.{order}) AS max_order
+                FROM {cv} AS cv2
+                INNER JOIN {pv} AS pv2 ON pv2.id = cv2.productversion_id
+                WHERE cv2.deleted_on IS NULL AND {where}
+                GROUP BY cv2.case_id
+            ) AS m ON m.case_id = cv.case_id
+            SET cv.latest = (pv.{order} = m.max_order),
+                cv.cc_version = cv.cc_version + 1
+            WHERE cv.deleted_on IS NULL
+                AND cv.latest <> (pv.{order} = m.max_order)
+            """.format(
+                cv=qn(CaseVersion._meta.db_table),
+                pv=qn(ProductVersion._meta.db_table),
+                order=qn("order"),
+                where=where,
+                ),
+            params,
+            )
 
 
     def all_versions(self):
@@ -118,19 +162,63 @@ class CaseVersion(MTModel, DraftStatusModel, HasEnvironmentsModel):
         """Save CaseVersion, updating latest version."""
         skip_set_latest = kwargs.pop("skip_set_latest", False)
         skip_sync_name = kwargs.pop("skip_sync_name", False)
+        user = kwargs.get("user")
         super(CaseVersion, self).save(*args, **kwargs)
         if not skip_set_latest:
             self.case.set_latest_version(update_instance=self)
 
         # keep the name in sync for all caseversions
         if not skip_sync_name:
-            for cv in self.case.versions.all():
-                if not cv == self:
-                    cv.name = self.name
-                    cv.save(
-                        skip_sync_name=True,
-                        skip_set_latest=True,
-                        )
+            self.sync_names({self.case_id: self.name}, user=user)
+
+        _search_backend().update([self.id])
+
+
+    # cases renamed per CASE-based UPDATE
+    SYNC_NAMES_CHUNK_SIZE = 500
+
+
+    @classmethod
+    def sync_names(cls, names, user=None):
+        """
+        Set name of all versions of cases, given dict mapping case id to name.
+
+        Issues one ``UPDATE ... SET name = CASE case_id WHEN ...`` per
+        ``SYNC_NAMES_CHUNK_SIZE`` cases, touching (and bumping ``cc_version``
+        of) only non-deleted versions whose name differs, if only in letter
+        case. Returns the number of caseversions updated.
+
+        """
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        items = sorted(names.items())
+        user_id = user.id if user is not None else None
+        updated = 0
+        for i in range(0, len(items), cls.SYNC_NAMES_CHUNK_SIZE):
+            chunk = items[i:i + cls.SYNC_NAMES_CHUNK_SIZE]
+            case_sql = "CASE case_id {0} END".format(
+                " ".join(["WHEN %s THEN %s"] * len(chunk)))
+            case_params = [v for item in chunk for v in item]
+            sql = """UPDATE {0}
+                SET name = {1},
+                    modified_on = %s,
+                    modified_by_id = %s,
+                    cc_version = cc_version + 1
+                WHERE case_id IN ({2})
+                    AND deleted_on IS NULL
+                    AND BINARY name <> {1}
+                """.format(
+                    qn(cls._meta.db_table),
+                    case_sql,
+                    ",".join(str(int(case_id)) for case_id, name in chunk),
+                    )
+            cursor.execute(
+                sql, case_params + [utcnow(), user_id] + case_params)
+            if cursor.rowcount:
+                _search_backend().update_cases(
+                    [case_id for case_id, name in chunk])
+            updated += cursor.rowcount
+        return updated
 
 
 
@@ -143,12 +231,14 @@ class CaseVersion(MTModel, DraftStatusModel, HasEnvironmentsModel):
             self.case.delete(*args, **kwargs)
         else:
             self.case.set_latest_version()
+        _search_backend().update([self.id])
 
 
     def undelete(self, *args, **kwargs):
         """Undelete CaseVersion, updating latest version."""
         super(CaseVersion, self).undelete(*args, **kwargs)
         self.case.set_latest_version()
+        _search_backend().update([self.id])
 
 
     def clean(self):
@@ -192,19 +282,31 @@ class CaseVersion(MTModel, DraftStatusModel, HasEnvironmentsModel):
         overrides.setdefault("name", u"Cloned: {0}".format(self.name))
         if "productversion" not in overrides and "case" not in overrides:
             overrides["case"] = self.case.clone(cascade=[])
-            suitecases = SuiteCase.objects.filter(case=self.case)
-            for suitecase in suitecases:
-                suite = suitecase.suite
-                order = SuiteCase.objects.filter(
-                    suite=suite,
-                    ).aggregate(Max("order"))["order__max"] or 0
-                SuiteCase.objects.create(
-                    case=overrides["case"],
-                    suite=suite,
-                    user=kwargs["user"],
-                    order=order + 1,
-                    )
-        return super(CaseVersion, self).clone(*args, **kwargs)
+            # add the new case to the end of each suite this one is in
+            suite_ids = list(
+                SuiteCase.objects.filter(case=self.case).values_list(
+                    "suite_id", flat=True).distinct())
+            max_orders = dict(
+                SuiteCase.objects.filter(suite__in=suite_ids).values_list(
+                    "suite").annotate(Max("order")).order_by())
+            user = kwargs.get("user")
+            SuiteCase.objects.bulk_create(
+                [
+                    SuiteCase(
+                        case=overrides["case"],
+                        suite_id=suite_id,
+                        order=(max_orders.get(suite_id) or 0) + 1,
+                        created_by=user,
+                        modified_by=user,
+                        )
+                    for suite_id in suite_ids
+                    ]
+                )
+            Suite.update_counts(suite_ids)
+        clone = super(CaseVersion, self).clone(*args, **kwargs)
+        # steps are cloned in bulk, after the clone was saved (and indexed)
+        _search_backend().update([clone.id])
+        return clone
 
 
     @property
@@ -272,11 +374,32 @@ class CaseStep(MTModel):
     instruction = models.TextField()
     expected = models.TextField(blank=True)
 
+    # save only reindexes the caseversion, which CaseVersion.clone also does
+    bulk_clone = True
+
 
     def __unicode__(self):
         return u"step #%s" % (self.number,)
 
 
+    def save(self, *args, **kwargs):
+        """Save CaseStep, reindexing its caseversion's text."""
+        super(CaseStep, self).save(*args, **kwargs)
+        _search_backend().update([self.caseversion_id])
+
+
+    def delete(self, *args, **kwargs):
+        """Delete CaseStep, reindexing its caseversion's text."""
+        super(CaseStep, self).delete(*args, **kwargs)
+        _search_backend().update([self.caseversion_id])
+
+
+    def undelete(self, *args, **kwargs):
+        """Undelete CaseStep, reindexing its caseversion's text."""
+        super(CaseStep, self).undelete(*args, **kwargs)
+        _search_backend().update([self.caseversion_id])
+
+
     def clean(self):
         """
         Validate uniqueness of caseversion/number combo.
@@ -317,6 +440,20 @@ class Suite(MTModel, DraftStatusModel):
     cases = models.ManyToManyField(
         Case, through="SuiteCase", related_name="suites")
 
+    # number of (not deleted) cases in the suite
+    case_count = models.IntegerField(default=0)
+
+    denormalized_counts = {
+        "case_count": """
+            SELECT COUNT(DISTINCT sc.case_id)
+            FROM library_suitecase as sc
+                INNER JOIN library_case as c ON c.id = sc.case_id
+            WHERE sc.suite_id = {0}.id
+                AND sc.deleted_on IS NULL
+                AND c.deleted_on IS NULL
+            """,
+        }
+
 
     def __unicode__(self):
         return self.name
@@ -331,6 +468,114 @@ class Suite(MTModel, DraftStatusModel):
         return super(Suite, self).clone(*args, **kwargs)
 
 
+    # suitecases reordered per CASE-based UPDATE
+    REORDER_CHUNK_SIZE = 500
+
+
+    def set_cases(self, case_ids, user=None):
+        """
+        Make this suite contain exactly the given case ids, in that order.
+
+        Duplicate ids after the first are ignored. Compares with the current
+        suitecases and writes only the difference: a single ``DELETE`` for
+        cases no longer included, a bulk ``INSERT`` for new cases, and a
+        CASE-based ``UPDATE`` per ``REORDER_CHUNK_SIZE`` suitecases whose order
+        changed; then the case count is updated, if cases were added or
+        removed. Raises ``ValueError`` if a case is not of this suite's
+        product. Returns a dictionary with the number of suitecases "added",
+        "removed" and "reordered".
+
+        """
+        wanted = []
+        orders = {}
+        for case_id in case_ids:
+            case_id = int(case_id)
+            if case_id not in orders:
+                orders[case_id] = len(wanted)
+                wanted.append(case_id)
+
+        if wanted:
+            invalid = set(wanted).difference(
+                Case.objects.filter(
+                    pk__in=wanted, product=self.product_id).values_list(
+                    "id", flat=True)
+                )
+            if invalid:
+                raise ValueError(
+                    "Not cases of product {0}: {1}".format(
+                        self.product_id,
+                        ", ".join(str(c) for c in sorted(invalid))))
+
+        # case id -> (suitecase id, order) of suitecases to keep
+        existing = {}
+        remove = []
+        for sc_id, case_id, order, deleted_on in SuiteCase.everything.filter(
+                suite=self).order_by("id").values_list(
+                "id", "case_id", "order", "deleted_on"):
+            if (deleted_on is not None or
+                    case_id not in orders or
+                    case_id in existing):
+                remove.append(sc_id)
+            else:
+                existing[case_id] = (sc_id, order)
+
+        reorder = dict(
+            (sc_id, orders[case_id])
+            for case_id, (sc_id, order) in existing.items()
+            if order != orders[case_id]
+            )
+        add = [
+            SuiteCase(
+                suite=self,
+                case_id=case_id,
+                order=orders[case_id],
+                created_by=user,
+                modified_by=user,
+                )
+            for case_id in wanted if case_id not in existing
+            ]
+
+        if remove:
+            SuiteCase.everything.filter(id__in=remove).delete(permanent=True)
+        self._reorder_suitecases(reorder, user=user)
+        SuiteCase.objects.bulk_create(add, batch_size=self.REORDER_CHUNK_SIZE)
+        if add or remove:
+            self.update_counts([self.id])
+            self.case_count = len(wanted)
+
+        return {
+            "added": len(add),
+            "removed": len(remove),
+            "reordered": len(reorder),
+            }
+
+
+    def _reorder_suitecases(self, orders, user=None):
+        """Set order of suitecases, given dict mapping suitecase id to order."""
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        items = sorted(orders.items())
+        for i in range(0, len(items), self.REORDER_CHUNK_SIZE):
+            chunk = items[i:i + self.REORDER_CHUNK_SIZE]
+            cursor.execute(
+                """UPDATE {0}
+                SET {1} = CASE id {2} END,
+                    modified_on = %s,
+                    modified_by_id = %s,
+                    cc_version = cc_version + 1
+                WHERE id IN ({3})
+                """.format(
+                    qn(SuiteCase._meta.db_table),
+                    qn("order"),
+                    " ".join(
+                        "WHEN {0} THEN {1}".format(sc_id, order)
+                        for sc_id, order in chunk),
+                    ",".join(str(sc_id) for sc_id, order in chunk),
+                    ),
+                [utcnow(), user.id if user is not None else None],
+                )
+
+
     class Meta:
         permissions = [("manage_suites", "Can add/edit/delete test suites.")]
 
@@ -343,6 +588,9 @@ class SuiteCase(MTModel):
     # order of test cases in the suite
     order = models.IntegerField(default=0, db_index=True)
 
+    # save only updates the suite's case count, which Suite.clone also does
+    bulk_clone = True
+
 
     class Meta:
         ordering = ["order"]
@@ -350,6 +598,21 @@ class SuiteCase(MTModel):
             ("manage_suite_cases", "Can add/remove cases from suites.")]
 
 
+    def save(self, *args, **kwargs):
+        """Save suitecase; new ones update the case count of their suite."""
+        adding = self.pk is None
+        ret = super(SuiteCase, self).save(*args, **kwargs)
+        if adding:
+            Suite.update_counts([self.suite_id])
+        return ret
+
+
+    @classmethod
+    def deletion_changed(cls, instances):
+        """Update case counts of the suites of (un)deleted suitecases."""
+        Suite.update_counts(set(sc.suite_id for sc in instances))
+
+
     def clean(self):
         """
         Validate uniqueness of suite/case combo.
@@ -372,3 +635,26 @@ class SuiteCase(MTModel):
                 "'{0}' is already in suite '{1}'".format(
                     self.case, self.suite)
                 )
+
+
+
+class CaseVersionSearchText(models.Model):
+    """
+    Searchable text of a caseversion, with the text of its steps concatenated.
+
+    One table holding all the text lets a full-text index cover caseversions
+    and their steps; see ``moztrap.model.library.search``. Not a foreign key,
+    so caseversion deletes don't cascade here; rows of deleted caseversions
+    are dropped when reindexed, and never match a search otherwise, as
+    searches narrow querysets that exclude deleted caseversions.
+
+    """
+    caseversion_id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    instruction = models.TextField(blank=True)
+    expected = models.TextField(blank=True)
+
+
+    def __unicode__(self):
+        return self.name
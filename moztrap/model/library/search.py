@@ -0,0 +1,387 @@
+"""
+Pluggable full-text search over caseversion text.
+
+The text searched is a caseversion's ``name`` and ``description`` and the
+``instruction`` and ``expected`` text of its steps. The backend in use is
+named by the ``SEARCH_BACKEND`` setting:
+
+``SubstringBackend``
+    No index; ``icontains`` lookups, as keyword filters have always done.
+
+``MySQLBackend``
+    MySQL (5.6+) ``FULLTEXT`` indexes on ``CaseVersionSearchText``; run the
+    ``rebuild_search_index`` management command to create and fill them.
+
+``MemoryBackend``
+    An in-process inverted index, for tests.
+
+Indexed backends match each word of a keyword as a word prefix, rather than
+the keyword as a substring: "log" finds "login" but not "catalog".
+
+"""
+from collections import defaultdict
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_by_path
+
+from .models import CaseVersion, CaseStep, CaseVersionSearchText
+
+
+
+FIELDS = ["name", "description", "instruction", "expected"]
+
+# lookup of each field, relative to a caseversion
+FIELD_LOOKUPS = {
+    "name": "name",
+    "description": "description",
+    "instruction": "steps__instruction",
+    "expected": "steps__expected",
+    }
+
+
+_backends = {}
+
+
+def get_backend():
+    """Return the search backend instance named by ``SEARCH_BACKEND``."""
+    path = settings.SEARCH_BACKEND
+    if path not in _backends:
+        _backends[path] = import_by_path(path)()
+    return _backends[path]
+
+
+
+def words(text):
+    """Return list of lowercased words in given text."""
+    return re.findall(r"\w+", text.lower(), re.UNICODE)
+
+
+
+class SubstringBackend(object):
+    """
+    Search backend without an index.
+
+    Also the base class for indexed backends, which override ``filter`` and
+    ``search`` and maintain their index in ``update``.
+
+    """
+    indexed = False
+
+
+    def update(self, caseversion_ids):
+        """(Re)index caseversions with given ids (or values queryset)."""
+        pass
+
+
+    def update_cases(self, case_ids):
+        """(Re)index all versions of cases with given ids."""
+        self.update(
+            CaseVersion.everything.filter(case__in=case_ids).values_list(
+                "id", flat=True))
+
+
+    def rebuild(self):
+        """Rebuild the entire index; return number of caseversions indexed."""
+        return 0
+
+
+    def filter(self, queryset, field, values, any=False, prefix=""):
+        """
+        Filter ``queryset`` to objects whose caseversion ``field`` matches.
+
+        ``field`` is one of ``FIELDS``; ``prefix`` is the lookup from the
+        queryset's model to its caseversion, e.g. ``"caseversion__"``. All
+        ``values`` must match, or any of them if ``any`` is True.
+
+        """
+        lookup = "{0}{1}__icontains".format(prefix, FIELD_LOOKUPS[field])
+        filters = Q()
+        for value in values:
+            q = Q(**{lookup: value})
+            filters = (filters | q) if any else (filters & q)
+        return queryset.filter(filters).distinct()
+
+
+    def search(self, queryset, values, any=False):
+        """
+        Filter caseversion ``queryset`` to those with text matching values.
+
+        A value matches if found in any of the ``FIELDS``; indexed backends
+        also order the results by descending relevance.
+
+        """
+        filters = Q()
+        for value in values:
+            q = Q()
+            for lookup in FIELD_LOOKUPS.values():
+                q |= Q(**{"{0}__icontains".format(lookup): value})
+            filters = (filters | q) if any else (filters & q)
+        return queryset.filter(filters).distinct()
+
+
+
+class MySQLBackend(SubstringBackend):
+    """
+    Search backend using MySQL ``FULLTEXT`` indexes in boolean mode.
+
+    The index table holds one row per caseversion with its step text
+    concatenated, rebuilt set-wise from the caseversion and its steps.
+
+    """
+    indexed = True
+
+    # caseversions reindexed per statement
+    CHUNK_SIZE = 500
+
+    # long enough for the step text of any reasonable caseversion
+    GROUP_CONCAT_MAX_LEN = 1024 * 1024
+
+    # index name: indexed columns
+    INDEXES = dict(
+        [("library_cvsearch_{0}".format(f), [f]) for f in FIELDS] +
+        [("library_cvsearch_all", FIELDS)]
+        )
+
+
+    def update(self, caseversion_ids):
+        """Replace index rows of given caseversions; two queries per chunk."""
+        ids = list(caseversion_ids)
+        if not ids:
+            return
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        cursor.execute(
+            "SET SESSION group_concat_max_len = %s",
+            [self.GROUP_CONCAT_MAX_LEN])
+        for i in range(0, len(ids), self.CHUNK_SIZE):
+            id_list = ",".join(
+                str(int(cv_id)) for cv_id in ids[i:i + self.CHUNK_SIZE])
+            cursor.execute(
+                "DELETE FROM {0} WHERE caseversion_id IN ({1})".format(
+                    qn(CaseVersionSearchText._meta.db_table), id_list))
+            cursor.execute(
+                """INSERT INTO {st} (
+                    caseversion_id, name, description, instruction, expected)
+                SELECT cv.id, cv.name, cv.description,
+                    COALESCE(GROUP_CONCAT(
+                        s.instruction ORDER BY s.number SEPARATOR ' '), ''),
+                    COALESCE(GROUP_CONCAT(
+                        s.expected ORDER BY s.number SEPARATOR ' '), '')
+                FROM {cv} AS cv
+                LEFT JOIN {step} AS s
+                    ON s.caseversion_id = cv.id AND s.deleted_on IS NULL
+                WHERE cv.id IN ({ids}) AND cv.deleted_on IS NULL
+                GROUP BY cv.id
+                """.format(
+                    st=qn(CaseVersionSearchText._meta.db_table),
+                    cv=qn(CaseVersion._meta.db_table),
+                    step=qn(CaseStep._meta.db_table),
+                    ids=id_list,
+                    )
+                )
+
+
+    def rebuild(self):
+        """Refill the index table, then create any missing indexes."""
+        table = CaseVersionSearchText._meta.db_table
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM {0}".format(qn(table)))
+        self.update(CaseVersion.objects.values_list("id", flat=True))
+
+        # building indexes is faster once the table is filled
+        cursor.execute(
+            """SELECT DISTINCT index_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s""",
+            [table])
+        existing = set(row[0] for row in cursor.fetchall())
+        for name, columns in sorted(self.INDEXES.items()):
+            if name not in existing:
+                cursor.execute(
+                    "CREATE FULLTEXT INDEX {0} ON {1} ({2})".format(
+                        qn(name), qn(table), ", ".join(map(qn, columns))))
+
+        return CaseVersionSearchText.objects.count()
+
+
+    def boolean_query(self, values, any=False):
+        """
+        Return boolean-mode query string for given keyword values.
+
+        Each word of a value is a required prefix term; values are required
+        groups, or optional groups (at least one must match) if ``any``.
+        Returns None if there are no words to search for.
+
+        """
+        groups = []
+        for value in values:
+            terms = " ".join("+{0}*".format(w) for w in words(value))
+            if terms:
+                groups.append("{0}({1})".format("" if any else "+", terms))
+        return " ".join(groups) or None
+
+
+    def _match(self, columns):
+        """Return MATCH ... AGAINST SQL for given columns."""
+        qn = connection.ops.quote_name
+        return "MATCH({0}) AGAINST (%s IN BOOLEAN MODE)".format(
+            ", ".join(
+                "{0}.{1}".format(
+                    qn(CaseVersionSearchText._meta.db_table), qn(c))
+                for c in columns)
+            )
+
+
+    def filter(self, queryset, field, values, any=False, prefix=""):
+        """Filter via a subquery on the ``field`` index."""
+        query = self.boolean_query(values, any)
+        if query is None:
+            return queryset.none()
+        matching = CaseVersionSearchText.objects.extra(
+            where=[self._match([field])], params=[query]).values(
+            "caseversion_id")
+        return queryset.filter(**{"{0}id__in".format(prefix): matching})
+
+
+    def search(self, queryset, values, any=False):
+        """Join the combined index, ordering by its relevance score."""
+        query = self.boolean_query(values, any)
+        if query is None:
+            return queryset.none()
+        qn = connection.ops.quote_name
+        match = self._match(FIELDS)
+        return queryset.extra(
+            select={"search_score": match},
+            select_params=[query],
+            tables=[CaseVersionSearchText._meta.db_table],
+            where=[
+                "{0}.caseversion_id = {1}.id".format(
+                    qn(CaseVersionSearchText._meta.db_table),
+                    qn(CaseVersion._meta.db_table)),
+                match,
+                ],
+            params=[query],
+            order_by=["-search_score"],
+            )
+
+
+
+class MemoryBackend(SubstringBackend):
+    """
+    Search backend with an in-process inverted index; for tests.
+
+    Scores a caseversion by the number of occurrences of matching words.
+
+    """
+    indexed = True
+
+
+    def __init__(self):
+        self.clear()
+
+
+    def clear(self):
+        """Empty the index."""
+        # field: word: caseversion id: occurrences
+        self.index = dict(
+            (f, defaultdict(lambda: defaultdict(int))) for f in FIELDS)
+        # caseversion id: field: words
+        self.docs = {}
+
+
+    def update(self, caseversion_ids):
+        """Reindex given caseversions from the database."""
+        ids = list(caseversion_ids)
+        for cv_id in ids:
+            for field, field_words in self.docs.pop(cv_id, {}).items():
+                for word in field_words:
+                    self.index[field][word].pop(cv_id, None)
+
+        texts = {}
+        for cv_id, name, description in CaseVersion.objects.filter(
+                id__in=ids).values_list("id", "name", "description"):
+            texts[cv_id] = {
+                "name": [name],
+                "description": [description],
+                "instruction": [],
+                "expected": [],
+                }
+        for cv_id, instruction, expected in CaseStep.objects.filter(
+                caseversion__in=list(texts)).order_by(
+                "caseversion", "number").values_list(
+                "caseversion_id", "instruction", "expected"):
+            texts[cv_id]["instruction"].append(instruction)
+            texts[cv_id]["expected"].append(expected)
+
+        for cv_id, fields in texts.items():
+            self.docs[cv_id] = {}
+            for field, text in fields.items():
+                field_words = words(u" ".join(text))
+                self.docs[cv_id][field] = field_words
+                for word in field_words:
+                    self.index[field][word][cv_id] += 1
+
+
+    def rebuild(self):
+        """Reindex all caseversions."""
+        self.clear()
+        self.update(CaseVersion.objects.values_list("id", flat=True))
+        return len(self.docs)
+
+
+    def scores(self, fields, values, any=False):
+        """Return dict mapping matching caseversion ids to scores."""
+        results = None
+        for value in values:
+            value_words = words(value)
+            if not value_words:
+                continue
+            value_scores = None
+            for term in value_words:
+                term_scores = defaultdict(int)
+                for field in fields:
+                    for word, postings in self.index[field].items():
+                        if word.startswith(term):
+                            for cv_id, count in postings.items():
+                                term_scores[cv_id] += count
+                value_scores = self._combine(value_scores, term_scores, False)
+            results = self._combine(results, value_scores, any)
+        return results or {}
+
+
+    def _combine(self, a, b, any):
+        """Union (if ``any``) or intersection of score dicts, summing."""
+        if a is None:
+            return dict(b)
+        if any:
+            keys = set(a).union(b)
+        else:
+            keys = set(a).intersection(b)
+        return dict((k, a.get(k, 0) + b.get(k, 0)) for k in keys)
+
+
+    def filter(self, queryset, field, values, any=False, prefix=""):
+        """Filter to caseversion ids found in the ``field`` index."""
+        return queryset.filter(
+            **{"{0}id__in".format(prefix): list(
+                self.scores([field], values, any))})
+
+
+    def search(self, queryset, values, any=False):
+        """Filter to matching caseversions, ordered by score."""
+        scores = self.scores(FIELDS, values, any)
+        if not scores:
+            return queryset.none()
+        qn = connection.ops.quote_name
+        return queryset.filter(id__in=list(scores)).extra(
+            select={
+                "search_score": "CASE {0}.id {1} END".format(
+                    qn(CaseVersion._meta.db_table),
+                    " ".join(["WHEN %s THEN %s"] * len(scores))),
+                },
+            select_params=[v for item in scores.items() for v in item],
+            order_by=["-search_score"],
+            )
@@ -7,7 +7,8 @@ creation, modification, and soft-deletion.
 """
 import datetime
 
-from django.db import models, router
+from django.db import (
+    connection, connections, models, router, transaction, DatabaseError)
 from django.db.models.deletion import Collector
 from django.db.models.query import QuerySet
 from django.db.models.signals import class_prepared
@@ -43,6 +44,22 @@ class SoftDeleteCollector(Collector):
         super(SoftDeleteCollector, self).collect(objs, *args, **kwargs)
 
 
+    def can_fast_delete(self, objs, from_field=None):
+        """
+        Never fast-delete MTModels.
+
+        Django "fast-deletes" dependents nothing else depends on by deleting
+        them with a single query, without collecting them. Soft-deleting
+        needs them collected, so that they are soft-deleted too.
+
+        """
+        model = getattr(objs, "model", None)
+        if model is not None and issubclass(model, MTModel):
+            return False
+        return super(SoftDeleteCollector, self).can_fast_delete(
+            objs, from_field)
+
+
     def delete(self, user=None):
         """
         Soft-delete all collected instances.
@@ -54,6 +71,7 @@ class SoftDeleteCollector(Collector):
             model._base_manager.filter(
                 pk__in=pk_list, deleted_on__isnull=True).update(
                 deleted_by=user, deleted_on=now)
+        self._deletion_changed()
 
 
     def undelete(self, user=None):
@@ -69,6 +87,14 @@ class SoftDeleteCollector(Collector):
             model._base_manager.filter(
                 pk__in=pk_list, deleted_on__in=deletion_times).update(
                 deleted_by=None, deleted_on=None)
+        self._deletion_changed()
+
+
+    def _deletion_changed(self):
+        """Let each collected model react to (un)deletion of its instances."""
+        for model, instances in self.data.iteritems():
+            if hasattr(model, "deletion_changed"):
+                model.deletion_changed(instances)
 
 
 
@@ -87,6 +113,61 @@ class MTQuerySet(QuerySet):
         return super(MTQuerySet, self).create(*args, **kwargs)
 
 
+    def bulk_create_with_ids(self, objs, user=None, batch_size=500):
+        """
+        Bulk-create ``objs`` (unsaved instances), setting their ids.
+
+        Issues one multi-row ``INSERT`` per ``batch_size`` objects, each in its
+        own savepoint. The ids of a multi-row insert need not be consecutive
+        (with ``innodb_autoinc_lock_mode`` 2, InnoDB interleaves concurrent
+        inserts), so they are read back rather than computed. Each row is
+        inserted with a negative ``cc_version`` token (-1 for the first object
+        of the batch, -2 for the second...); the token-carrying rows above the
+        highest id seen before the insert are selected, and their tokens are
+        reset to 0 before the savepoint is released. Other transactions' rows
+        are not visible until committed, and committed rows never carry a
+        token, so only this batch's rows are found. If not all of them are
+        found, raises ``DatabaseError`` (rolling back the batch).
+
+        """
+        if user is not None:
+            for obj in objs:
+                obj.created_by = user
+                obj.modified_by = user
+        conn = connections[self.db]
+        qn = conn.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        pk = qn(self.model._meta.pk.column)
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX({0}) FROM {1}".format(pk, table))
+        floor = cursor.fetchone()[0] or 0
+        for i in range(0, len(objs), batch_size):
+            batch = objs[i:i + batch_size]
+            for j, obj in enumerate(batch):
+                obj.cc_version = -(j + 1)
+            with transaction.atomic(using=self.db):
+                self.bulk_create(batch)
+                cursor.execute(
+                    "SELECT {0}, cc_version FROM {1} "
+                    "WHERE {0} > %s AND cc_version < 0".format(pk, table),
+                    [floor],
+                    )
+                rows = cursor.fetchall()
+                ids = dict((-token, obj_id) for obj_id, token in rows)
+                if len(rows) != len(batch) or len(ids) != len(batch):
+                    raise DatabaseError(
+                        "Found {0} rows of {1} inserted into {2}.".format(
+                            len(rows), len(batch), table))
+                cursor.execute(
+                    "UPDATE {1} SET cc_version = 0 WHERE {0} IN ({2})".format(
+                        pk, table, ",".join(str(v) for v in ids.values())))
+            for j, obj in enumerate(batch):
+                obj.id = ids[j + 1]
+                obj.cc_version = 0
+            floor = max(ids.values())
+        return objs
+
+
     def update(self, *args, **kwargs):
         """
         Update all objects in this queryset with modifications in ``kwargs``.
@@ -149,6 +230,11 @@ class MTManager(models.Manager):
         return qs
 
 
+    def bulk_create_with_ids(self, *args, **kwargs):
+        """Proxy to ``MTQuerySet.bulk_create_with_ids``."""
+        return self.get_query_set().bulk_create_with_ids(*args, **kwargs)
+
+
 
 class MTModel(models.Model):
     """
@@ -171,6 +257,13 @@ class MTModel(models.Model):
     # for optimistic concurrency control
     cc_version = models.IntegerField(default=0)
 
+    # denormalized counts kept up to date by ``update_counts``: field name ->
+    # SQL expression counting the field's true value, with ``{0}`` standing
+    # for the (quoted) table of this model, to correlate on. ``save`` doesn't
+    # write these fields for existing instances, so that a stale copy can't
+    # overwrite a count.
+    denormalized_counts = {}
+
 
 
     # default manager returns all objects, so admin can see all
@@ -200,7 +293,10 @@ class MTModel(models.Model):
         # MTModels always have an auto-PK and we don't set PKs explicitly, so
         # we can assume that a set PK means this should be an update.
         if kwargs.get("force_update") or self.id is not None:
-            non_pks = [f for f in self._meta.local_fields if not f.primary_key]
+            non_pks = [
+                f for f in self._meta.local_fields
+                if not f.primary_key and f.name not in self.denormalized_counts
+                ]
             # This isn't a race condition because the save will only take
             # effect if previous_version is actually up to date.
             previous_version = self.cc_version
@@ -245,40 +341,108 @@ class MTModel(models.Model):
         if overrides is None:
             overrides = {}
 
-        overrides["created_on"] = utcnow()
-        overrides["created_by"] = user
-        overrides["modified_by"] = user
-
-        clone = self.__class__()
-
-        for field in self._meta.fields:
-            if field.primary_key:
-                continue
-            val = overrides.get(field.name, getattr(self, field.name))
-            setattr(clone, field.name, val)
-
+        clone = self._clone_instance(overrides, user=user)
         clone.save(force_insert=True)
 
         for name, filter_func in cascade.items():
             mgr = getattr(self, name)
             if mgr.__class__.__name__ == "ManyRelatedManager":  # M2M
-                clone_mgr = getattr(clone, name)
-                existing = set(clone_mgr.all())
-                new = set(filter_func(mgr.all()))
-                clone_mgr.add(*new.difference(existing))
-                clone_mgr.remove(*existing.difference(new))
+                self._clone_m2m(clone, mgr, filter_func(mgr.all()))
             elif mgr.__class__.__name__ == "RelatedManager":  # reverse FK
-                reverse_name = getattr(self.__class__, name).related.field.name
-                for obj in filter_func(mgr.all()):
-                    obj.clone(overrides={reverse_name: clone})
+                related = getattr(self.__class__, name).related
+                reverse_name = related.field.name
+                objs = filter_func(mgr.all())
+                if _plain_clone(related.model):
+                    related.model.objects.bulk_create(
+                        [
+                            obj._clone_instance({reverse_name: clone})
+                            for obj in objs
+                            ]
+                        )
+                else:
+                    for obj in objs:
+                        obj.clone(overrides={reverse_name: clone})
             else:
                 raise ValueError(
                     "Cannot cascade-clone '{0}'; "
                     "not a many-to-many or reverse foreignkey.".format(name))
 
+        if clone.denormalized_counts:
+            # counts copied over only hold if everything counted was cloned
+            clone.refresh_counts()
+
         return clone
 
 
+    def _clone_instance(self, overrides, user=None):
+        """
+        Return an unsaved copy of this instance, with field ``overrides``.
+
+        The copy is stamped as created and modified now by ``user``.
+
+        """
+        now = utcnow()
+        overrides = dict(
+            overrides,
+            created_on=now,
+            created_by=user,
+            modified_on=now,
+            modified_by=user,
+            )
+
+        clone = self.__class__()
+        for field in self._meta.fields:
+            if field.primary_key:
+                continue
+            val = overrides.get(field.name, getattr(self, field.name))
+            setattr(clone, field.name, val)
+        return clone
+
+
+    def _clone_m2m(self, clone, mgr, objs):
+        """
+        Set m2m relation of ``clone`` (the ``mgr`` relation) to ``objs``.
+
+        Replaces any links the clone got on save. If ``objs`` is a queryset,
+        links are copied with a single ``INSERT ... SELECT``.
+
+        """
+        through = mgr.through
+        qn = connection.ops.quote_name
+        table = qn(through._meta.db_table)
+        source = qn(through._meta.get_field(mgr.source_field_name).column)
+        target = qn(through._meta.get_field(mgr.target_field_name).column)
+        cursor = connection.cursor()
+        cursor.execute(
+            "DELETE FROM {0} WHERE {1} = %s".format(table, source),
+            [clone.pk])
+        if isinstance(objs, QuerySet):
+            sql, params = objs.values_list(
+                "pk", flat=True).query.sql_with_params()
+            cursor.execute(
+                "INSERT INTO {0} ({1}, {2}) "
+                "SELECT DISTINCT %s, sub.{3} FROM ({4}) AS sub".format(
+                    table,
+                    source,
+                    target,
+                    qn(objs.model._meta.pk.column),
+                    sql,
+                    ),
+                [clone.pk] + list(params),
+                )
+        else:
+            through.objects.bulk_create(
+                [
+                    through(**{
+                        mgr.source_field_name: clone,
+                        mgr.target_field_name: obj,
+                        })
+                    for obj in set(objs)
+                    ]
+                )
+
+
+
     def delete(self, user=None, permanent=False):
         """
         (Soft) delete this instance, unless permanent=True.
@@ -297,6 +461,91 @@ class MTModel(models.Model):
         self._collector.undelete(user)
 
 
+    @classmethod
+    def deletion_changed(cls, instances):
+        """
+        Hook called after ``instances`` were (soft) deleted or undeleted.
+
+        Called for every model in a delete cascade, so models can keep
+        denormalized data depending on them up to date.
+
+        """
+        pass
+
+
+    # rows recounted per UPDATE
+    COUNTS_CHUNK_SIZE = 500
+
+
+    @classmethod
+    def update_counts(cls, ids=None):
+        """
+        Recount ``denormalized_counts`` of rows with given ids (default all).
+
+        One ``UPDATE`` per ``COUNTS_CHUNK_SIZE`` rows. Modification
+        timestamps and versions are left alone, as counts aren't edits.
+
+        """
+        if not cls.denormalized_counts:
+            return
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        sql = "UPDATE {0} SET {1}".format(
+            table,
+            ", ".join(
+                "{0} = ({1})".format(qn(field), count.format(table))
+                for field, count in sorted(cls.denormalized_counts.items())
+                ),
+            )
+        cursor = connection.cursor()
+        if ids is None:
+            cursor.execute(sql)
+            return
+        ids = sorted(set(ids))
+        for i in range(0, len(ids), cls.COUNTS_CHUNK_SIZE):
+            cursor.execute(
+                "{0} WHERE id IN ({1})".format(
+                    sql,
+                    ",".join(
+                        str(int(pk))
+                        for pk in ids[i:i + cls.COUNTS_CHUNK_SIZE]),
+                    )
+                )
+
+
+    @classmethod
+    def stale_counts(cls):
+        """
+        Return list of rows whose ``denormalized_counts`` are off.
+
+        Each is a tuple ``(id, field name, stored count, true count)``.
+
+        """
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        cursor = connection.cursor()
+        stale = []
+        for field, count in sorted(cls.denormalized_counts.items()):
+            true_count = count.format(table)
+            cursor.execute(
+                "SELECT id, {1}, ({2}) FROM {0} WHERE {1} <> ({2}) "
+                "ORDER BY id".format(table, qn(field), true_count))
+            stale.extend(
+                (pk, field, stored, actual)
+                for pk, stored, actual in cursor.fetchall())
+        return sorted(stale)
+
+
+    def refresh_counts(self):
+        """Recount this instance's ``denormalized_counts``, and reload them."""
+        self.update_counts([self.pk])
+        fields = list(self.denormalized_counts)
+        values = self.__class__.everything.filter(pk=self.pk).values_list(
+            *fields)[0]
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
+
+
     @property
     def _collector(self):
         """Returns populated delete-cascade collector."""
@@ -311,6 +560,23 @@ class MTModel(models.Model):
 
 
 
+def _plain_clone(model):
+    """
+    True if ``model`` instances can be cloned in bulk.
+
+    That is, if neither ``clone`` nor ``save`` is overridden, so that
+    ``bulk_create`` of ``_clone_instance`` copies skips nothing; or if the
+    model sets ``bulk_clone``, as its ``save`` only does what the clone of
+    its parent takes care of anyway.
+
+    """
+    return getattr(model, "bulk_clone", False) or (
+        model.clone.__func__ is MTModel.clone.__func__ and
+        model.save.__func__ is MTModel.save.__func__
+        )
+
+
+
 class NotDeletedCount(models.Count):
     """A Count on a related field that only counts not-deleted objects."""
     def add_to_query(self, query, alias, col, source, is_summary):
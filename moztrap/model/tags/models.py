@@ -4,6 +4,7 @@ Models for tags.
 """
 from django.db import models
 
+from ..autocomplete import NameIndex
 from ..mtmodel import MTModel
 from ..core.models import Product
 
@@ -20,11 +21,35 @@ class Tag(MTModel):
     # a tag may be considered a user-story
     # is_user_story = models.BooleanField(default=False)
 
+    # for autocomplete; scoped by product
+    name_index = NameIndex(
+        "tags",
+        lambda: Tag.objects.values_list("id", "name", "product_id"),
+        )
+
     def __unicode__(self):
         """Unicode representation is name."""
         return self.name
 
 
+    def save(self, *args, **kwargs):
+        """Save tag, invalidating the name index."""
+        super(Tag, self).save(*args, **kwargs)
+        self.name_index.invalidate()
+
+
+    def delete(self, *args, **kwargs):
+        """Delete tag, invalidating the name index."""
+        super(Tag, self).delete(*args, **kwargs)
+        self.name_index.invalidate()
+
+
+    def undelete(self, *args, **kwargs):
+        """Undelete tag, invalidating the name index."""
+        super(Tag, self).undelete(*args, **kwargs)
+        self.name_index.invalidate()
+
+
     def clone(self, *args, **kwargs):
         """Clone tag; sets name prefix by default."""
         overrides = kwargs.setdefault("overrides", {})
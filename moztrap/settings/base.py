@@ -142,6 +142,7 @@ INSTALLED_APPS = [
     "moztrap.model.execution",
     "moztrap.model.attachments",
     "moztrap.model.tags",
+    "moztrap.model.jobs",
     "moztrap.view",
     "moztrap.view.lists",
     "moztrap.view.markup",
@@ -243,6 +244,12 @@ SOUTH_MIGRATION_MODULES = {
     "preferences": "moztrap.model.migrations.preferences",
     }
 
+# Backend for keyword searches of caseversion text; see
+# moztrap.model.library.search. With MySQL 5.6+, set to
+# "moztrap.model.library.search.MySQLBackend" and run the
+# rebuild_search_index management command.
+SEARCH_BACKEND = "moztrap.model.library.search.SubstringBackend"
+
 SITE_URL = "http://localhost:8000"
 BROWSERID_CREATE_USER = "moztrap.model.core.auth.browserid_create_user"
 
@@ -2,13 +2,22 @@
 # are ready to forego the flexibility of the Tastypie API and just write
 # our own view functions straight up
 
+import hashlib
 import json
 from collections import defaultdict
 
-from django.http import HttpResponse, HttpResponseBadRequest
-from django.views.decorators.cache import never_cache
+from django.db.models import Count, Max, Q, Sum
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, StreamingHttpResponse)
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition
 
-from moztrap.model.library.models import CaseVersion
+from moztrap.model.execution.models import RunCaseVersion, RunSuite
+from moztrap.model.library.models import (
+    CaseVersion, Case, CaseStep, Suite, SuiteCase)
+from moztrap.model.library.search import get_backend
+from moztrap.model.tags.models import Tag
+from moztrap.view.lists.filters import filter_url
 
 @never_cache
 def caseselection(request):
@@ -19,13 +28,18 @@ def caseselection(request):
     This view function is about 10 faster on an average workload compared
     to the Tastpie version but it also has much fewer filtering options
     and it returns less data.
+
+    With ``search``, only caseversions whose name, description or step text
+    match it are returned; if the search backend is indexed, they are ranked
+    by relevance unless ``order_by`` is given.
     """
     if not request.GET.get("productversion__product"):
         return HttpResponseBadRequest("productversion__product is required")
     product_id = request.GET["productversion__product"]
     not_in_case = request.GET.get("case__suites__ne", None)
     in_case = request.GET.get("case__suites", None)
-    order_by = request.GET.get("order_by", "case__id")
+    order_by = request.GET.get("order_by")
+    search = request.GET.get("search", "").strip()
     limit = int(request.GET.get("limit", 0))
     offset = int(request.GET.get("offset", 0))
 
@@ -34,8 +48,11 @@ def caseselection(request):
         .filter(latest=True)
         .filter(productversion__product_id=product_id)
         .select_related("case", "created_by")
-        .order_by(order_by)
     )
+    if search:
+        caseversions = get_backend().search(caseversions, [search])
+    if order_by or not search:
+        caseversions = caseversions.order_by(order_by or "case__id")
     if not_in_case:
         caseversions = caseversions.exclude(case__suites=not_in_case)
     elif in_case:
@@ -94,3 +111,536 @@ def caseselection(request):
         json.dumps(context, indent=2),
         content_type="application/json"
     )
+
+
+# rows (and their related data) fetched per query while streaming
+CHUNK_SIZE = 500
+
+
+def _dumps(obj):
+    """Return compact JSON of ``obj``."""
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _int_list(request, name):
+    """Return list of ints from (repeatable) querystring param ``name``."""
+    return [int(v) for v in request.GET.getlist(name) if v]
+
+
+def _int_param(request, name):
+    """Return int querystring param ``name``, or 0 if not given."""
+    return int(request.GET.get(name) or 0)
+
+
+def _state(queryset):
+    """Return aggregates of MTModel ``queryset`` that change with its rows."""
+    return queryset.aggregate(
+        Max("modified_on"), Count("id"), Sum("cc_version"))
+
+
+def _links_state(queryset):
+    """Return aggregates of m2m link ``queryset`` that change with its rows."""
+    return queryset.aggregate(Max("id"), Count("id"))
+
+
+def _etag(*states):
+    """Return an ETag hashing the given aggregate dicts."""
+    return hashlib.md5(
+        repr([sorted(s.items()) for s in states])).hexdigest()
+
+
+def _stream_json(chunks, meta):
+    """
+    Yield compact JSON of ``{"objects": [...], "meta": meta}``.
+
+    ``chunks`` yields lists of objects; ``meta`` is serialized only once they
+    are exhausted, so the generator producing them may still fill it in.
+
+    """
+    yield '{"objects":['
+    first = True
+    for chunk in chunks:
+        for obj in chunk:
+            yield ("" if first else ",") + _dumps(obj)
+            first = False
+    yield '],"meta":' + _dumps(meta) + '}'
+
+
+def _keyset_chunks(fetch, key, last, limit, meta):
+    """
+    Yield lists of rows, paging by key rather than offset.
+
+    ``fetch(last, size)`` returns up to ``size`` rows following row ``last``
+    (from the first row, if ``last`` is None) in key order. At most ``limit``
+    rows are yielded (all, if 0). ``meta["next"]`` is set to ``key(row)`` of
+    the last row yielded if there may be more rows, else None.
+
+    """
+    meta["next"] = None
+    count = 0
+    while not limit or count < limit:
+        size = CHUNK_SIZE
+        if limit:
+            size = min(size, limit - count)
+        rows = fetch(last, size)
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        count += len(rows)
+        last = rows[-1]
+    meta["next"] = key(last)
+
+
+def _tags_map(caseversion_ids):
+    """Return dict mapping caseversion ids to lists of their (live) tags."""
+    tags_map = defaultdict(list)
+    tags = (
+        CaseVersion.tags.through.objects
+        .filter(caseversion__in=caseversion_ids)
+        .filter(tag__deleted_on__isnull=True)
+        .order_by("id")
+        .values("caseversion_id", "tag_id", "tag__name", "tag__description")
+    )
+    for t in tags:
+        tags_map[t["caseversion_id"]].append({
+            "id": t["tag_id"],
+            "name": t["tag__name"],
+            "description": t["tag__description"],
+        })
+    return tags_map
+
+
+def _created_by(row):
+    """Return dict of the creator in values() ``row``, or {} if none."""
+    if row["created_by_id"] is None:
+        return {}
+    return {
+        "id": row["created_by_id"],
+        "username": row["created_by__username"],
+    }
+
+
+def _caseselection_params(request):
+    """
+    Return dict of v2 caseselection querystring params.
+
+    Raises ``ValueError`` if the product is missing or a param isn't valid.
+
+    """
+    product_ids = _int_list(request, "productversion__product")
+    if not product_ids:
+        raise ValueError("productversion__product is required")
+    return {
+        "product_id": product_ids[0],
+        "in_suites": _int_list(request, "case__suites"),
+        "not_in_suites": _int_list(request, "case__suites__ne"),
+        "tags": _int_list(request, "tag"),
+        "priorities": _int_list(request, "priority"),
+        "search": request.GET.get("search", "").strip(),
+        "after": _int_param(request, "after"),
+        "limit": _int_param(request, "limit"),
+    }
+
+
+def _caseselection_etag(request):
+    """
+    Return an ETag for v2 caseselection, or None if the request is invalid.
+
+    Derived from the latest modification, the count and the sum of
+    ``cc_version`` of the product's caseversions, and the same for its cases,
+    its and global tags, and tag links; and only when the request filters on
+    them, for the given suites' memberships and (when searching) the steps.
+    Any change to those that shows up in the results changes one of them.
+
+    """
+    try:
+        params = _caseselection_params(request)
+    except ValueError:
+        return None
+    product_id = params["product_id"]
+    states = [
+        _state(CaseVersion.objects.filter(
+            productversion__product=product_id)),
+        _state(Case.objects.filter(product=product_id)),
+        _state(Tag.objects.filter(
+            Q(product=product_id) | Q(product__isnull=True))),
+        _links_state(CaseVersion.tags.through.objects.filter(
+            caseversion__productversion__product=product_id)),
+        ]
+    suite_ids = params["in_suites"] + params["not_in_suites"]
+    if suite_ids:
+        states.append(_state(SuiteCase.objects.filter(suite__in=suite_ids)))
+    if params["search"]:
+        states.append(_state(CaseStep.objects.filter(
+            caseversion__productversion__product=product_id)))
+    return _etag(*states)
+
+
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_caseselection_etag)
+def caseselection_v2(request):
+    """
+    Return latest caseversions of a product for selection, as compact JSON.
+
+    Pages by case id: results are ordered by case id, and ``after`` returns
+    only those with a greater case id, so deep pages are as cheap as the
+    first. ``meta.next`` is the ``after`` value for the next page (or null, on
+    the last page). ``limit`` defaults to 0, meaning no limit. There is no
+    count of all matches.
+
+    Filters: ``case__suites``, ``case__suites__ne``, ``tag`` and ``priority``
+    (repeatable; any of the given values matches) and ``search`` (keywords
+    in name, description or step text, via the search backend).
+
+    Tags are fetched only for the caseversions returned; the response is
+    streamed, and an ETag lets clients revalidate cheaply.
+
+    """
+    try:
+        params = _caseselection_params(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    caseversions = CaseVersion.objects.filter(
+        latest=True, productversion__product=params["product_id"])
+    if params["in_suites"]:
+        caseversions = caseversions.filter(
+            case__in=SuiteCase.objects.filter(
+                suite__in=params["in_suites"]).values("case_id"))
+    if params["not_in_suites"]:
+        caseversions = caseversions.exclude(
+            case__in=SuiteCase.objects.filter(
+                suite__in=params["not_in_suites"]).values("case_id"))
+    if params["tags"]:
+        caseversions = caseversions.filter(
+            id__in=CaseVersion.tags.through.objects.filter(
+                tag__in=params["tags"]).values("caseversion_id"))
+    if params["priorities"]:
+        caseversions = caseversions.filter(
+            case__priority__in=params["priorities"])
+    if params["search"]:
+        caseversions = get_backend().search(caseversions, [params["search"]])
+    caseversions = caseversions.order_by("case__id")
+
+    def fetch(last, size):
+        qs = caseversions
+        if last is not None:
+            qs = qs.filter(case__gt=last["case_id"])
+        return list(
+            qs.values(
+                "id",
+                "case_id",
+                "name",
+                "case__priority",
+                "created_by_id",
+                "created_by__username",
+                )[:size]
+            )
+
+    after = params["after"]
+    meta = {"limit": params["limit"], "after": after}
+    chunks = _keyset_chunks(
+        fetch,
+        lambda row: row["case_id"],
+        {"case_id": after} if after else None,
+        params["limit"],
+        meta,
+        )
+    return StreamingHttpResponse(
+        _stream_json((_caseselection_items(rows) for rows in chunks), meta),
+        content_type="application/json",
+        )
+
+
+def _caseselection_items(rows):
+    """Return caseselection objects for caseversion rows, with their tags."""
+    tags_map = _tags_map([r["id"] for r in rows])
+    return [
+        {
+            "id": row["id"],
+            "case_id": row["case_id"],
+            "name": row["name"],
+            "priority": row["case__priority"],
+            "created_by": _created_by(row),
+            "tags": [
+                {"name": t["name"], "description": t["description"]}
+                for t in tags_map[row["id"]]
+            ],
+        }
+        for row in rows
+    ]
+
+
+def _suiteselection_params(request):
+    """
+    Return dict of suiteselection querystring params.
+
+    Raises ``ValueError`` if the product is missing or a param isn't valid.
+
+    """
+    product_ids = _int_list(request, "product")
+    if not product_ids:
+        raise ValueError("product is required")
+    return {
+        "product_id": product_ids[0],
+        "in_run": _int_param(request, "runs"),
+        "not_in_run": _int_param(request, "runs__ne"),
+        "limit": _int_param(request, "limit"),
+        "offset": _int_param(request, "offset"),
+    }
+
+
+def _suiteselection_etag(request):
+    """
+    Return an ETag for suiteselection, or None if the request is invalid.
+
+    Changes with any change to the product's suites, their cases (counted)
+    or their inclusion in runs.
+
+    """
+    try:
+        params = _suiteselection_params(request)
+    except ValueError:
+        return None
+    product_id = params["product_id"]
+    return _etag(
+        _state(Suite.objects.filter(product=product_id)),
+        _state(SuiteCase.objects.filter(suite__product=product_id)),
+        _state(RunSuite.objects.filter(suite__product=product_id)),
+        )
+
+
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_suiteselection_etag)
+def suiteselection(request):
+    """
+    Return suites of a product for selection in a run, as compact JSON.
+
+    A fast stand-in for the ``suiteselection`` Tastypie resource, returning
+    the same fields the run form's multiselect uses. With ``runs``, returns
+    only the suites in that run, in run order; with ``runs__ne``, only the
+    suites not in that run, by id. ``limit`` (0, the default, for all) and
+    ``offset`` page the results.
+
+    Case counts are read from each suite's denormalized ``case_count``.
+
+    """
+    try:
+        params = _suiteselection_params(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    suites = Suite.objects.filter(product=params["product_id"])
+    if params["in_run"]:
+        # filtering and ordering share the join to the run's suites
+        suites = suites.filter(
+            runsuites__run=params["in_run"],
+            runsuites__deleted_on__isnull=True,
+            ).order_by("runsuites__order", "id")
+    else:
+        suites = suites.order_by("id")
+    if params["not_in_run"]:
+        suites = suites.exclude(
+            id__in=RunSuite.objects.filter(
+                run=params["not_in_run"]).values("suite_id"))
+
+    limit, offset = params["limit"], params["offset"]
+    count = None
+    if limit:
+        count = suites.count()
+        suites = suites[offset:offset + limit]
+    rows = list(
+        suites.values(
+            "id",
+            "name",
+            "status",
+            "product_id",
+            "created_by_id",
+            "created_by__username",
+            "case_count",
+            )
+        )
+    if count is None:
+        count = len(rows)
+
+    # filter_url resolves the view on every call; do it once, then fill in
+    # each suite id
+    filter_cases = filter_url("manage_cases", Suite(pk="{0}"))
+
+    objects = [
+        {
+            "id": row["id"],
+            "suite_id": row["id"],
+            "name": row["name"],
+            "status": row["status"],
+            "product_id": row["product_id"],
+            "case_count": row["case_count"],
+            "filter_cases": filter_cases.format(row["id"]),
+            "created_by": _created_by(row),
+        }
+        for row in rows
+    ]
+    return HttpResponse(
+        _dumps({
+            "objects": objects,
+            "meta": {"count": count, "limit": limit, "offset": offset},
+        }),
+        content_type="application/json",
+        )
+
+
+def _runcaseversions_params(request):
+    """
+    Return dict of runcaseversions querystring params.
+
+    Raises ``ValueError`` if the run is missing or a param isn't valid.
+
+    """
+    run_ids = _int_list(request, "run")
+    if not run_ids:
+        raise ValueError("run is required")
+    return {
+        "run_id": run_ids[0],
+        "environments": _int_list(request, "environment"),
+        "after": _int_param(request, "after"),
+        "limit": _int_param(request, "limit"),
+    }
+
+
+def _runcaseversions_etag(request):
+    """
+    Return an ETag for runcaseversions, or None if the request is invalid.
+
+    Changes with any change to the run's runcaseversions or their
+    environments, or to their caseversions, cases, steps, tags or tag links.
+
+    """
+    try:
+        params = _runcaseversions_params(request)
+    except ValueError:
+        return None
+    run_id = params["run_id"]
+    return _etag(
+        _state(RunCaseVersion.objects.filter(run=run_id)),
+        _links_state(RunCaseVersion.environments.through.objects.filter(
+            runcaseversion__run=run_id,
+            environment__deleted_on__isnull=True,
+            )),
+        _state(CaseVersion.objects.filter(runcaseversions__run=run_id)),
+        _state(Case.objects.filter(versions__runcaseversions__run=run_id)),
+        _state(CaseStep.objects.filter(
+            caseversion__runcaseversions__run=run_id)),
+        _state(Tag.objects.all()),
+        _links_state(CaseVersion.tags.through.objects.filter(
+            caseversion__runcaseversions__run=run_id)),
+        )
+
+
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_runcaseversions_etag)
+def runcaseversions(request):
+    """
+    Return the caseversions of a run, with steps and tags, as compact JSON.
+
+    A fast stand-in for the ``runcaseversion`` Tastypie resource. Results are
+    in run order; ``after`` (a runcaseversion id) returns only those following
+    it, and ``meta.next`` is the ``after`` value for the next page (or null,
+    on the last page). ``limit`` defaults to 0, meaning no limit.
+
+    With ``environment`` (repeatable), only runcaseversions in any of those
+    environments are returned.
+
+    Steps, tags and environments are fetched in one query each per chunk of
+    runcaseversions; the response is streamed, and an ETag lets clients
+    revalidate cheaply.
+
+    """
+    try:
+        params = _runcaseversions_params(request)
+        last = None
+        if params["after"]:
+            last = RunCaseVersion.everything.values("id", "order").get(
+                pk=params["after"])
+    except (ValueError, RunCaseVersion.DoesNotExist) as e:
+        return HttpResponseBadRequest(str(e))
+
+    rcvs = RunCaseVersion.objects.filter(
+        run=params["run_id"]).order_by("order", "id")
+    if params["environments"]:
+        rcvs = rcvs.filter(
+            id__in=RunCaseVersion.environments.through.objects.filter(
+                environment__in=params["environments"]).values(
+                "runcaseversion_id"))
+
+    def fetch(last, size):
+        qs = rcvs
+        if last is not None:
+            qs = qs.filter(
+                Q(order__gt=last["order"]) |
+                Q(order=last["order"], id__gt=last["id"])
+                )
+        return list(
+            qs.values(
+                "id",
+                "run_id",
+                "order",
+                "caseversion_id",
+                "caseversion__case_id",
+                "caseversion__name",
+                "caseversion__description",
+                "caseversion__status",
+                "caseversion__case__priority",
+                )[:size]
+            )
+
+    meta = {"limit": params["limit"], "after": params["after"]}
+    chunks = _keyset_chunks(
+        fetch, lambda row: row["id"], last, params["limit"], meta)
+    return StreamingHttpResponse(
+        _stream_json((_runcaseversion_items(rows) for rows in chunks), meta),
+        content_type="application/json",
+        )
+
+
+def _runcaseversion_items(rows):
+    """Return objects for runcaseversion rows, with related data in bulk."""
+    cv_ids = [r["caseversion_id"] for r in rows]
+
+    steps_map = defaultdict(list)
+    steps = CaseStep.objects.filter(caseversion__in=cv_ids).order_by(
+        "caseversion", "number", "id").values(
+        "caseversion_id", "number", "instruction", "expected")
+    for s in steps:
+        steps_map[s.pop("caseversion_id")].append(s)
+
+    envs_map = defaultdict(list)
+    envs = RunCaseVersion.environments.through.objects.filter(
+        runcaseversion__in=[r["id"] for r in rows],
+        environment__deleted_on__isnull=True,
+        ).order_by("environment").values_list(
+        "runcaseversion_id", "environment_id")
+    for rcv_id, env_id in envs:
+        envs_map[rcv_id].append(env_id)
+
+    tags_map = _tags_map(cv_ids)
+
+    return [
+        {
+            "id": row["id"],
+            "run_id": row["run_id"],
+            "order": row["order"],
+            "environments": envs_map[row["id"]],
+            "caseversion": {
+                "id": row["caseversion_id"],
+                "case_id": row["caseversion__case_id"],
+                "name": row["caseversion__name"],
+                "description": row["caseversion__description"],
+                "status": row["caseversion__status"],
+                "priority": row["caseversion__case__priority"],
+                "steps": steps_map[row["caseversion_id"]],
+                "tags": tags_map[row["caseversion_id"]],
+            },
+        }
+        for row in rows
+    ]
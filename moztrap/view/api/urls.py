@@ -5,6 +5,7 @@ from tastypie.api import Api
 from moztrap.model.core import api as core
 from moztrap.model.environments import api as environments
 from moztrap.model.execution import api as execution
+from moztrap.model.jobs import api as jobs
 from moztrap.model.library import api as library
 from moztrap.model.tags import api as tags
 from moztrap.model import API_VERSION
@@ -16,6 +17,7 @@ v1_api.register(execution.RunResource())
 v1_api.register(execution.RunCaseVersionResource())
 v1_api.register(execution.RunSuiteResource())
 v1_api.register(execution.ResultResource())
+v1_api.register(execution.ResultBatchResource())
 v1_api.register(execution.SuiteSelectionResource())
 v1_api.register(library.CaseResource())
 v1_api.register(library.CaseVersionResource())
@@ -23,6 +25,8 @@ v1_api.register(library.CaseStepResource())
 v1_api.register(library.SuiteResource())
 v1_api.register(library.CaseSelectionResource())
 v1_api.register(library.SuiteCaseResource())
+v1_api.register(library.SuiteMembershipResource())
+v1_api.register(library.CaseNamesResource())
 v1_api.register(library.CaseVersionSelectionResource())
 v1_api.register(library.CaseVersionSearchResource())
 v1_api.register(environments.ProfileResource())
@@ -34,6 +38,7 @@ v1_api.register(core.ProductResource())
 v1_api.register(core.ProductVersionResource())
 v1_api.register(core.ProductVersionEnvironmentsResource())
 v1_api.register(tags.TagResource())
+v1_api.register(jobs.JobResource())
 
 urlpatterns = patterns(
     "moztrap.view.api",
@@ -41,4 +46,13 @@ urlpatterns = patterns(
     url(r"^speedy/caseselection/",
         "speedy.caseselection",
         name="caseselection"),
+    url(r"^speedy/v2/caseselection/",
+        "speedy.caseselection_v2",
+        name="caseselection_v2"),
+    url(r"^speedy/suiteselection/",
+        "speedy.suiteselection",
+        name="suiteselection"),
+    url(r"^speedy/runcaseversions/",
+        "speedy.runcaseversions",
+        name="runcaseversions"),
 )
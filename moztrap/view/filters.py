@@ -104,14 +104,15 @@ class RunCaseVersionFilterSet(filters.FilterSet):
         filters.ChoicesFilter(
             "result status",
             key="resultstatus",
-            lookup="results__status",
-            extra_filters={"results__is_latest": True},
+            lookup="latest_results__status",
+            extra_filters={"latest_results__deleted_on__isnull": True},
             choices=sorted(Choices(*model.Result.COMPLETED_STATES)),
             ),
         filters.KeywordExactFilter(
             "id", lookup="caseversion__case__id", coerce=int),
-        filters.KeywordFilter("name", lookup="caseversion__name"),
-        filters.KeywordFilter("description", lookup="caseversion__description"),
+        cases.CaseVersionTextFilter("name", lookup="caseversion__name"),
+        cases.CaseVersionTextFilter(
+            "description", lookup="caseversion__description"),
         filters.ChoicesFilter(
             "priority",
             lookup="caseversion__case__priority",
@@ -139,9 +140,9 @@ class RunCaseVersionFilterSet(filters.FilterSet):
             key="productversion",
             queryset=model.ProductVersion.objects.all().order_by(
                 "product__name", "version")),
-        filters.KeywordFilter(
+        cases.CaseVersionTextFilter(
             "instruction", lookup="caseversion__steps__instruction"),
-        filters.KeywordFilter(
+        cases.CaseVersionTextFilter(
             "expected result",
             lookup="caseversion__steps__expected",
             key="expected"),
@@ -174,8 +175,9 @@ class RunTestsRunCaseVersionFilterSet(filters.FilterSet):
     filters = [
         filters.KeywordExactFilter(
             "id", lookup="caseversion__case__id", coerce=int),
-        filters.KeywordFilter("name", lookup="caseversion__name"),
-        filters.KeywordFilter("description", lookup="caseversion__description"),
+        cases.CaseVersionTextFilter("name", lookup="caseversion__name"),
+        cases.CaseVersionTextFilter(
+            "description", lookup="caseversion__description"),
         filters.ChoicesFilter(
             "priority",
             lookup="caseversion__case__priority",
@@ -187,9 +189,9 @@ class RunTestsRunCaseVersionFilterSet(filters.FilterSet):
             lookup="caseversion__tags",
             queryset=model.Tag.objects.all().order_by("name"),
             switchable=True),
-        filters.KeywordFilter(
+        cases.CaseVersionTextFilter(
             "instruction", lookup="caseversion__steps__instruction"),
-        filters.KeywordFilter(
+        cases.CaseVersionTextFilter(
             "expected result",
             lookup="caseversion__steps__expected",
             key="expected"),
@@ -273,8 +275,8 @@ class CaseVersionFilterSet(filters.FilterSet):
             choices=Choices(1, 2, 3, 4),
             coerce=int,
             ),
-        filters.KeywordFilter("name"),
-        filters.KeywordFilter("description"),
+        cases.CaseVersionTextFilter("name"),
+        cases.CaseVersionTextFilter("description"),
         filters.ModelFilter(
             "tag",
             lookup="tags",
@@ -291,8 +293,9 @@ class CaseVersionFilterSet(filters.FilterSet):
             key="productversion",
             queryset=model.ProductVersion.objects.all().order_by(
                 "product__name", "version").select_related()),
-        filters.KeywordFilter("instruction", lookup="steps__instruction"),
-        filters.KeywordFilter(
+        cases.CaseVersionTextFilter(
+            "instruction", lookup="steps__instruction"),
+        cases.CaseVersionTextFilter(
             "expected result",
             lookup="steps__expected",
             key="expected"),
@@ -1,6 +1,8 @@
 from filters import KeywordFilter
 from django.db.models import Q
 
+from moztrap.model.library import search
+
 
 class PrefixIDFilter(KeywordFilter):
     """
@@ -56,3 +58,36 @@ class PrefixIDFilter(KeywordFilter):
             return queryset.filter(query_filters).distinct()
 
         return queryset
+
+
+
+class CaseVersionTextFilter(KeywordFilter):
+    """
+    A keyword filter on caseversion text, using the search backend.
+
+    The last part of ``lookup`` names the searched field (one of
+    ``search.FIELDS``); any preceding parts, less ``steps``, are the path to
+    the caseversion, e.g. ``caseversion__steps__expected``.
+
+    """
+    def __init__(self, *args, **kwargs):
+        super(CaseVersionTextFilter, self).__init__(*args, **kwargs)
+        parts = self.lookup.split("__")
+        self.field = parts.pop()
+        if parts and parts[-1] == "steps":
+            parts.pop()
+        self.prefix = "".join("{0}__".format(p) for p in parts)
+
+
+    def filter(self, queryset, values):
+        """Values are ANDed (ORed if toggled) in a search of the field."""
+        if values:
+            return search.get_backend().filter(
+                queryset,
+                self.field,
+                values,
+                any=self.toggle,
+                prefix=self.prefix,
+                )
+
+        return queryset
@@ -7,7 +7,8 @@ import json
 from django.http import HttpResponse, Http404
 from django.shortcuts import redirect, get_object_or_404
 from django.template.response import TemplateResponse
-from django.views.decorators.cache import never_cache
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import redirect_to_login
@@ -19,6 +20,7 @@ from moztrap import model
 from moztrap.view.filters import ProfileFilterSet, EnvironmentFilterSet
 from moztrap.view.lists import decorators as lists
 from moztrap.view.users.decorators import permission_required
+from moztrap.view.utils import autocomplete
 from moztrap.view.utils.ajax import ajax
 from moztrap.view.utils.auth import login_maybe_required
 
@@ -196,32 +198,19 @@ def productversion_environments_edit(request, productversion_id):
 @never_cache
 @login_required
 def element_autocomplete(request):
-    text = request.GET.get("text")
-    elements = []
-    if text is not None:
-        elements = model.Element.objects.filter(
-            name__icontains=text)
-    suggestions = []
-    for e in elements:
-        start = e.name.lower().index(text.lower())
-        pre = e.name[:start]
-        post = e.name[start + len(text):]
-        suggestions.append({
-                "preText": pre,
-                "typedText": text,
-                "postText": post,
-                "id": e.id,
-                "name": e.name,
-                "type": "element",
-                })
-    return HttpResponse(
-        json.dumps(
-            {
-                "suggestions": suggestions
-                }
-            ),
-        content_type="application/json",
-        )
+    """Return autocomplete list of existing elements in JSON format."""
+    return autocomplete.suggestions_response(
+        request, model.Element.name_index, "element")
+
+
+
+@login_required
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=lambda request: model.Element.name_index.generation())
+def element_autocomplete_index(request):
+    """Return all element names in JSON format, for client-side autocomplete."""
+    return autocomplete.index_response(model.Element.name_index, "element")
+
 
 
 @transaction.commit_on_success
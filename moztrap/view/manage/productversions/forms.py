@@ -52,15 +52,12 @@ class EditProductVersionForm(BaseProductVersionForm):
 
 
     def save(self, user=None):
-        """Save and return product version; copy envs."""
+        """Save and return product version; queue copy of missing cases."""
         pv = super(EditProductVersionForm, self).save(user=user)
 
         fill_from = self.cleaned_data.get("fill_from")
         if fill_from:
-            # get the cases we already have in this version
-            existing = pv.caseversions.all().values_list("case_id", flat=True)
-            for cv in fill_from.caseversions.exclude(case_id__in=existing):
-                cv.clone(overrides={"productversion": pv, "name": cv.name})
+            pv.queue_copy_cases(fill_from, user=user or self.user)
 
         return pv
 
@@ -84,14 +81,24 @@ class AddProductVersionForm(BaseProductVersionForm):
         widgets = EditProductVersionForm.Meta.widgets.copy()
 
 
+    def clean(self):
+        """Validate that cases are cloned from a version of the product."""
+        cleaned_data = super(AddProductVersionForm, self).clean()
+        product = cleaned_data.get("product")
+        clone_from = cleaned_data.get("clone_from")
+        if product and clone_from and clone_from.product_id != product.id:
+            raise forms.ValidationError(
+                "Cases can only be copied from a version of the same product.")
+        return cleaned_data
+
+
     def save(self, user=None):
-        """Save and return product version; copy envs."""
+        """Save and return product version; copy envs, queue copy of cases."""
         pv = super(AddProductVersionForm, self).save(user=user)
 
         clone_from = self.cleaned_data.get("clone_from")
         if clone_from:
             pv.environments.add(*clone_from.environments.all())
-            for cv in clone_from.caseversions.all():
-                cv.clone(overrides={"productversion": pv, "name": cv.name})
+            pv.queue_copy_cases(clone_from, user=user or self.user)
 
         return pv
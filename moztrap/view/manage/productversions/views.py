@@ -27,7 +27,7 @@ from . import forms
 @login_maybe_required
 @lists.actions(
     model.ProductVersion,
-    ["delete", "clone"],
+    ["delete", "clone", "clone_with_cases"],
     permission="core.manage_products")
 @lists.finder(ManageFinder)
 @lists.filter("productversions", filterset_class=ProductVersionFilterSet)
@@ -74,6 +74,12 @@ def productversion_add(request):
                 request, u"Product version '{0}' added.".format(
                     productversion.name)
                 )
+            if form.cleaned_data.get("clone_from"):
+                messages.info(
+                    request,
+                    u"Cases are being copied to '{0}' in the background.".format(
+                        productversion.name)
+                    )
             return redirect("manage_productversions")
     else:
         pf = PinnedFilters(request.COOKIES)
@@ -104,6 +110,12 @@ def productversion_edit(request, productversion_id):
         pv = form.save_if_valid()
         if pv is not None:
             messages.success(request, u"Saved '{0}'.".format(pv.name))
+            if form.cleaned_data.get("fill_from"):
+                messages.info(
+                    request,
+                    u"Cases are being copied to '{0}' in the background.".format(
+                        pv.name)
+                    )
             pre_page = request.GET.get('from', "manage_productversions")
             return redirect(pre_page)
     else:
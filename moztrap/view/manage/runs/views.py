@@ -2,8 +2,10 @@
 Manage views for runs.
 
 """
+from django.db import connection
 from django.shortcuts import get_object_or_404, redirect
 from django.template.response import TemplateResponse
+from django.utils.datastructures import SortedDict
 from django.views.decorators.cache import never_cache
 
 from django.contrib import messages
@@ -29,7 +31,8 @@ from . import forms
 @lists.actions(
     model.Run,
     ["delete", "clone", "activate", "draft", "deactivate", "refresh"],
-    permission="execution.manage_runs")
+    permission="execution.manage_runs",
+    methods={"activate": "queue_activate", "refresh": "queue_refresh"})
 @lists.finder(ManageFinder)
 @lists.filter("runs", filterset_class=RunFilterSet)
 @lists.sort("runs")
@@ -40,13 +43,42 @@ def runs_list(request):
         request,
         "manage/run/runs.html",
         {
-            "runs": model.Run.objects.select_related().annotate(
-                suite_count=NotDeletedCount("suites", distinct=True)),
+            "runs": _annotate_pending_jobs(
+                model.Run.objects.select_related().annotate(
+                    suite_count=NotDeletedCount("suites", distinct=True))),
             }
         )
 
 
 
+def _annotate_pending_jobs(runs):
+    """
+    Annotate the unfinished activate or refresh job of each run, if any.
+
+    Adds ``pending_job_status``, ``pending_job_progress`` and
+    ``pending_job_message`` (all None if no job is pending), looked up by the
+    job's unique active key.
+
+    """
+    qn = connection.ops.quote_name
+    run_table = qn(model.Run._meta.db_table)
+    keys = ", ".join(
+        "CONCAT('{0}', {1}.id)".format(key.format(""), run_table)
+        for key in [model.Run.ACTIVATE_JOB_KEY, model.Run.REFRESH_JOB_KEY])
+
+    select = SortedDict()
+    for field in ["status", "progress", "message"]:
+        select["pending_job_{0}".format(field)] = (
+            "SELECT j.{0} FROM {1} AS j "
+            "WHERE j.active_key IN ({2}) "
+            "ORDER BY j.id LIMIT 1".format(
+                qn(field), qn(model.Job._meta.db_table), keys)
+            )
+
+    return runs.extra(select=select)
+
+
+
 @never_cache
 @login_maybe_required
 def run_details(request, run_id):
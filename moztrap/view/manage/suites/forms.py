@@ -53,8 +53,11 @@ class SuiteForm(mtforms.NonFieldErrorsClassFormMixin, mtforms.MTModelForm):
         self.cleaned_data with the real objects.
         """
         # fetch the case objects in one query, but loses order.
-        cases = dict((unicode(x.id), x) for x in
-            model.Case.objects.filter(pk__in=self.cleaned_data["cases"]))
+        cases = model.Case.objects.filter(pk__in=self.cleaned_data["cases"])
+        product = self.cleaned_data.get("product")
+        if product is not None:
+            cases = cases.filter(product=product)
+        cases = dict((unicode(x.id), x) for x in cases)
 
         # put them back in order and remove dups, if any
         try:
@@ -81,10 +84,8 @@ class SuiteForm(mtforms.NonFieldErrorsClassFormMixin, mtforms.MTModelForm):
         suite = super(SuiteForm, self).save(user=user)
 
         if "cases" in self.changed_data:
-            suite.suitecases.all().delete(permanent=True)
-            for i, case in enumerate(self.cleaned_data["cases"]):
-                model.SuiteCase.objects.create(
-                    suite=suite, case=case, order=i, user=user)
+            suite.set_cases(
+                [case.id for case in self.cleaned_data["cases"]], user=user)
 
         return suite
 
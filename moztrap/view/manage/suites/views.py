@@ -9,7 +9,6 @@ from django.views.decorators.cache import never_cache
 from django.contrib import messages
 
 from moztrap import model
-from moztrap.model.mtmodel import NotDeletedCount
 from moztrap.view.filters import SuiteFilterSet
 from moztrap.view.lists import decorators as lists
 from moztrap.view.lists.filters import PinnedFilters
@@ -39,8 +38,7 @@ def suites_list(request):
         request,
         "manage/suite/suites.html",
         {
-            "suites": model.Suite.objects.select_related().annotate(
-                case_count=NotDeletedCount("cases", distinct=True)),
+            "suites": model.Suite.objects.select_related(),
             }
         )
 
@@ -2,13 +2,10 @@
 Manage views for tags.
 
 """
-import json
-
-from django.db.models import Q
-from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.template.response import TemplateResponse
-from django.views.decorators.cache import never_cache
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition
 
 from django.contrib import messages
 
@@ -18,6 +15,7 @@ from moztrap.view.filters import TagFilterSet
 from moztrap.view.lists import decorators as lists
 from moztrap.view.lists.filters import PinnedFilters
 from moztrap.view.users.decorators import permission_required
+from moztrap.view.utils import autocomplete
 from moztrap.view.utils.ajax import ajax
 from moztrap.view.utils.auth import login_maybe_required
 
@@ -126,35 +124,24 @@ def tag_edit(request, tag_id):
 @login_maybe_required
 def tag_autocomplete(request):
     """Return autocomplete list of existing tags in JSON format."""
-    text = request.GET.get("text")
-    product_id = request.GET.get("product-id")
-    if text is not None:
-        tags = model.Tag.objects.filter(name__icontains=text)
-        if product_id is not None:
-            tags = tags.filter(Q(product=product_id) | Q(product=None))
-    else:
-        tags = []
-    suggestions = []
-    for tag in tags:
-        # can't just use split due to case; we match "text" insensitively, but
-        # want pre and post to be case-accurate
-        start = tag.name.lower().index(text.lower())
-        pre = tag.name[:start]
-        post = tag.name[start + len(text):]
-        suggestions.append({
-                "preText": pre,
-                "typedText": text,
-                "postText": post,
-                "id": tag.id,
-                "product-id": tag.product.id if tag.product else None,
-                "name": tag.name,
-                "type": "tag",
-                })
-    return HttpResponse(
-        json.dumps(
-            {
-                "suggestions": suggestions
-                }
-            ),
-        content_type="application/json",
+    try:
+        product_id = int(request.GET["product-id"])
+    except (KeyError, ValueError):
+        product_id = None
+    return autocomplete.suggestions_response(
+        request,
+        model.Tag.name_index,
+        "tag",
+        scope_key="product-id",
+        scope=product_id,
         )
+
+
+
+@login_maybe_required
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=lambda request: model.Tag.name_index.generation())
+def tag_autocomplete_index(request):
+    """Return all tag names in JSON format, for client-side autocomplete."""
+    return autocomplete.index_response(
+        model.Tag.name_index, "tag", scope_key="product-id")
@@ -169,6 +169,9 @@ urlpatterns = patterns(
         name="manage_tag_edit"),
 
     # autocomplete
+    url(r"^tags/_autocomplete/index/$",
+        "tags.views.tag_autocomplete_index",
+        name="manage_tags_autocomplete_index"),
     url(r"^tags/_autocomplete/",
         "tags.views.tag_autocomplete",
         name="manage_tags_autocomplete"),
@@ -207,5 +210,8 @@ urlpatterns = patterns(
     # autocomplete
     url(r"^elements/_autocomplete/$",
         "environments.views.element_autocomplete",
-        name="manage_environment_autocomplete_elements")
+        name="manage_environment_autocomplete_elements"),
+    url(r"^elements/_autocomplete/index/$",
+        "environments.views.element_autocomplete_index",
+        name="manage_environment_autocomplete_elements_index"),
 )
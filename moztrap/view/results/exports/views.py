@@ -0,0 +1,60 @@
+"""
+Streaming result exports for runs, series and product versions.
+
+"""
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from moztrap.view.utils.auth import login_maybe_required
+
+from moztrap import model
+from moztrap.model.execution.export import ResultExport
+
+
+
+def _export_response(request, export, filename):
+    """
+    Return a streaming response for given ``ResultExport``.
+
+    The format is taken from the ``format`` querystring parameter ("csv", the
+    default, or "json"); ``latest=1`` exports only latest results.
+
+    """
+    format = request.GET.get("format", "csv")
+    if format not in ResultExport.FORMATS:
+        format = "csv"
+    if request.GET.get("latest"):
+        export = ResultExport(export.results, latest=True)
+
+    response = StreamingHttpResponse(
+        export.lines(format),
+        content_type=ResultExport.CONTENT_TYPES[format],
+        )
+    response["Content-Disposition"] = (
+        'attachment; filename="{0}.{1}"'.format(filename, format))
+    return response
+
+
+
+@login_maybe_required
+def run_export(request, run_id):
+    """Export results of a run, or of all builds of a series."""
+    run = get_object_or_404(model.Run, pk=run_id)
+    return _export_response(
+        request,
+        ResultExport.for_run(run),
+        "run-{0}-results".format(run.id),
+        )
+
+
+
+@login_maybe_required
+def productversion_export(request, productversion_id):
+    """Export results of all runs of a product version."""
+    productversion = get_object_or_404(
+        model.ProductVersion, pk=productversion_id)
+    return _export_response(
+        request,
+        ResultExport.for_productversion(productversion),
+        "productversion-{0}-results".format(productversion.id),
+        )
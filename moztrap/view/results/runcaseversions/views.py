@@ -14,6 +14,7 @@ from moztrap.view.lists import decorators as lists
 from moztrap.view.utils.ajax import ajax
 
 from ..finders import ResultsFinder
+from ..summary import annotate_runcaseversions
 
 
 
@@ -28,20 +29,23 @@ def runcaseversions_list(request):
         request,
         "results/case/cases.html",
         {
-            "runcaseversions": model.RunCaseVersion.objects.only(
-                "caseversion__name",
-                "caseversion__case__priority",
-                "run__name",
-                "run__productversion",
-                "run__productversion__version",
-                "run__productversion__product__name",
-                ).select_related(
-                    "results",
-                    "run",
-                    "run__productversion",
-                    "run__productversion__product",
+            "runcaseversions": annotate_runcaseversions(
+                model.RunCaseVersion.objects.only(
+                    "caseversion__name",
+                    "caseversion__status",
                     "caseversion__case__priority",
-                    )
+                    "run__name",
+                    "run__productversion",
+                    "run__productversion__version",
+                    "run__productversion__product__name",
+                    ).select_related(
+                        "results",
+                        "run",
+                        "run__productversion",
+                        "run__productversion__product",
+                        "caseversion__case__priority",
+                        )
+                )
             }
         )
 
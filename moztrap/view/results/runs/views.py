@@ -14,6 +14,7 @@ from moztrap.view.lists import decorators as lists
 from moztrap.view.utils.ajax import ajax
 
 from ..finders import ResultsFinder
+from ..summary import annotate_runs
 
 
 
@@ -28,17 +29,20 @@ def runs_list(request):
         request,
         "results/run/runs.html",
         {
-            "runs": model.Run.objects.filter(is_series=False).only(
-                "name",
-                "start",
-                "end",
-                "productversion",
-                "productversion__version",
-                "productversion__product__name",
-                ).select_related(
+            "runs": annotate_runs(
+                model.Run.objects.filter(is_series=False).only(
+                    "name",
+                    "status",
+                    "start",
+                    "end",
                     "productversion",
-                    "productversion__product",
-                    )
+                    "productversion__version",
+                    "productversion__product__name",
+                    ).select_related(
+                        "productversion",
+                        "productversion__product",
+                        )
+                )
             }
         )
 
@@ -0,0 +1,103 @@
+"""
+Result summary and completion annotations for results list querysets.
+
+Each annotation is a correlated subquery, so a whole page of runs or
+runcaseversions gets its summaries in the list query itself, and the
+``completion`` annotation can be sorted on in SQL.
+
+"""
+from django.db import connection
+from django.utils.datastructures import SortedDict
+
+from ... import model
+
+
+
+def _completion_sql(total, skipped, completed):
+    """Return SQL for completed / (total - skipped), or 0 if no denominator."""
+    return (
+        "CASE WHEN ({0}) - ({1}) > 0 "
+        "THEN 1.0 * ({2}) / (({0}) - ({1})) ELSE 0 END".format(
+            total, skipped, completed)
+        )
+
+
+
+def annotate_runs(runs):
+    """
+    Annotate result summary counts and ``completion`` onto queryset of runs.
+
+    Counts come from the denormalized run result summaries, and the total of
+    case/environment combinations from the run's ``env_count``, so the cost
+    per run is independent of the number of cases and results in it.
+
+    """
+    qn = connection.ops.quote_name
+    run_table = qn(model.Run._meta.db_table)
+
+    def summary_sum(field):
+        return (
+            "SELECT COALESCE(SUM(s.{0}), 0) FROM {1} AS s "
+            "WHERE s.run_id = {2}.id AND s.deleted_on IS NULL".format(
+                qn(field),
+                qn(model.RunResultSummary._meta.db_table),
+                run_table,
+                )
+            )
+
+    total = "{0}.{1}".format(run_table, qn("env_count"))
+
+    select = SortedDict()
+    for status in model.Result.COMPLETED_STATES:
+        select[status] = summary_sum(status)
+    select["completion"] = _completion_sql(
+        total, summary_sum("skipped"), summary_sum("completed"))
+
+    return runs.extra(select=select)
+
+
+
+def annotate_runcaseversions(runcaseversions):
+    """
+    Annotate result summary counts and ``completion`` onto runcaseversions.
+
+    Counts come from the latest result pointers, which hold the status of
+    each tester's latest result, so the results table isn't touched.
+
+    """
+    qn = connection.ops.quote_name
+    rcv_table = qn(model.RunCaseVersion._meta.db_table)
+
+    def latest_results(select, statuses):
+        return (
+            "SELECT {0} FROM {1} AS r "
+            "WHERE r.runcaseversion_id = {2}.id "
+            "AND r.deleted_on IS NULL "
+            "AND r.status IN ({3})".format(
+                select,
+                qn(model.LatestResult._meta.db_table),
+                rcv_table,
+                ", ".join(["'{0}'".format(s) for s in statuses]),
+                )
+            )
+
+    total = (
+        "SELECT COUNT(*) FROM {0} AS rce "
+        "WHERE rce.runcaseversion_id = {1}.id".format(
+            qn(model.RunCaseVersion.environments.through._meta.db_table),
+            rcv_table,
+            )
+        )
+
+    select = SortedDict()
+    for status in model.Result.COMPLETED_STATES:
+        select[status] = latest_results("COUNT(*)", [status])
+    select["completion"] = _completion_sql(
+        total,
+        latest_results("COUNT(*)", [model.Result.STATUS.skipped]),
+        latest_results(
+            "COUNT(DISTINCT r.environment_id)",
+            model.Result.COMPLETED_STATES),
+        )
+
+    return runcaseversions.extra(select=select)
@@ -35,6 +35,16 @@ urlpatterns = patterns(
         "runcaseversions.views.runcaseversion_details",
         name="results_runcaseversion_details"),
 
+    # exports ----------------------------------------------------------------
+
+    url(r"^runs/(?P<run_id>\d+)/export/$",
+        "exports.views.run_export",
+        name="results_run_export"),
+
+    url(r"^productversions/(?P<productversion_id>\d+)/export/$",
+        "exports.views.productversion_export",
+        name="results_productversion_export"),
+
     # results ----------------------------------------------------------------
 
     # list
@@ -138,17 +138,24 @@ class EnvironmentBuildSelectionForm(EnvironmentSelectionForm):
 
 
     def save(self):
-        """Find the run with this build, or create a new one."""
+        """
+        Find the run with this build, or queue a job to create a new one.
+
+        Returns the environment ID and the run ID; if the run is being created
+        in the background the run ID is None, and the queued job is available
+        as ``self.job``.
+
+        """
+        self.job = None
+        envid = super(EnvironmentBuildSelectionForm, self).save()
         try:
             this_run = model.Run.objects.get(
                 series=self.run,
                 build=self.cleaned_data["build"],
                 )
         except ObjectDoesNotExist:
-            this_run = self.run.clone_for_series(
-                build=self.cleaned_data["build"],
-                user=self.user,
-                )
-            this_run.activate()
+            self.job = self.run.queue_series_build(
+                self.cleaned_data["build"], user=self.user)
+            return envid, None
         # now we need to return this new run as the one to be executed.
-        return super(EnvironmentBuildSelectionForm, self).save(), this_run.id
+        return envid, this_run.id
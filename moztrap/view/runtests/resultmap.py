@@ -0,0 +1,161 @@
+"""
+Bulk-loaded results for the runcaseversions on a page of the runtests list.
+
+"""
+from collections import defaultdict
+
+from ... import model
+
+
+
+class ResultMap(object):
+    """
+    Results, step results, bugs and suites for runcaseversions of a run.
+
+    ``load`` fetches everything needed to display a page of runcaseversions in
+    one environment for one tester, in a constant number of queries. Looking
+    up a runcaseversion that wasn't loaded loads it on its own.
+
+    """
+    def __init__(self, run, user, environment):
+        self.run = run
+        self.user = user
+        self.environment = environment
+
+        self._loaded = set()
+        # rcv id -> user's latest result
+        self._results = {}
+        # rcv id -> most recently modified completed result of another tester
+        self._other_results = {}
+        # ids of loaded results of the user
+        self._result_ids = set()
+        # (result id, step id) -> step result
+        self._stepresults = {}
+        # result id -> set of bug urls
+        self._result_bugs = defaultdict(set)
+        # caseversion id -> set of bug urls
+        self._caseversion_ids = set()
+        self._caseversion_bugs = defaultdict(set)
+        # case id -> list of suites
+        self._suites = defaultdict(list)
+
+
+    def load(self, runcaseversions):
+        """Load everything for given runcaseversions."""
+        rcvs = [
+            rcv for rcv in runcaseversions if rcv.id not in self._loaded]
+        if not rcvs:
+            return
+        rcv_ids = [rcv.id for rcv in rcvs]
+        self._loaded.update(rcv_ids)
+
+        other_states = (
+            model.Result.COMPLETED_STATES + [model.Result.STATUS.skipped])
+        for result in model.Result.objects.filter(
+                latest__runcaseversion__in=rcv_ids,
+                latest__environment=self.environment,
+                latest__deleted_on__isnull=True,
+                ).select_related("tester"):
+            rcv_id = result.runcaseversion_id
+            if result.tester_id == self.user.id:
+                self._results[rcv_id] = result
+                self._result_ids.add(result.id)
+            elif result.status in other_states:
+                other = self._other_results.get(rcv_id)
+                if other is None or result.modified_on > other.modified_on:
+                    self._other_results[rcv_id] = result
+
+        result_ids = [
+            self._results[i].id for i in rcv_ids if i in self._results]
+        if result_ids:
+            for stepresult in model.StepResult.objects.filter(
+                    result__in=result_ids):
+                self._stepresults[
+                    (stepresult.result_id, stepresult.step_id)] = stepresult
+                if stepresult.bug_url:
+                    self._result_bugs[stepresult.result_id].add(
+                        stepresult.bug_url)
+
+        cv_ids = set(rcv.caseversion_id for rcv in rcvs).difference(
+            self._caseversion_ids)
+        self._caseversion_ids.update(cv_ids)
+        for cv_id, bug_url in model.StepResult.objects.filter(
+                result__runcaseversion__caseversion__in=cv_ids).exclude(
+                    bug_url="").values_list(
+                        "result__runcaseversion__caseversion",
+                        "bug_url").distinct():
+            self._caseversion_bugs[cv_id].add(bug_url)
+
+        case_ids = set(rcv.caseversion.case_id for rcv in rcvs)
+        for suitecase in model.SuiteCase.everything.filter(
+                case__in=case_ids,
+                suite__runs=self.run,
+                suite__deleted_on__isnull=True,
+                ).select_related("suite").order_by("suite__id"):
+            suites = self._suites[suitecase.case_id]
+            if suitecase.suite not in suites:
+                suites.append(suitecase.suite)
+
+
+    def result(self, runcaseversion):
+        """
+        Return the user's latest result for ``runcaseversion``.
+
+        If there is none, returns an *unsaved* default Result (it will be saved
+        when the case is started.)
+
+        """
+        self.load([runcaseversion])
+        try:
+            return self._results[runcaseversion.id]
+        except KeyError:
+            return model.Result(
+                environment=self.environment,
+                tester=self.user,
+                runcaseversion=runcaseversion,
+                is_latest=True,
+                )
+
+
+    def other_result(self, runcaseversion):
+        """Return latest completed result of another tester, or None."""
+        self.load([runcaseversion])
+        return self._other_results.get(runcaseversion.id)
+
+
+    def stepresult(self, result, step):
+        """
+        Return step result of ``result`` for ``step``.
+
+        If there is none, returns an *unsaved* default StepResult. Returns None
+        if ``result`` is not one of the loaded results.
+
+        """
+        if result.id is not None and result.id not in self._result_ids:
+            return None
+        try:
+            return self._stepresults[(result.id, step.id)]
+        except KeyError:
+            return model.StepResult(result=result, step=step)
+
+
+    def bug_urls(self, obj):
+        """
+        Return set of bug urls of a loaded result or caseversion.
+
+        For a caseversion, these are from all of its results in any run.
+        Returns None if ``obj`` wasn't loaded.
+
+        """
+        if isinstance(obj, model.Result):
+            if obj.id in self._result_ids:
+                return self._result_bugs[obj.id]
+        elif obj.id in self._caseversion_ids:
+            return self._caseversion_bugs[obj.id]
+        return None
+
+
+    def suites(self, runcaseversion):
+        """Return suites of this run that include the rcv's case."""
+        self.load([runcaseversion])
+        return self._suites[runcaseversion.caseversion.case_id]
@@ -11,6 +11,44 @@ from .... import model
 register = template.Library()
 
 
+
+def _resultmap(context, user, environment):
+    """Return the ResultMap in context if it's for this user/environment."""
+    resultmap = context.get("resultmap")
+    if (resultmap is not None and resultmap.user == user and
+            resultmap.environment == environment):
+        return resultmap
+    return None
+
+
+
+class PrefetchResults(Tag):
+    """
+    Loads results for a page of runcaseversions into the context's ResultMap.
+
+    The ``result_for``, ``other_result_for``, ``stepresult_for``,
+    ``bug_urls_for`` and ``suites_for`` tags then look up their values in the
+    ``resultmap`` rather than querying for each runcaseversion.
+
+    """
+    name = "prefetch_results"
+    options = Options(
+        Argument("runcaseversions"),
+        )
+
+
+    def render_tag(self, context, runcaseversions):
+        """Load ``runcaseversions`` into the ResultMap, if there is one."""
+        resultmap = context.get("resultmap")
+        if resultmap is not None:
+            resultmap.load(runcaseversions)
+        return u""
+
+
+register.tag(PrefetchResults)
+
+
+
 class ResultFor(Tag):
     """
     Places Result for this runcaseversion/user/env in context.
@@ -31,23 +69,25 @@ class ResultFor(Tag):
 
     def render_tag(self, context, runcaseversion, user, environment, varname):
         """Get/construct Result and place it in context under ``varname``"""
-        result_kwargs = dict(
-            environment=environment,
-            tester=user,
-            runcaseversion=runcaseversion,
-            is_latest=True,
-            )
+        resultmap = _resultmap(context, user, environment)
+        if resultmap is not None:
+            context[varname] = resultmap.result(runcaseversion)
+            return u""
+
         try:
-            result = model.Result.objects.get(**result_kwargs)
+            result = model.Result.objects.get(
+                latest__environment=environment,
+                latest__tester=user,
+                latest__runcaseversion=runcaseversion,
+                latest__deleted_on__isnull=True,
+                )
         except model.Result.DoesNotExist:
-            result = model.Result(**result_kwargs)
-        except model.Result.MultipleObjectsReturned:
-            # find the latest one and set it to latest, which will set all
-            # others to is_latest=False
-            result = model.Result.objects.filter(**result_kwargs).order_by(
-                "-modified_on")[0]
-            result.set_latest()
-            result.save()
+            result = model.Result(
+                environment=environment,
+                tester=user,
+                runcaseversion=runcaseversion,
+                is_latest=True,
+                )
 
         context[varname] = result
         return u""
@@ -74,14 +114,18 @@ class OtherResultFor(Tag):
 
     def render_tag(self, context, runcaseversion, user, environment, varname):
         """Get/construct Result and place it in context under ``varname``"""
+        resultmap = _resultmap(context, user, environment)
+        if resultmap is not None:
+            context[varname] = resultmap.other_result(runcaseversion)
+            return u""
 
         # check for any completed result states from other users for this
         # same case/env combo.
         include_kwargs = dict(
-            environment=environment,
-            runcaseversion=runcaseversion,
-            is_latest=True,
-            status__in=(model.Result.COMPLETED_STATES +
+            latest__environment=environment,
+            latest__runcaseversion=runcaseversion,
+            latest__deleted_on__isnull=True,
+            latest__status__in=(model.Result.COMPLETED_STATES +
                 [model.Result.STATUS.skipped]),
             )
         exclude_kwargs = dict(
@@ -128,6 +172,13 @@ class StepResultFor(Tag):
 
     def render_tag(self, context, result, casestep, varname):
         """Get/construct StepResult and place it in context under ``varname``"""
+        resultmap = context.get("resultmap")
+        if resultmap is not None:
+            stepresult = resultmap.stepresult(result, casestep)
+            if stepresult is not None:
+                context[varname] = stepresult
+                return u""
+
         stepresult_kwargs = dict(
             result=result,
             step=casestep,
@@ -145,6 +196,36 @@ register.tag(StepResultFor)
 
 
 
+class BugUrlsFor(Tag):
+    """
+    Places set of bug urls for a result or caseversion in context.
+
+    """
+    name = "bug_urls_for"
+    options = Options(
+        Argument("obj"),
+        "as",
+        Argument("varname", resolve=False),
+        )
+
+
+    def render_tag(self, context, obj, varname):
+        """Get set of bug urls and place it in context under ``varname``"""
+        bug_urls = None
+        resultmap = context.get("resultmap")
+        if resultmap is not None:
+            bug_urls = resultmap.bug_urls(obj)
+        if bug_urls is None:
+            bug_urls = obj.bug_urls()
+
+        context[varname] = bug_urls
+        return u""
+
+
+register.tag(BugUrlsFor)
+
+
+
 class CompletionFor(Tag):
     """
     Places completion percentage in context.
@@ -188,6 +269,11 @@ class SuitesFor(Tag):
 
     def render_tag(self, context, run, runcaseversion, varname):
         """Get/construct Suite list and place it in context under ``varname``"""
+        resultmap = context.get("resultmap")
+        if resultmap is not None and resultmap.run == run:
+            context[varname] = resultmap.suites(runcaseversion)
+            return u""
+
         result = model.Suite.objects.filter(cases=runcaseversion.caseversion.case, runs=run)
 
         context[varname] = result
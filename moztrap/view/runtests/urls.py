@@ -16,5 +16,8 @@ urlpatterns = patterns(
     url(r"^run/(?P<run_id>\d+)/env/(?P<env_id>\d+)/$",
         "run",
         name="runtests_run"),
+    url(r"^job/(?P<job_id>\d+)/env/(?P<env_id>\d+)/$",
+        "job",
+        name="runtests_job"),
 
 )
@@ -21,6 +21,7 @@ from ..utils.ajax import ajax
 
 from .finders import RunTestsFinder
 from .forms import EnvironmentSelectionForm, EnvironmentBuildSelectionForm
+from .resultmap import ResultMap
 
 
 
@@ -93,6 +94,10 @@ def set_environment(request, run_id):
                 # we should just use the run id from this run.
                 envid = result
                 runid = run_id
+            if runid is None:
+                # the run for this build is being created in the background
+                return redirect(
+                    "runtests_job", job_id=form.job.id, env_id=envid)
             return redirect("runtests_run", run_id=runid, env_id=envid)
     else:
         # run just specified, prompt user for env and possibly build
@@ -109,6 +114,33 @@ def set_environment(request, run_id):
 
 
 
+@never_cache
+@permission_required("execution.execute")
+def job(request, job_id, env_id):
+    """Wait for a job preparing a run; then run tests in given environment."""
+    job = get_object_or_404(model.Job, pk=job_id)
+
+    if job.status == model.Job.STATUS.done:
+        return redirect(
+            "runtests_run", run_id=job.result_data["run_id"], env_id=env_id)
+
+    if job.status == model.Job.STATUS.failed:
+        messages.error(
+            request,
+            "Sorry, the test run could not be prepared. "
+            "Please try again or select a different test run.")
+        return redirect("runtests")
+
+    return TemplateResponse(
+        request,
+        "runtests/job.html",
+        {
+            "job": job,
+            }
+        )
+
+
+
 # maps valid action names to default parameters
 ACTIONS = {
     "start": {},
@@ -209,7 +241,8 @@ def run(request, run_id, env_id):
                 {
                     "environment": environment,
                     "runcaseversion": rcv,
-                    "run": run
+                    "run": run,
+                    "resultmap": ResultMap(run, request.user, environment),
                     }
                 )
         else:
@@ -219,11 +252,12 @@ def run(request, run_id, env_id):
         current=environment.id, environments=run.environments.all())
 
     current_result_select = (
-        "SELECT status from execution_result as r "
-        "WHERE r.runcaseversion_id = execution_runcaseversion.id "
-        "AND r.environment_id = {0} "
-        "AND r.status not in ({1}) "
-        "AND r.is_latest = 1 "
+        "SELECT lr.status from execution_latestresult as lr "
+        "INNER JOIN execution_result as r ON r.id = lr.result_id "
+        "WHERE lr.runcaseversion_id = execution_runcaseversion.id "
+        "AND lr.environment_id = {0} "
+        "AND lr.status not in ({1}) "
+        "AND lr.deleted_on IS NULL "
         "ORDER BY r.created_on DESC LIMIT 1".format(
             environment.id,
             ", ".join(
@@ -239,6 +273,8 @@ def run(request, run_id, env_id):
             "productversion": run.productversion,
             "run": run,
             "envform": envform,
+            # results for the page of runcaseversions are loaded in bulk
+            "resultmap": ResultMap(run, request.user, environment),
             "runcaseversions": run.runcaseversions.select_related(
                 "caseversion__case",
                 ).prefetch_related(
@@ -0,0 +1,78 @@
+"""
+JSON responses for autocomplete from in-process name indexes.
+
+"""
+import json
+
+from django.http import HttpResponse
+
+
+
+# default and maximum number of suggestions returned
+LIMIT = 20
+MAX_LIMIT = 100
+
+
+
+def get_limit(request):
+    """Return number of suggestions requested by ``limit`` querystring."""
+    try:
+        limit = int(request.GET.get("limit", LIMIT))
+    except ValueError:
+        limit = LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+
+def suggestions_response(request, index, type, scope_key=None, scope=None):
+    """
+    Return JSON response of suggestions for the ``text`` querystring.
+
+    ``index`` is a ``NameIndex``; ``type`` is included in each suggestion, as
+    is the suggestion's scope under ``scope_key``, if given.
+
+    """
+    text = request.GET.get("text")
+    suggestions = []
+    if text is not None:
+        for s in index.suggest(text, scope=scope, limit=get_limit(request)):
+            suggestion = {
+                "preText": s.name[:s.start],
+                "typedText": text,
+                "postText": s.name[s.start + len(text):],
+                "id": s.id,
+                "name": s.name,
+                "type": type,
+                }
+            if scope_key is not None:
+                suggestion[scope_key] = s.scope
+            suggestions.append(suggestion)
+    return HttpResponse(
+        json.dumps(
+            {
+                "suggestions": suggestions
+                }
+            ),
+        content_type="application/json",
+        )
+
+
+
+def index_response(index, type, scope_key=None):
+    """
+    Return JSON response of all names in ``index``, for matching client-side.
+
+    Meant to be served with the index generation as ETag, so clients can
+    reuse their copy until the index changes.
+
+    """
+    items = []
+    for id, name, scope in index.rows():
+        item = {"id": id, "name": name, "type": type}
+        if scope_key is not None:
+            item[scope_key] = scope
+        items.append(item)
+    return HttpResponse(
+        json.dumps({"items": items}),
+        content_type="application/json",
+        )
@@ -214,7 +214,8 @@ var MT = (function (MT, $) {
         MT.populateMultiselectItems({
             container: '#run-add-form',
             trigger_field: '#id_productversion',
-            ajax_url_root: "/api/v1/suiteselection/?format=json&limit=0",
+            // ajax_url_root: "/api/v1/suiteselection/?format=json&limit=0",
+            ajax_url_root: "/api/speedy/suiteselection/?format=json&limit=0",
             ajax_trigger_filter: "product",
             ajax_for_field: "runs",
             for_type: "run",
@@ -223,7 +224,8 @@ var MT = (function (MT, $) {
         MT.populateMultiselectItems({
             container: '#run-edit-form',
             trigger_field: '#id_productversion',
-            ajax_url_root: "/api/v1/suiteselection/?format=json&limit=0",
+            // ajax_url_root: "/api/v1/suiteselection/?format=json&limit=0",
+            ajax_url_root: "/api/speedy/suiteselection/?format=json&limit=0",
             ajax_trigger_filter: "product",
             ajax_for_field: "runs",
             for_type: "run",
@@ -83,3 +83,56 @@ class ProductVersionResourceTest(ApiCrudCases):
         return ["product"]
 
     # additional test cases, if any
+
+    def test_create_clone_from(self):
+        """Creating with clone_from copies envs and queues a case copy job."""
+        fields = self.new_object_data
+        source = self.F.ProductVersionFactory.create(
+            product=self.product_fixture,
+            version="source",
+            environments={"OS": ["Linux"]},
+            )
+        cv = self.F.CaseVersionFactory.create(productversion=source)
+        fields[u"clone_from"] = unicode(
+            self.get_detail_url(self.resource_name, str(source.id)))
+
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=fields,
+            )
+
+        pv = self.backend_object(self._id_from_uri(res.headers["Location"]))
+        self.assertEqual(
+            set(pv.environments.all()), set(source.environments.all()))
+        job = self.model.Job.objects.get()
+        self.assertEqual(res.json["copy_job"], job.id)
+        self.assertEqual(job.created_by, self.user)
+
+        self.model.Job.claim_next().run()
+
+        self.assertEqual(pv.caseversions.get().case, cv.case)
+
+
+    def test_create_clone_from_other_product(self):
+        """Cannot clone cases from a version of a different product."""
+        fields = self.new_object_data
+        source = self.F.ProductVersionFactory.create()
+        fields[u"clone_from"] = unicode(
+            self.get_detail_url(self.resource_name, str(source.id)))
+
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=fields,
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text,
+            "Cases can only be copied from a version of the same product.")
+        self.assertEqual(
+            self.model.ProductVersion.objects.filter(
+                product=self.product_fixture).count(),
+            0,
+            )
@@ -217,3 +217,95 @@ class ImportCasesTest(case.DBTestCase):
 
         self.assertEqual(output, ("No files found to import.\n", ""))
         self.assertEqual(self.model.CaseVersion.objects.count(), 0)
+
+
+    def test_stream(self):
+        """With --stream, imports the file in batches."""
+        self.F.ProductVersionFactory.create(product__name="Foo", version="1.0")
+
+        data = {
+            "suites": [{"name": "Suite"}],
+            "cases": [
+                {"name": "Foo", "steps": [{"instruction": "do this"}]},
+                {"name": "Bar", "steps": [{"instruction": "do that"}]},
+                ],
+            }
+
+        with self.tempfile(json.dumps(data)) as path:
+            output = self.call_command(
+                "Foo", "1.0", path, stream=True, batch_size=2, verbosity=2)
+
+        self.assertEqual(
+            output,
+            (
+                "Committed 2 items.\nCommitted 3 items.\n"
+                "Imported 2 cases\nImported 1 suites\n",
+                "",
+                )
+            )
+        self.assertEqual(
+            set(self.model.CaseVersion.objects.values_list("name", flat=True)),
+            set(["Foo", "Bar"]))
+
+
+    def test_stream_resume(self):
+        """With --resume, skips given number of items."""
+        self.F.ProductVersionFactory.create(product__name="Foo", version="1.0")
+
+        data = {
+            "cases": [
+                {"name": "Foo", "steps": [{"instruction": "do this"}]},
+                {"name": "Bar", "steps": [{"instruction": "do that"}]},
+                ],
+            }
+
+        with self.tempfile(json.dumps(data)) as path:
+            output = self.call_command("Foo", "1.0", path, stream=True, resume=1)
+
+        self.assertEqual(output, ("Imported 1 cases\nImported 0 suites\n", ""))
+        self.assertEqual(self.model.CaseVersion.objects.get().name, "Bar")
+
+
+    def test_stream_bad_json(self):
+        """Malformed JSON error says how many items were committed."""
+        self.F.ProductVersionFactory.create(product__name="Foo", version="1.0")
+
+        contents = '{"cases": [{"name": "Foo"}, {"name": }]}'
+        with self.tempfile(contents) as path:
+            with self.assertRaises(CommandError) as cm:
+                self.call_command("Foo", "1.0", path, stream=True, batch_size=1)
+
+        self.assertIn("Resume with --resume=1", str(cm.exception))
+        self.assertEqual(self.model.CaseVersion.objects.get().name, "Foo")
+
+
+    def test_resume_requires_stream(self):
+        """--resume without --stream is an error."""
+        self.assertRaises(
+            CommandError,
+            self.call_command,
+            "Foo", "1.0", "file.json", resume=1,
+        )
+
+
+    def test_workers(self):
+        """With --workers, imports in bulk and reports throughput."""
+        self.F.ProductVersionFactory.create(product__name="Foo", version="1.0")
+
+        data = {
+            "cases": [
+                {"name": "Case {0}".format(i),
+                 "steps": [{"instruction": "do this"}]}
+                for i in range(5)
+                ],
+            }
+
+        with self.tempfile(json.dumps(data)) as path:
+            stdout, stderr = self.call_command(
+                "Foo", "1.0", path, workers=2, batch_size=2)
+
+        self.assertRegexpMatches(
+            stdout,
+            r"^Read 5 items in [\d.]+ seconds \(\d+ items/second\) "
+            r"with 2 workers.\nImported 5 cases\nImported 0 suites\n$")
+        self.assertEqual(self.model.CaseVersion.objects.count(), 5)
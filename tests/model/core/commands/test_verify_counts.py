@@ -0,0 +1,66 @@
+"""
+Tests for management command to verify and repair denormalized counts.
+
+"""
+from cStringIO import StringIO
+
+from django.core.management import call_command
+
+from mock import patch
+
+from tests import case
+
+
+
+class VerifyCountsTest(case.DBTestCase):
+    """Tests for verify_counts management command."""
+    def call_command(self, *args, **kwargs):
+        """Runs the management command under test and returns stdout output."""
+        with patch("sys.stdout", StringIO()) as stdout:
+            call_command("verify_counts", *args, **kwargs)
+
+        stdout.seek(0)
+        return stdout.read()
+
+
+    def test_all_good(self):
+        """Reports no stale counts if all are correct."""
+        self.F.SuiteCaseFactory.create()
+        self.F.RunCaseVersionFactory.create()
+
+        self.assertEqual(self.call_command(), "Found 0 stale counts.\n")
+
+
+    def test_reports_stale(self):
+        """Reports stale counts, without changing them."""
+        sc = self.F.SuiteCaseFactory.create()
+        self.model.Suite.everything.update(case_count=3)
+
+        output = self.call_command()
+
+        self.assertEqual(
+            output,
+            "Suite {0}: case_count is 3, should be 1.\n"
+            "Found 1 stale counts.\n".format(sc.suite.id),
+            )
+        self.assertEqual(self.refresh(sc.suite).case_count, 3)
+
+
+    def test_repair(self):
+        """With --repair, recounts stale counts."""
+        rcv = self.F.RunCaseVersionFactory.create()
+        self.model.Run.everything.update(case_count=0)
+
+        output = self.call_command(repair=True)
+
+        self.assertEqual(
+            output,
+            "Run {0}: case_count is 0, should be 1.\n"
+            "Repaired 1 stale counts.\n".format(rcv.run.id),
+            )
+        self.assertEqual(self.refresh(rcv.run).case_count, 1)
+
+
+    def test_quiet(self):
+        """Verbosity 0 prints nothing."""
+        self.assertEqual(self.call_command(verbosity=0), "")
@@ -0,0 +1,44 @@
+"""
+Tests for IndexGeneration model.
+
+"""
+from django.db import transaction
+
+from tests import case
+
+
+
+class IndexGenerationTest(case.DBTestCase):
+    """Tests for IndexGeneration model."""
+    def test_unicode(self):
+        """Unicode representation is name and generation."""
+        g = self.model.IndexGeneration(name="tags", generation=3)
+
+        self.assertEqual(unicode(g), u"tags (3)")
+
+
+    def test_current_never_bumped(self):
+        """Generation of a name never bumped is 0."""
+        self.assertEqual(self.model.IndexGeneration.current("foo"), 0)
+
+
+    def test_bump(self):
+        """Bumping increments the generation of only that name."""
+        self.model.IndexGeneration.bump("foo")
+        self.model.IndexGeneration.bump("foo")
+        self.model.IndexGeneration.bump("bar")
+
+        self.assertEqual(self.model.IndexGeneration.current("foo"), 2)
+        self.assertEqual(self.model.IndexGeneration.current("bar"), 1)
+
+
+    def test_bump_rolled_back(self):
+        """A bump is rolled back with its transaction."""
+        self.model.IndexGeneration.bump("foo")
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                self.model.IndexGeneration.bump("foo")
+                raise ValueError()
+
+        self.assertEqual(self.model.IndexGeneration.current("foo"), 1)
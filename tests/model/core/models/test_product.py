@@ -52,3 +52,38 @@ class ProductTest(case.DBTestCase):
 
         self.assertEqual(self.refresh(v1).order, 1)
         self.assertEqual(self.refresh(v2).order, 2)
+
+
+    def test_reorder_versions_latest(self):
+        """reorder_versions marks the last version and its caseversions latest."""
+        p = self.F.ProductFactory()
+        v1 = self.F.ProductVersionFactory(product=p, version="1.1")
+        c = self.F.CaseFactory(product=p)
+        cv1 = self.F.CaseVersionFactory(productversion=v1, case=c)
+        v2 = self.F.ProductVersionFactory(product=p, version="1.2")
+        cv2 = self.F.CaseVersionFactory(productversion=v2, case=c)
+
+        self.model.ProductVersion.objects.filter(pk=v2.pk).update(
+            version="1.0", notrack=True)
+        p.reorder_versions()
+
+        self.assertEqual(self.refresh(v2).order, 1)
+        self.assertEqual(self.refresh(v1).latest, True)
+        self.assertEqual(self.refresh(v2).latest, False)
+        self.assertEqual(self.refresh(cv1).latest, True)
+        self.assertEqual(self.refresh(cv2).latest, False)
+
+
+    def test_reorder_versions_queries(self):
+        """reorder_versions takes three queries however many cases there are."""
+        p = self.F.ProductFactory()
+        v1 = self.F.ProductVersionFactory(product=p, version="1")
+        v2 = self.F.ProductVersionFactory(product=p, version="2")
+        for i in range(3):
+            c = self.F.CaseFactory(product=p)
+            self.F.CaseVersionFactory(productversion=v1, case=c)
+            self.F.CaseVersionFactory(productversion=v2, case=c)
+
+        # select versions, reorder them, recompute latest caseversions
+        with self.assertNumQueries(3):
+            p.reorder_versions()
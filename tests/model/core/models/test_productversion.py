@@ -104,6 +104,36 @@ class ProductVersionTest(case.DBTestCase):
         self.assertEqual(len(new.team.all()), 2)
 
 
+    def test_clone_with_cases(self):
+        """Clone with cases queues a job to copy the caseversions."""
+        cv = self.F.CaseVersionFactory.create()
+        u = self.F.UserFactory.create()
+
+        new = cv.productversion.clone_with_cases(user=u)
+
+        self.assertEqual(new.version, "1.0.next")
+        self.assertEqual(len(new.caseversions.all()), 0)
+        job = self.model.Job.objects.get()
+        self.assertEqual(job.created_by, u)
+
+        self.model.Job.claim_next().run()
+
+        new_cv = new.caseversions.get()
+        self.assertEqual(new_cv.case, cv.case)
+        self.assertEqual(new_cv.created_by, u)
+
+
+    def test_queue_copy_cases_dedupes(self):
+        """Copying the same cases again while queued returns the same job."""
+        pv = self.F.ProductVersionFactory.create(version="1.0")
+        other = self.F.ProductVersionFactory.create(
+            product=pv.product, version="2.0")
+
+        job = other.queue_copy_cases(pv)
+
+        self.assertEqual(other.queue_copy_cases(pv), job)
+
+
     def test_adding_new_version_reorders(self):
         """Adding a new product version reorders the versions."""
         p = self.F.ProductFactory.create()
@@ -325,3 +325,51 @@ class EnvironmentResourceTest(ApiCrudCases):
 
         # check that it made the right number of environments
         self._test_filter_list_by(u'profile', self.profile_fixture.id, 27)
+
+
+    def test_patch_skips_existing(self):
+        """Combinations already in the profile are not created again."""
+        fields = self.new_object_data
+        self.F.ElementFactory(category=self.category_fixture1, name="A 1")
+        env = self.F.EnvironmentFactory.create(profile=self.profile_fixture)
+        env.elements.add(self.element_fixture1, self.element_fixture2)
+
+        fields.pop('elements')
+        fields['categories'] = [
+            unicode(self.get_detail_url(
+                "category", str(self.category_fixture1.id))),
+            unicode(self.get_detail_url(
+                "category", str(self.category_fixture2.id))),
+        ]
+
+        self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=fields,
+            )
+
+        self._test_filter_list_by(u'profile', self.profile_fixture.id, 2)
+
+
+    def test_patch_same_category_twice_error(self):
+        """Listing a category twice would put two of its elements in one
+        environment; that's an error."""
+        fields = self.new_object_data
+        fields.pop('elements')
+        fields['categories'] = [
+            unicode(self.get_detail_url(
+                "category", str(self.category_fixture1.id))),
+            unicode(self.get_detail_url(
+                "category", str(self.category_fixture1.id))),
+        ]
+
+        res = self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=fields,
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text, "Elements must each belong to a different Category.")
+        self.assertEqual(self.model.Environment.objects.count(), 0)
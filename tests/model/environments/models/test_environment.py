@@ -2,6 +2,8 @@
 Tests for Environment model.
 
 """
+from mock import patch
+
 from tests import case
 
 
@@ -98,3 +100,107 @@ class EnvironmentTest(case.DBTestCase):
         env = self.refresh(env)
         self.assertEqual(env.profile, None)
         self.assertEqual(env.modified_by, u)
+
+
+
+class EnvironmentGenerateTest(case.DBTestCase):
+    """Tests for Environment.generate."""
+    def setUp(self):
+        """Two categories of two elements each, and a profile."""
+        os = self.F.CategoryFactory(name="OS")
+        browser = self.F.CategoryFactory(name="Browser")
+        self.windows = self.F.ElementFactory(name="Windows", category=os)
+        self.linux = self.F.ElementFactory(name="Linux", category=os)
+        self.firefox = self.F.ElementFactory(name="Firefox", category=browser)
+        self.chrome = self.F.ElementFactory(name="Chrome", category=browser)
+        self.profile = self.F.ProfileFactory.create()
+
+
+    def generate(self, **kwargs):
+        """Generate all combinations of OS and browser in the profile."""
+        return self.model.Environment.generate(
+            [[self.windows, self.linux], [self.firefox, self.chrome]],
+            profile=self.profile,
+            **kwargs)
+
+
+    def environments(self):
+        """Return set of environment names in the profile."""
+        return set(unicode(e) for e in self.profile.environments.all())
+
+
+    def test_generate(self):
+        """Creates an environment for each combination, with its creator."""
+        u = self.F.UserFactory.create()
+
+        self.assertEqual(self.generate(user=u), 4)
+
+        self.assertEqual(
+            self.environments(),
+            set([
+                "Firefox, Linux",
+                "Firefox, Windows",
+                "Chrome, Linux",
+                "Chrome, Windows",
+                ])
+            )
+        self.assertEqual(
+            set(e.created_by for e in self.profile.environments.all()),
+            set([u]))
+
+
+    def test_skips_existing(self):
+        """Combinations the profile already has are not created again."""
+        env = self.F.EnvironmentFactory.create(profile=self.profile)
+        env.elements.add(self.linux, self.chrome)
+
+        self.assertEqual(self.generate(), 3)
+
+        self.assertEqual(len(self.environments()), 4)
+        self.assertEqual(self.generate(), 0)
+
+
+    def test_ids(self):
+        """Elements may be given by id."""
+        self.model.Environment.generate(
+            [[self.windows.id], [self.firefox.id]], profile=self.profile)
+
+        self.assertEqual(self.environments(), set(["Firefox, Windows"]))
+
+
+    def test_non_consecutive_ids(self):
+        """Element links go to the right environments whatever their ids."""
+        from moztrap.model.mtmodel import MTQuerySet
+        bulk_create = MTQuerySet.bulk_create
+
+        def interleaved(qs, objs, batch_size=None):
+            """Insert environments backwards, with another between each."""
+            if qs.model is not self.model.Environment:
+                return bulk_create(qs, objs, batch_size)
+            for obj in reversed(objs):
+                bulk_create(qs, [obj])
+                self.F.EnvironmentFactory.create()
+            return objs
+
+        with patch.object(MTQuerySet, "bulk_create", interleaved):
+            self.generate()
+
+        self.assertEqual(
+            self.environments(),
+            set([
+                "Firefox, Linux", "Firefox, Windows",
+                "Chrome, Linux", "Chrome, Windows",
+                ]),
+            )
+
+
+    def test_queries(self):
+        """Number of queries depends on the number of chunks."""
+        # existing combinations, highest environment id, then per chunk:
+        # savepoint, insert environments, read back their ids, reset their
+        # cc_version, release savepoint; then per chunk, insert element links
+        with patch.object(self.model.Environment, "GENERATE_CHUNK_SIZE", 3):
+            with self.assertNumQueries(14):
+                self.generate()
+
+        self.assertEqual(len(self.environments()), 4)
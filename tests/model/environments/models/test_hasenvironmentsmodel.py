@@ -2,6 +2,8 @@
 Tests for ``HasEnvironmentsModel``.
 
 """
+from mock import patch
+
 from tests import case
 
 
@@ -24,3 +26,60 @@ class HasEnvironmentsModelTest(case.TestCase):
     def test_cascade_envs_to(self):
         """cascade_envs_to returns empty dict in base class."""
         self.assertEqual(self.model_class.cascade_envs_to([], True), {})
+
+
+
+class EnvCascadeTest(case.DBTestCase):
+    """Tests for set-based adding and removing of environments."""
+    def setUp(self):
+        """A product version with one of two envs, and three caseversions."""
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["OS X", "Linux"]})
+        self.pv = self.F.ProductVersionFactory.create(
+            environments=self.envs[1:])
+        self.cvs = [
+            self.F.CaseVersionFactory.create(productversion=self.pv)
+            for i in range(3)
+            ]
+
+
+    def test_add_skips_existing(self):
+        """Adding an env some objects already have adds it to the others."""
+        self.cvs[0].environments.add(self.envs[0])
+
+        self.pv.add_envs(*self.envs)
+
+        for cv in self.cvs:
+            self.assertEqual(set(cv.environments.all()), set(self.envs))
+
+
+    def test_add_queries(self):
+        """Number of queries doesn't depend on the number of caseversions."""
+        # productversion insert; for draft runs and caseversions, find them
+        # then one insert per chunk (there are no runs)
+        with self.assertNumQueries(4):
+            self.pv.add_envs(self.envs[0])
+
+        with patch.object(self.model.CaseVersion, "ENVS_CHUNK_SIZE", 2):
+            with self.assertNumQueries(5):
+                self.pv.add_envs(self.envs[0])
+
+
+    def test_remove_chunked(self):
+        """Removal deletes from every chunk of objects."""
+        with patch.object(self.model.CaseVersion, "ENVS_CHUNK_SIZE", 2):
+            self.pv.remove_envs(self.envs[1])
+
+        for cv in self.cvs:
+            self.assertEqual(list(cv.environments.all()), [])
+        self.assertEqual(list(self.pv.environments.all()), [])
+
+
+    def test_ids(self):
+        """Environments may be given by id."""
+        cv = self.cvs[0]
+
+        cv.add_envs(self.envs[0].id)
+        cv.remove_envs(self.envs[1].id)
+
+        self.assertEqual(list(cv.environments.all()), [self.envs[0]])
@@ -0,0 +1,159 @@
+"""
+Tests for ResultBatchResource api.
+
+This is a write-only resource via ``post``.
+
+"""
+
+from tests import case
+
+
+
+class ResultBatchResourceTest(case.api.ApiTestCase):
+
+    @property
+    def factory(self):
+        """The model factory for this object."""
+        return self.F.RunCaseVersionFactory
+
+
+    @property
+    def resource_name(self):
+        return "resultbatch"
+
+
+    def setUp(self):
+        """A run with a passing and a failing case, and a tester."""
+        super(ResultBatchResourceTest, self).setUp()
+        self.user = self.F.UserFactory.create(
+            username="foo",
+            permissions=["execution.execute"],
+            )
+        self.apikey = self.F.ApiKeyFactory.create(owner=self.user)
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+                {"OS": ["OS X", "Linux"]})
+        pv = self.F.ProductVersionFactory.create(environments=self.envs)
+        self.run = self.F.RunFactory.create(name="RunA", productversion=pv)
+
+        self.c_p = self.F.CaseVersionFactory.create(
+            case__product=pv.product,
+            productversion=pv,
+            name="PassCase",
+            )
+        self.c_f = self.F.CaseVersionFactory.create(
+            case__product=pv.product,
+            productversion=pv,
+            name="FailCase",
+            )
+        self.F.CaseStepFactory(caseversion=self.c_f)
+
+        self.factory.create(
+            caseversion=self.c_p, run=self.run, environments=self.envs)
+        self.factory.create(
+            caseversion=self.c_f, run=self.run, environments=self.envs)
+
+
+    @property
+    def params(self):
+        return {"username": self.user.username, "api_key": self.apikey.key}
+
+
+    @property
+    def payload(self):
+        return {
+            "objects": [
+                {
+                    "case": self.c_p.case.id,
+                    "environment": self.envs[0].id,
+                    "run_id": self.run.id,
+                    "status": "passed"
+                },
+                {
+                    "bug": "http://www.deathvalleydogs.com",
+                    "case": self.c_f.case.id,
+                    "comment": "why u no pass?",
+                    "environment": self.envs[0].id,
+                    "run_id": self.run.id,
+                    "status": "failed",
+                    "stepnumber": 1
+                }
+            ]
+        }
+
+
+    def test_submit_results(self):
+        """Submit a batch of results for an existing test run."""
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload=self.payload,
+            )
+
+        self.assertEqual(res.json["created"], 2)
+
+        result = self.model.Result.objects.get(
+            runcaseversion__caseversion=self.c_p)
+        self.assertEqual(result.status, "passed")
+        self.assertEqual(result.environment, self.envs[0])
+        self.assertEqual(result.tester, self.user)
+
+        result = self.model.Result.objects.get(
+            runcaseversion__caseversion=self.c_f)
+        self.assertEqual(result.status, "failed")
+        self.assertEqual(result.comment, "why u no pass?")
+        self.assertEqual(
+            set(result.bug_urls()), set(["http://www.deathvalleydogs.com"]))
+
+
+    def test_submit_results_errors(self):
+        """An invalid item fails the whole batch, with errors by index."""
+        payload = self.payload
+        del payload["objects"][1]["status"]
+
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload=payload,
+            status=400,
+            )
+
+        self.assertEqual(
+            res.json["errors"],
+            [{"index": 1,
+              "error": "bad result object data missing key: status"}],
+            )
+        self.assertEqual(self.model.Result.objects.count(), 0)
+
+
+    def test_submit_results_no_objects(self):
+        """Submitted data without an objects list is a bad request."""
+        self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload={"case": self.c_p.case.id},
+            status=400,
+            )
+
+
+    def test_submit_results_no_authentication(self):
+        """Submit results for an existing test run by non-user."""
+        self.post(
+            self.get_list_url(self.resource_name),
+            payload=self.payload,
+            status=401,
+            )
+
+
+    def test_submit_results_no_authorization(self):
+        """Submit results for an existing test run by user without perms."""
+        user = self.F.UserFactory.create(username="bar")
+        apikey = self.F.ApiKeyFactory.create(owner=user)
+
+        self.post(
+            self.get_list_url(self.resource_name),
+            params={"username": user.username, "api_key": apikey.key},
+            payload=self.payload,
+            status=401,
+            )
+
+        self.assertEqual(self.model.Result.objects.count(), 0)
@@ -0,0 +1,64 @@
+"""
+Tests for management command to export results.
+
+"""
+from cStringIO import StringIO
+import json
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from mock import patch
+
+from tests import case
+
+
+
+class ExportResultsTest(case.DBTestCase):
+    """Tests for export_results management command."""
+    def call_command(self, *args, **kwargs):
+        """Runs the management command under test and returns stdout output."""
+        with patch("sys.stdout", StringIO()) as stdout:
+            call_command("export_results", *args, **kwargs)
+
+        stdout.seek(0)
+        return stdout.read()
+
+
+    def test_run_csv(self):
+        """Exports results of a run as CSV by default."""
+        r = self.F.ResultFactory.create(status="passed")
+
+        lines = self.call_command(
+            "run", str(r.runcaseversion.run.id)).splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("{0},".format(r.id)))
+
+
+    def test_productversion_json(self):
+        """Exports results of a product version as JSON lines."""
+        r = self.F.ResultFactory.create(status="passed")
+
+        output = self.call_command(
+            "productversion",
+            str(r.runcaseversion.run.productversion.id),
+            format="json",
+            )
+
+        self.assertEqual(
+            [json.loads(l)["id"] for l in output.splitlines()], [r.id])
+
+
+    def test_usage(self):
+        """Bad arguments are a usage error."""
+        with self.assertRaises(CommandError):
+            self.call_command("suite", "1")
+
+
+    def test_nonexistent_run(self):
+        """Nonexistent run id raises CommandError."""
+        with self.assertRaises(CommandError) as cm:
+            self.call_command("run", "9999")
+
+        self.assertEqual(str(cm.exception), "Run 9999 does not exist.")
@@ -0,0 +1,74 @@
+"""
+Tests for management command to rebuild run result summaries.
+
+"""
+from cStringIO import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from mock import patch
+
+from tests import case
+
+
+
+class RebuildResultSummariesTest(case.DBTestCase):
+    """Tests for rebuild_result_summaries management command."""
+    def call_command(self, *args, **kwargs):
+        """Runs the management command under test and returns stdout output."""
+        with patch("sys.stdout", StringIO()) as stdout:
+            call_command("rebuild_result_summaries", *args, **kwargs)
+
+        stdout.seek(0)
+        return stdout.read()
+
+
+    def test_rebuilds_all(self):
+        """With no arguments, rebuilds summaries for all runs."""
+        r1 = self.F.ResultFactory.create(status="passed")
+        r2 = self.F.ResultFactory.create(status="failed")
+        self.model.RunResultSummary.everything.all().delete(permanent=True)
+
+        output = self.call_command()
+
+        self.assertEqual(output, "Rebuilt 2 run result summaries.\n")
+        self.assertEqual(
+            self.model.RunResultSummary.objects.get(
+                run=r1.runcaseversion.run).passed, 1)
+        self.assertEqual(
+            self.model.RunResultSummary.objects.get(
+                run=r2.runcaseversion.run).failed, 1)
+
+
+    def test_rebuilds_given_runs(self):
+        """Rebuilds only summaries of runs given by id."""
+        r1 = self.F.ResultFactory.create(status="passed")
+        self.F.ResultFactory.create(status="failed")
+        self.model.RunResultSummary.everything.all().delete(permanent=True)
+
+        output = self.call_command(str(r1.runcaseversion.run.id))
+
+        self.assertEqual(output, "Rebuilt 1 run result summaries.\n")
+        self.assertEqual(
+            self.model.RunResultSummary.objects.get().run,
+            r1.runcaseversion.run)
+
+
+    def test_quiet(self):
+        """Verbosity 0 prints nothing."""
+        self.assertEqual(self.call_command(verbosity=0), "")
+
+
+    def test_bad_run_id(self):
+        """Non-numeric run id is a usage error."""
+        with self.assertRaises(CommandError):
+            self.call_command("foo")
+
+
+    def test_nonexistent_run(self):
+        """Nonexistent run id raises CommandError."""
+        with self.assertRaises(CommandError) as cm:
+            self.call_command("9999")
+
+        self.assertEqual(str(cm.exception), "Run(s) 9999 do not exist.")
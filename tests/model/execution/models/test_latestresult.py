@@ -0,0 +1,137 @@
+"""
+Tests for LatestResult model.
+
+"""
+from tests import case
+
+
+
+class LatestResultTest(case.DBTestCase):
+    def setUp(self):
+        """A runcaseversion, an environment, and a tester."""
+        self.rcv = self.F.RunCaseVersionFactory.create()
+        self.env = self.F.EnvironmentFactory.create()
+        self.tester = self.F.UserFactory.create()
+
+
+    def result(self, status, **kwargs):
+        """Create a result with given status for the rcv and env."""
+        kwargs.setdefault("tester", self.tester)
+        return self.F.ResultFactory.create(
+            runcaseversion=self.rcv,
+            environment=self.env,
+            status=status,
+            **kwargs)
+
+
+    def pointer(self, tester=None):
+        """Return the latest result pointer for the rcv, env and tester."""
+        return self.model.LatestResult.objects.get(
+            runcaseversion=self.rcv,
+            environment=self.env,
+            tester=tester or self.tester,
+            )
+
+
+    def test_unicode(self):
+        """Unicode representation names rcv, environment, tester and status."""
+        self.result("passed")
+
+        self.assertEqual(
+            unicode(self.pointer()),
+            u"Latest result of {0} in {1} by {2}: passed".format(
+                self.rcv, self.env, self.tester))
+
+
+    def test_new_result(self):
+        """A new result gets a pointer."""
+        r = self.result("passed")
+
+        p = self.pointer()
+        self.assertEqual(p.result, r)
+        self.assertEqual(p.status, "passed")
+
+
+    def test_replace_result(self):
+        """A newer result moves the pointer and unsets the old latest flag."""
+        r1 = self.result("passed")
+        r2 = self.result("failed")
+
+        p = self.pointer()
+        self.assertEqual(p.result, r2)
+        self.assertEqual(p.status, "failed")
+        self.assertFalse(self.refresh(r1).is_latest)
+        self.assertTrue(self.refresh(r2).is_latest)
+        self.assertEqual(self.model.LatestResult.objects.count(), 1)
+
+
+    def test_per_tester(self):
+        """Each tester has their own pointer."""
+        other = self.F.UserFactory.create()
+        r1 = self.result("passed")
+        r2 = self.result("failed", tester=other)
+
+        self.assertEqual(self.pointer().result, r1)
+        self.assertEqual(self.pointer(other).result, r2)
+        self.assertTrue(self.refresh(r1).is_latest)
+
+
+    def test_status_change(self):
+        """Changing the status of the latest result updates the pointer."""
+        r = self.result("started")
+        r.status = "passed"
+        r.save()
+
+        self.assertEqual(self.pointer().status, "passed")
+
+
+    def test_old_status_change(self):
+        """Changing the status of an older result doesn't touch the pointer."""
+        r1 = self.result("started")
+        self.result("failed")
+        r1 = self.refresh(r1)
+        r1.status = "passed"
+        r1.save()
+
+        self.assertEqual(self.pointer().status, "failed")
+
+
+    def test_deleted_result(self):
+        """Deleting the latest result deletes its pointer."""
+        r = self.result("passed")
+        r.delete()
+
+        self.assertEqual(self.model.LatestResult.objects.count(), 0)
+
+
+    def test_undeleted_result(self):
+        """Undeleting the latest result undeletes its pointer."""
+        r = self.result("passed")
+        r.delete()
+        self.refresh(r).undelete()
+
+        self.assertEqual(self.pointer().result, r)
+
+
+    def test_new_result_after_delete(self):
+        """A new result revives the pointer of a deleted result."""
+        r1 = self.result("passed")
+        r1.delete()
+        r2 = self.result("failed")
+
+        self.assertEqual(self.pointer().result, r2)
+        self.assertEqual(self.model.LatestResult.everything.count(), 1)
+        self.assertEqual(
+            self.model.RunResultSummary.objects.all().totals()["passed"], 0)
+
+
+    def test_set_latest(self):
+        """Setting an older result latest moves the pointer back to it."""
+        r1 = self.result("passed")
+        self.result("failed")
+        r1 = self.refresh(r1)
+        r1.set_latest()
+
+        p = self.pointer()
+        self.assertEqual(p.result, r1)
+        self.assertEqual(p.status, "passed")
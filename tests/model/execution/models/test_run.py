@@ -277,6 +277,81 @@ class RunTest(case.DBTestCase):
 
 
 
+class RunCountsTest(case.DBTestCase):
+    """Tests for the denormalized ``Run.case_count`` and ``env_count``."""
+    def setUp(self):
+        """A run in two environments, with two runcaseversions."""
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Windows", "Linux"]})
+        pv = self.F.ProductVersionFactory(environments=self.envs)
+        self.run = self.F.RunFactory(productversion=pv)
+        self.rcvs = [
+            self.F.RunCaseVersionFactory(
+                run=self.run, caseversion__productversion=pv)
+            for i in range(2)
+            ]
+
+
+    def counts(self):
+        """Return stored (case_count, env_count) of the run."""
+        r = self.refresh(self.run)
+        return (r.case_count, r.env_count)
+
+
+    def test_add_runcaseversion(self):
+        """Adding runcaseversions counts them and their environments."""
+        self.assertEqual(self.counts(), (2, 4))
+
+
+    def test_delete_and_undelete_runcaseversion(self):
+        """Deleted runcaseversions aren't counted; undeleted ones are again."""
+        self.rcvs[0].delete()
+
+        self.assertEqual(self.counts(), (1, 2))
+
+        self.rcvs[0].undelete()
+
+        self.assertEqual(self.counts(), (2, 4))
+
+
+    def test_remove_envs(self):
+        """Removing environments from the run uncounts them."""
+        self.run.remove_envs(self.envs[0])
+
+        self.assertEqual(self.counts(), (2, 2))
+
+
+    def test_add_envs(self):
+        """Adding environments to a runcaseversion counts them."""
+        self.rcvs[0].remove_envs(*self.envs)
+
+        self.assertEqual(self.counts(), (2, 2))
+
+        self.rcvs[0].add_envs(*self.envs)
+
+        self.assertEqual(self.counts(), (2, 4))
+
+
+    def test_activate(self):
+        """Locking in runcaseversions on activation counts them."""
+        self.F.model.RunCaseVersion.everything.all().delete(permanent=True)
+        self.F.model.Run.everything.filter(pk=self.run.pk).update(
+            case_count=0, env_count=0)
+        cv = self.F.CaseVersionFactory.create(
+            productversion=self.run.productversion,
+            status="active",
+            environments=self.envs,
+            )
+        ts = self.F.SuiteFactory.create(
+            product=self.run.productversion.product, status="active")
+        self.F.SuiteCaseFactory.create(suite=ts, case=cv.case)
+        self.F.RunSuiteFactory.create(suite=ts, run=self.run)
+
+        self.run.activate()
+
+        self.assertEqual((self.run.case_count, self.run.env_count), (1, 2))
+        self.assertEqual(self.counts(), (1, 2))
+
 
 
 class RunActivationTest(case.DBTestCase):
@@ -452,6 +527,96 @@ class RunActivationTest(case.DBTestCase):
         self.assertOrderedCaseVersions(r, [tcv1, tcv2, tcv3, tcv4])
 
 
+    def _ordered_suites_run(self):
+        """Return active run of two suites of two cases each, and the cvs."""
+        cvs = []
+        suites = []
+        for i in range(2):
+            ts = self.F.SuiteFactory.create(product=self.p, status="active")
+            for j in range(2):
+                cv = self.F.CaseVersionFactory.create(
+                    case__product=self.p,
+                    productversion=self.pv8,
+                    status="active",
+                    )
+                self.F.SuiteCaseFactory.create(
+                    suite=ts, case=cv.case, order=j)
+                cvs.append(cv)
+            suites.append(ts)
+
+        r = self.F.RunFactory.create(productversion=self.pv8)
+        self.F.RunSuiteFactory.create(suite=suites[0], run=r, order=1)
+        self.F.RunSuiteFactory.create(suite=suites[1], run=r, order=2)
+        r.activate()
+        return r, cvs
+
+
+    def test_refresh_unchanged(self):
+        """Refreshing an unchanged run leaves its runcaseversions alone."""
+        r, cvs = self._ordered_suites_run()
+        before = list(
+            r.runcaseversions.values_list("id", "order", "cc_version"))
+
+        r.refresh()
+
+        self.assertEqual(
+            list(r.runcaseversions.values_list("id", "order", "cc_version")),
+            before,
+            )
+
+
+    def test_refresh_reorders_in_place(self):
+        """Reordering suites reorders the existing runcaseversions."""
+        r, cvs = self._ordered_suites_run()
+        ids = dict(r.runcaseversions.values_list("caseversion", "id"))
+        r.runsuites.filter(order=1).update(order=3)
+
+        r.refresh()
+
+        self.assertOrderedCaseVersions(r, cvs[2:] + cvs[:2])
+        self.assertEqual(
+            dict(r.runcaseversions.values_list("caseversion", "id")), ids)
+
+
+    def test_refresh_reorder_chunked(self):
+        """Bulk reordering is done in chunks."""
+        r, cvs = self._ordered_suites_run()
+        r.runsuites.filter(order=1).update(order=3)
+
+        with patch.object(Run, "REORDER_CHUNK_SIZE", 1):
+            r.refresh()
+
+        self.assertOrderedCaseVersions(r, cvs[2:] + cvs[:2])
+
+
+    def test_refresh_adds_and_removes(self):
+        """Only added and removed cases are inserted and deleted."""
+        r, cvs = self._ordered_suites_run()
+        kept = r.runcaseversions.get(caseversion=cvs[1])
+        ts = r.suites.get(suitecases__case=cvs[0].case)
+        ts.suitecases.get(case=cvs[0].case).delete(permanent=True)
+        new_cv = self.F.CaseVersionFactory.create(
+            case__product=self.p, productversion=self.pv8, status="active")
+        self.F.SuiteCaseFactory.create(suite=ts, case=new_cv.case, order=5)
+
+        r.refresh()
+
+        self.assertOrderedCaseVersions(r, [cvs[1], new_cv] + cvs[2:])
+        self.assertEqual(
+            r.runcaseversions.get(caseversion=cvs[1]).id, kept.id)
+
+
+    def test_case_in_two_suites(self):
+        """A case in two suites is included once, placed by its first suite."""
+        r, cvs = self._ordered_suites_run()
+        ts = r.suites.get(suitecases__case=cvs[2].case)
+        self.F.SuiteCaseFactory.create(suite=ts, case=cvs[0].case, order=9)
+
+        r.refresh()
+
+        self.assertOrderedCaseVersions(r, cvs)
+
+
     def test_sets_status_active(self):
         """Sets status of run to active."""
         r = self.F.RunFactory.create(status="draft")
@@ -621,6 +786,50 @@ class RunActivationTest(case.DBTestCase):
         self.assertEqual(set(rcv.environments.all()), set(self.envs[1:]))
 
 
+    def test_removes_stale_envs_in_chunks(self):
+        """Stale runcaseversion environments are deleted in chunks."""
+        r = self.F.RunFactory.create(productversion=self.pv8, status="draft")
+        rcv = self.F.RunCaseVersionFactory.create(
+            run=r,
+            caseversion__productversion=self.pv8,
+            caseversion__status="active",
+            )
+        ts = self.F.SuiteFactory.create(product=self.p, status="active")
+        self.F.SuiteCaseFactory.create(suite=ts, case=rcv.caseversion.case)
+        self.F.RunSuiteFactory.create(suite=ts, run=r)
+        rcv.caseversion.environments.remove(*self.envs[:3])
+
+        with patch.object(Run, "RCV_ENV_DELETE_CHUNK_SIZE", 2):
+            r.activate()
+
+        self.assertEqual(set(rcv.environments.all()), set(self.envs[3:]))
+
+
+    def test_adds_envs_on_previously_included_rcv(self):
+        """Re-activating adds missing envs, but not deleted ones."""
+        r = self.F.RunFactory.create(productversion=self.pv8, status="draft")
+        rcv = self.F.RunCaseVersionFactory.create(
+            run=r,
+            caseversion__productversion=self.pv8,
+            caseversion__status="active",
+            )
+        ts = self.F.SuiteFactory.create(product=self.p, status="active")
+        self.F.SuiteCaseFactory.create(suite=ts, case=rcv.caseversion.case)
+        self.F.RunSuiteFactory.create(suite=ts, run=r)
+        rcv.environments.clear()
+        self.model.Environment.everything.filter(pk=self.envs[0].pk).update(
+            deleted_on=datetime.datetime(2012, 3, 24))
+
+        r.activate()
+
+        self.assertEqual(
+            set(self.model.RunCaseVersion.environments.through.objects.filter(
+                    runcaseversion=rcv).values_list(
+                    "environment", flat=True)),
+            set(e.id for e in self.envs[1:]),
+            )
+
+
     def test_removes_draft_caseversions_and_their_results(self):
         """Re-activating removes caseversions that are now draft."""
         r = self.F.RunFactory.create(productversion=self.pv8, status="draft")
@@ -681,7 +890,7 @@ class RunActivationTest(case.DBTestCase):
         Query 2: Get the caseversion ids that SHOULD be included in this run,
             in order
 
-            "SELECT DISTINCT cv.id as id
+            "SELECT cv.id as id
             FROM execution_run as r
                 INNER JOIN execution_runsuite as rs
                     ON rs.run_id = r.id
@@ -692,85 +901,75 @@ class RunActivationTest(case.DBTestCase):
                 INNER JOIN library_caseversion as cv
                     ON cv.case_id = sc.case_id
                     AND cv.productversion_id = r.productversion_id
-                INNER JOIN library_caseversion_environments as cve
-                    ON cv.id = cve.caseversion_id
             WHERE cv.status = 'active'
+                AND cv.deleted_on IS NULL
                 AND s.status = 'active'
                 AND rs.run_id = 1
-                AND cve.environment_id IN (1,2,3,4)
-            ORDER BY rs.order, sc.order
+                AND EXISTS (
+                    SELECT 1 FROM library_caseversion_environments as cve
+                    WHERE cve.caseversion_id = cv.id
+                        AND cve.environment_id IN (1,2,3,4))
+            ORDER BY rs.`order`, sc.`order`
             ",
 
-        Query 3-6: Get all the runcaseversions that are not in the result of
-         Query 2
-            to be used for delete. and then delete them.
+        Query 3: Get the runcaseversions that were locked in previously, to
+            diff against the result of Query 2.
 
             "SELECT `execution_runcaseversion`.`id`,
-            `execution_runcaseversion`.`created_on`,
-            `execution_runcaseversion`.`created_by_id`,
-            `execution_runcaseversion`.`modified_on`,
-            `execution_runcaseversion`.`modified_by_id`,
-            `execution_runcaseversion`.`deleted_on`,
-            `execution_runcaseversion`.`deleted_by_id`,
-            `execution_runcaseversion`.`cc_version`,
-            `execution_runcaseversion`.`run_id`, `execution_runcaseversion`
-            .`caseversion_id`, `execution_runcaseversion`.`order` FROM
+            `execution_runcaseversion`.`caseversion_id`,
+            `execution_runcaseversion`.`order` FROM
             `execution_runcaseversion` WHERE (`execution_runcaseversion`
             .`deleted_on` IS NULL AND `execution_runcaseversion`.`run_id` =
-            1  AND NOT (`execution_runcaseversion`.`caseversion_id` IN (2,
-            3, 4, 5, 6, 7))) ORDER BY `execution_runcaseversion`.`order` ASC",
-
-            "SELECT `execution_result`.`id`, `execution_result`
-            .`created_on`, `execution_result`.`created_by_id`,
-            `execution_result`.`modified_on`,
-            `execution_result`.`modified_by_id`,
-            `execution_result`.`deleted_on`, `execution_result`
-            .`deleted_by_id`, `execution_result`.`cc_version`,
-            `execution_result`.`tester_id`, `execution_result`
-            .`runcaseversion_id`, `execution_result`.`environment_id`,
-            `execution_result`.`status`, `execution_result`.`comment`,
-            `execution_result`.`is_latest`, `execution_result`.`review`,
-            `execution_result`.`reviewed_by_id` FROM `execution_result`
-            WHERE `execution_result`.`runcaseversion_id` IN (1)",
-
-            "DELETE FROM `execution_runcaseversion_environments` WHERE
-            `runcaseversion_id` IN (1)",
+            1 ) ORDER BY `execution_runcaseversion`.`order` ASC",
+
+        Query 4-9: Collect the runcaseversions no longer needed, and their
+            environments, results and latest results, and delete them.
+
+            "SELECT ... FROM `execution_runcaseversion` WHERE (
+            `execution_runcaseversion`.`deleted_on` IS NULL AND
+            `execution_runcaseversion`.`run_id` = 1  AND
+            `execution_runcaseversion`.`id` IN (1))",
+
+            "SELECT ... FROM `execution_runcaseversion_environments` WHERE
+            `execution_runcaseversion_environments`.`runcaseversion_id` IN
+            (1)",
+
+            "SELECT ... FROM `execution_result` WHERE
+            `execution_result`.`runcaseversion_id` IN (1)",
+
+            "SELECT ... FROM `execution_latestresult` WHERE
+            `execution_latestresult`.`runcaseversion_id` IN (1)",
+
+            "DELETE FROM `execution_runcaseversion_environments` WHERE `id`
+            IN (4, 3, 2, 1)",
 
             "DELETE FROM `execution_runcaseversion` WHERE `id` IN (1)",
 
-        Query 7: find duplicates in the existing rcvs, if they exist
+        Query 10-12: Recount the run result summaries, since results were
+            deleted along with the runcaseversions.
 
-            SELECT `execution_runcaseversion`.`caseversion_id`,
-            COUNT(`execution_runcaseversion`.`caseversion_id`) AS
-            `num_records` FROM `execution_runcaseversion` WHERE (
-            `execution_runcaseversion`.`deleted_on` IS NULL AND
-            `execution_runcaseversion`.`run_id` = 8 ) GROUP BY
-            `execution_runcaseversion`.`caseversion_id` HAVING COUNT(
-            `execution_runcaseversion`.`caseversion_id`) > 1  ORDER BY
-            `execution_runcaseversion`.`order` ASC
+            "SELECT `execution_runcaseversion`.`run_id`,
+            `execution_result`.`environment_id`, `execution_result`.`status`,
+            COUNT(`execution_result`.`id`) AS `num` FROM ...",
 
-        Query 8: Get existing runcaseversions with the caseversion ids so we
-         can use
-            Them to build the new RunCaseVersion objects we will only be
-            updated
-            with order in the bulk create.
+            "SELECT `execution_runcaseversion`.`run_id`,
+            `execution_result`.`environment_id`, COUNT(DISTINCT
+            `execution_result`.`runcaseversion_id`) AS `num` FROM ...",
 
-            "SELECT `execution_runcaseversion`.`id`,
-            `execution_runcaseversion`.`caseversion_id` FROM
-            `execution_runcaseversion` WHERE (`execution_runcaseversion`
-            .`deleted_on` IS NULL AND `execution_runcaseversion`.`run_id` =
-            1 ) ORDER BY `execution_runcaseversion`.`order` ASC",
+            "SELECT ... FROM `execution_runresultsummary` WHERE
+            `execution_runresultsummary`.`run_id` IN (1)",
 
-        Query 9: update order on existing rcvs
+        Query 13: Reorder the existing rcvs whose order changed, all in one
+            statement.
 
-            "UPDATE `execution_runcaseversion` SET `modified_on` =
-            '2013-03-15 01:00:08', `modified_by_id` = NULL, `order` = 4,
-            `cc_version` = `execution_runcaseversion`.`cc_version` + 1 WHERE
-             (`execution_runcaseversion`.`deleted_on` IS NULL AND
-             `execution_runcaseversion`.`run_id` = 8  AND
-             `execution_runcaseversion`.`caseversion_id` = 16 )",
+            "UPDATE execution_runcaseversion
+                SET `order` = CASE id WHEN 2 THEN 4 END,
+                    modified_on = '2013-03-15 01:00:08',
+                    modified_by_id = NULL,
+                    cc_version = cc_version + 1
+                WHERE id IN (2)",
 
-        Query 10: bulk insert for RunCaseVersions
+        Query 14: bulk insert for RunCaseVersions
 
             "INSERT INTO `execution_runcaseversion` (`created_on`,
             `created_by_id`, `modified_on`, `modified_by_id`, `deleted_on`,
@@ -784,112 +983,62 @@ class RunActivationTest(case.DBTestCase):
              NULL, 0, 8, 17, 5), ('2013-03-15 01:00:08', NULL,
              '2013-03-15 01:00:08', NULL, NULL, NULL, 0, 8, 18, 6)"
 
-        Query 11: In order to add the runcaseversion_environment records,
-            we need to have all the relevant runcaseversions and prefetch the
-            environments for the caseversions
-
-            "SELECT `execution_runcaseversion`.`id`,
-            `execution_runcaseversion`.`created_on`,
-            `execution_runcaseversion`.`created_by_id`,
-            `execution_runcaseversion`.`modified_on`,
-            `execution_runcaseversion`.`modified_by_id`,
-            `execution_runcaseversion`.`deleted_on`,
-            `execution_runcaseversion`.`deleted_by_id`,
-            `execution_runcaseversion`.`cc_version`,
-            `execution_runcaseversion`.`run_id`, `execution_runcaseversion`
-            .`caseversion_id`, `execution_runcaseversion`.`order`,
-            `library_caseversion`.`id`, `library_caseversion`.`created_on`,
-            `library_caseversion`.`created_by_id`, `library_caseversion`
-            .`modified_on`, `library_caseversion`.`modified_by_id`,
-            `library_caseversion`.`deleted_on`, `library_caseversion`
-            .`deleted_by_id`, `library_caseversion`.`cc_version`,
-            `library_caseversion`.`status`, `library_caseversion`
-            .`productversion_id`, `library_caseversion`.`case_id`,
-            `library_caseversion`.`name`, `library_caseversion`
-            .`description`, `library_caseversion`.`latest`,
-            `library_caseversion`.`envs_narrowed` FROM
-            `execution_runcaseversion` INNER JOIN `library_caseversion` ON (
-            `execution_runcaseversion`.`caseversion_id` =
-            `library_caseversion`.`id`) WHERE (`execution_runcaseversion`
-            .`deleted_on` IS NULL AND `execution_runcaseversion`.`run_id` =
-            1 ) ORDER BY `execution_runcaseversion`.`order` ASC",
-
-        Query 12: This is the prefetch_related query used with Query 9.  Django
-            makes a separate query and links them in-memory.
-
-            "SELECT (`library_caseversion_environments`.`caseversion_id`) AS
-             `_prefetch_related_val`, `environments_environment`.`id`,
-             `environments_environment`.`created_on`,
-             `environments_environment`.`created_by_id`,
-             `environments_environment`.`modified_on`,
-             `environments_environment`.`modified_by_id`,
-             `environments_environment`.`deleted_on`,
-             `environments_environment`.`deleted_by_id`,
-             `environments_environment`.`cc_version`,
-             `environments_environment`.`profile_id` FROM
-             `environments_environment` INNER JOIN
-             `library_caseversion_environments` ON (
-             `environments_environment`.`id` =
-             `library_caseversion_environments`.`environment_id`) WHERE (
-             `environments_environment`.`deleted_on` IS NULL AND
-             `library_caseversion_environments`.`caseversion_id` IN (2, 3,
-             4, 5, 6, 7))",
-
-        Query 13: runcaseversion_environments that already existed that
-        pertain to
-            the runcaseversions that are still relevant.
-
-            "SELECT `execution_runcaseversion_environments`
-            .`runcaseversion_id`, `execution_runcaseversion_environments`
-            .`environment_id` FROM `execution_runcaseversion_environments`
-            WHERE `execution_runcaseversion_environments`
-            .`runcaseversion_id` IN (3, 4, 5, 2, 6, 7)",
-
-        Query 14: Get the environments for this run so we can find the
-        intersection
-            with the caseversions.
-
-            "SELECT `environments_environment`.`id` FROM
-            `environments_environment` INNER JOIN
-            `execution_run_environments` ON (`environments_environment`.`id`
-             = `execution_run_environments`.`environment_id`) WHERE (
-             `environments_environment`.`deleted_on` IS NULL AND
-             `execution_run_environments`.`run_id` = 1 )",
+        Query 15: Add missing runcaseversion_environment mappings, for the
+            environments each caseversion has in common with the run.
 
-        Query 15: Find the runcaseversion_environments that are no longer
-        relevant.
-
-            "SELECT `execution_runcaseversion_environments`.`id`,
-            `execution_runcaseversion_environments`.`runcaseversion_id`,
-            `execution_runcaseversion_environments`.`environment_id` FROM
-            `execution_runcaseversion_environments`
-            WHERE ((`execution_runcaseversion_environments`.`runcaseversion_id`
-            = 2  AND `execution_runcaseversion_environments`.`environment_id`
-            = 5 ))",
+            "INSERT INTO execution_runcaseversion_environments
+                (runcaseversion_id, environment_id)
+            SELECT rcv.id, cve.environment_id
+            FROM execution_runcaseversion as rcv
+                INNER JOIN library_caseversion_environments as cve
+                    ON cve.caseversion_id = rcv.caseversion_id
+                INNER JOIN execution_run_environments as re
+                    ON re.environment_id = cve.environment_id
+                    AND re.run_id = rcv.run_id
+                INNER JOIN environments_environment as e
+                    ON e.id = cve.environment_id
+            WHERE rcv.run_id = 1
+                AND rcv.deleted_on IS NULL
+                AND e.deleted_on IS NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM execution_runcaseversion_environments as rce
+                    WHERE rce.runcaseversion_id = rcv.id
+                        AND rce.environment_id = cve.environment_id)",
+
+        Query 16: Find (a chunk of) the runcaseversion_environments that are
+            no longer relevant.
+
+            "SELECT rce.id
+            FROM execution_runcaseversion_environments as rce
+                INNER JOIN execution_runcaseversion as rcv
+                    ON rcv.id = rce.runcaseversion_id
+            WHERE rcv.run_id = 1
+                AND rcv.deleted_on IS NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM library_caseversion_environments as cve
+                    ...)
+            LIMIT 1000",
+
+        Query 17: Delete them.
+
+            "DELETE FROM execution_runcaseversion_environments WHERE id
+            IN (9)",
 
-        Query 16: Delete the runcaseversion_environments that pertained to the
-            caseversion that are no longer relevant.
+        Query 18: Recompute the run's denormalized counts.
 
-            "DELETE FROM `execution_runcaseversion_environments` WHERE `id`
-            IN (9)",
+            "UPDATE `execution_run` SET `case_count` = (SELECT COUNT(*) ...),
+                `env_count` = (SELECT COUNT(*) ...)
+            WHERE `execution_run`.`id` IN (1)"
 
-        Query 17: Bulk insert of runcaseversion_environment mappings.
+        Query 19: Read the recomputed counts back.
 
-            "INSERT INTO `execution_runcaseversion_environments`
-            (`runcaseversion_id`, `environment_id`) VALUES (7, 3), (5, 4),
-            (3, 1), (3, 3), (6, 4), (7, 4), (5, 2), (6, 1), (4, 4), (3, 2),
-            (7, 1), (6, 3), (6, 2), (4, 3), (4, 2), (3, 4), (5, 1), (4, 1),
-            (7, 2), (5, 3)",
+            "SELECT `execution_run`.`case_count`,
+                `execution_run`.`env_count`
+            FROM `execution_run` WHERE `execution_run`.`id` = 1"
 
-        Query 18: Update the test run to make it active.
+        Query 20: Update the test run to make it active.
 
-            "UPDATE `execution_run` SET `created_on` = '2012-11-20 00:11:25',
-            `created_by_id` = NULL, `modified_on` = '2012-11-20 00:11:25',
-            `modified_by_id` = NULL, `deleted_on` = NULL, `deleted_by_id` =
-            NULL, `cc_version` = 1, `has_team` = 0, `status` = 'active',
-            `productversion_id` = 1, `name` = 'Test Run', `description` = '',
-            `start` = '2012-11-19', `end` = NULL, `build` = NULL,
-            `is_series` = 0, `series_id` = NULL
+            "UPDATE `execution_run` SET ... `status` = 'active' ...
             WHERE (`execution_run`.`deleted_on` IS NULL
             AND `execution_run`.`id` = 1
             AND `execution_run`.`cc_version` = 0 )"
@@ -943,7 +1092,7 @@ class RunActivationTest(case.DBTestCase):
         connection.queries = []
 
         try:
-            with self.assertNumQueries(17):
+            with self.assertNumQueries(20):
                 r.activate()
 
             # to debug, uncomment these lines:
@@ -957,9 +1106,9 @@ class RunActivationTest(case.DBTestCase):
             updates = [x["sql"] for x in connection.queries if x["sql"].startswith("UPDATE")]
             deletes = [x["sql"] for x in connection.queries if x["sql"].startswith("DELETE")]
 
-            self.assertEqual(len(selects), 10)
+            self.assertEqual(len(selects), 12)
             self.assertEqual(len(inserts), 2)
-            self.assertEqual(len(updates), 2)
+            self.assertEqual(len(updates), 3)
             self.assertEqual(len(deletes), 3)
         except AssertionError as e:
             raise e
@@ -1069,6 +1218,174 @@ class RunActivationTest(case.DBTestCase):
             self.model.Result.objects.count(), 1)
 
 
+    def _series(self):
+        """Return an active series of one suite of two cases, and the cvs."""
+        ts = self.F.SuiteFactory.create(product=self.p, status="active")
+        cvs = []
+        for i in range(2):
+            cv = self.F.CaseVersionFactory.create(
+                case__product=self.p,
+                productversion=self.pv8,
+                status="active",
+                )
+            self.F.SuiteCaseFactory.create(suite=ts, case=cv.case, order=i)
+            cvs.append(cv)
+        series = self.F.RunFactory.create(
+            productversion=self.pv8, is_series=True, status="active")
+        self.F.RunSuiteFactory.create(suite=ts, run=series)
+        return series, cvs
+
+
+    def _build(self, series, build):
+        """Clone and activate a build run of ``series``."""
+        r = series.clone_for_series(build=build)
+        r.activate()
+        return r
+
+
+    def assertSameRunCaseVersions(self, r1, r2):
+        """Assert runs have same cvs in same order, with same environments."""
+        def rcvs(run):
+            return [
+                (rcv.caseversion.id, rcv.order,
+                 set(rcv.environments.values_list("id", flat=True)))
+                for rcv in run.runcaseversions.all()
+                ]
+        self.assertEqual(rcvs(r1), rcvs(r2))
+
+
+    def test_series_build_copies_sibling(self):
+        """A new build of an unchanged series copies a sibling's rcvs."""
+        series, cvs = self._series()
+        # one of the case versions has fewer environments
+        cvs[1].remove_envs(self.envs[0])
+        b1 = self._build(series, "1")
+
+        with patch.object(Run, "_select_caseversions") as select:
+            with patch.object(Run, "_bulk_insert_new_runcaseversions") as bulk:
+                b2 = self._build(series, "2")
+
+        self.assertFalse(select.called)
+        self.assertFalse(bulk.called)
+        self.assertOrderedCaseVersions(b2, cvs)
+        self.assertSameRunCaseVersions(b1, b2)
+        self.assertEqual(b2.status, "active")
+        self.assertEqual(b2.lock_fingerprint, b1.lock_fingerprint)
+        self.assertEqual(b2.case_count, 2)
+        self.assertEqual(b2.env_count, 7)
+
+
+    def test_series_build_unrelated_change_copies(self):
+        """Changes to caseversions outside the series' suites still copy."""
+        series, cvs = self._series()
+        b1 = self._build(series, "1")
+        other = self.F.CaseVersionFactory.create(
+            case__product=self.p,
+            productversion=self.pv8,
+            status="active",
+            )
+        other.add_envs(*self.envs)
+
+        with patch.object(Run, "_bulk_insert_new_runcaseversions") as bulk:
+            b2 = self._build(series, "2")
+
+        self.assertFalse(bulk.called)
+        self.assertSameRunCaseVersions(b1, b2)
+
+
+    def test_series_build_stores_fingerprint(self):
+        """Locking a build stores its fingerprint; clones don't inherit it."""
+        series, cvs = self._series()
+        b1 = self._build(series, "1")
+
+        self.assertEqual(len(b1.lock_fingerprint), 40)
+        self.assertEqual(
+            self.refresh(b1).lock_fingerprint, b1.lock_fingerprint)
+        self.assertEqual(b1.clone().lock_fingerprint, "")
+        self.assertEqual(series.lock_fingerprint, "")
+
+
+    def test_series_build_caseversion_environments_changed_locks(self):
+        """Caseversion environments added after the sibling lock afresh."""
+        series, cvs = self._series()
+        cvs[1].remove_envs(self.envs[0])
+        b1 = self._build(series, "1")
+        # additions don't cascade to the sibling's locked-in rcvs
+        cvs[1].add_envs(self.envs[0])
+
+        b2 = self._build(series, "2")
+
+        self.assertNotEqual(b2.lock_fingerprint, b1.lock_fingerprint)
+        self.assertEqual(
+            set(b2.runcaseversions.get(caseversion=cvs[1]).environments.all()),
+            set(self.envs),
+            )
+        self.assertEqual(
+            b1.runcaseversions.get(
+                caseversion=cvs[1]).environments.count(), 3)
+
+
+    def test_series_build_caseversion_status_changed_locks(self):
+        """A caseversion made draft after the sibling is left out."""
+        series, cvs = self._series()
+        self._build(series, "1")
+        cvs[0].status = "draft"
+        cvs[0].save()
+
+        b2 = self._build(series, "2")
+
+        self.assertOrderedCaseVersions(b2, cvs[1:])
+
+
+    def test_series_first_build_locks(self):
+        """The first build of a series has nothing to copy; it locks."""
+        series, cvs = self._series()
+
+        b1 = self._build(series, "1")
+
+        self.assertOrderedCaseVersions(b1, cvs)
+        self.assertEqual(
+            self.F.model.RunCaseVersion.environments.through.objects.filter(
+                runcaseversion__run=b1).count(),
+            8,
+            )
+
+
+    def test_series_build_suite_changed_locks(self):
+        """A new build of a series whose suites changed is locked afresh."""
+        series, cvs = self._series()
+        b1 = self._build(series, "1")
+        cv = self.F.CaseVersionFactory.create(
+            case__product=self.p,
+            productversion=self.pv8,
+            status="active",
+            )
+        self.F.SuiteCaseFactory.create(
+            suite=series.suites.get(), case=cv.case, order=5)
+
+        b2 = self._build(series, "2")
+
+        self.assertOrderedCaseVersions(b1, cvs)
+        self.assertOrderedCaseVersions(b2, cvs + [cv])
+
+
+    def test_series_build_environments_changed_locks(self):
+        """A new build of a series whose environments changed locks."""
+        series, cvs = self._series()
+        self._build(series, "1")
+        series.remove_envs(self.envs[0])
+
+        b2 = self._build(series, "2")
+
+        self.assertOrderedCaseVersions(b2, cvs)
+        self.assertEqual(
+            set(self.F.model.RunCaseVersion.environments.through.objects.filter(
+                    runcaseversion__run=b2).values_list(
+                    "environment", flat=True)),
+            set(e.id for e in self.envs[1:]),
+            )
+
+
 
 class RefreshTransactionTest(case.TransactionTestCase):
     """Tests for ``Importer`` transactional behavior."""
@@ -147,6 +147,16 @@ class RunCaseVersionTest(case.DBTestCase):
             )
 
 
+    def test_result_summary_deleted(self):
+        """``result_summary`` doesn't count deleted latest results."""
+        rcv = self.F.RunCaseVersionFactory()
+        self.F.ResultFactory(runcaseversion=rcv, status="passed")
+        self.F.ResultFactory(runcaseversion=rcv, status="failed").delete()
+
+        self.assertEqual(rcv.result_summary()["passed"], 1)
+        self.assertEqual(rcv.result_summary()["failed"], 0)
+
+
     def test_result_summary_specific(self):
         """``result_summary`` has results only from one runcaseversion."""
         rcv = self.F.RunCaseVersionFactory()
@@ -0,0 +1,236 @@
+"""
+Tests for RunResultSummary model.
+
+"""
+from django.db import transaction
+
+from tests import case
+
+
+
+class RunResultSummaryTest(case.DBTestCase):
+    def setUp(self):
+        """A run with one runcaseversion, and an environment."""
+        self.rcv = self.F.RunCaseVersionFactory.create()
+        self.run = self.rcv.run
+        self.env = self.F.EnvironmentFactory.create()
+        self.tester = self.F.UserFactory.create()
+
+
+    def summary(self):
+        """Return the counts in the summary row for run and env."""
+        s = self.model.RunResultSummary.objects.get(
+            run=self.run, environment=self.env)
+        return dict(
+            (f, getattr(s, f))
+            for f in self.model.RunResultSummary.COUNT_FIELDS
+            if getattr(s, f))
+
+
+    def result(self, status, **kwargs):
+        """Create a result with given status for the run and env."""
+        kwargs.setdefault("tester", self.tester)
+        return self.F.ResultFactory.create(
+            runcaseversion=self.rcv,
+            environment=self.env,
+            status=status,
+            **kwargs)
+
+
+    def test_unicode(self):
+        """Unicode representation names run and environment."""
+        self.result("passed")
+        s = self.model.RunResultSummary.objects.get()
+
+        self.assertEqual(
+            unicode(s),
+            u"Result summary for run '{0}' in {1}".format(self.run, self.env))
+
+
+    def test_new_result_counted(self):
+        """A new latest result is counted under its status."""
+        self.result("passed")
+
+        self.assertEqual(self.summary(), {"passed": 1, "completed": 1})
+
+
+    def test_pending_states(self):
+        """Assigned and started results are counted as pending."""
+        self.result("assigned")
+        self.result("started", tester=self.F.UserFactory.create())
+
+        self.assertEqual(self.summary(), {"pending": 2})
+
+
+    def test_replaced_result_uncounted(self):
+        """A result no longer latest for its tester is uncounted."""
+        self.result("started")
+        self.result("failed")
+
+        self.assertEqual(self.summary(), {"failed": 1, "completed": 1})
+
+
+    def test_completed_counts_combos_once(self):
+        """Completed counts a case/env combo once, whatever the testers."""
+        self.result("passed")
+        self.result("failed", tester=self.F.UserFactory.create())
+
+        self.assertEqual(
+            self.summary(), {"passed": 1, "failed": 1, "completed": 1})
+
+
+    def test_completed_kept_while_other_tester_completed(self):
+        """Restarting a combo one tester completed keeps it if another did."""
+        self.result("passed")
+        self.result("failed", tester=self.F.UserFactory.create())
+        self.result("started")
+
+        self.assertEqual(
+            self.summary(), {"pending": 1, "failed": 1, "completed": 1})
+
+
+    def test_restarted_uncompleted(self):
+        """Restarting the only completed result uncompletes the combo."""
+        self.result("skipped")
+        self.result("passed")
+        self.result("started")
+
+        self.assertEqual(self.summary(), {"pending": 1})
+
+
+    def test_status_change(self):
+        """Changing status of a latest result moves its count."""
+        r = self.result("passed")
+        r.status = "invalidated"
+        r.save()
+
+        self.assertEqual(self.summary(), {"invalidated": 1, "completed": 1})
+
+
+    def test_status_change_not_latest(self):
+        """Changing status of a non-latest result doesn't affect counts."""
+        r = self.result("passed")
+        self.result("failed")
+        r = self.refresh(r)
+        r.status = "blocked"
+        r.save()
+
+        self.assertEqual(self.summary(), {"failed": 1, "completed": 1})
+
+
+    def test_save_rolled_back_with_enclosing_transaction(self):
+        """A result saved in a rolled back atomic block leaves no trace."""
+        self.result("passed")
+
+        class Rollback(Exception):
+            pass
+
+        try:
+            with transaction.atomic():
+                self.result("failed")
+                raise Rollback()
+        except Rollback:
+            pass
+
+        self.assertEqual(self.summary(), {"passed": 1, "completed": 1})
+        self.assertEqual(
+            self.model.LatestResult.objects.get().result.status, "passed")
+        self.assertEqual(self.model.Result.objects.count(), 1)
+
+
+    def test_set_latest_existing(self):
+        """Making an older result latest again moves the count back to it."""
+        r = self.result("passed")
+        self.result("failed")
+        r = self.refresh(r)
+
+        r.set_latest()
+
+        self.assertEqual(self.summary(), {"passed": 1, "completed": 1})
+        self.assertEqual(
+            self.model.Result.objects.filter(is_latest=True).get(), r)
+
+
+    def test_delete_result(self):
+        """Deleting a result recounts its run."""
+        r = self.result("passed")
+
+        r.delete()
+
+        self.assertEqual(
+            self.model.RunResultSummary.objects.filter(run=self.run).count(),
+            0)
+
+
+    def test_undelete_result(self):
+        """Undeleting a result recounts its run."""
+        r = self.result("passed")
+        r.delete()
+
+        self.refresh(r).undelete()
+
+        self.assertEqual(self.summary(), {"passed": 1, "completed": 1})
+
+
+    def test_delete_runcaseversion(self):
+        """Deleting a runcaseversion recounts its run."""
+        self.result("passed")
+
+        self.rcv.delete()
+
+        self.assertEqual(
+            self.model.RunResultSummary.objects.filter(run=self.run).count(),
+            0)
+
+
+    def test_rebuild(self):
+        """Rebuilding recounts summaries from latest results."""
+        self.result("started")
+        self.result("blocked")
+        self.result("skipped", tester=self.F.UserFactory.create())
+        self.model.RunResultSummary.everything.all().delete(permanent=True)
+
+        num = self.model.RunResultSummary.rebuild()
+
+        self.assertEqual(num, 1)
+        self.assertEqual(
+            self.summary(), {"blocked": 1, "skipped": 1, "completed": 1})
+
+
+    def test_rebuild_specific_runs(self):
+        """Rebuilding only touches summaries for the given runs."""
+        self.result("passed")
+        other = self.F.ResultFactory.create(status="failed")
+        self.model.RunResultSummary.everything.all().update(
+            passed=5, failed=5)
+
+        self.model.RunResultSummary.rebuild(runs=[self.run.id])
+
+        self.assertEqual(self.summary(), {"passed": 1, "completed": 1})
+        self.assertEqual(
+            self.model.RunResultSummary.objects.get(
+                run=other.runcaseversion.run).failed,
+            5)
+
+
+    def test_totals(self):
+        """Queryset ``totals`` sums counts across environments."""
+        self.result("passed")
+        self.F.ResultFactory.create(
+            runcaseversion=self.rcv, status="failed")
+
+        totals = self.model.RunResultSummary.objects.filter(
+            run=self.run).totals()
+
+        self.assertEqual(totals["passed"], 1)
+        self.assertEqual(totals["failed"], 1)
+        self.assertEqual(totals["completed"], 2)
+        self.assertEqual(totals["pending"], 0)
+
+
+    def test_totals_empty(self):
+        """Totals of no summary rows are all zero."""
+        totals = self.model.RunResultSummary.objects.filter(
+            run=self.run).totals()
+
+        self.assertEqual(set(totals.values()), set([0]))
@@ -0,0 +1,362 @@
+"""
+Tests for ResultBatch.
+
+"""
+from mock import patch
+
+from tests import case
+
+
+
+class ResultBatchTest(case.DBTestCase):
+    def setUp(self):
+        """A run with two cases in two environments, and a tester."""
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["OS X", "Linux"]})
+        self.run = self.F.RunFactory.create()
+        self.rcv1 = self.F.RunCaseVersionFactory.create(
+            run=self.run, environments=self.envs)
+        self.rcv2 = self.F.RunCaseVersionFactory.create(
+            run=self.run, environments=self.envs)
+        self.tester = self.F.UserFactory.create()
+
+
+    @property
+    def ResultBatch(self):
+        """The class under test."""
+        from moztrap.model.execution.batch import ResultBatch
+        return ResultBatch
+
+
+    def item(self, rcv, env, status, **kwargs):
+        """Return a result item for given rcv, environment and status."""
+        kwargs.update({
+                "case": rcv.caseversion.case.id,
+                "environment": env.id,
+                "run_id": rcv.run.id,
+                "status": status,
+                })
+        return kwargs
+
+
+    def batch(self, *items):
+        """Return a ResultBatch of given items for the tester."""
+        return self.ResultBatch(list(items), user=self.tester)
+
+
+    def summary(self, env):
+        """Return the counts in the summary row for the run and env."""
+        s = self.model.RunResultSummary.objects.get(
+            run=self.run, environment=env)
+        return dict(
+            (f, getattr(s, f))
+            for f in self.model.RunResultSummary.COUNT_FIELDS
+            if getattr(s, f))
+
+
+    def test_save(self):
+        """Saves a latest result for each item."""
+        b = self.batch(
+            self.item(self.rcv1, self.envs[0], "passed"),
+            self.item(self.rcv2, self.envs[0], "blocked", comment="why?"),
+            )
+
+        self.assertTrue(b.is_valid())
+        self.assertEqual(b.save(), 2)
+
+        r1 = self.model.Result.objects.get(runcaseversion=self.rcv1)
+        r2 = self.model.Result.objects.get(runcaseversion=self.rcv2)
+        self.assertEqual(r1.status, "passed")
+        self.assertEqual(r1.environment, self.envs[0])
+        self.assertEqual(r1.tester, self.tester)
+        self.assertEqual(r1.created_by, self.tester)
+        self.assertTrue(r1.is_latest)
+        self.assertEqual(r2.status, "blocked")
+        self.assertEqual(r2.comment, "why?")
+
+
+    def test_replaces_latest(self):
+        """Testers' previous latest result for a case/env is no longer latest."""
+        old = self.F.ResultFactory.create(
+            runcaseversion=self.rcv1,
+            environment=self.envs[0],
+            tester=self.tester,
+            status="failed",
+            )
+        other = self.F.ResultFactory.create(
+            runcaseversion=self.rcv1,
+            environment=self.envs[1],
+            tester=self.tester,
+            status="failed",
+            )
+
+        self.batch(self.item(self.rcv1, self.envs[0], "passed")).save()
+
+        self.assertFalse(self.refresh(old).is_latest)
+        self.assertTrue(self.refresh(other).is_latest)
+        self.assertEqual(
+            self.model.Result.objects.get(
+                runcaseversion=self.rcv1,
+                environment=self.envs[0],
+                is_latest=True).status,
+            "passed",
+            )
+
+
+    def test_last_item_latest(self):
+        """Of several items for one case/env, the last one is latest."""
+        self.batch(
+            self.item(self.rcv1, self.envs[0], "failed"),
+            self.item(self.rcv1, self.envs[0], "passed"),
+            ).save()
+
+        self.assertEqual(
+            list(self.model.Result.objects.filter(
+                    runcaseversion=self.rcv1).order_by("id").values_list(
+                    "status", "is_latest")),
+            [("failed", False), ("passed", True)],
+            )
+        self.assertEqual(self.summary(self.envs[0]),
+                         {"passed": 1, "completed": 1})
+
+
+    def test_skip_all_envs(self):
+        """A skipped item skips the case in all of its environments."""
+        self.batch(self.item(self.rcv1, self.envs[0], "skipped")).save()
+
+        self.assertEqual(
+            set(self.model.Result.objects.filter(
+                    runcaseversion=self.rcv1, status="skipped").values_list(
+                    "environment", flat=True)),
+            set(e.id for e in self.envs),
+            )
+
+
+    def test_failed_step(self):
+        """A failed item with a step number records a failed step result."""
+        step = self.F.CaseStepFactory.create(caseversion=self.rcv1.caseversion)
+
+        self.batch(
+            self.item(self.rcv2, self.envs[0], "passed"),
+            self.item(
+                self.rcv1, self.envs[0], "failed",
+                stepnumber=step.number, bug="http://www.example.com/"),
+            ).save()
+
+        result = self.model.Result.objects.get(runcaseversion=self.rcv1)
+        sr = result.stepresults.get()
+        self.assertEqual(sr.step, step)
+        self.assertEqual(sr.status, "failed")
+        self.assertEqual(sr.bug_url, "http://www.example.com/")
+
+
+    def test_concurrent_results(self):
+        """Steps and latest pointers go to the batch's own results."""
+        from moztrap.model.mtmodel import MTQuerySet
+        step = self.F.CaseStepFactory.create(caseversion=self.rcv1.caseversion)
+        other = self.F.UserFactory.create()
+        bulk_create = MTQuerySet.bulk_create
+
+        def interleaved(qs, objs, batch_size=None):
+            """Insert results backwards, each after another tester's."""
+            if qs.model is not self.model.Result:
+                return bulk_create(qs, objs, batch_size)
+            for obj in reversed(objs):
+                self.F.ResultFactory.create(
+                    runcaseversion=self.rcv1,
+                    environment=self.envs[0],
+                    tester=other,
+                    )
+                bulk_create(qs, [obj])
+            return objs
+
+        with patch.object(MTQuerySet, "bulk_create", interleaved):
+            self.batch(
+                self.item(self.rcv2, self.envs[0], "passed"),
+                self.item(
+                    self.rcv1, self.envs[0], "failed", stepnumber=step.number),
+                ).save()
+
+        result = self.model.Result.objects.get(
+            runcaseversion=self.rcv1, tester=self.tester)
+        self.assertEqual(result.stepresults.get().step, step)
+        self.assertEqual(
+            set(self.model.LatestResult.objects.filter(
+                tester=self.tester).values_list("result__tester", flat=True)),
+            set([self.tester.id]),
+            )
+
+
+    def test_failed_bad_step(self):
+        """A failed item with a nonexistent step number is still saved."""
+        self.batch(
+            self.item(self.rcv1, self.envs[0], "failed", stepnumber=5)).save()
+
+        result = self.model.Result.objects.get(runcaseversion=self.rcv1)
+        self.assertEqual(result.status, "failed")
+        self.assertEqual(result.stepresults.count(), 0)
+
+
+    def test_summary(self):
+        """Run result summaries reflect the batch."""
+        self.F.ResultFactory.create(
+            runcaseversion=self.rcv1,
+            environment=self.envs[0],
+            tester=self.tester,
+            status="started",
+            )
+
+        self.batch(
+            self.item(self.rcv1, self.envs[0], "failed"),
+            self.item(self.rcv2, self.envs[0], "passed"),
+            ).save()
+
+        self.assertEqual(
+            self.summary(self.envs[0]),
+            {"passed": 1, "failed": 1, "completed": 2},
+            )
+
+
+    def test_summary_completed_elsewhere(self):
+        """Completion isn't counted twice for a case completed by another."""
+        self.F.ResultFactory.create(
+            runcaseversion=self.rcv1,
+            environment=self.envs[0],
+            status="passed",
+            )
+
+        self.batch(self.item(self.rcv1, self.envs[0], "failed")).save()
+
+        self.assertEqual(
+            self.summary(self.envs[0]),
+            {"passed": 1, "failed": 1, "completed": 1},
+            )
+
+
+    def test_summary_matches_rebuild(self):
+        """Incremental summary updates match a full rebuild."""
+        self.F.ResultFactory.create(
+            runcaseversion=self.rcv2,
+            environment=self.envs[1],
+            tester=self.tester,
+            status="passed",
+            )
+        self.batch(
+            self.item(self.rcv1, self.envs[0], "skipped"),
+            self.item(self.rcv2, self.envs[1], "invalidated"),
+            self.item(self.rcv2, self.envs[0], "failed"),
+            ).save()
+        before = [self.summary(e) for e in self.envs]
+
+        self.model.RunResultSummary.rebuild(runs=[self.run.id])
+
+        self.assertEqual([self.summary(e) for e in self.envs], before)
+
+
+    def test_missing_key(self):
+        """An item missing a required key is an error."""
+        item = self.item(self.rcv1, self.envs[0], "passed")
+        del item["status"]
+        b = self.batch(self.item(self.rcv2, self.envs[0], "passed"), item)
+
+        self.assertFalse(b.is_valid())
+        self.assertEqual(
+            b.errors,
+            [{"index": 1,
+              "error": "bad result object data missing key: status"}],
+            )
+
+
+    def test_bad_status(self):
+        """An item with an unknown status is an error."""
+        b = self.batch(self.item(self.rcv1, self.envs[0], "started"))
+
+        self.assertFalse(b.is_valid())
+        self.assertEqual(
+            b.errors,
+            [{"index": 0, "error": "started is not a valid status."}],
+            )
+
+
+    def test_bad_id(self):
+        """An item with a non-integer id is an error."""
+        item = self.item(self.rcv1, self.envs[0], "passed")
+        item["run_id"] = "foo"
+        b = self.batch(item)
+
+        self.assertFalse(b.is_valid())
+        self.assertEqual(b.errors[0]["index"], 0)
+
+
+    def test_bad_environment(self):
+        """An item with a nonexistent environment is an error."""
+        item = self.item(self.rcv1, self.envs[0], "passed")
+        item["environment"] = self.envs[1].id + 100
+        b = self.batch(item)
+
+        self.assertFalse(b.is_valid())
+        self.assertEqual(
+            b.errors,
+            [{"index": 0,
+              "error": "Specified environment does not exist: {0}".format(
+                        self.envs[1].id + 100)}],
+            )
+
+
+    def test_no_runcaseversion(self):
+        """An item for a case not in the run is an error."""
+        cv = self.F.CaseVersionFactory.create()
+        item = self.item(self.rcv1, self.envs[0], "passed")
+        item["case"] = cv.case.id
+        b = self.batch(item)
+
+        self.assertFalse(b.is_valid())
+        self.assertEqual(
+            b.errors,
+            [{"index": 0,
+              "error": "RunCaseVersion not found for run: {0}, case: {1}, "
+                       "environment: {2}".format(
+                        self.run.id, cv.case.id, self.envs[0].id)}],
+            )
+
+
+    def test_invalid_saves_nothing(self):
+        """If any item is invalid, none are saved."""
+        item = self.item(self.rcv1, self.envs[0], "passed")
+        del item["case"]
+        b = self.batch(self.item(self.rcv2, self.envs[0], "passed"), item)
+
+        with self.assertRaises(ValueError):
+            b.save()
+
+        self.assertEqual(self.model.Result.objects.count(), 0)
+
+
+    def test_constant_queries(self):
+        """Number of queries doesn't depend on the number of items."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def count(*items):
+            with CaptureQueriesContext(connection) as ctx:
+                self.batch(*items).save()
+            return len(ctx)
+
+        cvs = [self.F.CaseVersionFactory.create() for i in range(3)]
+        rcvs = [
+            self.F.RunCaseVersionFactory.create(
+                run=self.run, caseversion=cv, environments=self.envs)
+            for cv in cvs
+            ]
+
+        # create the summary rows up front
+        self.batch(
+            *[self.item(self.rcv1, env, "passed") for env in self.envs]).save()
+
+        one = count(self.item(self.rcv2, self.envs[0], "failed"))
+        many = count(
+            *[self.item(rcv, env, "failed") for rcv in rcvs
+              for env in self.envs])
+
+        # one summary update per run/env touched
+        self.assertEqual(many, one + 1)
@@ -0,0 +1,135 @@
+"""
+Tests for ResultExport.
+
+"""
+import json
+
+from tests import case
+
+
+
+class ResultExportTest(case.DBTestCase):
+    @property
+    def ResultExport(self):
+        """The class under test."""
+        from moztrap.model.execution.export import ResultExport
+        return ResultExport
+
+
+    def test_row(self):
+        """Each result is a flat row with case, environment, tester and bugs."""
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux"], "Browser": ["Firefox"]})
+        r = self.F.ResultFactory.create(
+            status="failed",
+            comment="broken",
+            environment=envs[0],
+            runcaseversion__caseversion__name="Open it",
+            tester__username="tester",
+            )
+        self.F.StepResultFactory.create(result=r, bug_url="http://b/2")
+        self.F.StepResultFactory.create(result=r, bug_url="http://b/1")
+        self.F.StepResultFactory.create(result=r)
+
+        rows = list(self.ResultExport.for_run(r.runcaseversion.run))
+
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row["id"], r.id)
+        self.assertEqual(row["case_id"], r.runcaseversion.caseversion.case.id)
+        self.assertEqual(row["case"], "Open it")
+        self.assertEqual(row["environment"], "Firefox, Linux")
+        self.assertEqual(row["tester"], "tester")
+        self.assertEqual(row["status"], "failed")
+        self.assertEqual(row["comment"], "broken")
+        self.assertEqual(row["bugs"], ["http://b/1", "http://b/2"])
+        self.assertEqual(row["created_on"], r.created_on.isoformat())
+
+
+    def test_run_only(self):
+        """Run export excludes results of other runs."""
+        r = self.F.ResultFactory.create()
+        self.F.ResultFactory.create()
+
+        rows = list(self.ResultExport.for_run(r.runcaseversion.run))
+
+        self.assertEqual([row["id"] for row in rows], [r.id])
+
+
+    def test_series(self):
+        """Series export includes results of all its builds."""
+        series = self.F.RunFactory.create(is_series=True)
+        r1 = self.F.ResultFactory.create(runcaseversion__run__series=series)
+        r2 = self.F.ResultFactory.create(runcaseversion__run__series=series)
+        self.F.ResultFactory.create()
+
+        rows = list(self.ResultExport.for_run(series))
+
+        self.assertEqual([row["id"] for row in rows], [r1.id, r2.id])
+
+
+    def test_productversion(self):
+        """Product version export includes results of all its runs."""
+        r1 = self.F.ResultFactory.create()
+        pv = r1.runcaseversion.run.productversion
+        r2 = self.F.ResultFactory.create(runcaseversion__run__productversion=pv)
+        self.F.ResultFactory.create()
+
+        rows = list(self.ResultExport.for_productversion(pv))
+
+        self.assertEqual([row["id"] for row in rows], [r1.id, r2.id])
+
+
+    def test_latest(self):
+        """With ``latest``, only latest results are exported."""
+        old = self.F.ResultFactory.create()
+        new = self.F.ResultFactory.create(
+            runcaseversion=old.runcaseversion,
+            environment=old.environment,
+            tester=old.tester,
+            )
+
+        rows = list(
+            self.ResultExport.for_run(old.runcaseversion.run, latest=True))
+
+        self.assertEqual([row["id"] for row in rows], [new.id])
+
+
+    def test_chunks(self):
+        """Results are read in chunks of CHUNK_SIZE, in id order."""
+        rcv = self.F.RunCaseVersionFactory.create()
+        results = [
+            self.F.ResultFactory.create(runcaseversion=rcv) for i in range(5)]
+        export = self.ResultExport.for_run(rcv.run)
+        export.CHUNK_SIZE = 2
+
+        # values, bugs and environment labels for each of three chunks
+        with self.assertNumQueries(9):
+            rows = list(export)
+
+        self.assertEqual(
+            [row["id"] for row in rows], [r.id for r in results])
+
+
+    def test_csv(self):
+        """CSV export has a header line and a line per result."""
+        r = self.F.ResultFactory.create(status="passed", comment="a, b")
+        self.F.StepResultFactory.create(result=r, bug_url="http://b/1")
+
+        lines = list(self.ResultExport.for_run(r.runcaseversion.run).csv_lines())
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("id,run_id,run,case_id"))
+        self.assertIn(',passed,"a, b",http://b/1,1,', lines[1])
+
+
+    def test_json(self):
+        """JSON export is one object per line."""
+        r = self.F.ResultFactory.create(status="passed")
+
+        lines = list(
+            self.ResultExport.for_run(r.runcaseversion.run).json_lines())
+
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith("\n"))
+        self.assertEqual(json.loads(lines[0])["id"], r.id)
@@ -0,0 +1,121 @@
+"""
+Tests for background job tasks for runs.
+
+"""
+from tests import case
+
+
+
+class RunJobsTest(case.DBTestCase):
+    def setUp(self):
+        """A run with a suite containing an active case version."""
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"]})
+        self.pv = self.F.ProductVersionFactory.create(environments=envs)
+        self.run = self.F.RunFactory.create(productversion=self.pv)
+        self.suite = self.F.SuiteFactory.create(
+            product=self.pv.product, status="active")
+        self.F.RunSuiteFactory.create(run=self.run, suite=self.suite)
+        self.cv = self.F.CaseVersionFactory.create(
+            case__product=self.pv.product,
+            productversion=self.pv,
+            status="active",
+            )
+        self.F.SuiteCaseFactory.create(suite=self.suite, case=self.cv.case)
+        self.user = self.F.UserFactory.create()
+
+
+    def work(self):
+        """Claim and run the next job; return it."""
+        job = self.model.Job.claim_next()
+        job.run()
+        return self.refresh(job)
+
+
+    def test_activate(self):
+        """Activate job locks in case versions and activates the run."""
+        job = self.run.queue_activate(user=self.user)
+
+        self.assertEqual(self.refresh(self.run).status, "draft")
+
+        job = self.work()
+
+        self.assertEqual(job.status, "done", job.error)
+        self.assertEqual(job.result_data, {"run_id": self.run.id})
+        run = self.refresh(self.run)
+        self.assertEqual(run.status, "active")
+        self.assertEqual(run.modified_by, self.user)
+        self.assertEqual(
+            [rcv.caseversion for rcv in run.runcaseversions.all()], [self.cv])
+
+
+    def test_activate_queued_once(self):
+        """Activating a run twice before the job runs queues one job."""
+        job = self.run.queue_activate(user=self.user)
+
+        self.assertEqual(self.run.queue_activate(user=self.user), job)
+
+
+    def test_activate_retry(self):
+        """Activate job can safely run again."""
+        self.run.queue_activate(user=self.user)
+        self.work()
+        self.run.queue_activate(user=self.user)
+
+        self.assertEqual(self.work().status, "done")
+        self.assertEqual(self.run.runcaseversions.count(), 1)
+
+
+    def test_refresh(self):
+        """Refresh job picks up changes to suites of an active run."""
+        self.run.activate()
+        cv2 = self.F.CaseVersionFactory.create(
+            case__product=self.pv.product,
+            productversion=self.pv,
+            status="active",
+            )
+        self.F.SuiteCaseFactory.create(suite=self.suite, case=cv2.case)
+
+        self.run.queue_refresh(user=self.user)
+        self.assertEqual(self.work().status, "done")
+
+        self.assertEqual(
+            set(rcv.caseversion for rcv in self.run.runcaseversions.all()),
+            set([self.cv, cv2]))
+
+
+    def test_series_build(self):
+        """Series build job creates an active run for the build."""
+        self.run.is_series = True
+        self.run.status = "active"
+        self.run.save()
+
+        job = self.run.queue_series_build("foobuild", user=self.user)
+        job = self.work()
+
+        self.assertEqual(job.status, "done", job.error)
+        newrun = self.model.Run.objects.get(pk=job.result_data["run_id"])
+        self.assertEqual(newrun.series, self.run)
+        self.assertEqual(newrun.build, "foobuild")
+        self.assertEqual(newrun.status, "active")
+        self.assertEqual(newrun.created_by, self.user)
+        self.assertEqual(
+            [rcv.caseversion for rcv in newrun.runcaseversions.all()],
+            [self.cv])
+
+
+    def test_series_build_retry(self):
+        """A retried series build job reuses the run of an earlier attempt."""
+        self.run.is_series = True
+        self.run.status = "active"
+        self.run.save()
+        # an earlier attempt died after cloning the run
+        newrun = self.run.clone_for_series(build="foobuild")
+
+        self.run.queue_series_build("foobuild", user=self.user)
+        job = self.work()
+
+        self.assertEqual(job.result_data, {"run_id": newrun.id})
+        self.assertEqual(self.refresh(newrun).status, "active")
+        self.assertEqual(
+            self.model.Run.objects.filter(series=self.run).count(), 1)
@@ -0,0 +1,71 @@
+"""
+Tests for JobResource api.
+
+This is a read-only resource for polling job status.
+
+"""
+
+from tests import case
+
+
+
+class JobResourceTest(case.api.ApiTestCase):
+
+    @property
+    def resource_name(self):
+        return "job"
+
+
+    def enqueue(self, **kwargs):
+        """Queue a job for a task in the job model tests."""
+        return self.model.Job.enqueue(
+            "tests.model.jobs.models.test_job.succeed", **kwargs)
+
+
+    def test_get_queued(self):
+        """Get status of a queued job."""
+        job = self.enqueue(value=1)
+
+        res = self.get_detail(job.id)
+
+        self.assertEqual(res.json["status"], "queued")
+        self.assertEqual(res.json["progress"], 0)
+        self.assertEqual(res.json["result"], None)
+
+
+    def test_get_done(self):
+        """Get result of a finished job."""
+        job = self.enqueue(value=1)
+        self.model.Job.claim_next().run()
+
+        res = self.get_detail(job.id)
+
+        self.assertEqual(res.json["status"], "done")
+        self.assertEqual(res.json["progress"], 100)
+        self.assertEqual(res.json["result"], {"value": 1})
+
+
+    def test_filter_by_status(self):
+        """List jobs filtered by status."""
+        job = self.enqueue(value=1)
+        self.enqueue(value=2)
+        self.model.Job.claim_next().run()
+
+        res = self.get_list(params={"status": "queued"})
+
+        self.assertEqual(
+            [o["id"] for o in res.json["objects"]], [job.id + 1])
+
+
+    def test_read_only(self):
+        """Jobs can't be created via the API."""
+        user = self.F.UserFactory.create(
+            username="foo", permissions=["execution.execute"])
+        apikey = self.F.ApiKeyFactory.create(owner=user)
+
+        self.post(
+            self.get_list_url(self.resource_name),
+            params={"username": user.username, "api_key": apikey.key},
+            payload={"task": "os.system"},
+            status=405,
+            )
@@ -0,0 +1,67 @@
+"""
+Tests for management command to run background jobs.
+
+"""
+from cStringIO import StringIO
+
+from django.core.management import call_command
+
+from mock import patch
+
+from tests import case
+
+
+
+class RunJobsTest(case.DBTestCase):
+    """Tests for run_jobs management command."""
+    def call_command(self, *args, **kwargs):
+        """Runs the management command under test; returns stdout, stderr."""
+        with patch("sys.stdout", StringIO()) as stdout:
+            with patch("sys.stderr", StringIO()) as stderr:
+                call_command("run_jobs", *args, **kwargs)
+
+        return stdout.getvalue(), stderr.getvalue()
+
+
+    def enqueue(self, task, **kwargs):
+        """Queue a job for one of the tasks in the job model tests."""
+        return self.model.Job.enqueue(
+            "tests.model.jobs.models.test_job.{0}".format(task), **kwargs)
+
+
+    def test_once(self):
+        """Runs all queued jobs, then exits."""
+        j1 = self.enqueue("succeed", value=1)
+        j2 = self.enqueue("succeed", value=2)
+
+        out, err = self.call_command(once=True)
+
+        self.assertEqual(
+            out,
+            "Job {0} tests.model.jobs.models.test_job.succeed done.\n"
+            "Job {1} tests.model.jobs.models.test_job.succeed done.\n".format(
+                j1.id, j2.id)
+            )
+        self.assertEqual(self.refresh(j1).status, "done")
+        self.assertEqual(self.refresh(j2).status, "done")
+
+
+    def test_failed(self):
+        """Retries a failing job until it is out of attempts."""
+        job = self.enqueue("fail")
+
+        out, err = self.call_command(once=True)
+
+        job = self.refresh(job)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(err.count("ValueError: Nope."), 3)
+
+
+    def test_quiet(self):
+        """Verbosity 0 silences output about successful jobs."""
+        self.enqueue("succeed", value=1)
+
+        out, err = self.call_command(once=True, verbosity=0)
+
+        self.assertEqual(out, "")
@@ -0,0 +1,255 @@
+"""
+Tests for Job model.
+
+"""
+from datetime import datetime
+import time
+
+from mock import patch
+
+from tests import case
+
+
+
+def succeed(job, value):
+    """A task that reports progress and returns ``value``."""
+    job.set_progress(50, "Halfway.")
+    return {"value": value}
+
+
+
+def fail(job):
+    """A task that always fails."""
+    raise ValueError("Nope.")
+
+
+
+def wait(job, seconds):
+    """A task that takes ``seconds`` to finish."""
+    time.sleep(seconds)
+    return {}
+
+
+
+class JobTest(case.DBTestCase):
+    def enqueue(self, task="succeed", **kwargs):
+        """Queue a job for one of the tasks in this module."""
+        return self.model.Job.enqueue(
+            "tests.model.jobs.models.test_job.{0}".format(task), **kwargs)
+
+
+    def test_unicode(self):
+        """Unicode representation is task and status."""
+        job = self.enqueue(value=1)
+
+        self.assertEqual(
+            unicode(job), u"tests.model.jobs.models.test_job.succeed (queued)")
+
+
+    def test_enqueue(self):
+        """Queued job records task, arguments and user."""
+        u = self.F.UserFactory.create()
+        job = self.refresh(self.enqueue(value=1, user=u))
+
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.arguments, '{"value": 1}')
+        self.assertEqual(job.created_by, u)
+
+
+    def test_enqueue_key(self):
+        """Queueing with the key of an unfinished job returns that job."""
+        job = self.enqueue(value=1, key="foo")
+
+        self.assertEqual(self.enqueue(value=2, key="foo"), job)
+        self.assertEqual(self.model.Job.objects.count(), 1)
+
+
+    def test_enqueue_key_finished(self):
+        """Queueing with the key of a finished job queues a new job."""
+        job = self.enqueue(value=1, key="foo")
+        self.model.Job.claim_next().run()
+
+        self.assertNotEqual(self.enqueue(value=2, key="foo"), job)
+
+
+    def test_enqueue_key_concurrent(self):
+        """A job with the key queued concurrently is returned."""
+        job = self.enqueue(value=1, key="foo")
+        filter_ = self.model.Job.everything.filter
+
+        # the first lookup misses the job, as if it was not yet committed
+        def miss(**kwargs):
+            return filter_(**kwargs).none()
+
+        with patch.object(self.model.Job.everything, "filter", miss):
+            self.assertEqual(self.enqueue(value=2, key="foo"), job)
+        self.assertEqual(self.model.Job.objects.count(), 1)
+
+
+    def test_run_releases_key(self):
+        """A finished job no longer holds its key."""
+        job = self.enqueue(value=1, key="foo")
+        self.assertEqual(job.active_key, "foo")
+
+        self.model.Job.claim_next().run()
+
+        job = self.refresh(job)
+        self.assertEqual(job.active_key, None)
+        self.assertEqual(job.key, "foo")
+
+
+    def test_run_failed_keeps_key(self):
+        """A job queued to be retried still holds its key."""
+        job = self.enqueue("fail", key="foo")
+        self.model.Job.claim_next().run()
+
+        self.assertEqual(self.refresh(job).active_key, "foo")
+
+
+    def test_claim_next(self):
+        """Claims the oldest queued job."""
+        job = self.enqueue(value=1)
+        self.enqueue(value=2)
+
+        claimed = self.model.Job.claim_next()
+
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.status, "running")
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNotNone(claimed.started_on)
+
+
+    def test_claim_next_skips_claimed(self):
+        """A job claimed by one worker isn't claimed by another."""
+        self.enqueue(value=1)
+        job = self.enqueue(value=2)
+        self.model.Job.claim_next()
+
+        self.assertEqual(self.model.Job.claim_next(), job)
+        self.assertEqual(self.model.Job.claim_next(), None)
+
+
+    def test_run(self):
+        """Running a job records its result."""
+        self.enqueue(value=3)
+        job = self.model.Job.claim_next()
+
+        self.assertTrue(job.run())
+
+        job = self.refresh(job)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.message, "Halfway.")
+        self.assertEqual(job.result_data, {"value": 3})
+        self.assertTrue(job.finished)
+        self.assertIsNotNone(job.finished_on)
+
+
+    def test_run_failed_retries(self):
+        """A failed job is queued again while it has attempts left."""
+        self.enqueue("fail")
+        job = self.model.Job.claim_next()
+
+        self.assertFalse(job.run())
+
+        job = self.refresh(job)
+        self.assertEqual(job.status, "queued")
+        self.assertIn("ValueError: Nope.", job.error)
+        self.assertFalse(job.finished)
+
+
+    def test_run_failed(self):
+        """A job fails for good once it is out of attempts."""
+        self.enqueue("fail")
+        for i in range(3):
+            job = self.model.Job.claim_next()
+            job.run()
+
+        job = self.refresh(job)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(self.model.Job.claim_next(), None)
+
+
+    def test_run_bad_task(self):
+        """A job whose task can't be imported fails."""
+        self.model.Job.enqueue("tests.model.jobs.models.test_job.missing")
+        job = self.model.Job.claim_next()
+
+        self.assertFalse(job.run())
+        self.assertIn("ImproperlyConfigured", self.refresh(job).error)
+
+
+    def test_requeue_stale(self):
+        """Jobs without a heartbeat since before the timeout are requeued."""
+        job = self.enqueue(value=1)
+        self.model.Job.claim_next()
+        self.model.Job.objects.filter(pk=job.pk).update(
+            started_on=datetime(2012, 1, 1),
+            heartbeat_on=datetime(2012, 1, 1),
+            )
+
+        self.assertEqual(self.model.Job.requeue_stale(60), 1)
+        self.assertEqual(self.refresh(job).status, "queued")
+
+
+    def test_requeue_stale_recent(self):
+        """Jobs running since after the timeout are left alone."""
+        job = self.enqueue(value=1)
+        self.model.Job.claim_next()
+
+        self.assertEqual(self.model.Job.requeue_stale(60), 0)
+        self.assertEqual(self.refresh(job).status, "running")
+
+
+    def test_requeue_stale_recent_heartbeat(self):
+        """Long-running jobs with a recent heartbeat are left alone."""
+        job = self.enqueue(value=1)
+        self.model.Job.claim_next()
+        self.model.Job.objects.filter(pk=job.pk).update(
+            started_on=datetime(2012, 1, 1))
+
+        self.assertEqual(self.model.Job.requeue_stale(60), 0)
+        self.assertEqual(self.refresh(job).status, "running")
+
+
+    def test_requeue_stale_no_heartbeat(self):
+        """Jobs claimed before heartbeats were recorded go by start time."""
+        job = self.enqueue(value=1)
+        self.model.Job.claim_next()
+        self.model.Job.objects.filter(pk=job.pk).update(
+            started_on=datetime(2012, 1, 1), heartbeat_on=None)
+
+        self.assertEqual(self.model.Job.requeue_stale(60), 1)
+
+
+    def test_requeue_stale_out_of_attempts(self):
+        """Stale jobs out of attempts fail, and release their key."""
+        job = self.enqueue(value=1, key="foo")
+        self.model.Job.claim_next()
+        self.model.Job.objects.filter(pk=job.pk).update(
+            heartbeat_on=datetime(2012, 1, 1), max_attempts=1)
+
+        self.assertEqual(self.model.Job.requeue_stale(60), 0)
+        job = self.refresh(job)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.active_key, None)
+
+
+
+class JobHeartbeatTest(case.TransactionTestCase):
+    """Tests for the heartbeat a worker records while running a job."""
+    def test_heartbeat(self):
+        """A heartbeat is recorded while the task runs."""
+        job = self.model.Job.enqueue(
+            "tests.model.jobs.models.test_job.wait", seconds=0.5)
+        self.model.Job.claim_next()
+        self.model.Job.objects.filter(pk=job.pk).update(
+            heartbeat_on=datetime(2012, 1, 1))
+        job = self.refresh(job)
+
+        with patch.object(self.model.Job, "HEARTBEAT_INTERVAL", 0.1):
+            self.assertTrue(job.run())
+
+        self.assertGreater(
+            self.refresh(job).heartbeat_on, datetime(2012, 1, 1))
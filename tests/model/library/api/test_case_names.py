@@ -0,0 +1,131 @@
+"""
+Tests for CaseNamesResource api.
+
+This is a write-only resource via ``post``.
+
+"""
+
+from tests import case
+
+
+
+class CaseNamesResourceTest(case.api.ApiTestCase):
+
+    @property
+    def resource_name(self):
+        return "casenames"
+
+
+    def setUp(self):
+        """Two cases with two versions each, and a user."""
+        super(CaseNamesResourceTest, self).setUp()
+        self.user = self.F.UserFactory.create(
+            username="foo",
+            permissions=["library.manage_cases"],
+            )
+        self.apikey = self.F.ApiKeyFactory.create(owner=self.user)
+        self.cvs = []
+        for name in ["One", "Two"]:
+            cv = self.F.CaseVersionFactory.create(
+                name=name, productversion__version="1")
+            self.F.CaseVersionFactory.create(
+                name=name,
+                case=cv.case,
+                productversion__product=cv.case.product,
+                productversion__version="2",
+                )
+            self.cvs.append(cv)
+
+
+    @property
+    def params(self):
+        return {"username": self.user.username, "api_key": self.apikey.key}
+
+
+    def names(self, cv):
+        """Return set of names of all versions of caseversion's case."""
+        return set(cv.case.versions.values_list("name", flat=True))
+
+
+    def test_rename(self):
+        """Renames all versions of the given cases."""
+        cv1, cv2 = self.cvs
+
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload={
+                "cases": [
+                    {"case": cv1.case.id, "name": "Uno"},
+                    {"case": unicode(self.get_detail_url(
+                        "case", cv2.case.id)), "name": "Dos"},
+                    ],
+                },
+            status=200,
+            )
+
+        self.assertEqual(res.json, {"renamed": 4})
+        self.assertEqual(self.names(cv1), set(["Uno"]))
+        self.assertEqual(self.names(cv2), set(["Dos"]))
+        self.assertEqual(
+            self.refresh(cv1).modified_by, self.user)
+
+
+    def test_empty_name(self):
+        """An empty name is a bad request; nothing changes."""
+        cv1, cv2 = self.cvs
+
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload={"cases": [{"case": cv1.case.id, "name": " "}]},
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text, "Case names must be 1 to 200 characters long.")
+        self.assertEqual(self.names(cv1), set(["One"]))
+
+
+    def test_bad_data(self):
+        """Missing case or name is a bad request."""
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload={"cases": [{"name": "Foo"}]},
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text,
+            "Submitted data must have a list of 'cases', each with a 'case' "
+            "and a 'name'.",
+            )
+
+
+    def test_nonexistent_case(self):
+        """Nonexistent cases are a bad request."""
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload={"cases": [{"case": 9999, "name": "Foo"}]},
+            status=400,
+            )
+
+        self.assertEqual(res.text, "Case(s) 9999 do not exist.")
+
+
+    def test_no_authorization(self):
+        """User without manage cases permission cannot rename cases."""
+        user = self.F.UserFactory.create(username="bar")
+        apikey = self.F.ApiKeyFactory.create(owner=user)
+        cv1, cv2 = self.cvs
+
+        self.post(
+            self.get_list_url(self.resource_name),
+            params={"username": user.username, "api_key": apikey.key},
+            payload={"cases": [{"case": cv1.case.id, "name": "Uno"}]},
+            status=401,
+            )
+
+        self.assertEqual(self.names(cv1), set(["One"]))
@@ -0,0 +1,118 @@
+"""
+Tests for SuiteMembershipResource api.
+
+This is a write-only resource via ``post``.
+
+"""
+
+from tests import case
+
+
+
+class SuiteMembershipResourceTest(case.api.ApiTestCase):
+
+    @property
+    def factory(self):
+        """The model factory for this object."""
+        return self.F.SuiteCaseFactory
+
+
+    @property
+    def resource_name(self):
+        return "suitemembership"
+
+
+    def setUp(self):
+        """A suite with two cases, a third case, and a user."""
+        super(SuiteMembershipResourceTest, self).setUp()
+        self.user = self.F.UserFactory.create(
+            username="foo",
+            permissions=["library.manage_suite_cases"],
+            )
+        self.apikey = self.F.ApiKeyFactory.create(owner=self.user)
+        self.suite = self.F.SuiteFactory.create()
+        self.cases = [
+            self.F.CaseFactory.create(product=self.suite.product)
+            for i in range(3)
+            ]
+        for i, c in enumerate(self.cases[:2]):
+            self.factory.create(suite=self.suite, case=c, order=i)
+
+
+    @property
+    def params(self):
+        return {"username": self.user.username, "api_key": self.apikey.key}
+
+
+    @property
+    def payload(self):
+        c1, c2, c3 = self.cases
+        return {
+            "suite": unicode(
+                self.get_detail_url("suite", self.suite.id)),
+            "cases": [
+                c3.id,
+                unicode(self.get_detail_url("case", c1.id)),
+                ],
+            }
+
+
+    def test_set_cases(self):
+        """Sets the cases of the suite, in order."""
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload=self.payload,
+            status=200,
+            )
+
+        self.assertEqual(
+            res.json, {"added": 1, "removed": 1, "reordered": 1})
+        c1, c2, c3 = self.cases
+        self.assertEqual(
+            list(self.suite.cases.order_by("suitecases__order")), [c3, c1])
+
+
+    def test_other_product(self):
+        """Cases of another product are a bad request; nothing changes."""
+        payload = self.payload
+        other = self.F.CaseFactory.create()
+        payload["cases"].append(other.id)
+
+        res = self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload=payload,
+            status=400,
+            )
+
+        self.assertIn(str(other.id), res.text)
+        self.assertEqual(
+            list(self.suite.cases.order_by("suitecases__order")),
+            self.cases[:2],
+            )
+
+
+    def test_no_suite(self):
+        """Submitted data without a suite is a bad request."""
+        self.post(
+            self.get_list_url(self.resource_name),
+            params=self.params,
+            payload={"cases": [self.cases[0].id]},
+            status=400,
+            )
+
+
+    def test_no_authorization(self):
+        """User without manage suite cases permission cannot set cases."""
+        user = self.F.UserFactory.create(username="bar")
+        apikey = self.F.ApiKeyFactory.create(owner=user)
+
+        self.post(
+            self.get_list_url(self.resource_name),
+            params={"username": user.username, "api_key": apikey.key},
+            payload=self.payload,
+            status=401,
+            )
+
+        self.assertEqual(self.suite.cases.count(), 2)
@@ -0,0 +1,59 @@
+"""
+Tests for management command to rebuild the search index.
+
+"""
+from cStringIO import StringIO
+
+from django.core.management import call_command
+from django.test.utils import override_settings
+
+from mock import patch
+
+from tests import case
+
+
+
+class RebuildSearchIndexTest(case.DBTestCase):
+    """Tests for rebuild_search_index management command."""
+    def call_command(self, *args, **kwargs):
+        """Runs the management command under test and returns stdout output."""
+        with patch("sys.stdout", StringIO()) as stdout:
+            call_command("rebuild_search_index", *args, **kwargs)
+
+        stdout.seek(0)
+        return stdout.read()
+
+
+    @override_settings(
+        SEARCH_BACKEND="moztrap.model.library.search.MemoryBackend")
+    def test_rebuilds(self):
+        """Reindexes all caseversions."""
+        from moztrap.model.library.search import get_backend
+        backend = get_backend()
+        cv = self.F.CaseVersionFactory.create(name="Foo")
+        backend.clear()
+
+        output = self.call_command()
+
+        self.assertEqual(output, "Indexed 1 caseversions.\n")
+        self.assertEqual(
+            list(
+                backend.filter(
+                    self.model.CaseVersion.objects.all(), "name", ["foo"])),
+            [cv],
+            )
+
+
+    def test_no_index(self):
+        """Says so if the search backend has no index."""
+        output = self.call_command()
+
+        self.assertEqual(
+            output, "The search backend SubstringBackend has no index.\n")
+
+
+    def test_quiet(self):
+        """Outputs nothing with verbosity 0."""
+        output = self.call_command(verbosity=0)
+
+        self.assertEqual(output, "")
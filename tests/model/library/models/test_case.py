@@ -105,6 +105,21 @@ class CaseVersionTest(case.DBTestCase):
             self.assertEqual(len(SuiteCase.objects.filter(suite=suites[i])), 2)
 
 
+    def test_clone_suites_order(self):
+        """Cloned case goes to the end of each suite, with the cloning user."""
+        cv = self.F.CaseVersionFactory()
+        suite = self.F.SuiteFactory(product=cv.case.product)
+        self.F.SuiteCaseFactory(suite=suite, case=cv.case, order=3)
+        self.F.SuiteCaseFactory(suite=suite, order=7)
+
+        user = self.F.UserFactory.create(username='tester')
+        new = cv.clone(user=user)
+
+        sc = SuiteCase.objects.get(suite=suite, case=new.case)
+        self.assertEqual(sc.order, 8)
+        self.assertEqual(sc.created_by, user)
+
+
     def test_clone_steps(self):
         """Cloning a caseversion clones its steps."""
         cs = self.F.CaseStepFactory.create()
@@ -355,6 +370,49 @@ class CaseVersionTest(case.DBTestCase):
         self.assertEqual(cv.latest, True)
 
 
+    def test_update_latest_versions_for_cases(self):
+        """update_latest_versions recomputes latest for given cases only."""
+        cv1 = self.F.CaseVersionFactory.create(productversion__version="1")
+        pv2 = self.F.ProductVersionFactory.create(
+            product=cv1.productversion.product, version="2")
+        cv2 = self.F.CaseVersionFactory.create(
+            case=cv1.case, productversion=pv2)
+        other = self.F.CaseVersionFactory.create()
+        self.model.CaseVersion.objects.update(latest=False, notrack=True)
+
+        self.model.Case.update_latest_versions(cases=[cv1.case])
+
+        self.assertEqual(self.refresh(cv1).latest, False)
+        self.assertEqual(self.refresh(cv2).latest, True)
+        self.assertEqual(self.refresh(other).latest, False)
+
+
+    def test_update_latest_versions_for_product(self):
+        """update_latest_versions recomputes latest for a whole product."""
+        cv1 = self.F.CaseVersionFactory.create()
+        cv2 = self.F.CaseVersionFactory.create(
+            productversion=cv1.productversion)
+        other = self.F.CaseVersionFactory.create()
+        self.model.CaseVersion.objects.update(latest=False, notrack=True)
+
+        self.model.Case.update_latest_versions(
+            product=cv1.productversion.product)
+
+        self.assertEqual(self.refresh(cv1).latest, True)
+        self.assertEqual(self.refresh(cv2).latest, True)
+        self.assertEqual(self.refresh(other).latest, False)
+
+
+    def test_update_latest_versions_only_changed(self):
+        """Caseversions whose latest flag doesn't change are not updated."""
+        cv = self.F.CaseVersionFactory.create()
+        version = self.refresh(cv).cc_version
+
+        cv.case.set_latest_version()
+
+        self.assertEqual(self.refresh(cv).cc_version, version)
+
+
     def test_skip_set_latest(self):
         """Passing skip_set_latest to save skips setting latest version."""
         cv1 = self.F.CaseVersionFactory.create(productversion__version="1")
@@ -382,6 +440,87 @@ class CaseVersionTest(case.DBTestCase):
         self.assertEqual(c.latest_version(), cv)
 
 
+    def test_save_syncs_name(self):
+        """Saving a case version renames the other versions of its case."""
+        cv = self.F.CaseVersionFactory.create(name="Old")
+        other = self.F.CaseVersionFactory.create(
+            case=cv.case, productversion__product=cv.case.product, name="Old")
+        unrelated = self.F.CaseVersionFactory.create(name="Old")
+        u = self.F.UserFactory.create()
+        version = self.refresh(other).cc_version
+
+        cv.name = "New"
+        cv.save(user=u)
+
+        other = self.refresh(other)
+        self.assertEqual(other.name, "New")
+        self.assertEqual(other.modified_by, u)
+        self.assertEqual(other.cc_version, version + 1)
+        self.assertEqual(self.refresh(unrelated).name, "Old")
+
+
+    def test_save_syncs_name_in_one_query(self):
+        """Name sync is one query, however many versions the case has."""
+        cv = self.F.CaseVersionFactory.create(name="Old")
+        for v in ["2", "3", "4"]:
+            self.F.CaseVersionFactory.create(
+                case=cv.case,
+                productversion__product=cv.case.product,
+                productversion__version=v,
+                )
+        cv = self.refresh(cv)
+        cv.name = "New"
+
+        # the save itself and the name sync
+        with self.assertNumQueries(2):
+            cv.save(skip_set_latest=True)
+
+        self.assertEqual(
+            set(cv.case.versions.values_list("name", flat=True)),
+            set(["New"]))
+
+
+    def test_sync_names(self):
+        """sync_names renames versions of many cases at once."""
+        cv1 = self.F.CaseVersionFactory.create(name="One")
+        cv2 = self.F.CaseVersionFactory.create(name="Two")
+        cv3 = self.F.CaseVersionFactory.create(name="Three")
+
+        updated = self.model.CaseVersion.sync_names(
+            {cv1.case.id: "Uno", cv2.case.id: "Two"})
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(self.refresh(cv1).name, "Uno")
+        self.assertEqual(self.refresh(cv2).name, "Two")
+        self.assertEqual(self.refresh(cv3).name, "Three")
+
+
+    def test_sync_names_letter_case(self):
+        """A rename that only changes letter case reaches all versions."""
+        cv = self.F.CaseVersionFactory.create(name="login test")
+        other = self.F.CaseVersionFactory.create(
+            case=cv.case,
+            productversion__product=cv.case.product,
+            name="login test",
+            )
+
+        cv.name = "Login Test"
+        cv.save()
+
+        self.assertEqual(self.refresh(other).name, "Login Test")
+
+
+    def test_sync_names_skips_deleted(self):
+        """sync_names does not touch deleted versions."""
+        cv = self.F.CaseVersionFactory.create(name="Old")
+        cv.delete()
+
+        self.model.CaseVersion.sync_names({cv.case.id: "New"})
+
+        self.assertEqual(
+            self.model.CaseVersion.everything.get(pk=cv.pk).name, "Old")
+
+
     def test_bug_urls(self):
         """bug_urls aggregates bug urls from all results, sans dupes."""
         cv = self.F.CaseVersionFactory.create()
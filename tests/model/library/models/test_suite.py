@@ -74,3 +74,190 @@ class SuiteTest(case.DBTestCase):
 
         self.F.SuiteCaseFactory.create(
             case=sc.case, suite=sc.suite)
+
+
+
+class SuiteSetCasesTest(case.DBTestCase):
+    """Tests for Suite.set_cases."""
+    def setUp(self):
+        """A suite with three cases, and two more cases of its product."""
+        self.suite = self.F.SuiteFactory.create()
+        self.cases = [
+            self.F.CaseFactory.create(product=self.suite.product)
+            for i in range(5)
+            ]
+        for i, c in enumerate(self.cases[:3]):
+            self.F.SuiteCaseFactory.create(suite=self.suite, case=c, order=i)
+        self.user = self.F.UserFactory.create()
+
+
+    def suite_cases(self):
+        """List of (case, order) for the suite's cases, in order."""
+        return [
+            (sc.case, sc.order)
+            for sc in self.model.SuiteCase.objects.filter(
+                suite=self.suite).order_by("order")
+            ]
+
+
+    def test_add_remove_reorder(self):
+        """Adds, removes and reorders suitecases to match given case ids."""
+        c0, c1, c2, c3, c4 = self.cases
+
+        result = self.suite.set_cases(
+            [c2.id, c3.id, c0.id], user=self.user)
+
+        self.assertEqual(result, {"added": 1, "removed": 1, "reordered": 2})
+        self.assertEqual(self.suite_cases(), [(c2, 0), (c3, 1), (c0, 2)])
+        self.assertFalse(
+            self.model.SuiteCase.everything.filter(case=c1).exists())
+        added = self.model.SuiteCase.objects.get(case=c3)
+        self.assertEqual(added.created_by, self.user)
+        moved = self.model.SuiteCase.objects.get(case=c2)
+        self.assertEqual(moved.modified_by, self.user)
+
+
+    def test_unchanged(self):
+        """Unchanged suitecases are not written."""
+        c0, c1, c2, c3, c4 = self.cases
+        before = self.model.SuiteCase.objects.get(case=c0)
+
+        result = self.suite.set_cases([c0.id, c1.id, c2.id, c4.id])
+
+        self.assertEqual(result, {"added": 1, "removed": 0, "reordered": 0})
+        self.assertEqual(
+            self.refresh(before).cc_version, before.cc_version)
+
+
+    def test_duplicates(self):
+        """Only the first of duplicate case ids counts."""
+        c0, c1, c2, c3, c4 = self.cases
+
+        self.suite.set_cases([c1.id, c0.id, c1.id])
+
+        self.assertEqual(self.suite_cases(), [(c1, 0), (c0, 1)])
+
+
+    def test_removes_duplicate_and_deleted_suitecases(self):
+        """Duplicate and soft-deleted suitecases are removed."""
+        c0, c1, c2, c3, c4 = self.cases
+        self.F.SuiteCaseFactory.create(suite=self.suite, case=c0, order=5)
+        self.F.SuiteCaseFactory.create(
+            suite=self.suite, case=c3, order=6).delete()
+
+        self.suite.set_cases([c0.id, c1.id, c2.id])
+
+        self.assertEqual(self.suite_cases(), [(c0, 0), (c1, 1), (c2, 2)])
+        self.assertEqual(
+            self.model.SuiteCase.everything.filter(suite=self.suite).count(),
+            3,
+            )
+
+
+    def test_empty(self):
+        """Setting no cases empties the suite."""
+        self.suite.set_cases([])
+
+        self.assertEqual(self.suite_cases(), [])
+
+
+    def test_other_product(self):
+        """Cases of another product raise ValueError; nothing is written."""
+        other = self.F.CaseFactory.create()
+
+        with self.assertRaises(ValueError):
+            self.suite.set_cases([self.cases[3].id, other.id])
+
+        self.assertEqual(len(self.suite_cases()), 3)
+
+
+    def test_queries(self):
+        """Number of queries does not depend on the number of cases."""
+        c0, c1, c2, c3, c4 = self.cases
+
+        # validate, read current, delete, reorder, insert, recount
+        with self.assertNumQueries(6):
+            self.suite.set_cases([c4.id, c3.id, c0.id, c1.id])
+
+
+    def test_case_count(self):
+        """Updates the suite's case count."""
+        c0, c1, c2, c3, c4 = self.cases
+
+        self.suite.set_cases([c3.id, c4.id])
+
+        self.assertEqual(self.suite.case_count, 2)
+        self.assertEqual(self.refresh(self.suite).case_count, 2)
+
+
+
+class SuiteCaseCountTest(case.DBTestCase):
+    """Tests for the denormalized ``Suite.case_count``."""
+    def setUp(self):
+        """A suite with two cases."""
+        self.suite = self.F.SuiteFactory.create()
+        self.scs = [
+            self.F.SuiteCaseFactory.create(suite=self.suite) for i in range(2)]
+
+
+    def case_count(self):
+        """Return the stored case count of the suite."""
+        return self.refresh(self.suite).case_count
+
+
+    def test_add(self):
+        """Adding a case to the suite counts it."""
+        self.assertEqual(self.case_count(), 2)
+
+
+    def test_delete_and_undelete_suitecase(self):
+        """Deleted suitecases aren't counted; undeleted ones are again."""
+        self.scs[0].delete()
+
+        self.assertEqual(self.case_count(), 1)
+
+        self.scs[0].undelete()
+
+        self.assertEqual(self.case_count(), 2)
+
+
+    def test_delete_case(self):
+        """Deleting a case uncounts it from its suites."""
+        self.scs[0].case.delete()
+
+        self.assertEqual(self.case_count(), 1)
+
+
+    def test_save_doesnt_overwrite(self):
+        """Saving a copy of the suite with a stale count keeps the count."""
+        stale = self.model.Suite.objects.get(pk=self.suite.pk)
+        self.scs[0].delete()
+        stale.name = "New name"
+
+        stale.save()
+
+        self.assertEqual(self.case_count(), 1)
+
+
+    def test_clone(self):
+        """A cloned suite has the count of its cloned cases."""
+        new = self.suite.clone()
+
+        self.assertEqual(new.case_count, 2)
+        self.assertEqual(self.refresh(new).case_count, 2)
+
+
+    def test_stale_counts(self):
+        """Counts changed behind the model's back are found and repaired."""
+        self.model.Suite.everything.filter(pk=self.suite.pk).update(
+            case_count=5)
+
+        self.assertEqual(
+            self.model.Suite.stale_counts(),
+            [(self.suite.pk, "case_count", 5, 2)],
+            )
+
+        self.model.Suite.update_counts()
+
+        self.assertEqual(self.model.Suite.stale_counts(), [])
+        self.assertEqual(self.case_count(), 2)
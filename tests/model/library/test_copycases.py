@@ -0,0 +1,206 @@
+"""
+Tests for set-based copying of caseversions between product versions.
+
+"""
+from tests import case
+
+
+
+class CopyCaseVersionsTest(case.DBTestCase):
+    """Tests for copy_caseversions."""
+    def setUp(self):
+        """Source and (later) target product versions of a product."""
+        self.source = self.F.ProductVersionFactory.create(
+            version="1.0", environments={"OS": ["Linux", "Windows"]})
+        self.target = self.F.ProductVersionFactory.create(
+            product=self.source.product, version="2.0")
+        self.source = self.refresh(self.source)
+        self.user = self.F.UserFactory.create()
+
+
+    def copy(self, **kwargs):
+        """Copy caseversions from source to target."""
+        from moztrap.model.library.copycases import copy_caseversions
+        kwargs.setdefault("user", self.user)
+        kwargs.setdefault("source", self.source)
+        return copy_caseversions(target=self.target, **kwargs)
+
+
+    def test_copies_caseversion(self):
+        """Copy has the case, name, description and status of the source."""
+        cv = self.F.CaseVersionFactory.create(
+            productversion=self.source,
+            name="Foo",
+            description="Bar",
+            status="draft",
+            )
+
+        self.assertEqual(self.copy(), 1)
+
+        new = self.target.caseversions.get()
+        self.assertNotEqual(new.id, cv.id)
+        self.assertEqual(new.case, cv.case)
+        self.assertEqual(new.name, "Foo")
+        self.assertEqual(new.description, "Bar")
+        self.assertEqual(new.status, "draft")
+        self.assertEqual(new.created_by, self.user)
+        self.assertEqual(new.modified_by, self.user)
+
+
+    def test_copies_steps(self):
+        """Copy gets the (non-deleted) steps of the source."""
+        cv = self.F.CaseVersionFactory.create(productversion=self.source)
+        self.F.CaseStepFactory.create(
+            caseversion=cv, number=1, instruction="Do", expected="Done")
+        self.F.CaseStepFactory.create(
+            caseversion=cv, number=2, instruction="Undo")
+        self.F.CaseStepFactory.create(caseversion=cv, number=3).delete()
+
+        self.copy()
+
+        new = self.target.caseversions.get()
+        self.assertEqual(
+            [(s.number, s.instruction, s.expected) for s in new.steps.all()],
+            [(1, "Do", "Done"), (2, "Undo", "")],
+            )
+
+
+    def test_copies_attachments(self):
+        """Copy gets the attachments of the source."""
+        cv = self.F.CaseVersionFactory.create(productversion=self.source)
+        a = self.F.CaseAttachmentFactory.create(
+            caseversion=cv, name="file.txt")
+
+        self.copy()
+
+        new = self.target.caseversions.get()
+        attachment = new.attachments.get()
+        self.assertEqual(attachment.name, "file.txt")
+        self.assertEqual(attachment.attachment.name, a.attachment.name)
+
+
+    def test_copies_tags(self):
+        """Copy gets the tags of the source."""
+        cv = self.F.CaseVersionFactory.create(productversion=self.source)
+        t1 = self.F.TagFactory.create(name="one")
+        t2 = self.F.TagFactory.create(name="two")
+        cv.tags.add(t1, t2)
+
+        self.copy()
+
+        new = self.target.caseversions.get()
+        self.assertEqual(set(new.tags.all()), set([t1, t2]))
+
+
+    def test_copies_narrowed_environments(self):
+        """Copy gets the (narrowed) environments of the source."""
+        cv = self.F.CaseVersionFactory.create(productversion=self.source)
+        linux = cv.environments.get(elements__name="Linux")
+        windows = cv.environments.get(elements__name="Windows")
+        cv.remove_envs(windows)
+
+        self.copy()
+
+        new = self.target.caseversions.get()
+        self.assertEqual(list(new.environments.all()), [linux])
+        self.assertTrue(new.envs_narrowed)
+
+
+    def test_skips_existing(self):
+        """Cases that already have a version in target are not copied."""
+        cv = self.F.CaseVersionFactory.create(productversion=self.source)
+        existing = self.F.CaseVersionFactory.create(
+            productversion=self.target, case=cv.case, name="Mine")
+        other = self.F.CaseVersionFactory.create(productversion=self.source)
+
+        self.assertEqual(self.copy(), 1)
+
+        self.assertEqual(
+            set(self.target.caseversions.values_list("case_id", flat=True)),
+            set([cv.case_id, other.case_id]),
+            )
+        self.assertEqual(self.refresh(existing).name, "Mine")
+        self.assertEqual(self.copy(), 0)
+
+
+    def test_skips_deleted(self):
+        """Deleted caseversions are not copied."""
+        self.F.CaseVersionFactory.create(productversion=self.source).delete()
+
+        self.assertEqual(self.copy(), 0)
+
+        self.assertEqual(self.target.caseversions.count(), 0)
+
+
+    def test_sets_latest(self):
+        """Copies to the latest product version become the latest versions."""
+        cv = self.F.CaseVersionFactory.create(productversion=self.source)
+
+        self.copy()
+
+        new = self.target.caseversions.get()
+        self.assertTrue(new.latest)
+        self.assertFalse(self.refresh(cv).latest)
+
+
+    def test_latest(self):
+        """Without a source, copies the latest version of each case."""
+        middle = self.F.ProductVersionFactory.create(
+            product=self.source.product, version="1.5")
+        old = self.F.CaseVersionFactory.create(
+            productversion=self.source, name="Old")
+        new = self.F.CaseVersionFactory.create(
+            productversion=middle, case=old.case, name="New")
+        self.F.CaseStepFactory.create(
+            caseversion=new, number=1, instruction="New step")
+        self.F.CaseVersionFactory.create(
+            productversion=self.source, name="Only")
+
+        self.assertEqual(self.copy(source=None), 2)
+
+        self.assertEqual(
+            set(self.target.caseversions.values_list("name", flat=True)),
+            set(["New", "Only"]),
+            )
+        copied = self.target.caseversions.get(case=old.case)
+        self.assertEqual(
+            [s.instruction for s in copied.steps.all()], ["New step"])
+        self.assertTrue(copied.latest)
+
+
+    def test_different_product(self):
+        """Cannot copy caseversions to a version of another product."""
+        from moztrap.model.library.copycases import copy_caseversions
+        other = self.F.ProductVersionFactory.create()
+
+        with self.assertRaises(ValueError):
+            copy_caseversions(self.source, other)
+
+
+    def test_chunks(self):
+        """Copies in chunks, reporting progress after each one."""
+        for i in range(5):
+            cv = self.F.CaseVersionFactory.create(productversion=self.source)
+            self.F.CaseStepFactory.create(caseversion=cv, number=1)
+        calls = []
+
+        self.assertEqual(
+            self.copy(chunk_size=2, progress=lambda *a: calls.append(a)), 5)
+
+        self.assertEqual(calls, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(self.target.caseversions.count(), 5)
+        self.assertEqual(
+            self.model.CaseStep.objects.filter(
+                caseversion__productversion=self.target).count(),
+            5,
+            )
+
+
+    def test_queries_per_chunk(self):
+        """Number of queries depends on number of chunks, not of cases."""
+        for i in range(10):
+            self.F.CaseVersionFactory.create(productversion=self.source)
+
+        # one to find cases, then per chunk: five inserts and the latest update
+        with self.assertNumQueries(7):
+            self.copy()
@@ -1,4 +1,10 @@
 """Tests for suite/case importer."""
+from cStringIO import StringIO
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from tests import case
 
 from mock import patch
@@ -9,6 +15,9 @@ from moztrap.model.library.importer import ImportResult, SuiteImporter
 
 class ImporterTestBase(object):
     """Common base class for importer tests."""
+    bulk = False
+
+
     def setUp(self):
         """Setup for importer tests; create a product version."""
         self.pv = self.F.ProductVersionFactory.create()
@@ -17,7 +26,7 @@ class ImporterTestBase(object):
     def import_data(self, case_data):
         """Instantiate ``Importer``, call ``import_data`` and return result."""
         from moztrap.model.library.importer import Importer
-        return Importer().import_data(self.pv, case_data)
+        return Importer().import_data(self.pv, case_data, bulk=self.bulk)
 
 
 class ImporterTest(ImporterTestBase, case.DBTestCase):
@@ -721,6 +730,261 @@ class ImporterTest(ImporterTestBase, case.DBTestCase):
 
 
 
+class ImportStreamTest(ImporterTestBase, case.DBTestCase):
+    """Tests for ``Importer.import_stream``."""
+    def import_stream(self, case_data, **kwargs):
+        """Call ``import_stream`` on JSON of given data; return result."""
+        from moztrap.model.library.importer import Importer
+        return Importer().import_stream(
+            self.pv, StringIO(json.dumps(case_data)), **kwargs)
+
+
+    def test_batches(self):
+        """Imports in batches, calling callback after each batch."""
+        batches = []
+
+        result = self.import_stream(
+            {
+                "suites": [{"name": "Suite"}],
+                "cases": [
+                    {"name": "Foo", "suites": ["Suite"]},
+                    {"name": "Bar", "suites": ["Suite"]},
+                    ],
+                },
+            batch_size=2,
+            callback=batches.append,
+            )
+
+        self.assertEqual(batches, [2, 3])
+        self.assertEqual(result.num_cases, 2)
+        suite = self.model.Suite.objects.get()
+        self.assertEqual(
+            set(suite.cases.values_list("versions__name", flat=True)),
+            set(["Foo", "Bar"]))
+
+
+    def test_skip(self):
+        """Skipped items are not imported."""
+        result = self.import_stream(
+            {"cases": [{"name": "Foo"}, {"name": "Bar"}]}, skip=1)
+
+        self.assertEqual(result.num_cases, 1)
+        self.assertEqual(self.model.CaseVersion.objects.get().name, "Bar")
+
+
+
+    def test_workers(self):
+        """With workers, cases are prepared in a pool and written in order."""
+        batches = []
+
+        result = self.import_stream(
+            {
+                "cases": [
+                    {"name": "Case {0}".format(i), "tags": ["tag"]}
+                    for i in range(5)
+                    ],
+                },
+            batch_size=2,
+            callback=batches.append,
+            workers=2,
+            )
+
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertEqual(result.num_cases, 5)
+        self.assertEqual(
+            self.model.Tag.objects.get().caseversions.count(), 5)
+
+
+
+class PrepareCasesTest(case.TestCase):
+    """Tests for ``prepare_cases``."""
+    def prepare(self, *cases):
+        """Return result of ``prepare_cases`` for given case dicts."""
+        from moztrap.model.library.importer import prepare_cases
+        return prepare_cases(list(cases))
+
+
+    def test_prepare(self):
+        """Normalizes steps and fills in defaults."""
+        data = {
+            "name": "Foo",
+            "created_by": "one@example.com",
+            "steps": [{"instruction": "do", "expected": "done"},
+                      {"instruction": "again"}],
+            }
+
+        self.assertEqual(
+            self.prepare(data),
+            [
+                {
+                    "data": data,
+                    "error": None,
+                    "name": "Foo",
+                    "description": "",
+                    "idprefix": "",
+                    "created_by": "one@example.com",
+                    "steps": [("do", "done"), ("again", "")],
+                    "tags": [],
+                    "suites": [],
+                    }
+                ]
+            )
+
+
+    def test_errors(self):
+        """Cases without a name or a step instruction get an error."""
+        prepared = self.prepare(
+            {"description": "Foo"},
+            {"name": "Foo", "steps": [{"expected": "done"}]},
+            )
+
+        self.assertEqual(
+            [p["error"] for p in prepared],
+            [
+                ImportResult.SKIP_CASE_NO_NAME,
+                ImportResult.SKIP_STEP_NO_INSTRUCTION,
+                ]
+            )
+
+
+
+class BulkImporterTest(ImporterTest):
+    """Runs the ``Importer`` tests, and some more, in bulk mode."""
+    bulk = True
+
+
+    def test_step_no_instruction_skip(self):
+        """Skip import on case with step and no instruction."""
+        result = self.import_data(
+            {
+                "cases": [
+                    {
+                        "name": "Foo",
+                        "steps": [{"expected": "did this"}]
+                        }
+                    ]
+                }
+            )
+
+        self.assertFalse(list(self.model.CaseVersion.objects.all()))
+        self.assertEqual(result.num_cases, 0)
+        self.assertEqual(
+            result.warnings[0]["reason"],
+            ImportResult.SKIP_STEP_NO_INSTRUCTION,
+            )
+
+
+    def test_create_two_caseversions_same_user(self):
+        """Two caseversions by the same user; the user is looked up once."""
+        user = self.F.UserFactory.create(email="sumbudee@mozilla.com")
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.import_data(
+                {
+                    "cases": [
+                        {
+                            "created_by": "sumbudee@mozilla.com",
+                            "name": name,
+                            "steps": [{"instruction": "do this"}],
+                            }
+                        for name in ["Foo", "Bar"]
+                        ]
+                    }
+                )
+
+        self.assertEqual(
+            len([q for q in ctx.captured_queries
+                 if "`auth_user`" in q["sql"]]),
+            1,
+            )
+        self.assertEqual(result.num_cases, 2)
+        for name in ["Foo", "Bar"]:
+            cv = self.model.CaseVersion.objects.get(name=name)
+            self.assertEqual(cv.created_by, user)
+
+
+    def test_name_conflict_within_data(self):
+        """A second case with the same name in the data is skipped."""
+        result = self.import_data(
+            {
+                "cases": [
+                    {"name": "Foo", "steps": [{"instruction": "do this"}]},
+                    {"name": "foo", "steps": [{"instruction": "do this"}]},
+                    ]
+                }
+            )
+
+        self.assertEqual(result.num_cases, 1)
+        self.assertEqual(
+            result.warnings[0]["reason"],
+            ImportResult.SKIP_CASE_NAME_CONFLICT,
+            )
+
+
+    def test_global_tag(self):
+        """An existing global tag is used if there is no product tag."""
+        tag = self.model.Tag.objects.create(name="FooTag")
+
+        self.import_data(
+            {
+                "cases": [
+                    {
+                        "name": "Foo",
+                        "steps": [{"instruction": "do this"}],
+                        "tags": ["FooTag"],
+                        }
+                    ]
+                }
+            )
+
+        cv = self.model.CaseVersion.objects.get()
+        self.assertEqual(cv.tags.get(), tag)
+
+
+    def test_environments_and_latest(self):
+        """Caseversions get the product version's environments and latest."""
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "OS X"]})
+        self.pv.environments.add(*envs)
+
+        self.import_data({"cases": [{"name": "Foo"}]})
+
+        cv = self.model.CaseVersion.objects.get()
+        self.assertEqual(set(cv.environments.all()), set(envs))
+        self.assertTrue(cv.latest)
+
+
+    def test_queries(self):
+        """The number of queries doesn't depend on the number of cases."""
+        self.F.UserFactory.create(email="one@example.com")
+
+        def case_data(prefix, num):
+            return {
+                "cases": [
+                    {
+                        "name": "{0} {1}".format(prefix, i),
+                        "created_by": "one@example.com",
+                        "steps": [{"instruction": "a"}, {"instruction": "b"}],
+                        "tags": ["tag1", "tag2"],
+                        "suites": ["suite1"],
+                        }
+                    for i in range(num)
+                    ]
+                }
+
+        # creates the tags and suite
+        self.import_data(case_data("first", 1))
+        with CaptureQueriesContext(connection) as one:
+            self.import_data(case_data("one", 1))
+        with CaptureQueriesContext(connection) as ten:
+            result = self.import_data(case_data("ten", 10))
+
+        self.assertEqual(len(ten), len(one))
+        self.assertEqual(result.num_cases, 10)
+        self.assertEqual(self.model.CaseStep.objects.count(), 24)
+
+
+
 class ImporterTransactionTest(ImporterTestBase, case.TransactionTestCase):
     """Tests for ``Importer`` transactional behavior."""
 
@@ -0,0 +1,97 @@
+"""
+Tests for background job tasks for the case library.
+
+"""
+from mock import patch
+
+from tests import case
+
+
+
+class CopyProductVersionCasesTest(case.DBTestCase):
+    def setUp(self):
+        """Two versions of a product; the first has two case versions."""
+        self.source = self.F.ProductVersionFactory.create(version="1.0")
+        self.target = self.F.ProductVersionFactory.create(
+            product=self.source.product, version="2.0")
+        self.cvs = [
+            self.F.CaseVersionFactory.create(productversion=self.source)
+            for i in range(2)
+            ]
+        self.user = self.F.UserFactory.create()
+
+
+    def work(self):
+        """Claim and run the next job; return it."""
+        job = self.model.Job.claim_next()
+        job.run()
+        return self.refresh(job)
+
+
+    def test_copy(self):
+        """Job copies the caseversions and reports the number copied."""
+        job = self.target.queue_copy_cases(self.source, user=self.user)
+
+        self.assertEqual(self.target.caseversions.count(), 0)
+
+        job = self.work()
+
+        self.assertEqual(job.status, "done", job.error)
+        self.assertEqual(
+            job.result_data,
+            {"productversion_id": self.target.id, "copied": 2},
+            )
+        self.assertEqual(
+            set(self.target.caseversions.values_list("case_id", flat=True)),
+            set(cv.case_id for cv in self.cvs),
+            )
+        self.assertEqual(
+            set(self.target.caseversions.values_list(
+                "created_by", flat=True)),
+            set([self.user.id]),
+            )
+
+
+    def test_copy_latest(self):
+        """Without a source, job copies the latest version of each case."""
+        self.target.queue_copy_cases(user=self.user)
+
+        job = self.work()
+
+        self.assertEqual(job.status, "done", job.error)
+        self.assertEqual(job.result_data["copied"], 2)
+        self.assertEqual(
+            set(self.target.caseversions.values_list("case_id", flat=True)),
+            set(cv.case_id for cv in self.cvs),
+            )
+
+
+    @patch("moztrap.model.library.copycases.CHUNK_SIZE", 1)
+    def test_progress(self):
+        """Job reports progress after each chunk."""
+        from moztrap.model.library.jobs import copy_productversion_cases
+        job = self.target.queue_copy_cases(self.source)
+        progress = []
+        job.set_progress = lambda pct, message="": progress.append(
+            (pct, message))
+
+        result = copy_productversion_cases(
+            job, source_id=self.source.id, target_id=self.target.id)
+
+        self.assertEqual(result["copied"], 2)
+        self.assertEqual(
+            progress,
+            [(50, "Copied 1 of 2 cases."), (100, "Copied 2 of 2 cases.")],
+            )
+
+
+    def test_retry(self):
+        """A retried job copies only cases not copied before."""
+        self.F.CaseVersionFactory.create(
+            productversion=self.target, case=self.cvs[0].case)
+
+        self.target.queue_copy_cases(self.source)
+        job = self.work()
+
+        self.assertEqual(job.result_data["copied"], 1)
+        self.assertEqual(self.target.caseversions.count(), 2)
@@ -0,0 +1,60 @@
+"""Tests for incremental JSON array reader."""
+from cStringIO import StringIO
+import json
+
+from tests import case
+
+
+
+class IterArrayItemsTest(case.TestCase):
+    """Tests for ``iter_array_items``."""
+    def items(self, contents, keys=("suites", "cases"), chunk_size=3):
+        """Return list of (key, item) read from given JSON string."""
+        from moztrap.model.library.jsonstream import iter_array_items
+        return list(
+            iter_array_items(StringIO(contents), keys, chunk_size=chunk_size))
+
+
+    def test_items(self):
+        """Yields items of named arrays in file order, skipping other keys."""
+        contents = json.dumps(
+            {
+                "suites": [{"name": "s1"}],
+                "other": {"x": [1, 2, {"y": "z"}]},
+                "cases": [{"name": "c1", "num": 12345}, {"name": u"c\xe9"}],
+                },
+            indent=2,
+            sort_keys=True,
+            )
+
+        self.assertEqual(
+            self.items(contents),
+            [
+                ("cases", {"name": "c1", "num": 12345}),
+                ("cases", {"name": u"c\xe9"}),
+                ("suites", {"name": "s1"}),
+                ]
+            )
+
+
+    def test_chunk_sizes(self):
+        """Result doesn't depend on chunk size."""
+        contents = json.dumps(
+            {"cases": [{"name": "c{0}".format(i)} for i in range(10)]})
+
+        for chunk_size in [1, 2, 7, 65536]:
+            self.assertEqual(
+                len(self.items(contents, chunk_size=chunk_size)), 10)
+
+
+    def test_empty(self):
+        """Empty object or arrays yield nothing."""
+        self.assertEqual(self.items("{}"), [])
+        self.assertEqual(self.items('{"cases": []}'), [])
+
+
+    def test_malformed(self):
+        """Malformed JSON raises ValueError."""
+        for contents in ["", "[]", '{"cases": [{"a": }]}', '{"cases": [{}']:
+            with self.assertRaises(ValueError):
+                self.items(contents)
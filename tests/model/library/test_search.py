@@ -0,0 +1,263 @@
+"""
+Tests for full-text search backends over caseversion text.
+
+"""
+from django.test.utils import override_settings
+
+from tests import case
+
+
+
+class SubstringBackendTest(case.DBTestCase):
+    """Tests for the default (unindexed) search backend."""
+    @property
+    def backend(self):
+        from moztrap.model.library.search import SubstringBackend
+        return SubstringBackend()
+
+
+    def test_filter_contains(self):
+        """Filters by substring, ANDing values."""
+        cv = self.F.CaseVersionFactory.create(name="Catalog login")
+        self.F.CaseVersionFactory.create(name="Catalog")
+
+        qs = self.backend.filter(
+            self.model.CaseVersion.objects.all(), "name", ["talo", "logi"])
+
+        self.assertEqual(list(qs), [cv])
+
+
+    def test_filter_any(self):
+        """With ``any``, values are ORed."""
+        cv1 = self.F.CaseVersionFactory.create(name="One")
+        cv2 = self.F.CaseVersionFactory.create(name="Two")
+        self.F.CaseVersionFactory.create(name="Three")
+
+        qs = self.backend.filter(
+            self.model.CaseVersion.objects.all(),
+            "name",
+            ["one", "two"],
+            any=True,
+            )
+
+        self.assertEqual(set(qs), set([cv1, cv2]))
+
+
+    def test_filter_steps_with_prefix(self):
+        """Step fields are looked up via the prefix to the caseversion."""
+        rcv = self.F.RunCaseVersionFactory.create()
+        self.F.CaseStepFactory.create(
+            caseversion=rcv.caseversion, expected="It works")
+        self.F.RunCaseVersionFactory.create()
+
+        qs = self.backend.filter(
+            self.model.RunCaseVersion.objects.all(),
+            "expected",
+            ["works"],
+            prefix="caseversion__",
+            )
+
+        self.assertEqual(list(qs), [rcv])
+
+
+    def test_search_any_field(self):
+        """Search matches values in any field."""
+        cv1 = self.F.CaseVersionFactory.create(description="Some foo")
+        cv2 = self.F.CaseVersionFactory.create()
+        self.F.CaseStepFactory.create(caseversion=cv2, instruction="Foo it")
+        self.F.CaseVersionFactory.create(name="Bar")
+
+        qs = self.backend.search(self.model.CaseVersion.objects.all(), ["foo"])
+
+        self.assertEqual(set(qs), set([cv1, cv2]))
+
+
+
+@override_settings(SEARCH_BACKEND="moztrap.model.library.search.MemoryBackend")
+class MemoryBackendTest(case.DBTestCase):
+    """Tests for the in-process inverted index search backend."""
+    def setUp(self):
+        """Start with an empty index."""
+        from moztrap.model.library.search import get_backend
+        self.backend = get_backend()
+        self.backend.clear()
+
+
+    def filter(self, field, values, **kwargs):
+        """Filter all caseversions by given field and values."""
+        return self.backend.filter(
+            self.model.CaseVersion.objects.all(), field, values, **kwargs)
+
+
+    def test_indexed_on_save(self):
+        """Saving a caseversion indexes its name and description."""
+        cv = self.F.CaseVersionFactory.create(name="Foo", description="Bar")
+        self.F.CaseVersionFactory.create(name="Baz")
+
+        self.assertEqual(list(self.filter("name", ["foo"])), [cv])
+        self.assertEqual(list(self.filter("description", ["bar"])), [cv])
+
+
+    def test_word_prefix(self):
+        """Each word of a value matches as a word prefix, not a substring."""
+        cv = self.F.CaseVersionFactory.create(name="Login to site")
+        self.F.CaseVersionFactory.create(name="Catalog")
+
+        self.assertEqual(list(self.filter("name", ["log sit"])), [cv])
+        self.assertEqual(list(self.filter("name", ["talog"])), [])
+
+
+    def test_all_values(self):
+        """Values are ANDed by default, ORed with ``any``."""
+        cv1 = self.F.CaseVersionFactory.create(name="One")
+        cv2 = self.F.CaseVersionFactory.create(name="One two")
+
+        self.assertEqual(list(self.filter("name", ["one", "two"])), [cv2])
+        self.assertEqual(
+            set(self.filter("name", ["one", "two"], any=True)),
+            set([cv1, cv2]),
+            )
+
+
+    def test_steps(self):
+        """Saving or deleting a step reindexes its caseversion."""
+        cv = self.F.CaseVersionFactory.create()
+        step = self.F.CaseStepFactory.create(
+            caseversion=cv, instruction="Click", expected="Clicked")
+
+        self.assertEqual(list(self.filter("instruction", ["click"])), [cv])
+        self.assertEqual(list(self.filter("expected", ["clicked"])), [cv])
+
+        step.delete()
+
+        self.assertEqual(list(self.filter("instruction", ["click"])), [])
+
+
+    def test_rename_syncs_other_versions(self):
+        """Renaming a caseversion reindexes the other versions of its case."""
+        cv = self.F.CaseVersionFactory.create(
+            name="Old", productversion__version="1")
+        other = self.F.CaseVersionFactory.create(
+            name="Old",
+            case=cv.case,
+            productversion__product=cv.productversion.product,
+            productversion__version="2",
+            )
+
+        cv.name = "New"
+        cv.save()
+
+        self.assertEqual(set(self.filter("name", ["new"])), set([cv, other]))
+
+
+    def test_clone(self):
+        """A cloned caseversion is indexed with its cloned steps."""
+        cv = self.F.CaseVersionFactory.create()
+        self.F.CaseStepFactory.create(caseversion=cv, instruction="Frobnicate")
+
+        new = cv.clone()
+
+        self.assertEqual(
+            set(self.filter("instruction", ["frob"])), set([cv, new]))
+
+
+    def test_deleted(self):
+        """A deleted caseversion is dropped from the index."""
+        cv = self.F.CaseVersionFactory.create(name="Foo")
+
+        cv.delete()
+
+        self.assertEqual(self.backend.docs, {})
+
+
+    def test_prefix(self):
+        """Filters other models through the prefix to their caseversion."""
+        rcv = self.F.RunCaseVersionFactory.create(caseversion__name="Foo")
+        self.F.RunCaseVersionFactory.create(caseversion__name="Bar")
+
+        qs = self.backend.filter(
+            self.model.RunCaseVersion.objects.all(),
+            "name",
+            ["foo"],
+            prefix="caseversion__",
+            )
+
+        self.assertEqual(list(qs), [rcv])
+
+
+    def test_search_ranked(self):
+        """Search covers all fields and orders by number of matches."""
+        cv1 = self.F.CaseVersionFactory.create(name="Foo")
+        cv2 = self.F.CaseVersionFactory.create(
+            name="Foo", description="More foo")
+        self.F.CaseStepFactory.create(caseversion=cv2, expected="Foo again")
+        self.F.CaseVersionFactory.create(name="Bar")
+
+        qs = self.backend.search(self.model.CaseVersion.objects.all(), ["foo"])
+
+        self.assertEqual(list(qs), [cv2, cv1])
+
+
+    def test_search_no_match(self):
+        """Search with no match returns empty queryset."""
+        self.F.CaseVersionFactory.create(name="Foo")
+
+        qs = self.backend.search(self.model.CaseVersion.objects.all(), ["bar"])
+
+        self.assertEqual(list(qs), [])
+
+
+    def test_rebuild(self):
+        """Rebuild reindexes all caseversions."""
+        cv = self.F.CaseVersionFactory.create(name="Foo")
+        self.backend.clear()
+
+        self.assertEqual(self.backend.rebuild(), 1)
+
+        self.assertEqual(list(self.filter("name", ["foo"])), [cv])
+
+
+    def test_bulk_copy(self):
+        """Caseversions copied in bulk to a product version are indexed."""
+        from moztrap.model.library.copycases import copy_caseversions
+        cv = self.F.CaseVersionFactory.create(name="Foo")
+        target = self.F.ProductVersionFactory.create(
+            product=cv.productversion.product, version="2")
+
+        copy_caseversions(cv.productversion, target)
+
+        self.assertEqual(
+            set(self.filter("name", ["foo"])),
+            set(self.model.CaseVersion.objects.all()),
+            )
+        self.assertEqual(len(self.backend.docs), 2)
+
+
+
+class MySQLBackendTest(case.TestCase):
+    """Tests for MySQL full-text backend query building."""
+    def query(self, values, **kwargs):
+        from moztrap.model.library.search import MySQLBackend
+        return MySQLBackend().boolean_query(values, **kwargs)
+
+
+    def test_all(self):
+        """Each word is a required prefix; values are required groups."""
+        self.assertEqual(
+            self.query(["log in", "site"]), "+(+log* +in*) +(+site*)")
+
+
+    def test_any(self):
+        """With ``any``, values are optional groups."""
+        self.assertEqual(
+            self.query(["log in", "site"], any=True), "(+log* +in*) (+site*)")
+
+
+    def test_operators_stripped(self):
+        """Boolean-mode operators in values are not passed through."""
+        self.assertEqual(self.query(['-"foo" +bar*']), "+(+foo* +bar*)")
+
+
+    def test_no_words(self):
+        """Returns None if there are no words to search for."""
+        self.assertIsNone(self.query(["--", ""]))
@@ -0,0 +1,200 @@
+"""
+Tests for in-process name indexes for autocomplete.
+
+"""
+from mock import patch
+
+from tests import case
+
+
+
+class NameIndexTest(case.DBTestCase):
+    """Tests for NameIndex."""
+    def index(self, rows):
+        """Return a NameIndex of given ``(id, name, scope)`` rows."""
+        from moztrap.model.autocomplete import NameIndex
+        index = NameIndex("test", lambda: rows)
+        index.invalidate()
+        return index
+
+
+    def names(self, suggestions):
+        """Return list of names of given suggestions."""
+        return [s.name for s in suggestions]
+
+
+    def test_substring(self):
+        """Matches names containing text, case-insensitively."""
+        index = self.index(
+            [(1, "Firefox", None), (2, "Fennec", None), (3, "Opera", None)])
+
+        self.assertEqual(self.names(index.suggest("REF")), ["Firefox"])
+
+
+    def test_start(self):
+        """Suggestions give the start of the match in the name."""
+        index = self.index([(1, "Windows 7", None)])
+
+        s = index.suggest("dow")[0]
+
+        self.assertEqual(s, (1, "Windows 7", None, 3))
+
+
+    def test_short_text(self):
+        """Texts shorter than a trigram are matched too."""
+        index = self.index([(1, "OS X", None), (2, "Linux", None)])
+
+        self.assertEqual(self.names(index.suggest("x")), ["OS X", "Linux"])
+
+
+    def test_ranking(self):
+        """Name prefixes, then word prefixes, then others; shortest first."""
+        index = self.index(
+            [
+                (1, "catalog", None),
+                (2, "login page", None),
+                (3, "user login", None),
+                (4, "login", None),
+                ]
+            )
+
+        self.assertEqual(
+            self.names(index.suggest("log")),
+            ["login", "login page", "user login", "catalog"],
+            )
+
+
+    def test_limit(self):
+        """Returns at most ``limit`` best suggestions."""
+        index = self.index(
+            [(i, "tag {0}".format(i), None) for i in range(10, 20)])
+
+        self.assertEqual(
+            self.names(index.suggest("tag", limit=2)), ["tag 10", "tag 11"])
+
+
+    def test_scope(self):
+        """With a scope, returns rows of that scope or global rows."""
+        index = self.index(
+            [(1, "one", 1), (2, "one two", 2), (3, "one three", None)])
+
+        self.assertEqual(
+            self.names(index.suggest("one", scope=1)), ["one", "one three"])
+        self.assertEqual(len(index.suggest("one")), 3)
+
+
+    def test_rebuilt_when_invalidated(self):
+        """Rows are reloaded only after the index is invalidated."""
+        rows = [(1, "one", None)]
+        index = self.index(rows)
+        self.assertEqual(index.rows(), [(1, "one", None)])
+
+        rows.append((2, "two", None))
+
+        self.assertEqual(len(index.rows()), 1)
+
+        index.invalidate()
+
+        self.assertEqual(len(index.rows()), 2)
+
+
+    def test_rebuilt_after_max_age(self):
+        """The index is rebuilt once it is older than ``MAX_AGE``."""
+        rows = [(1, "one", None)]
+        index = self.index(rows)
+        with patch("moztrap.model.autocomplete.time.time", return_value=0):
+            index.rows()
+
+        rows.append((2, "two", None))
+
+        with patch("moztrap.model.autocomplete.time.time",
+                   return_value=index.MAX_AGE):
+            self.assertEqual(len(index.rows()), 1)
+        with patch("moztrap.model.autocomplete.time.time",
+                   return_value=index.MAX_AGE + 1):
+            self.assertEqual(len(index.rows()), 2)
+
+
+    def test_invalidate_rolled_back(self):
+        """An invalidation rolled back with its transaction is not seen."""
+        from django.db import transaction
+        rows = [(1, "one", None)]
+        index = self.index(rows)
+        index.rows()
+
+        rows.append((2, "two", None))
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                index.invalidate()
+                raise ValueError()
+
+        self.assertEqual(len(index.rows()), 1)
+
+
+
+class TagNameIndexTest(case.DBTestCase):
+    """Tests for keeping the tag name index up to date."""
+    def setUp(self):
+        """Start from a fresh index."""
+        self.model.Tag.name_index.invalidate()
+
+
+    def names(self, text):
+        return [s.name for s in self.model.Tag.name_index.suggest(text)]
+
+
+    def test_save(self):
+        """Saving a tag updates the index."""
+        t = self.F.TagFactory.create(name="foo")
+        self.assertEqual(self.names("fo"), ["foo"])
+
+        t.name = "bar"
+        t.save()
+
+        self.assertEqual(self.names("fo"), [])
+
+
+    def test_delete(self):
+        """Deleting or undeleting a tag updates the index."""
+        t = self.F.TagFactory.create(name="foo")
+        self.assertEqual(self.names("fo"), ["foo"])
+
+        t.delete()
+
+        self.assertEqual(self.names("fo"), [])
+
+        self.refresh(t).undelete()
+
+        self.assertEqual(self.names("fo"), ["foo"])
+
+
+
+class ElementNameIndexTest(case.DBTestCase):
+    """Tests for keeping the element name index up to date."""
+    def setUp(self):
+        """Start from a fresh index."""
+        self.model.Element.name_index.invalidate()
+
+
+    def names(self, text):
+        return [s.name for s in self.model.Element.name_index.suggest(text)]
+
+
+    def test_save_and_delete(self):
+        """Saving or deleting an element updates the index."""
+        e = self.F.ElementFactory.create(name="foo")
+        self.assertEqual(self.names("fo"), ["foo"])
+
+        e.delete()
+
+        self.assertEqual(self.names("fo"), [])
+
+
+    def test_delete_category(self):
+        """Deleting a category drops its elements from the index."""
+        e = self.F.ElementFactory.create(name="foo")
+        self.assertEqual(self.names("fo"), ["foo"])
+
+        e.category.delete()
+
+        self.assertEqual(self.names("fo"), [])
@@ -8,6 +8,9 @@ a test-only model.
 """
 import datetime
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from mock import patch
 
 from tests import case
@@ -433,6 +436,16 @@ class CascadeDeleteTest(MTModelTestCase):
             self.refresh(s).deleted_on, self.refresh(p).deleted_on)
 
 
+    def test_cascade_to_leaf_model(self):
+        """Models nothing else depends on are soft-deleted, not skipped."""
+        sc = self.F.SuiteCaseFactory.create()
+
+        sc.suite.delete()
+
+        self.assertIsNot(
+            self.model.SuiteCase.everything.get(pk=sc.pk).deleted_on, None)
+
+
 
 class UndeleteMixin(object):
     """Utility assertions mixin for undelete tests."""
@@ -571,6 +584,95 @@ class CloneTest(UndeleteMixin, MTModelTestCase):
 
 
 
+class CascadeCloneTest(case.DBTestCase):
+    """Tests for cascade-cloning reverse FKs and m2ms in bulk."""
+    def test_reverse_fk_bulk(self):
+        """Reverse FK children are cloned with one insert per relation."""
+        cv = self.F.CaseVersionFactory.create()
+        for i in range(1, 6):
+            self.F.CaseStepFactory.create(caseversion=cv, number=i)
+        pv = self.F.ProductVersionFactory.create(
+            product=cv.productversion.product, version="2.0")
+
+        with CaptureQueriesContext(connection) as queries:
+            new = cv.clone(cascade=["steps"], overrides={"productversion": pv})
+
+        inserts = [
+            q for q in queries
+            if q["sql"].startswith("INSERT INTO `library_casestep`")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            list(new.steps.values_list("number", flat=True)), range(1, 6))
+        self.assertEqual(cv.steps.count(), 5)
+
+
+    def test_reverse_fk_filter(self):
+        """A cascade filter callable limits the cloned reverse FK children."""
+        cv = self.F.CaseVersionFactory.create()
+        self.F.CaseStepFactory.create(caseversion=cv, number=1)
+        self.F.CaseStepFactory.create(caseversion=cv, number=2)
+        pv = self.F.ProductVersionFactory.create(
+            product=cv.productversion.product, version="2.0")
+
+        new = cv.clone(
+            cascade={"steps": lambda qs: qs.filter(number=2)},
+            overrides={"productversion": pv},
+            )
+
+        self.assertEqual(new.steps.get().number, 2)
+
+
+    def test_m2m_filter(self):
+        """A cascade filter callable limits the copied m2m links."""
+        t1 = self.F.TagFactory.create(name="one")
+        t2 = self.F.TagFactory.create(name="two")
+        cv = self.F.CaseVersionFactory.create()
+        cv.tags.add(t1, t2)
+        pv = self.F.ProductVersionFactory.create(
+            product=cv.productversion.product, version="2.0")
+
+        new = cv.clone(
+            cascade={"tags": lambda qs: qs.filter(name="two")},
+            overrides={"productversion": pv},
+            )
+
+        self.assertEqual(list(new.tags.all()), [t2])
+
+
+    def test_m2m_filter_list(self):
+        """A cascade filter callable may return a list."""
+        t1 = self.F.TagFactory.create(name="one")
+        t2 = self.F.TagFactory.create(name="two")
+        cv = self.F.CaseVersionFactory.create()
+        cv.tags.add(t1, t2)
+        pv = self.F.ProductVersionFactory.create(
+            product=cv.productversion.product, version="2.0")
+
+        new = cv.clone(
+            cascade={"tags": lambda qs: [t for t in qs if t.name == "one"]},
+            overrides={"productversion": pv},
+            )
+
+        self.assertEqual(list(new.tags.all()), [t1])
+
+
+    def test_m2m_replaces_links_from_save(self):
+        """Cloned m2m is exactly the source's, not what the clone got on save."""
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "OS X"]})
+        cv = self.F.CaseVersionFactory.create()
+        cv.environments.add(envs[0])
+        pv = self.F.ProductVersionFactory.create(
+            product=cv.productversion.product, version="2.0",
+            environments=envs)
+
+        new = cv.clone(
+            cascade=["environments"], overrides={"productversion": pv})
+
+        self.assertEqual(list(new.environments.all()), [envs[0]])
+
+
+
 class MTManagerTest(MTModelTestCase):
     """Tests for MTManager."""
     def test_objects_doesnt_include_deleted(self):
@@ -762,3 +864,99 @@ class OptimisticLockingTest(case.DBTestCase):
 
         with self.assertRaises(self.model.ConcurrencyError):
             p.save()
+
+
+
+class BulkCreateWithIdsTest(MTModelTestCase):
+    """Tests for bulk creation with ids read back."""
+    def create(self, names, **kwargs):
+        """Bulk-create products with given names; return them."""
+        return self.model.Product.objects.bulk_create_with_ids(
+            [self.model.Product(name=name) for name in names], **kwargs)
+
+
+    def assertIdsMatch(self, products):
+        """Assert each product's id is that of the row with its name."""
+        for p in products:
+            self.assertEqual(self.model.Product.objects.get(pk=p.id).name,
+                             p.name)
+
+
+    def test_ids(self):
+        """Sets the id of each created object."""
+        products = self.create(["one", "two", "three"])
+
+        self.assertIdsMatch(products)
+
+
+    def test_batches(self):
+        """Sets ids across several batches."""
+        products = self.create(
+            ["p{0}".format(i) for i in range(5)], batch_size=2)
+
+        self.assertEqual(self.model.Product.objects.count(), 5)
+        self.assertIdsMatch(products)
+
+
+    def test_user(self):
+        """Sets created_by and modified_by to given user."""
+        p = self.create(["one"], user=self.user)[0]
+
+        p = self.refresh(p)
+        self.assertEqual(p.created_by, self.user)
+        self.assertEqual(p.modified_by, self.user)
+
+
+    def test_resets_cc_version(self):
+        """Leaves no negative cc_version tokens behind."""
+        products = self.create(["one", "two"])
+
+        self.assertEqual(
+            set(self.model.Product.objects.values_list(
+                "cc_version", flat=True)),
+            set([0]),
+            )
+        self.assertEqual([p.cc_version for p in products], [0, 0])
+
+
+    def test_non_consecutive_ids(self):
+        """Ids are right even if the rows' ids are not consecutive."""
+        from moztrap.model.mtmodel import MTQuerySet
+        bulk_create = MTQuerySet.bulk_create
+
+        def interleaved(qs, objs, batch_size=None):
+            """Insert rows backwards, with another insert between each."""
+            for obj in reversed(objs):
+                bulk_create(qs, [obj])
+                self.F.ProductFactory.create(name="other")
+            return objs
+
+        with patch.object(MTQuerySet, "bulk_create", interleaved):
+            products = self.create(["one", "two", "three"])
+
+        self.assertIdsMatch(products)
+
+
+    def test_missing_rows(self):
+        """Raises DatabaseError if not all inserted rows are found."""
+        from django.db import DatabaseError
+        from moztrap.model.mtmodel import MTQuerySet
+        bulk_create = MTQuerySet.bulk_create
+
+        def lossy(qs, objs, batch_size=None):
+            """Insert all but the last row."""
+            return bulk_create(qs, objs[:-1])
+
+        with patch.object(MTQuerySet, "bulk_create", lossy):
+            with self.assertRaises(DatabaseError):
+                self.create(["one", "two"])
+
+        self.assertEqual(self.model.Product.objects.count(), 0)
+
+
+    def test_queries(self):
+        """One query up front, then five per batch (with the savepoint)."""
+        with CaptureQueriesContext(connection) as ctx:
+            self.create(["p{0}".format(i) for i in range(5)], batch_size=2)
+
+        self.assertEqual(len(ctx), 1 + 5 * 3)
@@ -5,6 +5,7 @@ Tests for home speedy API views.
 import json
 
 from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
 
 from tests import case
 
@@ -254,3 +255,487 @@ class SpeedyCaseVersionsViewTest(case.view.ViewTestCase):
             [x["name"] for x in json.loads(res.content)["objects"]],
             expect_names
         )
+
+    def test_search(self):
+        pv = self.F.ProductVersionFactory.create()
+        for name in ["Login", "Logout", "Settings"]:
+            tc = self.F.CaseFactory.create(product=pv.product)
+            self.F.CaseVersionFactory.create(
+                case=tc, productversion=pv, status="active", name=name
+            )
+
+        res = self.get(
+            params={
+                "productversion__product": pv.product.id,
+                "search": "log"},
+            status=200
+        )
+        self.assertEqual(
+            [x["name"] for x in json.loads(res.content)["objects"]],
+            ["Login", "Logout"]
+        )
+        self.assertEqual(json.loads(res.content)["meta"]["count"], 2)
+
+    @override_settings(
+        SEARCH_BACKEND="moztrap.model.library.search.MemoryBackend")
+    def test_search_ranked(self):
+        from moztrap.model.library.search import get_backend
+        get_backend().clear()
+        pv = self.F.ProductVersionFactory.create()
+        tc1 = self.F.CaseFactory.create(product=pv.product)
+        self.F.CaseVersionFactory.create(
+            case=tc1, productversion=pv, status="active", name="Login"
+        )
+        tc2 = self.F.CaseFactory.create(product=pv.product)
+        cv2 = self.F.CaseVersionFactory.create(
+            case=tc2, productversion=pv, status="active", name="Login",
+            description="Login with a password"
+        )
+        self.F.CaseStepFactory.create(caseversion=cv2, instruction="Log in")
+
+        res = self.get(
+            params={
+                "productversion__product": pv.product.id,
+                "search": "log"},
+            status=200
+        )
+        # ranked by number of matches rather than by case id
+        self.assertEqual(
+            [x["case_id"] for x in json.loads(res.content)["objects"]],
+            [tc2.id, tc1.id]
+        )
+
+        res = self.get(
+            params={
+                "productversion__product": pv.product.id,
+                "search": "log",
+                "order_by": "case__id"},
+            status=200
+        )
+        self.assertEqual(
+            [x["case_id"] for x in json.loads(res.content)["objects"]],
+            [tc1.id, tc2.id]
+        )
+
+
+
+class SpeedyCaseSelectionV2ViewTest(case.view.ViewTestCase):
+    """Tests for keyset-paginated, streamed caseselection API view."""
+
+    @property
+    def url(self):
+        return reverse("caseselection_v2")
+
+    def create_cases(self, pv, count):
+        cvs = []
+        for i in range(count):
+            tc = self.F.CaseFactory.create(product=pv.product)
+            cvs.append(self.F.CaseVersionFactory.create(
+                case=tc, productversion=pv, status="active",
+                name="Case {0}".format(i)))
+        return cvs
+
+    def get_json(self, **params):
+        return json.loads(self.get(params=params, status=200).body)
+
+    def test_that_productversion__product_is_required(self):
+        res = self.get(status=400)
+        self.assertEqual(res.body, "productversion__product is required")
+
+    def test_bad_param(self):
+        pv = self.F.ProductVersionFactory.create()
+        self.get(
+            params={"productversion__product": pv.product.id, "after": "x"},
+            status=400,
+        )
+
+    def test_no_results(self):
+        pv = self.F.ProductVersionFactory.create()
+        self.assertEqual(
+            self.get_json(productversion__product=pv.product.id),
+            {
+                "objects": [],
+                "meta": {"limit": 0, "after": 0, "next": None}
+            }
+        )
+
+    def test_one_fuller_result(self):
+        pv = self.F.ProductVersionFactory.create()
+        tc = self.F.CaseFactory.create(product=pv.product, priority=2)
+        u = self.F.UserFactory.create()
+        cv = self.F.CaseVersionFactory.create(
+            case=tc, productversion=pv, status="active", user=u
+        )
+        t = self.F.TagFactory.create()
+        cv.tags.add(t)
+        t2 = self.F.TagFactory.create(name="Will Delete")
+        t2.delete()
+        cv.tags.add(t2)
+
+        res = self.get(
+            params={"productversion__product": pv.product.id}, status=200)
+
+        # compact JSON
+        self.assertNotIn(", ", res.body)
+        self.assertEqual(
+            json.loads(res.body)["objects"],
+            [{
+                "id": cv.id,
+                "case_id": tc.id,
+                "created_by": {
+                    "id": u.id,
+                    "username": u.username
+                },
+                "name": cv.name,
+                "priority": 2,
+                "tags": [{
+                    "name": t.name,
+                    "description": t.description
+                }]
+            }]
+        )
+
+    def test_keyset_pagination(self):
+        pv = self.F.ProductVersionFactory.create()
+        cvs = self.create_cases(pv, 5)
+
+        data = self.get_json(productversion__product=pv.product.id, limit=2)
+
+        self.assertEqual(
+            [x["id"] for x in data["objects"]], [cv.id for cv in cvs[:2]])
+        self.assertEqual(data["meta"]["next"], cvs[1].case.id)
+
+        data = self.get_json(
+            productversion__product=pv.product.id,
+            limit=2,
+            after=data["meta"]["next"],
+        )
+
+        self.assertEqual(
+            [x["id"] for x in data["objects"]], [cv.id for cv in cvs[2:4]])
+
+        data = self.get_json(
+            productversion__product=pv.product.id,
+            limit=2,
+            after=data["meta"]["next"],
+        )
+
+        self.assertEqual([x["id"] for x in data["objects"]], [cvs[4].id])
+        self.assertEqual(data["meta"]["next"], None)
+
+    def test_chunked(self):
+        from moztrap.view.api import speedy
+        pv = self.F.ProductVersionFactory.create()
+        cvs = self.create_cases(pv, 5)
+        t = self.F.TagFactory.create()
+        cvs[3].tags.add(t)
+
+        orig = speedy.CHUNK_SIZE
+        speedy.CHUNK_SIZE = 2
+        try:
+            data = self.get_json(productversion__product=pv.product.id)
+        finally:
+            speedy.CHUNK_SIZE = orig
+
+        self.assertEqual(
+            [x["id"] for x in data["objects"]], [cv.id for cv in cvs])
+        self.assertEqual(
+            [len(x["tags"]) for x in data["objects"]], [0, 0, 0, 1, 0])
+
+    def test_filtered(self):
+        pv = self.F.ProductVersionFactory.create()
+        cv1, cv2, cv3 = self.create_cases(pv, 3)
+        t = self.F.TagFactory.create()
+        cv1.tags.add(t)
+        cv2.tags.add(t)
+        cv2.case.priority = 1
+        cv2.case.save()
+        s = self.F.SuiteFactory.create(product=pv.product)
+        self.F.SuiteCaseFactory.create(suite=s, case=cv1.case)
+
+        def ids(**params):
+            return [
+                x["id"] for x in self.get_json(
+                    productversion__product=pv.product.id, **params
+                )["objects"]
+            ]
+
+        self.assertEqual(ids(tag=t.id), [cv1.id, cv2.id])
+        self.assertEqual(ids(priority=1), [cv2.id])
+        self.assertEqual(ids(case__suites=s.id), [cv1.id])
+        self.assertEqual(ids(case__suites__ne=s.id), [cv2.id, cv3.id])
+        self.assertEqual(ids(tag=t.id, case__suites__ne=s.id), [cv2.id])
+
+    def test_search(self):
+        pv = self.F.ProductVersionFactory.create()
+        tc = self.F.CaseFactory.create(product=pv.product)
+        cv = self.F.CaseVersionFactory.create(
+            case=tc, productversion=pv, status="active", name="Login"
+        )
+        self.create_cases(pv, 1)
+
+        data = self.get_json(
+            productversion__product=pv.product.id, search="log")
+
+        self.assertEqual([x["id"] for x in data["objects"]], [cv.id])
+
+    def test_not_modified(self):
+        pv = self.F.ProductVersionFactory.create()
+        cv = self.create_cases(pv, 1)[0]
+        params = {"productversion__product": pv.product.id}
+        res = self.get(params=params, status=200)
+        etag = res.headers["ETag"]
+        self.assertIn("must-revalidate", res.headers["Cache-Control"])
+
+        self.get(params=params, headers={"If-None-Match": etag}, status=304)
+
+        cv.tags.add(self.F.TagFactory.create())
+        res = self.get(
+            params=params, headers={"If-None-Match": etag}, status=200)
+        etag = res.headers["ETag"]
+
+        cv.name = "Changed"
+        cv.save()
+        self.get(params=params, headers={"If-None-Match": etag}, status=200)
+
+    def test_not_modified_by_unused_state(self):
+        pv = self.F.ProductVersionFactory.create()
+        cv = self.create_cases(pv, 1)[0]
+        step = self.F.CaseStepFactory.create(caseversion=cv)
+        params = {"productversion__product": pv.product.id}
+        search = dict(params, search="step")
+        etag = self.get(params=params, status=200).headers["ETag"]
+        search_etag = self.get(params=search, status=200).headers["ETag"]
+
+        # steps only matter when searching, other products' tags never
+        step.instruction = "Changed"
+        step.save()
+        self.F.TagFactory.create(product=self.F.ProductFactory.create())
+
+        self.get(params=params, headers={"If-None-Match": etag}, status=304)
+        self.get(
+            params=search, headers={"If-None-Match": search_etag}, status=200)
+
+
+
+class SpeedySuiteSelectionViewTest(case.view.ViewTestCase):
+    """Tests for speedy suiteselection API view."""
+
+    @property
+    def url(self):
+        return reverse("suiteselection")
+
+    def get_json(self, **params):
+        return json.loads(self.get(params=params, status=200).body)
+
+    def test_that_product_is_required(self):
+        res = self.get(status=400)
+        self.assertEqual(res.body, "product is required")
+
+    def test_one_fuller_result(self):
+        u = self.F.UserFactory.create()
+        s = self.F.SuiteFactory.create(name="Foo", user=u)
+        self.F.SuiteCaseFactory.create(suite=s)
+        self.F.SuiteCaseFactory.create(suite=s)
+        self.F.SuiteCaseFactory.create(suite=s).delete()
+        self.F.SuiteFactory.create()
+
+        data = self.get_json(product=s.product.id)
+
+        self.assertEqual(
+            data,
+            {
+                "objects": [{
+                    "id": s.id,
+                    "suite_id": s.id,
+                    "name": "Foo",
+                    "status": "active",
+                    "product_id": s.product.id,
+                    "case_count": 2,
+                    "filter_cases": reverse("manage_cases") +
+                    "?filter-suite={0}".format(s.id),
+                    "created_by": {"id": u.id, "username": u.username},
+                }],
+                "meta": {"count": 1, "limit": 0, "offset": 0}
+            }
+        )
+
+    def test_paginate_results(self):
+        p = self.F.ProductFactory.create()
+        suites = [self.F.SuiteFactory.create(product=p) for i in range(4)]
+
+        data = self.get_json(product=p.id, limit=2, offset=1)
+
+        self.assertEqual(
+            [x["id"] for x in data["objects"]], [s.id for s in suites[1:3]])
+        self.assertEqual(
+            data["meta"], {"count": 4, "limit": 2, "offset": 1})
+
+    def test_runs(self):
+        r = self.F.RunFactory.create()
+        p = r.productversion.product
+        s1, s2, s3 = [self.F.SuiteFactory.create(product=p) for i in range(3)]
+        self.F.RunSuiteFactory.create(run=r, suite=s3, order=1)
+        self.F.RunSuiteFactory.create(run=r, suite=s1, order=2)
+
+        self.assertEqual(
+            [x["id"] for x in self.get_json(product=p.id, runs=r.id)[
+                "objects"]],
+            [s3.id, s1.id],
+        )
+        self.assertEqual(
+            [x["id"] for x in self.get_json(product=p.id, runs__ne=r.id)[
+                "objects"]],
+            [s2.id],
+        )
+
+    def test_queries(self):
+        p = self.F.ProductFactory.create()
+        for i in range(3):
+            s = self.F.SuiteFactory.create(product=p)
+            self.F.SuiteCaseFactory.create(suite=s)
+
+        # 3 for the ETag, 1 for suites (with their case counts)
+        with self.assertNumQueries(4):
+            self.get(params={"product": p.id}, status=200)
+
+    def test_not_modified(self):
+        s = self.F.SuiteFactory.create()
+        params = {"product": s.product.id}
+        etag = self.get(params=params, status=200).headers["ETag"]
+
+        self.get(params=params, headers={"If-None-Match": etag}, status=304)
+
+        self.F.SuiteCaseFactory.create(suite=s)
+        self.get(params=params, headers={"If-None-Match": etag}, status=200)
+
+
+
+class SpeedyRunCaseVersionsViewTest(case.view.ViewTestCase):
+    """Tests for speedy runcaseversions API view."""
+
+    @property
+    def url(self):
+        return reverse("runcaseversions")
+
+    def get_json(self, **params):
+        return json.loads(self.get(params=params, status=200).body)
+
+    def test_that_run_is_required(self):
+        res = self.get(status=400)
+        self.assertEqual(res.body, "run is required")
+
+    def test_after_not_found(self):
+        r = self.F.RunFactory.create()
+        self.get(params={"run": r.id, "after": 9999}, status=400)
+
+    def test_one_fuller_result(self):
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"]})
+        rcv = self.F.RunCaseVersionFactory.create(
+            caseversion__name="Foo",
+            caseversion__description="Bar",
+            order=3,
+            environments=envs,
+        )
+        cv = rcv.caseversion
+        self.F.CaseStepFactory.create(
+            caseversion=cv, number=2, instruction="Two", expected="2")
+        self.F.CaseStepFactory.create(
+            caseversion=cv, number=1, instruction="One", expected="")
+        t = self.F.TagFactory.create(name="Tag", description="Desc")
+        cv.tags.add(t)
+        self.F.RunCaseVersionFactory.create()
+
+        data = self.get_json(run=rcv.run.id)
+
+        self.assertEqual(
+            data,
+            {
+                "objects": [{
+                    "id": rcv.id,
+                    "run_id": rcv.run.id,
+                    "order": 3,
+                    "environments": sorted(e.id for e in envs),
+                    "caseversion": {
+                        "id": cv.id,
+                        "case_id": cv.case.id,
+                        "name": "Foo",
+                        "description": "Bar",
+                        "status": cv.status,
+                        "priority": None,
+                        "steps": [
+                            {
+                                "number": 1,
+                                "instruction": "One",
+                                "expected": "",
+                            },
+                            {
+                                "number": 2,
+                                "instruction": "Two",
+                                "expected": "2",
+                            },
+                        ],
+                        "tags": [
+                            {"id": t.id, "name": "Tag", "description": "Desc"}
+                        ],
+                    },
+                }],
+                "meta": {"limit": 0, "after": 0, "next": None}
+            }
+        )
+
+    def test_keyset_pagination(self):
+        r = self.F.RunFactory.create()
+        # equal orders are paged by id
+        rcvs = [
+            self.F.RunCaseVersionFactory.create(run=r, order=order)
+            for order in [1, 2, 2, 3]
+        ]
+
+        data = self.get_json(run=r.id, limit=2)
+
+        self.assertEqual(
+            [x["id"] for x in data["objects"]], [rcv.id for rcv in rcvs[:2]])
+        self.assertEqual(data["meta"]["next"], rcvs[1].id)
+
+        data = self.get_json(run=r.id, limit=2, after=data["meta"]["next"])
+
+        self.assertEqual(
+            [x["id"] for x in data["objects"]], [rcv.id for rcv in rcvs[2:]])
+
+    def test_environment(self):
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"]})
+        rcv = self.F.RunCaseVersionFactory.create(environments=envs[:1])
+        self.F.RunCaseVersionFactory.create(run=rcv.run, environments=envs[1:])
+
+        data = self.get_json(run=rcv.run.id, environment=envs[0].id)
+
+        self.assertEqual([x["id"] for x in data["objects"]], [rcv.id])
+
+    def test_queries(self):
+        r = self.F.RunFactory.create()
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"]})
+        t = self.F.TagFactory.create()
+        for i in range(3):
+            rcv = self.F.RunCaseVersionFactory.create(
+                run=r, environments=envs)
+            self.F.CaseStepFactory.create(caseversion=rcv.caseversion)
+            rcv.caseversion.tags.add(t)
+
+        # 7 for the ETag; 1 for runcaseversions and 1 each for their steps,
+        # environments and tags
+        with self.assertNumQueries(11):
+            self.get(params={"run": r.id}, status=200)
+
+    def test_not_modified(self):
+        rcv = self.F.RunCaseVersionFactory.create()
+        params = {"run": rcv.run.id}
+        etag = self.get(params=params, status=200).headers["ETag"]
+
+        self.get(params=params, headers={"If-None-Match": etag}, status=304)
+
+        self.F.CaseStepFactory.create(caseversion=rcv.caseversion)
+        self.get(params=params, headers={"If-None-Match": etag}, status=200)
@@ -2,8 +2,10 @@
 Tests for test case queryset-filtering by ID and with optional ID prefix.
 
 """
+from django.test.utils import override_settings
+
 from tests import case
-from moztrap.view.lists.cases import PrefixIDFilter
+from moztrap.view.lists.cases import PrefixIDFilter, CaseVersionTextFilter
 
 
 
@@ -106,3 +108,59 @@ class PrefixIDFilterTest(case.DBTestCase):
             set([x.name for x in res.all()]),
             set(["CV 3", "CV 4"]),
             )
+
+
+
+class CaseVersionTextFilterTest(case.DBTestCase):
+    """Tests for CaseVersionTextFilter"""
+
+    def test_field_and_prefix(self):
+        """Field and caseversion prefix are parsed from the lookup."""
+        f = CaseVersionTextFilter(
+            "expected", lookup="caseversion__steps__expected")
+
+        self.assertEqual(f.field, "expected")
+        self.assertEqual(f.prefix, "caseversion__")
+
+
+    def test_default_lookup(self):
+        """With no lookup, the name is the field on the caseversion."""
+        f = CaseVersionTextFilter("name")
+
+        self.assertEqual(f.field, "name")
+        self.assertEqual(f.prefix, "")
+
+
+    def test_substring(self):
+        """Default backend filters by substring."""
+        self.F.CaseVersionFactory.create(name="Catalog")
+        f = CaseVersionTextFilter("name")
+
+        res = f.filter(self.model.CaseVersion.objects.all(), [u"talo"])
+
+        self.assertEqual([x.name for x in res], ["Catalog"])
+
+
+    @override_settings(
+        SEARCH_BACKEND="moztrap.model.library.search.MemoryBackend")
+    def test_indexed(self):
+        """Indexed backend filters by word prefix."""
+        from moztrap.model.library.search import get_backend
+        get_backend().clear()
+        rcv = self.F.RunCaseVersionFactory.create()
+        self.F.CaseStepFactory.create(
+            caseversion=rcv.caseversion, instruction="Log in")
+        self.F.RunCaseVersionFactory.create()
+        f = CaseVersionTextFilter(
+            "instruction", lookup="caseversion__steps__instruction")
+
+        res = f.filter(self.model.RunCaseVersion.objects.all(), [u"log"])
+
+        self.assertEqual(list(res), [rcv])
+
+
+    def test_no_values(self):
+        """Doesn't touch the queryset if there are no values."""
+        qs = self.model.CaseVersion.objects.all()
+
+        self.assertIs(CaseVersionTextFilter("name").filter(qs, []), qs)
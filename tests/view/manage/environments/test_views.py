@@ -917,6 +917,31 @@ class ElementsAutocompleteTest(case.view.AuthenticatedViewTestCase,
 
 
 
+class ElementsAutocompleteIndexTest(case.view.AuthenticatedViewTestCase):
+    """Test for elements autocomplete index view."""
+    @property
+    def url(self):
+        """Shortcut for element-autocomplete-index url."""
+        return reverse("manage_environment_autocomplete_elements_index")
+
+
+    def test_all_elements_json(self):
+        """Returns all elements in JSON, with an ETag."""
+        e = self.F.ElementFactory.create(name="foo")
+
+        res = self.get()
+
+        self.assertEqual(
+            res.json,
+            {"items": [{"id": e.id, "name": "foo", "type": "element"}]},
+            )
+        self.assertEqual(
+            res.headers["ETag"],
+            '"{0}"'.format(self.model.Element.name_index.generation()),
+            )
+
+
+
 class NarrowEnvironmentsViewTests(case.view.NoCacheTest):
     """Common tests for narrow-environments view."""
     form_id = "narrow-envs-form"
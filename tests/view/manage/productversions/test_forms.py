@@ -70,6 +70,7 @@ class EditProductVersionFormTest(case.DBTestCase):
             )
 
         productversion = f.save()
+        self.model.Job.claim_next().run()
 
         self.assertEqual(
             set(productversion.caseversions.all().values_list(
@@ -115,6 +116,7 @@ class EditProductVersionFormTest(case.DBTestCase):
             )
 
         productversion = f.save()
+        self.model.Job.claim_next().run()
 
         self.assertEqual(
             set(productversion.caseversions.all().values_list(
@@ -154,6 +156,7 @@ class EditProductVersionFormTest(case.DBTestCase):
             )
 
         productversion = f.save()
+        self.model.Job.claim_next().run()
 
         self.assertEqual(
             set(productversion.caseversions.all().values_list(
@@ -198,9 +201,35 @@ class AddProductVersionFormTest(case.DBTestCase):
 
         self.assertEqual(productversion.product, pv.product)
         self.assertEqual(set(productversion.environments.all()), set(envs))
+        self.assertEqual(productversion.caseversions.count(), 0)
+
+        self.model.Job.claim_next().run()
+
         new_cv = productversion.caseversions.get()
         self.assertEqual(new_cv.case, cv.case)
         self.assertEqual(new_cv.name, cv.name)
         self.assertEqual(productversion.version, "2.0")
         self.assertEqual(productversion.codename, "Foo")
         self.assertEqual(productversion.created_by, u)
+
+
+    def test_clone_from_other_product(self):
+        """Cannot clone cases from a version of a different product."""
+        pv = self.F.ProductVersionFactory.create(version="1.0")
+        p = self.F.ProductFactory.create()
+
+        f = self.form(
+            {
+                "product": str(p.id),
+                "version": "2.0",
+                "clone_from": str(pv.id),
+                "cc_version": "0",
+                },
+            user=self.F.UserFactory(),
+            )
+
+        self.assertFalse(f.is_valid())
+        self.assertEqual(
+            f.non_field_errors(),
+            ["Cases can only be copied from a version of the same product."],
+            )
@@ -31,6 +31,52 @@ class ProductVersionsTest(case.view.manage.ListViewTestCase,
         return reverse("manage_productversions")
 
 
+    def test_clone_without_cases(self):
+        """Plain clone action does not copy cases."""
+        self.add_perm(self.perm)
+
+        cv = self.F.CaseVersionFactory.create()
+
+        self.get_form().submit(
+            name="action-clone",
+            index=0,
+            headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+
+        new = self.model.ProductVersion.objects.exclude(
+            pk=cv.productversion.pk).get()
+        self.assertEqual(new.caseversions.count(), 0)
+        self.assertEqual(self.model.Job.objects.count(), 0)
+
+
+    def test_clone_with_cases(self):
+        """Clone with cases action queues a job to copy cases."""
+        self.add_perm(self.perm)
+
+        cv = self.F.CaseVersionFactory.create()
+
+        self.get_form().submit(
+            name="action-clone_with_cases",
+            index=0,
+            headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+
+        new = self.model.ProductVersion.objects.exclude(
+            pk=cv.productversion.pk).get()
+        self.assertEqual(new.caseversions.count(), 0)
+        job = self.model.Job.objects.get()
+        self.assertEqual(job.created_by, self.user)
+
+        self.model.Job.claim_next().run()
+
+        self.assertEqual(new.caseversions.get().case, cv.case)
+
+
+    def test_clone_with_cases_requires_permission(self):
+        """Cloning with cases requires appropriate permission."""
+        self.assertActionRequiresPermission("clone_with_cases")
+
+
     def test_filter_by_version(self):
         """Can filter by version."""
         self.factory.create(name="Foo 1.0")
@@ -201,6 +247,28 @@ class AddProductVersionTest(case.view.FormViewTestCase,
         self.assertEqual(pv.codename, "codename")
 
 
+    def test_clone_from(self):
+        """Cases of clone_from version are copied in the background."""
+        cv = self.F.CaseVersionFactory.create(
+            productversion__product__name="Foo",
+            productversion__version="1.0",
+            )
+        form = self.get_form()
+        form["product"] = str(cv.productversion.product.id)
+        form["clone_from"] = str(cv.productversion.id)
+        form["version"] = "2.0"
+
+        res = form.submit(status=302)
+
+        res.follow().mustcontain(
+            "Cases are being copied to 'Foo 2.0' in the background.")
+
+        self.model.Job.claim_next().run()
+
+        pv = self.model.ProductVersion.objects.get(version="2.0")
+        self.assertEqual(pv.caseversions.get().case, cv.case)
+
+
     def test_error(self):
         """Bound form with errors is re-displayed."""
         res = self.get_form().submit()
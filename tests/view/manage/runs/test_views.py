@@ -37,6 +37,91 @@ class RunsTest(case.view.manage.ListViewTestCase,
         return reverse("manage_runs")
 
 
+    def test_activate(self):
+        """Activating a run queues a job that activates it."""
+        self.add_perm(self.perm)
+
+        r = self.factory.create(status="draft")
+
+        self.get_form().submit(
+            name="action-activate",
+            index=0,
+            headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+
+        self.assertEqual(self.refresh(r).status, "draft")
+        job = self.model.Job.objects.get()
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.created_by, self.user)
+
+        self.model.Job.claim_next().run()
+
+        self.assertEqual(self.refresh(r).status, "active")
+
+
+    def test_activate_shows_pending_job(self):
+        """A run being activated shows its job's status until it's done."""
+        self.add_perm(self.perm)
+
+        self.factory.create(status="draft")
+        self.get_form().submit(
+            name="action-activate",
+            index=0,
+            headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+
+        pending = self.get().html.find("div", "pending-job")
+        self.assertIn("job queued: 0%", pending.text)
+
+        self.model.Job.claim_next().run()
+
+        self.assertIsNone(self.get().html.find("div", "pending-job"))
+
+
+    def test_activate_twice_queues_one_job(self):
+        """Activating a run again before its job is done doesn't requeue."""
+        self.add_perm(self.perm)
+
+        r = self.factory.create(status="draft")
+        for i in range(2):
+            self.get_form().submit(
+                name="action-activate",
+                index=0,
+                headers={"X-Requested-With": "XMLHttpRequest"},
+                )
+
+        job = self.model.Job.objects.get()
+        self.assertEqual(job.active_key, "run-activate-{0}".format(r.id))
+
+
+    def test_refresh(self):
+        """Refreshing a run queues a job that refreshes it."""
+        self.add_perm(self.perm)
+
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"]})
+        pv = self.F.ProductVersionFactory.create(environments=envs)
+        r = self.factory.create(status="active", productversion=pv)
+        s = self.F.SuiteFactory.create(product=pv.product, status="active")
+        self.F.RunSuiteFactory.create(run=r, suite=s)
+        cv = self.F.CaseVersionFactory.create(
+            case__product=pv.product, productversion=pv, status="active")
+        self.F.SuiteCaseFactory.create(suite=s, case=cv.case)
+
+        self.get_form().submit(
+            name="action-refresh",
+            index=0,
+            headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+
+        self.assertEqual(r.runcaseversions.count(), 0)
+
+        self.model.Job.claim_next().run()
+
+        self.assertEqual(
+            [rcv.caseversion for rcv in r.runcaseversions.all()], [cv])
+
+
 
 class RunDetailTest(case.view.AuthenticatedViewTestCase,
                     case.view.NoCacheTest,
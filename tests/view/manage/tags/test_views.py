@@ -332,3 +332,71 @@ class TagsAutocompleteTest(case.view.AuthenticatedViewTestCase,
         res = self.get()
 
         self.assertEqual(res.json, {"suggestions": []})
+
+
+    def test_ranked_and_limited(self):
+        """Tags starting with the text rank first; limit is respected."""
+        self.F.TagFactory.create(name="catalog")
+        self.F.TagFactory.create(name="login")
+        self.F.TagFactory.create(name="logout")
+
+        res = self.app.get(
+            self.url, user=self.user, params={"text": "log", "limit": 2})
+
+        self.assertEqual(
+            [t["name"] for t in res.json["suggestions"]], ["login", "logout"])
+
+
+
+class TagsAutocompleteIndexTest(case.view.AuthenticatedViewTestCase):
+    """Test for tags autocomplete index view."""
+    @property
+    def url(self):
+        """Shortcut for tag-autocomplete-index url."""
+        return reverse("manage_tags_autocomplete_index")
+
+
+    def test_all_tags_json(self):
+        """Returns all tags in JSON."""
+        p = self.F.ProductFactory.create()
+        t = self.F.TagFactory.create(name="foo", product=p)
+
+        res = self.get()
+
+        self.assertEqual(
+            res.json,
+            {
+                "items": [
+                    {
+                        "id": t.id,
+                        "name": "foo",
+                        "product-id": p.id,
+                        "type": "tag",
+                        }
+                    ]
+                }
+            )
+
+
+    def test_conditional_get(self):
+        """Not modified until a tag changes."""
+        t = self.F.TagFactory.create(name="foo")
+        etag = self.get().headers["ETag"]
+
+        self.app.get(
+            self.url,
+            user=self.user,
+            headers={"If-None-Match": etag},
+            status=304,
+            )
+
+        t.name = "bar"
+        t.save()
+
+        res = self.app.get(
+            self.url,
+            user=self.user,
+            headers={"If-None-Match": etag},
+            status=200,
+            )
+        self.assertEqual(res.json["items"][0]["name"], "bar")
@@ -0,0 +1,92 @@
+"""
+Tests for result export views.
+
+"""
+import json
+
+from django.core.urlresolvers import reverse
+
+from tests import case
+
+
+
+class RunExportTest(case.view.AuthenticatedViewTestCase):
+    """Tests for run results export view."""
+    def setUp(self):
+        """Setup for run export tests; create a result."""
+        super(RunExportTest, self).setUp()
+        self.result = self.F.ResultFactory.create(status="passed")
+
+
+    @property
+    def url(self):
+        """Shortcut for run export url."""
+        return reverse(
+            "results_run_export",
+            kwargs=dict(run_id=self.result.runcaseversion.run.id),
+            )
+
+
+    def test_csv(self):
+        """Streams CSV by default."""
+        res = self.get()
+
+        self.assertEqual(res.content_type, "text/csv")
+        self.assertEqual(
+            res.headers["Content-Disposition"],
+            'attachment; filename="run-{0}-results.csv"'.format(
+                self.result.runcaseversion.run.id))
+        self.assertEqual(len(res.body.splitlines()), 2)
+
+
+    def test_json(self):
+        """Streams JSON lines with format=json."""
+        res = self.get(params={"format": "json"})
+
+        self.assertEqual(res.content_type, "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(l)["id"] for l in res.body.splitlines()],
+            [self.result.id])
+
+
+    def test_nonexistent_run(self):
+        """404 for a nonexistent run."""
+        self.app.get(
+            reverse("results_run_export", kwargs=dict(run_id=9999)),
+            user=self.user,
+            status=404,
+            )
+
+
+
+class ProductVersionExportTest(case.view.AuthenticatedViewTestCase):
+    """Tests for product version results export view."""
+    def setUp(self):
+        """Setup for product version export tests; create a result."""
+        super(ProductVersionExportTest, self).setUp()
+        self.result = self.F.ResultFactory.create(status="passed")
+
+
+    @property
+    def url(self):
+        """Shortcut for product version export url."""
+        return reverse(
+            "results_productversion_export",
+            kwargs=dict(
+                productversion_id=
+                    self.result.runcaseversion.run.productversion.id),
+            )
+
+
+    def test_latest(self):
+        """Streams only latest results with latest=1."""
+        new = self.F.ResultFactory.create(
+            runcaseversion=self.result.runcaseversion,
+            environment=self.result.environment,
+            tester=self.result.tester,
+            )
+
+        res = self.get(params={"format": "json", "latest": "1"})
+
+        self.assertEqual(
+            [json.loads(l)["id"] for l in res.body.splitlines()], [new.id])
@@ -3,6 +3,8 @@ Tests for runcaseversion results view.
 
 """
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from tests import case
 
@@ -40,6 +42,30 @@ class RunCaseVersionResultsViewTest(case.view.ListViewTestCase,
         self.assertNotInList(res, "Case 2")
 
 
+    def test_filter_by_result_status(self):
+        """Can filter by status of latest results."""
+        rcv1 = self.F.RunCaseVersionFactory.create(caseversion__name="Case 1")
+        rcv2 = self.F.RunCaseVersionFactory.create(caseversion__name="Case 2")
+        r = self.F.ResultFactory.create(runcaseversion=rcv1, status="passed")
+        self.F.ResultFactory.create(
+            runcaseversion=rcv2,
+            tester=r.tester,
+            environment=r.environment,
+            status="passed",
+            )
+        self.F.ResultFactory.create(
+            runcaseversion=rcv2,
+            tester=r.tester,
+            environment=r.environment,
+            status="failed",
+            )
+
+        res = self.get(params={"filter-resultstatus": "passed"})
+
+        self.assertInList(res, "Case 1")
+        self.assertNotInList(res, "Case 2")
+
+
     def test_filter_by_id(self):
         """Can filter by id."""
         rcv1 = self.F.RunCaseVersionFactory.create(caseversion__name="Case 1")
@@ -247,6 +273,86 @@ class RunCaseVersionResultsViewTest(case.view.ListViewTestCase,
         self.assertOrderInList(res, "Case 1", "Case 2")
 
 
+    def create_rcv_with_results(self, name, statuses, run=None):
+        """Create rcv in two envs, and results in first env with statuses."""
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"]})
+        if run is None:
+            run = self.F.RunFactory.create()
+        run.environments.add(*envs)
+        rcv = self.F.RunCaseVersionFactory.create(
+            caseversion__name=name,
+            run=run,
+            caseversion__environments=envs,
+            )
+        for status in statuses:
+            self.F.ResultFactory.create(
+                runcaseversion=rcv, environment=envs[0], status=status)
+        return rcv
+
+
+    def test_result_summary(self):
+        """List shows summary of latest result states per runcaseversion."""
+        self.create_rcv_with_results("Case 1", ["invalidated", "blocked"])
+
+        res = self.get()
+
+        summary = res.html.find("ul", "results-summary")
+        self.assertEqual(
+            summary.find("a", "invalidated").contents[0].strip(), "1")
+        self.assertEqual(
+            summary.find("a", "blocked").contents[0].strip(), "1")
+        self.assertEqual(
+            summary.find("a", "passed").contents[0].strip(), "0")
+
+
+    def test_result_summary_deleted(self):
+        """Deleted latest results aren't counted in the summary."""
+        rcv = self.create_rcv_with_results("Case 1", ["blocked"])
+        rcv.results.get().delete()
+
+        res = self.get()
+
+        summary = res.html.find("ul", "results-summary")
+        self.assertEqual(
+            summary.find("a", "blocked").contents[0].strip(), "0")
+
+
+    def test_completion(self):
+        """List shows completion percentage per runcaseversion."""
+        self.create_rcv_with_results("Case 1", ["passed"])
+
+        res = self.get()
+
+        self.assertEqual(
+            res.html.find("div", "completion")["data-perc"], "50")
+
+
+    def test_sort_by_completion(self):
+        """Can sort by completion."""
+        self.create_rcv_with_results("Case 1", ["passed"])
+        self.create_rcv_with_results("Case 2", [])
+
+        res = self.get(
+            params={"sortfield": "completion", "sortdirection": "desc"})
+
+        self.assertOrderInList(res, "Case 1", "Case 2")
+
+
+    def test_constant_queries(self):
+        """Number of queries doesn't grow with number of rcvs listed."""
+        rcv = self.create_rcv_with_results("Case 1", ["passed"])
+        self.get()
+        with CaptureQueriesContext(connection) as one:
+            self.get()
+        self.create_rcv_with_results("Case 2", ["failed"], run=rcv.run)
+        self.create_rcv_with_results("Case 3", ["skipped"], run=rcv.run)
+        with CaptureQueriesContext(connection) as three:
+            self.get()
+
+        self.assertEqual(len(three), len(one))
+
+
 
 class RunCaseVersionDetailTest(case.view.AuthenticatedViewTestCase):
     """Test for runcaseversion-detail ajax view."""
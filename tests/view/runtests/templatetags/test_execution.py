@@ -76,8 +76,8 @@ class ResultForTest(case.DBTestCase):
         self.assertEqual(self.model.Result.objects.count(), 2)
 
 
-    def test_dupe_latest_results_sets_non_latest_to_false(self):
-        """If dupe latest results exists, keep the last-modified."""
+    def test_dupe_latest_results_follows_latest_pointer(self):
+        """If dupe latest flags exist, the latest result pointer wins."""
 
         with mock.patch("moztrap.model.mtmodel.utcnow") as mock_utcnow:
             mock_utcnow.return_value = datetime.datetime(2012, 3, 24)
@@ -108,7 +108,19 @@ class ResultForTest(case.DBTestCase):
                 ), str(res2.id))
         self.assertEqual(self.model.Result.objects.count(), 2)
         self.assertEqual(
-            self.model.Result.objects.get(is_latest=True).pk, res2.pk)
+            self.model.LatestResult.objects.get().result, res2)
+
+
+    def test_deleted_result(self):
+        """If the latest result is deleted, a new unsaved one is returned."""
+        r = self.F.ResultFactory()
+        r.delete()
+
+        self.assertEqual(
+            self.result_for(
+                r.runcaseversion, r.tester, r.environment, "{{ result.id }}"),
+            "None",
+            )
 
 
     def test_result_does_not_exist(self):
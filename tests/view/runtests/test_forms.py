@@ -198,7 +198,7 @@ class EnvironmentBuildSelectionFormTest(case.DBTestCase):
 
 
     def test_save_series(self):
-        """Save method returns ID of selected environment and new run id."""
+        """Save returns selected environment; queues job creating new run."""
         envs = self.F.EnvironmentFactory.create_full_set(
             {"OS": ["Linux", "Windows"]})
         cat = self.model.Category.objects.get()
@@ -219,9 +219,14 @@ class EnvironmentBuildSelectionFormTest(case.DBTestCase):
         self.assertTrue(f.is_valid(), f.errors)
 
         envid, runid = f.save()
-        newrun = self.F.model.Run.objects.get(pk=runid)
 
         self.assertEqual(envid, envs[0].id)
+        self.assertEqual(runid, None)
+        self.assertEqual(f.job.status, "queued")
+
+        f.job = self.model.Job.claim_next()
+        self.assertTrue(f.job.run())
+        newrun = self.F.model.Run.objects.get(pk=f.job.result_data["run_id"])
 
         self.assertEqual(
             newrun.name,
@@ -230,6 +235,31 @@ class EnvironmentBuildSelectionFormTest(case.DBTestCase):
         self.assertEqual(newrun.is_series, False)
         self.assertEqual(newrun.series, r)
         self.assertEqual(newrun.created_by, user)
+        self.assertEqual(newrun.status, "active")
+
+
+    def test_save_series_existing_build(self):
+        """Save returns the id of an existing run for the build."""
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"]})
+        cat = self.model.Category.objects.get()
+        r = self.F.RunFactory(is_series=True)
+        existing = self.F.RunFactory(series=r, build="foobuild")
+
+        f = self.form(
+            {
+                "category_{0}".format(cat.id): str(envs[0].elements.get().id),
+                "build": "foobuild",
+                },
+            run=r,
+            environments=self.model.Environment.objects.all(),
+            user=self.F.UserFactory.create(),
+            )
+
+        self.assertTrue(f.is_valid(), f.errors)
+        self.assertEqual(f.save(), (envs[0].id, existing.id))
+        self.assertEqual(f.job, None)
+        self.assertEqual(self.model.Job.objects.count(), 0)
 
 
     def test_series_without_build_set(self):
@@ -0,0 +1,109 @@
+"""
+Tests for bulk-loading results of the runtests list.
+
+"""
+from tests import case
+
+
+
+class ResultMapTest(case.DBTestCase):
+    """Tests for ResultMap."""
+    def setUp(self):
+        """A runcaseversion, an environment and a tester."""
+        self.rcv = self.F.RunCaseVersionFactory.create()
+        self.env = self.F.EnvironmentFactory.create()
+        self.tester = self.F.UserFactory.create()
+
+
+    @property
+    def resultmap(self):
+        """A ResultMap for the rcv's run, tester and environment."""
+        from moztrap.view.runtests.resultmap import ResultMap
+        return ResultMap(self.rcv.run, self.tester, self.env)
+
+
+    def result(self, **kwargs):
+        """Create a result for the rcv in the environment."""
+        kwargs.setdefault("tester", self.tester)
+        kwargs.setdefault("status", "failed")
+        return self.F.ResultFactory.create(
+            runcaseversion=self.rcv, environment=self.env, **kwargs)
+
+
+    def test_result(self):
+        """Returns the tester's latest result."""
+        self.result(status="passed")
+        r = self.result()
+        rm = self.resultmap
+        rm.load([self.rcv])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(rm.result(self.rcv), r)
+
+
+    def test_no_result(self):
+        """Returns an unsaved result if the tester has none."""
+        self.result(tester=self.F.UserFactory.create())
+
+        result = self.resultmap.result(self.rcv)
+
+        self.assertEqual(result.id, None)
+        self.assertEqual(result.tester, self.tester)
+        self.assertEqual(result.environment, self.env)
+        self.assertEqual(result.runcaseversion, self.rcv)
+
+
+    def test_other_result(self):
+        """Returns latest completed result of another tester."""
+        other = self.F.UserFactory.create()
+        r = self.result(tester=other, status="passed")
+        self.result(tester=self.F.UserFactory.create(), status="started")
+        self.result()
+
+        self.assertEqual(self.resultmap.other_result(self.rcv), r)
+
+
+    def test_stepresult(self):
+        """Returns loaded step results, or an unsaved one."""
+        r = self.result()
+        step = self.F.CaseStepFactory.create(caseversion=self.rcv.caseversion)
+        step2 = self.F.CaseStepFactory.create(
+            caseversion=self.rcv.caseversion)
+        sr = self.F.StepResultFactory.create(result=r, step=step)
+        rm = self.resultmap
+        rm.load([self.rcv])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(rm.stepresult(r, step), sr)
+            self.assertEqual(rm.stepresult(r, step2).id, None)
+
+
+    def test_stepresult_not_loaded(self):
+        """Returns None for a result that wasn't loaded."""
+        r = self.F.ResultFactory.create()
+        step = self.F.CaseStepFactory.create()
+
+        self.assertEqual(self.resultmap.stepresult(r, step), None)
+
+
+    def test_bug_urls(self):
+        """Bug urls of results and of caseversions in any run."""
+        r = self.result()
+        self.F.StepResultFactory.create(
+            result=r, bug_url="http://www.example.com/1")
+        other = self.F.RunCaseVersionFactory.create(
+            caseversion=self.rcv.caseversion)
+        self.F.StepResultFactory.create(
+            result__runcaseversion=other,
+            bug_url="http://www.example.com/2")
+        unloaded = self.F.ResultFactory.create()
+        rm = self.resultmap
+        rm.load([self.rcv])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                rm.bug_urls(r), set(["http://www.example.com/1"]))
+            self.assertEqual(
+                rm.bug_urls(self.rcv.caseversion),
+                set(["http://www.example.com/1", "http://www.example.com/2"]))
+            self.assertEqual(rm.bug_urls(unloaded), None)
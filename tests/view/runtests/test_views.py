@@ -5,6 +5,8 @@ Tests for runtests views.
 from datetime import datetime
 
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from BeautifulSoup import BeautifulSoup
 from mock import patch
@@ -202,7 +204,7 @@ class SetEnvironmentTest(case.view.AuthenticatedViewTestCase,
 
 
     def test_set_environment_and_build(self):
-        """Selecting an environment and build redirects to run view for that run/env."""
+        """Selecting an environment and new build redirects to job view."""
         self.add_perm("execute")
         self.testrun.environments.add(*self.envs)
         self.testrun.is_series = True
@@ -216,15 +218,105 @@ class SetEnvironmentTest(case.view.AuthenticatedViewTestCase,
 
         res = form.submit(status=302)
 
-        # we now need to find the run that was created for the series
-        # by having the old run as its series value.
-        newrun = self.F.model.Run.objects.get(series=self.testrun)
+        job = self.model.Job.objects.get()
+        self.assertRedirects(
+            res,
+            reverse(
+                "runtests_job",
+                kwargs={"job_id": job.id, "env_id": self.envs[0].id})
+            )
+
+
+    def test_set_environment_and_existing_build(self):
+        """Selecting an environment and existing build redirects to run view."""
+        self.add_perm("execute")
+        self.testrun.environments.add(*self.envs)
+        self.testrun.is_series = True
+        self.testrun.save()
+        newrun = self.F.RunFactory.create(
+            series=self.testrun, build="rahbuild", status="active")
+
+        cat = self.model.Category.objects.get()
+
+        form = self.get().forms["runtests-environment-form"]
+        form["category_{0}".format(cat.id)] = self.envs[0].elements.get().id
+        form["build"] = "rahbuild"
+
+        res = form.submit(status=302)
+
         self.assertRedirects(
             res,
             reverse(
                 "runtests_run",
                 kwargs={"run_id": newrun.id, "env_id": self.envs[0].id})
-        )
+            )
+
+
+
+class RunTestsJobTest(case.view.AuthenticatedViewTestCase,
+                      case.view.NoCacheTest,
+                      ):
+    """Tests for view waiting on a job preparing a run."""
+    def setUp(self):
+        """These tests all require a series build job and execute perm."""
+        super(RunTestsJobTest, self).setUp()
+        self.series = self.F.RunFactory.create(
+            status="active", is_series=True)
+        self.env = self.F.EnvironmentFactory.create()
+        self.job = self.series.queue_series_build("rahbuild", user=self.user)
+        self.add_perm("execute")
+
+
+    @property
+    def url(self):
+        """Shortcut for runtests job url."""
+        return reverse(
+            "runtests_job",
+            kwargs={"job_id": self.job.id, "env_id": self.env.id})
+
+
+    def test_requires_execute_permission(self):
+        """Requires execute permission."""
+        res = self.app.get(
+            self.url, user=self.F.UserFactory.create(), status=302)
+
+        self.assertRedirects(res, "/")
+
+
+    def test_queued(self):
+        """Unfinished job shows progress and refreshes."""
+        res = self.get(status=200)
+
+        res.mustcontain('http-equiv="refresh"')
+        self.assertElement(
+            res.html, "section", id="runjob-{0}".format(self.job.id))
+
+
+    def test_done(self):
+        """Finished job redirects to run view for the new run."""
+        job = self.model.Job.claim_next()
+        job.run()
+
+        res = self.get(status=302)
+
+        self.assertRedirects(
+            res,
+            reverse(
+                "runtests_run",
+                kwargs={
+                    "run_id": job.result_data["run_id"],
+                    "env_id": self.env.id})
+            )
+
+
+    def test_failed(self):
+        """Failed job redirects to run selection with a message."""
+        self.model.Job.objects.filter(pk=self.job.id).update(status="failed")
+
+        res = self.get(status=302)
+
+        self.assertRedirects(res, reverse("runtests"))
+        res.follow().mustcontain("could not be prepared")
 
 
 
@@ -298,6 +390,44 @@ class RunTestsTest(case.view.ListViewTestCase,
         self.assertRedirects(res, "/")
 
 
+    def test_constant_queries(self):
+        """Number of queries doesn't depend on the number of cases shown."""
+        other = self.F.UserFactory.create()
+        suite = self.F.SuiteFactory.create(
+            product=self.testrun.productversion.product)
+        self.F.RunSuiteFactory.create(run=self.testrun, suite=suite)
+
+        def add_case():
+            rcv = self.create_rcv()
+            self.F.SuiteCaseFactory.create(
+                suite=suite, case=rcv.caseversion.case)
+            step = self.F.CaseStepFactory.create(caseversion=rcv.caseversion)
+            self.F.CaseStepFactory.create(caseversion=rcv.caseversion)
+            result = self.create_result(runcaseversion=rcv, status="failed")
+            self.F.StepResultFactory.create(
+                result=result, step=step, status="failed",
+                bug_url="http://www.example.com/")
+            self.create_result(
+                runcaseversion=rcv, tester=other, status="passed")
+
+        def count():
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.get()
+            return len(ctx), res
+
+        add_case()
+        # warm up per-process caches (content types etc.)
+        count()
+        one, res = count()
+        for i in range(3):
+            add_case()
+        many, res = count()
+
+        self.assertEqual(many, one)
+        self.assertEqual(len(res.html.findAll("article", "listitem")), 4)
+        self.assertEqual(len(res.html.findAll("li", "bugurl")), 4)
+
+
     def test_markdown_safe(self):
         """Raw HTML and markdown attributes are escaped."""
         rcv = self.create_rcv(caseversion__description="<script>")